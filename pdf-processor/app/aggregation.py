@@ -0,0 +1,143 @@
+import sys
+
+import pandas as pd
+
+# Agregados opcionais da resposta de extração: totais por seção, por CNPJ, por código
+# de receita e por situação, calculados com operações vetorizadas do pandas.
+# Espelham os somatórios que o frontend refaz a cada renderização
+# (src/lib/totalCalculations.ts, TaxSummary, BillingCalculationsTable).
+
+MONEY_FIELDS = [
+    "valor_original", "saldo_devedor", "multa", "juros", "saldo_devedor_consolidado",
+    "valor_suspenso",            # SIEFPAR
+    "principal", "total",        # DARF
+]
+
+# Chave de agrupamento na resposta -> coluna da linha extraída
+GROUP_KEYS = [
+    ("porCnpj", "cnpj"),
+    ("porReceita", "receita"),
+    ("porSituacao", "situacao"),
+]
+
+RECEITA_CODE_PATTERN = r"^\s*(\d{4}(?:-\d{2})?)"
+
+
+def _money_frame(items):
+    frame = pd.DataFrame.from_records(items)
+    money_columns = [field for field in MONEY_FIELDS if field in frame.columns]
+    if not money_columns:
+        return None, []
+    frame[money_columns] = frame[money_columns].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    return frame, money_columns
+
+
+def _totals_records(grouped, money_columns, key_name):
+    totals = grouped[money_columns].sum().round(2)
+    totals["itens"] = grouped.size()
+    totals = totals.reset_index().rename(columns={"_chave": key_name})
+    return totals.to_dict(orient="records")
+
+
+def aggregate_section(items):
+    """Totais de uma seção; retorna None se a seção não tiver colunas de valor."""
+    if not items:
+        return None
+    frame, money_columns = _money_frame(items)
+    if frame is None:
+        return None
+
+    total = {column: round(float(frame[column].sum()), 2) for column in money_columns}
+    total["itens"] = int(len(frame))
+    agregado = {"total": total}
+
+    for key_name, column in GROUP_KEYS:
+        # DARF usa "codigo" no lugar de "receita"
+        if column == "receita" and column not in frame.columns:
+            column = "codigo"
+        if column not in frame.columns:
+            continue
+        chave = frame[column].fillna("").astype(str)
+        if key_name == "porReceita":
+            # Agrupa pelo código (ex.: "2172-01 - COFINS" -> "2172-01"); sem código, usa o texto
+            chave = chave.str.extract(RECEITA_CODE_PATTERN, expand=False).fillna(chave.str.strip())
+        grouped = frame.assign(_chave=chave).groupby("_chave", sort=True)
+        agregado[key_name] = _totals_records(grouped, money_columns, column)
+    return agregado
+
+
+def compute_aggregates(resultado):
+    """Calcula os agregados de todas as seções da resposta que tenham valores monetários."""
+    agregados = {}
+    for section, items in resultado.items():
+        # Só listas de registros (ignora, por exemplo, "secoesPuladas" de respostas parciais)
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            continue
+        agregado = aggregate_section(items)
+        if agregado is not None:
+            agregados[section] = agregado
+    print(f"Agregados calculados para {len(agregados)} seções.", file=sys.stdout)
+    return agregados
+
+
+class SectionSummary:
+    """Contagem e totais (geral e por CNPJ) de uma seção, acumulados registro a registro.
+
+    Usado no caminho de resumo no lugar da lista de itens (os parsers chamam append):
+    cada registro é somado e descartado. Os valores são somados em centavos inteiros,
+    então o resultado não depende da ordem e resumos de trechos extraídos em paralelo
+    podem ser juntados com merge.
+    """
+
+    # Campos que o resumo lê dos registros; os parsers podem deixar os demais de fora
+    campos = ("cnpj", *MONEY_FIELDS)
+
+    def __init__(self):
+        self.por_cnpj = {}
+
+    def __len__(self):
+        return sum(grupo["itens"] for grupo in self.por_cnpj.values())
+
+    def append(self, item):
+        cnpj = item.get("cnpj") or ""
+        grupo = self.por_cnpj.get(cnpj)
+        if grupo is None:
+            grupo = self.por_cnpj[cnpj] = {"itens": 0}
+        grupo["itens"] += 1
+        for field in MONEY_FIELDS:
+            valor = item.get(field)
+            if isinstance(valor, (int, float)):
+                grupo[field] = grupo.get(field, 0) + round(valor * 100)
+
+    def merge(self, other):
+        for cnpj, outro in other.por_cnpj.items():
+            grupo = self.por_cnpj.setdefault(cnpj, {"itens": 0})
+            for chave, valor in outro.items():
+                grupo[chave] = grupo.get(chave, 0) + valor
+
+    def as_dict(self):
+        total = {"itens": 0}
+        por_cnpj = []
+        for cnpj in sorted(self.por_cnpj):
+            grupo = self.por_cnpj[cnpj]
+            total["itens"] += grupo["itens"]
+            for field in MONEY_FIELDS:
+                if field in grupo:
+                    total[field] = total.get(field, 0) + grupo[field]
+            por_cnpj.append({"cnpj": cnpj, "itens": grupo["itens"],
+                             **{field: grupo[field] / 100 for field in MONEY_FIELDS if field in grupo}})
+        for field in MONEY_FIELDS:
+            if field in total:
+                total[field] = total[field] / 100
+        resumo = {"total": total}
+        if any(self.por_cnpj):
+            resumo["porCnpj"] = por_cnpj
+        return resumo
+
+
+def summarize_items(items):
+    """Contagem e totais (geral e por CNPJ) de uma lista de itens já extraídos."""
+    resumo = SectionSummary()
+    for item in items:
+        resumo.append(item)
+    return resumo.as_dict()
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import signal
+import sys
+import traceback
+
+from app import profiling
+
+try:
+    import resource
+except ImportError:  # Windows: sem RLIMIT_CPU, o orçamento fica desativado
+    resource = None
+
+# Orçamento de CPU por requisição: com EXTRACTION_CPU_BUDGET_SECONDS > 0, a etapa de
+# extração roda em um processo filho (fork) limitado por RLIMIT_CPU. Se o limite for
+# atingido, o kernel encerra o filho (SIGXCPU e, no limite rígido, SIGKILL) e a
+# requisição falha com ExtractionBudgetExceeded, sem deixar o worker do uvicorn preso
+# em uma entrada patológica. Sem a variável (ou com 0), a função roda no próprio processo.
+# O filho é bifurcado de um processo com threads e pode travar em um lock herdado, sem
+# gastar CPU: por isso também há um limite de tempo de relógio
+# (EXTRACTION_WALL_BUDGET_SECONDS, padrão 4x o de CPU), depois do qual o filho é morto.
+# As exceções do parser voltam ao worker com o tipo original.
+
+
+class ExtractionBudgetExceeded(Exception):
+    pass
+
+
+def get_cpu_budget_seconds():
+    try:
+        return max(0, int(os.environ.get("EXTRACTION_CPU_BUDGET_SECONDS", "0")))
+    except ValueError:
+        return 0
+
+
+def get_wall_budget_seconds(cpu_budget):
+    try:
+        wall = float(os.environ.get("EXTRACTION_WALL_BUDGET_SECONDS", "0"))
+    except ValueError:
+        wall = 0
+    return wall if wall > 0 else cpu_budget * 4
+
+
+def _run_limited(conn, budget, func, args):
+    resource.setrlimit(resource.RLIMIT_CPU, (budget, budget + 1))
+    # O pool da extração paralela escaparia do limite do filho
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    try:
+        conn.send(("ok", profiling.profiled_call(func, *args)))
+    except Exception as e:
+        print(traceback.format_exc(), file=sys.stdout)
+        try:
+            conn.send(("erro", e))
+        except Exception:
+            # Exceção que não pode ser serializada: volta como RuntimeError com a mensagem
+            conn.send(("erro", RuntimeError(f"{type(e).__name__}: {e}")))
+    finally:
+        conn.close()
+
+
+def run_with_cpu_budget(func, *args):
+    """Executa func(*args) respeitando o orçamento de CPU configurado."""
+    budget = get_cpu_budget_seconds()
+    if not budget or resource is None:
+        return profiling.profiled_call(func, *args)
+
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_limited, args=(child_conn, budget, func, args), daemon=True)
+    process.start()
+    child_conn.close()
+    wall_budget = get_wall_budget_seconds(budget)
+    try:
+        if not parent_conn.poll(wall_budget):
+            process.kill()
+            process.join()
+            print(f"Tempo limite de {wall_budget:g}s esgotado em {func.__name__}; processo de extração encerrado.", file=sys.stdout)
+            raise ExtractionBudgetExceeded(f"Tempo limite de {wall_budget:g}s esgotado durante a extração.")
+        status, payload = parent_conn.recv()
+    except EOFError:
+        # O filho morreu sem responder: estouro do orçamento ou falha do processo
+        process.join()
+        if process.exitcode in (-signal.SIGXCPU, -signal.SIGKILL):
+            print(f"Orçamento de CPU de {budget}s esgotado em {func.__name__}; extração cancelada.", file=sys.stdout)
+            raise ExtractionBudgetExceeded(f"Orçamento de CPU de {budget}s esgotado durante a extração.")
+        raise RuntimeError(f"Processo de extração encerrado inesperadamente (código {process.exitcode}).")
+    finally:
+        parent_conn.close()
+    process.join()
+    if status == "erro":
+        raise payload
+    return payload
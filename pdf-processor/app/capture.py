@@ -0,0 +1,190 @@
+import datetime
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import uuid
+
+# Captura opcional do texto de requisições lentas ou com erro, para reproduzir em
+# laboratório os layouts reais (tools/replay_captures.py). Ativada por CAPTURE_DIR:
+# o texto já pré-processado (saída de preprocess_text) é gravado, mascarado, quando a
+# etapa de extração passa de CAPTURE_SLOW_MS ou falha. CNPJs, CPFs, nomes e valores
+# são trocados de forma determinística (HMAC com CAPTURE_MASK_KEY, obrigatória: sem
+# ela nada é capturado): o mesmo CNPJ vira sempre o mesmo CNPJ mascarado, preservando
+# o formato e o agrupamento por empresa.
+# O diretório é limitado a CAPTURE_MAX_BYTES; as capturas mais antigas são apagadas.
+
+CAPTURE_ID_PATTERN = re.compile(r"^\d{20}-[0-9a-f]{8}$")
+CAPTURE_SUFFIX = ".json.gz"
+
+CNPJ_PATTERN = re.compile(r"\b(\d{2})\.(\d{3})\.(\d{3})/(\d{4})-(\d{2})\b")
+CPF_PATTERN = re.compile(r"\b\d{3}\.\d{3}\.\d{3}-\d{2}\b")
+MONEY_PATTERN = re.compile(r"\b\d{1,3}(?:\.\d{3})*,\d{2}\b")
+# Nomes de empresas e pessoas: o texto depois do rótulo, até o fim da linha
+NAME_PATTERN = re.compile(
+    r"^(\s*(?:Devedor\s+Principal|Nome\s+Empresarial|Razão\s+Social|Nome|Contribuinte|Responsável)\s*:\s*)(\S.*)$"
+    r"|^(\s*CNPJ:\s*[\d./-]+\s+-\s+)(\S.*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+_warned_key = False
+
+
+def get_capture_dir():
+    return os.environ.get("CAPTURE_DIR", "")
+
+
+def get_slow_ms():
+    return float(os.environ.get("CAPTURE_SLOW_MS", "2000"))
+
+
+def get_max_bytes():
+    return int(os.environ.get("CAPTURE_MAX_BYTES", 100 * 1024 * 1024))
+
+
+def get_mask_key():
+    return os.environ.get("CAPTURE_MASK_KEY", "")
+
+
+def _mask_key():
+    key = get_mask_key()
+    if not key:
+        # Sem a chave o HMAC é reversível por força bruta (CNPJs e valores têm poucos dígitos)
+        raise ValueError("CAPTURE_MASK_KEY não configurada; texto não mascarado.")
+    return key.encode("utf-8")
+
+
+def capture_enabled():
+    """Captura ligada: exige CAPTURE_DIR e CAPTURE_MASK_KEY (sem a chave, nada é gravado)."""
+    global _warned_key
+    if not get_capture_dir():
+        return False
+    if not get_mask_key():
+        if not _warned_key:
+            _warned_key = True
+            print("ERRO: CAPTURE_DIR configurado sem CAPTURE_MASK_KEY; a captura de textos está desligada.", file=sys.stdout)
+        return False
+    return True
+
+
+def _digits(key, rotulo, valor, quantidade):
+    """`quantidade` dígitos derivados de HMAC(key, rotulo:valor)."""
+    digest = hmac.new(key, f"{rotulo}:{valor}".encode("utf-8"), hashlib.sha256).digest()
+    return str(int.from_bytes(digest, "big")).zfill(quantidade)[-quantidade:]
+
+
+def _replace_digits(original, digitos):
+    """Troca os dígitos de `original` pelos de `digitos`, mantendo pontuação e o zero à esquerda."""
+    saida = []
+    proximos = iter(digitos)
+    for posicao, caractere in enumerate(original):
+        if not caractere.isdigit():
+            saida.append(caractere)
+            continue
+        digito = next(proximos)
+        if posicao == 0 and (caractere == "0") != (digito == "0"):
+            # "0,50" continua começando em zero e "1.234,56" não passa a começar em zero
+            digito = "0" if caractere == "0" else str(int(digito) % 9 + 1)
+        saida.append(digito)
+    return "".join(saida)
+
+
+def mask_text(texto, key=None):
+    """Mascara CNPJs, CPFs, nomes e valores monetários do texto, de forma determinística."""
+    key = _mask_key() if key is None else key
+
+    def cnpj(match):
+        raiz = "".join(match.groups()[:3])
+        # Raiz e ordem mascaradas em separado: matriz e filiais continuam com a mesma raiz
+        mascarado = _digits(key, "cnpj-raiz", raiz, 8) + _digits(key, "cnpj-ordem", raiz + match.group(4), 4)
+        mascarado += _digits(key, "cnpj-dv", match.group(0), 2)
+        return _replace_digits(match.group(0), mascarado)
+
+    def nome(match):
+        rotulo = match.group(1) or match.group(3)
+        valor = match.group(2) or match.group(4)
+        return f"{rotulo}NOME {hmac.new(key, valor.strip().encode('utf-8'), hashlib.sha256).hexdigest()[:8].upper()}"
+
+    texto = CNPJ_PATTERN.sub(cnpj, texto)
+    texto = CPF_PATTERN.sub(lambda match: _replace_digits(match.group(0), _digits(key, "cpf", match.group(0), 11)), texto)
+    texto = NAME_PATTERN.sub(nome, texto)
+    return MONEY_PATTERN.sub(
+        lambda match: _replace_digits(match.group(0), _digits(key, "valor", match.group(0), len(match.group(0)))), texto
+    )
+
+
+def should_capture(duracao_ms, erro):
+    return capture_enabled() and (erro is not None or duracao_ms >= get_slow_ms())
+
+
+def enforce_size_cap(diretorio, max_bytes):
+    """Apaga as capturas mais antigas até o diretório caber em max_bytes."""
+    arquivos = []
+    for nome in os.listdir(diretorio):
+        if nome.endswith(CAPTURE_SUFFIX):
+            caminho = os.path.join(diretorio, nome)
+            arquivos.append((nome, caminho, os.path.getsize(caminho)))
+    total = sum(tamanho for _, _, tamanho in arquivos)
+    # Os nomes começam pelo instante da captura: a ordem alfabética é a cronológica
+    for _, caminho, tamanho in sorted(arquivos):
+        if total <= max_bytes:
+            break
+        os.remove(caminho)
+        total -= tamanho
+
+
+def save_capture(endpoint, doc_type, cleaned_text, duracao_ms, erro=None, secoes=None):
+    """Grava a captura mascarada e retorna o id (None se a gravação falhar)."""
+    diretorio = get_capture_dir()
+    try:
+        key = _mask_key()
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        capture_id = f"{agora.strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        registro = {
+            "id": capture_id,
+            "capturadoEm": agora.isoformat(timespec="seconds"),
+            "endpoint": endpoint,
+            "tipoDocumento": doc_type,
+            "secoes": secoes,
+            "duracaoMs": round(duracao_ms, 1),
+            # A mensagem de erro pode citar trechos do texto
+            "erro": mask_text(erro, key) if erro is not None else None,
+            "texto": mask_text(cleaned_text, key),
+        }
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, capture_id + CAPTURE_SUFFIX)
+        with gzip.open(caminho + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(registro, f, ensure_ascii=False)
+        os.replace(caminho + ".tmp", caminho)
+        enforce_size_cap(diretorio, get_max_bytes())
+        print(f"Captura {capture_id} gravada ({endpoint}, {duracao_ms:.0f} ms).", file=sys.stdout)
+        return capture_id
+    except Exception as e:
+        # A captura nunca pode derrubar a requisição
+        print(f"Erro ao gravar a captura de texto: {e}", file=sys.stdout)
+        return None
+
+
+def capture_in_background(endpoint, doc_type, cleaned_text, duracao_ms, erro=None, secoes=None):
+    """Mascara e grava em uma thread, sem atrasar a resposta da requisição já lenta."""
+    threading.Thread(
+        target=save_capture, args=(endpoint, doc_type, cleaned_text, duracao_ms, erro, secoes), daemon=True
+    ).start()
+
+
+def load_capture(caminho):
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_captures(diretorio):
+    """Caminhos das capturas do diretório, da mais antiga para a mais recente."""
+    return [
+        os.path.join(diretorio, nome)
+        for nome in sorted(os.listdir(diretorio))
+        if nome.endswith(CAPTURE_SUFFIX) and CAPTURE_ID_PATTERN.match(nome[: -len(CAPTURE_SUFFIX)])
+    ]
@@ -0,0 +1,72 @@
+import sys
+
+# Formato compacto (colunar) da resposta de extração, opcional: em vez de repetir as
+# chaves em cada linha, cada seção traz a lista de colunas e as linhas como listas de
+# valores. Strings que se repetem muito (CNPJ, receita, situação, modalidade...) são
+# codificadas por dicionário: a coluna guarda o índice em "dicionarios"[campo], que é
+# compartilhado entre as seções. Negociado por ?formato=compacto ou pelo cabeçalho
+# Accept: application/vnd.actplan.compacto+json.
+
+MEDIA_TYPE = "application/vnd.actplan.compacto+json"
+FORMAT_PARAM_VALUE = "compacto"
+FORMAT_VERSION = 1
+
+DICTIONARY_FIELDS = [
+    "cnpj", "cno", "receita", "situacao", "modalidade", "tipo_devedor", "codigo", "denominacao",
+    "localizacao", "tipo", "sispar_modalidade",
+]
+
+
+def wants_compact(accept_header, formato):
+    return formato == FORMAT_PARAM_VALUE or MEDIA_TYPE in (accept_header or "")
+
+
+def _is_row_list(valor):
+    return isinstance(valor, list) and bool(valor) and all(isinstance(item, dict) for item in valor)
+
+
+def compact_section(items, dicionarios, indices):
+    colunas = []
+    vistas = set()
+    for item in items:
+        for campo in item:
+            if campo not in vistas:
+                vistas.add(campo)
+                colunas.append(campo)
+    codificadas = [campo for campo in colunas if campo in DICTIONARY_FIELDS]
+    for campo in codificadas:
+        dicionarios.setdefault(campo, [])
+        indices.setdefault(campo, {})
+
+    linhas = []
+    for item in items:
+        linha = []
+        for campo in colunas:
+            valor = item.get(campo)
+            if campo in indices and isinstance(valor, str):
+                indice = indices[campo].get(valor)
+                if indice is None:
+                    indice = indices[campo][valor] = len(dicionarios[campo])
+                    dicionarios[campo].append(valor)
+                valor = indice
+            linha.append(valor)
+        linhas.append(linha)
+    return {"colunas": colunas, "codificadas": codificadas, "linhas": linhas}
+
+
+def to_compact(resultado):
+    """Converte uma resposta de extração para o formato compacto."""
+    dicionarios, indices = {}, {}
+    secoes = {}
+    compacto = {"formato": FORMAT_PARAM_VALUE, "versao": FORMAT_VERSION, "dicionarios": dicionarios, "secoes": secoes}
+    for chave, valor in resultado.items():
+        if _is_row_list(valor):
+            secoes[chave] = compact_section(valor, dicionarios, indices)
+        elif isinstance(valor, list) and not valor:
+            secoes[chave] = {"colunas": [], "codificadas": [], "linhas": []}
+        else:
+            # Campos que não são listas de linhas (agregados, tipoDocumento, partial...) seguem como estão
+            compacto[chave] = valor
+    print(f"Resposta compacta: {len(secoes)} seções, {sum(len(d) for d in dicionarios.values())} strings no dicionário.", file=sys.stdout)
+    return compacto
+
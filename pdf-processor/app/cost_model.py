@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+# Modelo de custo da extração usado pela inspeção prévia (/api/extraction/inspecao).
+# Por tipo de documento, tempo e pico de memória são estimados como fixo + porLinha * linhas
+# de texto do PDF. Os coeficientes vêm de cost_model.json, ajustado por
+# tools/calibrate_cost.py sobre as medições do corpus de regressão (tests/golden).
+# O tempo é o da extração sem os logs por linha; a memória é o pico de alocações Python
+# (tracemalloc), sem o próprio PDF e as estruturas do PyMuPDF.
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cost_model.json")
+
+# Modos de processamento recomendados ao cliente, do mais barato ao mais caro
+MODE_SYNC = "sincrono"     # chamada normal do endpoint de extração
+MODE_PARTIAL = "parcial"   # prazo_ms + continuação: seções entregues em partes
+MODE_BATCH = "lote"        # fora da requisição (tools/extract_bulk.py)
+
+_model = None
+
+
+def load_model():
+    """Coeficientes por tipo de documento ({} se o arquivo não existir)."""
+    global _model
+    if _model is None:
+        try:
+            with open(MODEL_PATH, encoding="utf-8") as f:
+                _model = json.load(f).get("modelo", {})
+        except (OSError, ValueError) as e:
+            print(f"Modelo de custo indisponível ({e}); inspeção sem estimativa.", file=sys.stdout)
+            _model = {}
+    return _model
+
+
+def fit_linear(pontos):
+    """Mínimos quadrados de y = fixo + porLinha * x para pontos [(x, y)], sem coeficientes negativos.
+
+    None sem pontos (tipo de documento sem medições): o modelo fica sem estimativa para ele.
+    """
+    n = len(pontos)
+    if not n:
+        return None
+    media_x = sum(x for x, _ in pontos) / n
+    media_y = sum(y for _, y in pontos) / n
+    variancia = sum((x - media_x) ** 2 for x, _ in pontos)
+    por_linha = sum((x - media_x) * (y - media_y) for x, y in pontos) / variancia if variancia else 0.0
+    por_linha = max(0.0, por_linha)
+    fixo = max(0.0, media_y - por_linha * media_x)
+    return {"fixo": round(fixo, 3), "porLinha": round(por_linha, 5)}
+
+
+def estimate(doc_type, linhas):
+    """{"tempoMs", "memoriaPicoKb"} estimados para o documento ou None sem modelo para o tipo."""
+    coeficientes = load_model().get(doc_type or "")
+    if not coeficientes or not all(coeficientes.get(medida) for medida in ("tempoMs", "memoriaPicoKb")):
+        return None
+    return {
+        medida: round(coeficientes[medida]["fixo"] + coeficientes[medida]["porLinha"] * linhas, 1)
+        for medida in ("tempoMs", "memoriaPicoKb")
+    }
+
+
+def get_sync_max_ms():
+    return float(os.environ.get("INSPECTION_SYNC_MAX_MS", "3000"))
+
+
+def get_partial_max_ms():
+    return float(os.environ.get("INSPECTION_PARTIAL_MAX_MS", "30000"))
+
+
+def recommend_mode(tempo_ms, permite_parcial):
+    """Modo de processamento para o tempo estimado (permite_parcial: o tipo aceita prazo_ms)."""
+    if tempo_ms <= get_sync_max_ms():
+        return MODE_SYNC
+    if permite_parcial and tempo_ms <= get_partial_max_ms():
+        return MODE_PARTIAL
+    return MODE_BATCH
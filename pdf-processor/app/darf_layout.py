@@ -0,0 +1,244 @@
+import re
+import sys
+
+import fitz  # PyMuPDF
+
+# Leitura da tabela "Composição do Documento de Arrecadação" do DARF pelas coordenadas
+# das palavras (page.get_text("words")), em vez das posições das linhas no texto corrido.
+# O cabeçalho Código / Denominação / Principal / Multa / Juros / Total define as colunas;
+# as palavras são agrupadas em linhas visuais pela altura e cada item (linha do código,
+# descrição e "PA ... Vencimento ...") é montado em uma única passada. Cada página é
+# lida de forma independente, então DARFs de muitas páginas podem ser divididos entre
+# processos. Quando nenhuma página tem a tabela, o chamador usa o extrator de texto.
+
+HEADER_COLUMNS = ["codigo", "denominacao", "principal", "multa", "juros", "total"]
+HEADER_WORDS = {
+    "código": "codigo", "codigo": "codigo",
+    "denominação": "denominacao", "denominacao": "denominacao",
+    "principal": "principal", "multa": "multa", "juros": "juros", "total": "total",
+}
+MONEY_COLUMNS = ["principal", "multa", "juros", "total"]
+
+CODE_PATTERN = re.compile(r"^\d{4}$")
+MONEY_PATTERN = re.compile(r"^\d{1,3}(?:\.\d{3})*,\d{2}$")
+PERIODO_PATTERN = re.compile(r"PA\s+(\d{2}/\d{2}/\d{4}|\d{2}/\d{4})")
+VENCIMENTO_PATTERN = re.compile(r"Vencimento\s+(\d{2}/\d{2}/\d{4})")
+TABLE_END_PREFIXES = ("Total do Documento", "VENCIMENTO", "AUTENTICAÇÃO")
+
+# Diferença máxima (em pontos) entre os centros verticais de palavras da mesma linha
+ROW_TOLERANCE = 3.0
+
+
+def page_words(page):
+    """Palavras da página como (x0, y0, x1, y1, texto), prontas para enviar a outro processo."""
+    return [tuple(word[:5]) for word in page.get_text("words")]
+
+
+def group_rows(words):
+    """Agrupa as palavras em linhas visuais (de cima para baixo), cada uma ordenada por x."""
+    rows = []
+    atual, centro = [], None
+    for word in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        meio = (word[1] + word[3]) / 2
+        if atual and meio - centro > ROW_TOLERANCE:
+            rows.append(sorted(atual))
+            atual = []
+        if not atual:
+            centro = meio
+        atual.append(word)
+    if atual:
+        rows.append(sorted(atual))
+    return rows
+
+
+def row_text(row):
+    return " ".join(word[4] for word in row)
+
+
+def find_header(rows):
+    """Índice da linha de cabeçalho e os centros x das colunas; (None, None) se não houver."""
+    for index, row in enumerate(rows):
+        centros = {}
+        for word in row:
+            coluna = HEADER_WORDS.get(word[4].lower())
+            if coluna and coluna not in centros:
+                centros[coluna] = (word[0] + word[2]) / 2
+        if len(centros) == len(HEADER_COLUMNS):
+            return index, centros
+    return None, None
+
+
+def column_bounds(centros):
+    """Limites x de cada coluna: ponto médio entre os centros de cabeçalhos vizinhos."""
+    ordem = sorted(HEADER_COLUMNS, key=centros.get)
+    limites = {}
+    for posicao, coluna in enumerate(ordem):
+        inicio = (centros[ordem[posicao - 1]] + centros[coluna]) / 2 if posicao else float("-inf")
+        fim = (centros[coluna] + centros[ordem[posicao + 1]]) / 2 if posicao + 1 < len(ordem) else float("inf")
+        limites[coluna] = (inicio, fim)
+    return limites
+
+
+def column_of(word, limites):
+    meio = (word[0] + word[2]) / 2
+    for coluna, (inicio, fim) in limites.items():
+        if inicio <= meio < fim:
+            return coluna
+    return None
+
+
+def start_item(row, limites):
+    """Abre um item a partir da linha do código: denominação e valores pelas colunas."""
+    palavras = row[1:]
+    # Valores são a sequência de palavras monetárias no fim da linha
+    inicio_valores = len(palavras)
+    while inicio_valores and MONEY_PATTERN.match(palavras[inicio_valores - 1][4]):
+        inicio_valores -= 1
+    valores = palavras[inicio_valores:]
+    item = {
+        "codigo": row[0][4],
+        "denominacao": [word[4] for word in palavras[:inicio_valores]],
+        "valores": {},
+        "resto": [],
+        # Sem valores na linha do código (fluxo de texto): vêm nas linhas de baixo
+        "valores_abaixo": not valores,
+    }
+    if len(valores) == len(MONEY_COLUMNS):
+        # Linha completa: a ordem basta, mesmo que o PDF não alinhe os valores às colunas
+        item["valores"] = {coluna: word[4] for coluna, word in zip(MONEY_COLUMNS, valores)}
+        return item
+    for word in valores:
+        # Células em branco: cada valor vai para a coluna sob a qual está
+        coluna = column_of(word, limites)
+        if coluna in MONEY_COLUMNS and coluna not in item["valores"]:
+            item["valores"][coluna] = word[4]
+        else:
+            item["denominacao"].append(word[4])
+    return item
+
+
+def add_values_below(item, row):
+    """Valores em linhas abaixo da linha do código: preenchem as colunas que faltam, na ordem."""
+    faltando = [coluna for coluna in MONEY_COLUMNS if coluna not in item["valores"]]
+    for coluna, word in zip(faltando, row):
+        item["valores"][coluna] = word[4]
+
+
+def values_missing(item):
+    return item["valores_abaixo"] and len(item["valores"]) < len(MONEY_COLUMNS)
+
+
+def finish_item(item, parse_currency, pagina):
+    """Converte o item aberto no formato de extract_darf_data; None se estiver incompleto."""
+    resto = item["resto"]
+    denominacao = " ".join(item["denominacao"])
+    if not denominacao and resto:
+        # Denominação quebrada para a linha de baixo do código
+        denominacao, resto = resto[0], resto[1:]
+    complemento = " ".join(resto)
+    periodo_match = PERIODO_PATTERN.search(complemento)
+    vencimento_match = VENCIMENTO_PATTERN.search(complemento)
+    periodo = periodo_match.group(1) if periodo_match else ""
+    vencimento = vencimento_match.group(1) if vencimento_match else ""
+    if not denominacao or not periodo or not vencimento:
+        print(f"❌ Dados incompletos para código {item['codigo']} na página {pagina} (leitura por coordenadas)", file=sys.stdout)
+        return None
+    darf_item = {
+        "codigo": item["codigo"],
+        "denominacao": denominacao,
+        "periodo_apuracao": periodo,
+        "vencimento": vencimento,
+    }
+    for coluna in MONEY_COLUMNS:
+        darf_item[coluna] = parse_currency(item["valores"].get(coluna, ""))
+    return darf_item
+
+
+def parse_page(words, pagina, parse_currency, centros=None):
+    """Lê os itens da tabela de uma página.
+
+    Retorna {"colunas", "itens", "aberta", "incompleta"}: colunas é None quando a página
+    não tem o cabeçalho (e nenhum foi herdado); aberta indica que a tabela chega ao fim
+    da página sem linha de encerramento e pode continuar na próxima; incompleta indica
+    que algum item ficou sem os valores (o item é descartado e a página deve ser lida
+    pelo extrator de texto).
+    """
+    rows = group_rows(words)
+    inicio, proprias = find_header(rows)
+    if proprias is not None:
+        centros, rows = proprias, rows[inicio + 1:]
+    elif centros is None:
+        return {"colunas": None, "itens": [], "aberta": False, "incompleta": False}
+
+    limites = column_bounds(centros)
+    codigo_fim = limites["codigo"][1]
+    itens = []
+    incompletos = []
+    aberto = None
+    aberta = True
+    for row in rows + [None]:
+        texto = row_text(row) if row else ""
+        fim = row is None or texto.startswith(TABLE_END_PREFIXES)
+        codigo = not fim and CODE_PATTERN.match(row[0][4]) and (row[0][0] + row[0][2]) / 2 < codigo_fim
+        if aberto and (fim or codigo):
+            if values_missing(aberto):
+                incompletos.append(aberto["codigo"])
+            else:
+                itens.append(finish_item(aberto, parse_currency, pagina))
+            aberto = None
+        if fim:
+            aberta = row is None
+            break
+        if codigo:
+            aberto = start_item(row, limites)
+        elif aberto:
+            if values_missing(aberto) and all(MONEY_PATTERN.match(word[4]) for word in row):
+                add_values_below(aberto, row)
+            else:
+                aberto["resto"].append(texto)
+    itens = [item for item in itens if item]
+    if incompletos:
+        print(f"❌ Valores não encontrados para os códigos {incompletos} na página {pagina} (leitura por coordenadas)", file=sys.stdout)
+    print(f"Página {pagina} do DARF: {len(itens)} itens lidos por coordenadas.", file=sys.stdout)
+    return {"colunas": centros, "itens": itens, "aberta": aberta, "incompleta": bool(incompletos)}
+
+
+def parse_pages(paginas, parse_currency, map_pages=map, fallback=None):
+    """Lê todas as páginas (map_pages permite distribuí-las entre processos).
+
+    Páginas sem cabeçalho logo depois de uma tabela que ficou aberta são lidas de novo
+    com as colunas herdadas. Páginas com itens sem valores são lidas por fallback(texto
+    da página), quando dado, no lugar da leitura por coordenadas. Retorna None quando
+    nenhuma página tem a tabela.
+    """
+    numeros = list(range(1, len(paginas) + 1))
+    resultados = list(map_pages(parse_page, paginas, numeros, [parse_currency] * len(paginas)))
+    if all(resultado["colunas"] is None for resultado in resultados):
+        return None
+
+    itens = []
+    anterior = None
+    for words, numero, resultado in zip(paginas, numeros, resultados):
+        if resultado["colunas"] is None and anterior is not None and anterior["aberta"]:
+            resultado = parse_page(words, numero, parse_currency, anterior["colunas"])
+        if resultado["incompleta"] and fallback is not None:
+            print(f"Página {numero} do DARF lida pelo extrator de texto.", file=sys.stdout)
+            itens.extend(fallback(page_text(words)))
+        else:
+            itens.extend(resultado["itens"])
+        anterior = resultado if resultado["colunas"] is not None else None
+    return itens
+
+
+def page_text(words):
+    """Texto da página, uma linha visual por linha."""
+    return "\n".join(row_text(row) for row in group_rows(words))
+
+
+def read_pdf_words(pdf_bytes):
+    """Palavras de cada página do PDF."""
+    pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return [page_words(page) for page in pdf]
+    finally:
+        pdf.close()
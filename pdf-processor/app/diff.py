@@ -0,0 +1,130 @@
+import sys
+from collections import defaultdict, deque
+
+from app.aggregation import MONEY_FIELDS
+
+# Comparação entre duas extrações de Situação Fiscal do mesmo cliente (relatório anterior
+# x atual). Cada linha recebe uma identidade estável por seção e as duas extrações são
+# casadas por dicionário, em tempo linear: linhas adicionadas, removidas, com valores
+# alterados e débitos que passaram da Pendência SIEF para a Exigibilidade Suspensa
+# (ou voltaram).
+
+DIFF_KEYS = {
+    "pendenciasDebito": ["cnpj", "receita", "periodo_apuracao", "vencimento"],
+    "debitosExigSuspensaSief": ["cnpj", "receita", "periodo_apuracao", "vencimento"],
+    "pendenciasInscricao": ["inscricao"],
+    "parcelamentosSiefpar": ["cnpj", "parcelamento"],
+    "pendenciasParcelamentoSispar": ["cnpj", "conta"],
+    "parcelamentosSipade": ["cnpj", "processo"],
+    "processosFiscais": ["cnpj", "processo"],
+    "debitosSicob": ["cnpj", "parcelamento"],
+    # Itens do DARF como gravados no histórico (seção "darf"); usado no reprocessamento
+    "darf": ["codigo", "periodo_apuracao", "vencimento"],
+}
+
+# Campos comparados nas linhas casadas, além dos valores monetários
+COMPARED_FIELDS = MONEY_FIELDS + ["situacao"]
+
+# Seções com a mesma identidade entre as quais um débito pode migrar
+MOVEMENT_PAIRS = [("pendenciasDebito", "debitosExigSuspensaSief")]
+
+
+def row_key(secao, item):
+    chave = []
+    for campo in DIFF_KEYS[secao]:
+        valor = str(item.get(campo) or "").strip()
+        # SIMPLES NAC. é numerado pela ordem no relatório (SIMPLES-001...): o número não é estável
+        if campo == "receita" and valor.startswith("SIMPLES-"):
+            valor = "SIMPLES"
+        chave.append(valor)
+    return tuple(chave)
+
+
+def _key_dict(secao, chave):
+    return dict(zip(DIFF_KEYS[secao], chave))
+
+
+def _differences(anterior, atual):
+    diferencas = {}
+    for campo in COMPARED_FIELDS:
+        if campo not in anterior and campo not in atual:
+            continue
+        antes, depois = anterior.get(campo), atual.get(campo)
+        if campo in MONEY_FIELDS:
+            antes, depois = float(antes or 0), float(depois or 0)
+            if round(antes - depois, 2) == 0:
+                continue
+            diferencas[campo] = {"antes": antes, "depois": depois, "variacao": round(depois - antes, 2)}
+        elif (antes or "") != (depois or ""):
+            diferencas[campo] = {"antes": antes, "depois": depois}
+    return diferencas
+
+
+def diff_section(secao, anteriores, atuais):
+    """Compara as linhas de uma seção; linhas com a mesma chave são casadas na ordem do relatório."""
+    pendentes = defaultdict(deque)
+    for item in anteriores:
+        pendentes[row_key(secao, item)].append(item)
+
+    adicionados, alterados = [], []
+    inalterados = 0
+    for item in atuais:
+        chave = row_key(secao, item)
+        fila = pendentes.get(chave)
+        if not fila:
+            adicionados.append((chave, item))
+            continue
+        anterior = fila.popleft()
+        # Caso mais comum: a linha não mudou
+        diferencas = {} if anterior == item else _differences(anterior, item)
+        if diferencas:
+            alterados.append({"chave": _key_dict(secao, chave), "antes": anterior, "depois": item, "diferencas": diferencas})
+        else:
+            inalterados += 1
+
+    removidos = [(chave, item) for chave, fila in pendentes.items() for item in fila]
+    return {"adicionados": adicionados, "removidos": removidos, "alterados": alterados, "inalterados": inalterados}
+
+
+def _extract_movements(secoes, origem, destino):
+    """Retira das listas as linhas que saíram de uma seção e entraram na outra."""
+    movidos = []
+    for de, para in ((origem, destino), (destino, origem)):
+        if de not in secoes or para not in secoes:
+            continue
+        entradas = defaultdict(deque)
+        for posicao, (chave, item) in enumerate(secoes[para]["adicionados"]):
+            entradas[chave].append(posicao)
+        usados = set()
+        restantes = []
+        for chave, item in secoes[de]["removidos"]:
+            fila = entradas.get(chave)
+            if fila:
+                posicao = fila.popleft()
+                usados.add(posicao)
+                movidos.append({"de": de, "para": para, "antes": item, "depois": secoes[para]["adicionados"][posicao][1]})
+            else:
+                restantes.append((chave, item))
+        secoes[de]["removidos"] = restantes
+        secoes[para]["adicionados"] = [linha for posicao, linha in enumerate(secoes[para]["adicionados"]) if posicao not in usados]
+    return movidos
+
+
+def diff_results(anterior, atual):
+    """Diferença entre dois resultados de extração da Situação Fiscal."""
+    secoes = {
+        secao: diff_section(secao, anterior.get(secao) or [], atual.get(secao) or [])
+        for secao in DIFF_KEYS
+        if secao in anterior or secao in atual
+    }
+    movidos = []
+    for origem, destino in MOVEMENT_PAIRS:
+        movidos += _extract_movements(secoes, origem, destino)
+
+    resumo = {}
+    for secao, resultado in secoes.items():
+        resultado["adicionados"] = [item for _, item in resultado["adicionados"]]
+        resultado["removidos"] = [item for _, item in resultado["removidos"]]
+        resumo[secao] = {campo: len(valor) if isinstance(valor, list) else valor for campo, valor in resultado.items()}
+    print(f"Diferença calculada: {resumo}; {len(movidos)} débitos movidos.", file=sys.stdout)
+    return {"secoes": secoes, "movidos": movidos, "resumo": resumo}
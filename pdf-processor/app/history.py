@@ -0,0 +1,486 @@
+import base64
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import zlib
+
+from app.aggregation import RECEITA_CODE_PATTERN
+from app.ingestion import format_date_for_db
+
+# Histórico local das extrações em SQLite. Cada resultado é gravado com um registro por
+# item, indexado por CNPJ, seção, código de receita e data do relatório, para responder
+# "quanto o cliente devia no mês passado?" sem reenviar nem reprocessar o PDF antigo.
+# Ativado por HISTORY_DB_PATH; o tamanho é limitado por HISTORY_MAX_EXTRACTIONS e
+# HISTORY_RETENTION_DAYS (as extrações mais antigas são apagadas a cada gravação).
+# O SHA-256 do arquivo enviado também é gravado (só para resultados completos), para que
+# o cliente pergunte pelo hash antes de reenviar um PDF já extraído.
+# Cada extração guarda a versão dos extratores que a produziu (versao_parser) e, em
+# fontes, o PDF (até HISTORY_SOURCE_MAX_BYTES) ou o texto pré-processado, comprimidos:
+# quando os extratores mudam, app/reprocessing.py refaz as extrações antigas a partir deles.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em TEXT NOT NULL,
+    data_relatorio TEXT NOT NULL,
+    tipo_documento TEXT NOT NULL,
+    arquivo TEXT NOT NULL DEFAULT '',
+    sha256 TEXT NOT NULL DEFAULT '',
+    versao_parser INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS fontes (
+    extracao_id INTEGER PRIMARY KEY REFERENCES extracoes(id) ON DELETE CASCADE,
+    tipo TEXT NOT NULL,
+    conteudo BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS itens (
+    extracao_id INTEGER NOT NULL REFERENCES extracoes(id) ON DELETE CASCADE,
+    secao TEXT NOT NULL,
+    cnpj TEXT NOT NULL,
+    receita TEXT NOT NULL,
+    data_relatorio TEXT NOT NULL,
+    dados TEXT NOT NULL,
+    posicao INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS itens_cnpj_data ON itens (cnpj, data_relatorio);
+CREATE INDEX IF NOT EXISTS itens_cnpj_secao_receita ON itens (cnpj, secao, receita, data_relatorio);
+CREATE INDEX IF NOT EXISTS itens_extracao ON itens (extracao_id);
+CREATE INDEX IF NOT EXISTS extracoes_data ON extracoes (data_relatorio);
+CREATE INDEX IF NOT EXISTS extracoes_criado_em ON extracoes (criado_em);
+"""
+
+# Cabeçalho do relatório do e-CAC: data e hora da emissão na primeira página
+REPORT_DATE_PATTERN = re.compile(r"(\d{2}/\d{2}/\d{4})\s+\d{2}:\d{2}(?::\d{2})?")
+REPORT_DATE_SEARCH_CHARS = 3000
+
+# Seção usada para os itens do DARF (a resposta do DARF não tem chave de seção)
+DARF_SECTION = "darf"
+
+# Campos aceitos na ordenação das páginas de uma seção e como cada um é comparado.
+# Datas DD/MM/YYYY (DARF) são convertidas para YYYY-MM-DD; campos ausentes valem 0 ou "".
+SORT_FIELD_TYPES = {
+    "saldo_devedor_consolidado": "numero", "saldo_devedor": "numero", "valor_original": "numero",
+    "multa": "numero", "juros": "numero", "principal": "numero", "total": "numero",
+    "valor_suspenso": "numero", "vencimento": "data", "inscrito_em": "data",
+    "cnpj": "texto", "receita": "texto", "situacao": "texto", "codigo": "texto",
+}
+
+ITEM_INSERT = (
+    "INSERT INTO itens (extracao_id, secao, cnpj, receita, data_relatorio, dados, posicao) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def get_history_path():
+    return os.environ.get("HISTORY_DB_PATH", "")
+
+
+def get_max_extractions():
+    return int(os.environ.get("HISTORY_MAX_EXTRACTIONS", "10000"))
+
+
+def get_retention_days():
+    return int(os.environ.get("HISTORY_RETENTION_DAYS", "730"))
+
+
+def get_store_source():
+    return os.environ.get("HISTORY_STORE_SOURCE", "1") != "0"
+
+
+def get_source_max_bytes():
+    return int(os.environ.get("HISTORY_SOURCE_MAX_BYTES", 2 * 1024 * 1024))
+
+
+def connect():
+    """Abre uma conexão com o histórico, criando o esquema na primeira vez."""
+    path = get_history_path()
+    if not path:
+        raise RuntimeError("HISTORY_DB_PATH não configurado; histórico indisponível.")
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    if path not in _schema_ready:
+        with _schema_lock:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            migrate(conn)
+            _schema_ready.add(path)
+    return conn
+
+
+def migrate(conn):
+    """Acrescenta as colunas criadas depois da primeira versão do esquema."""
+    colunas = {row["name"] for row in conn.execute("PRAGMA table_info(extracoes)")}
+    if "sha256" not in colunas:
+        conn.execute("ALTER TABLE extracoes ADD COLUMN sha256 TEXT NOT NULL DEFAULT ''")
+    if "versao_parser" not in colunas:
+        # Extrações gravadas antes do carimbo ficam com a versão 0
+        conn.execute("ALTER TABLE extracoes ADD COLUMN versao_parser INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS extracoes_sha256 ON extracoes (sha256, tipo_documento)")
+    conn.execute("CREATE INDEX IF NOT EXISTS extracoes_versao_parser ON extracoes (versao_parser, id)")
+    colunas_itens = {row["name"] for row in conn.execute("PRAGMA table_info(itens)")}
+    if "posicao" not in colunas_itens:
+        conn.execute("ALTER TABLE itens ADD COLUMN posicao INTEGER NOT NULL DEFAULT 0")
+        # Itens gravados antes da coluna: o rowid já segue a ordem do relatório em cada seção
+        conn.execute("UPDATE itens SET posicao = rowid")
+    conn.execute("DROP INDEX IF EXISTS itens_extracao_secao")
+    conn.execute("CREATE INDEX IF NOT EXISTS itens_extracao_secao_posicao ON itens (extracao_id, secao, posicao)")
+    # Um índice por campo de ordenação, com a mesma expressão de page_section: cada página é
+    # lida pelo índice, sem ordenar a seção inteira a cada pedido
+    for campo in SORT_FIELD_TYPES:
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS itens_ordem_{campo} ON itens (extracao_id, secao, {_sort_expression(campo)}, posicao)"
+        )
+    conn.commit()
+
+
+def normalize_cnpj(cnpj):
+    return re.sub(r"\D", "", cnpj or "")
+
+
+def receita_code(item):
+    """Código da receita do item (ex.: "2172-01 - COFINS" -> "2172-01"; DARF usa "codigo")."""
+    texto = str(item.get("receita") or item.get("codigo") or "")
+    match = re.match(RECEITA_CODE_PATTERN, texto)
+    return match.group(1) if match else texto.strip()
+
+
+def detect_report_date(text):
+    """Data de emissão do relatório (YYYY-MM-DD) pelo cabeçalho; None se não encontrar."""
+    match = REPORT_DATE_PATTERN.search(text[:REPORT_DATE_SEARCH_CHARS])
+    return format_date_for_db(match.group(1)) if match else None
+
+
+def result_sections(resultado):
+    """Lista (seção, itens) de um resultado de extração de Situação Fiscal ou DARF."""
+    if isinstance(resultado.get("data"), list):
+        return [(DARF_SECTION, resultado["data"])]
+    return [
+        (secao, itens) for secao, itens in resultado.items()
+        if isinstance(itens, list) and all(isinstance(item, dict) for item in itens) and secao != "agregados"
+    ]
+
+
+def _item_rows(extracao_id, data_relatorio, resultado):
+    # posicao é a ordem do item na seção: a chave estável do cursor, mesmo se os itens forem regravados
+    for secao, itens in result_sections(resultado):
+        for posicao, item in enumerate(itens):
+            yield (
+                extracao_id, secao, normalize_cnpj(item.get("cnpj")), receita_code(item),
+                data_relatorio, json.dumps(item, ensure_ascii=False), posicao,
+            )
+
+
+def apply_retention(conn):
+    # A idade conta da gravação, não da data do relatório: relatórios antigos podem ser importados
+    limite = (datetime.datetime.now() - datetime.timedelta(days=get_retention_days())).isoformat(timespec="seconds")
+    removidas = conn.execute("DELETE FROM extracoes WHERE criado_em < ?", (limite,)).rowcount
+    removidas += conn.execute(
+        "DELETE FROM extracoes WHERE id NOT IN (SELECT id FROM extracoes ORDER BY id DESC LIMIT ?)",
+        (get_max_extractions(),),
+    ).rowcount
+    if removidas:
+        print(f"Histórico: {removidas} extrações removidas pela retenção.", file=sys.stdout)
+
+
+def source_record(pdf_bytes, cleaned_text):
+    """(tipo, conteúdo) da fonte a guardar: o PDF se couber no limite, senão o texto pré-processado."""
+    if not get_store_source():
+        return None
+    if pdf_bytes and len(pdf_bytes) <= get_source_max_bytes():
+        return "pdf", pdf_bytes
+    if cleaned_text:
+        return "texto", cleaned_text.encode("utf-8")
+    return None
+
+
+def save_extraction(resultado, tipo_documento, data_relatorio=None, arquivo="", sha256="", versao_parser=0, fonte=None):
+    """Grava um resultado de extração e retorna o id da extração no histórico.
+
+    O sha256 só deve ser passado para resultados completos (ver set_content_hash).
+    fonte: (tipo, bytes) de source_record, usada no reprocessamento.
+    """
+    data_relatorio = data_relatorio or datetime.date.today().isoformat()
+    conn = connect()
+    try:
+        with conn:
+            extracao_id = conn.execute(
+                "INSERT INTO extracoes (criado_em, data_relatorio, tipo_documento, arquivo, sha256, versao_parser) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (datetime.datetime.now().isoformat(timespec="seconds"), data_relatorio, tipo_documento, arquivo or "",
+                 sha256 or "", versao_parser),
+            ).lastrowid
+            conn.executemany(ITEM_INSERT, _item_rows(extracao_id, data_relatorio, resultado))
+            if fonte:
+                conn.execute(
+                    "INSERT INTO fontes VALUES (?, ?, ?)", (extracao_id, fonte[0], zlib.compress(fonte[1], 6))
+                )
+            apply_retention(conn)
+    finally:
+        conn.close()
+    print(f"Histórico: extração {extracao_id} gravada ({tipo_documento}, relatório de {data_relatorio}).", file=sys.stdout)
+    return extracao_id
+
+
+def append_sections(extracao_id, resultado):
+    """Acrescenta seções a uma extração já gravada (continuação de uma resposta parcial)."""
+    conn = connect()
+    try:
+        with conn:
+            row = conn.execute("SELECT data_relatorio FROM extracoes WHERE id = ?", (extracao_id,)).fetchone()
+            if row is None:
+                return False
+            conn.executemany(ITEM_INSERT, _item_rows(extracao_id, row["data_relatorio"], resultado))
+    finally:
+        conn.close()
+    return True
+
+
+def load_source(extracao_id):
+    """(tipo, bytes) da fonte guardada da extração; None se não houver."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT tipo, conteudo FROM fontes WHERE extracao_id = ?", (extracao_id,)).fetchone()
+    finally:
+        conn.close()
+    return (row["tipo"], zlib.decompress(row["conteudo"])) if row else None
+
+
+def outdated_extractions(versao_parser, depois_de=0, limite=100):
+    """Extrações com fonte gravadas por versões anteriores dos extratores, em ordem de id."""
+    conn = connect()
+    try:
+        return [dict(row) for row in conn.execute(
+            "SELECT e.id, e.tipo_documento, e.versao_parser FROM extracoes e JOIN fontes f ON f.extracao_id = e.id "
+            "WHERE e.versao_parser < ? AND e.id > ? ORDER BY e.id LIMIT ?",
+            (versao_parser, depois_de, limite),
+        )]
+    finally:
+        conn.close()
+
+
+def count_outdated(versao_parser):
+    """{"pendentes": com fonte, "semFonte": sem fonte (só um novo envio corrige)} das versões anteriores."""
+    conn = connect()
+    try:
+        row = conn.execute(
+            "SELECT COUNT(f.extracao_id) AS pendentes, COUNT(*) - COUNT(f.extracao_id) AS sem_fonte "
+            "FROM extracoes e LEFT JOIN fontes f ON f.extracao_id = e.id WHERE e.versao_parser < ?",
+            (versao_parser,),
+        ).fetchone()
+    finally:
+        conn.close()
+    return {"pendentes": row["pendentes"], "semFonte": row["sem_fonte"]}
+
+
+def replace_result(extracao_id, resultado, versao_parser):
+    """Troca os itens de uma extração pelo resultado reprocessado e atualiza a versão."""
+    conn = connect()
+    try:
+        with conn:
+            row = conn.execute("SELECT data_relatorio FROM extracoes WHERE id = ?", (extracao_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute("DELETE FROM itens WHERE extracao_id = ?", (extracao_id,))
+            conn.executemany(ITEM_INSERT, _item_rows(extracao_id, row["data_relatorio"], resultado))
+            conn.execute("UPDATE extracoes SET versao_parser = ? WHERE id = ?", (versao_parser, extracao_id))
+    finally:
+        conn.close()
+    return True
+
+
+def set_parser_version(extracao_id, versao_parser):
+    """Atualiza só a versão de uma extração cujo resultado não mudou no reprocessamento."""
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("UPDATE extracoes SET versao_parser = ? WHERE id = ?", (versao_parser, extracao_id))
+    finally:
+        conn.close()
+
+
+def set_content_hash(extracao_id, sha256):
+    """Associa o hash do arquivo a uma extração que ficou completa (ex.: após a continuação)."""
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("UPDATE extracoes SET sha256 = ? WHERE id = ?", (sha256, extracao_id))
+    finally:
+        conn.close()
+
+
+def find_by_hash(sha256, tipo_documento=None, versao_parser=None):
+    """Id da extração completa mais recente do arquivo com esse SHA-256; None se não houver.
+
+    Com versao_parser, só conta a extração feita por essa versão dos extratores: uma gravada
+    antes de uma correção (ainda não reprocessada) não é devolvida como se fosse atual.
+    """
+    filtros, params = ["sha256 = ?"], [sha256.lower()]
+    if versao_parser is not None:
+        filtros.append("versao_parser = ?")
+        params.append(versao_parser)
+    if tipo_documento:
+        filtros.append("tipo_documento = ?")
+        params.append(tipo_documento)
+    conn = connect()
+    try:
+        row = conn.execute(
+            f"SELECT id FROM extracoes WHERE {' AND '.join(filtros)} ORDER BY id DESC LIMIT 1", params
+        ).fetchone()
+    finally:
+        conn.close()
+    return row["id"] if row else None
+
+
+def _sort_expression(campo):
+    valor = f"json_extract(dados, '$.{campo}')"
+    tipo = SORT_FIELD_TYPES[campo]
+    if tipo == "numero":
+        return f"COALESCE({valor}, 0)"
+    if tipo == "data":
+        return (
+            f"COALESCE(CASE WHEN {valor} LIKE '__/__/____' "
+            f"THEN substr({valor}, 7, 4) || '-' || substr({valor}, 4, 2) || '-' || substr({valor}, 1, 2) "
+            f"ELSE {valor} END, '')"
+        )
+    return f"COALESCE({valor}, '')"
+
+
+def encode_cursor(valor, posicao):
+    return base64.urlsafe_b64encode(json.dumps([valor, posicao]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Retorna (valor, posicao) do último item da página anterior; ValueError se o cursor for inválido."""
+    try:
+        valor, posicao = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(posicao, int) or not (valor is None or isinstance(valor, (int, float, str))):
+        raise ValueError("cursor inválido")
+    return valor, posicao
+
+
+def page_section(extracao_id, secao, ordenar=None, decrescente=False, limite=500, cursor=None):
+    """Uma página dos itens de uma seção, por cursor (keyset), na ordem do relatório ou por um campo.
+
+    Retorna {"itens", "total", "proximoCursor"} (proximoCursor é None na última página) ou
+    None se a extração não existir. Cada página custa uma consulta pelo índice do campo
+    (ver migrate), sem carregar nem ordenar a seção inteira.
+    """
+    if ordenar and ordenar not in SORT_FIELD_TYPES:
+        raise ValueError(f"ordenação não suportada: {ordenar}")
+    expressao = _sort_expression(ordenar) if ordenar else "NULL"
+    filtros, params = ["extracao_id = ?", "secao = ?"], [extracao_id, secao]
+    if cursor:
+        valor, posicao = decode_cursor(cursor)
+        if ordenar:
+            # Empates no campo são desfeitos pela ordem do relatório (posição crescente)
+            filtros.append(f"({expressao} {'<' if decrescente else '>'} ? OR ({expressao} = ? AND posicao > ?))")
+            params += [valor, valor, posicao]
+        else:
+            filtros.append("posicao > ?")
+            params.append(posicao)
+    ordem = f"{expressao} {'DESC' if decrescente else 'ASC'}, posicao" if ordenar else "posicao"
+
+    conn = connect()
+    try:
+        if conn.execute("SELECT 1 FROM extracoes WHERE id = ?", (extracao_id,)).fetchone() is None:
+            return None
+        total = conn.execute(
+            "SELECT COUNT(*) FROM itens WHERE extracao_id = ? AND secao = ?", (extracao_id, secao)
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT posicao, {expressao} AS chave, dados FROM itens WHERE {' AND '.join(filtros)} ORDER BY {ordem} LIMIT ?",
+            params + [limite + 1],
+        ).fetchall()
+    finally:
+        conn.close()
+    proximo = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        proximo = encode_cursor(rows[-1]["chave"], rows[-1]["posicao"])
+    return {"itens": [json.loads(row["dados"]) for row in rows], "total": total, "proximoCursor": proximo}
+
+
+def list_extractions(cnpj=None, de=None, ate=None, limite=100):
+    """Extrações gravadas (mais recentes primeiro), com o número de itens por seção."""
+    filtros, params = [], []
+    if cnpj:
+        filtros.append("e.id IN (SELECT extracao_id FROM itens WHERE cnpj = ?)")
+        params.append(normalize_cnpj(cnpj))
+    if de:
+        filtros.append("e.data_relatorio >= ?")
+        params.append(de)
+    if ate:
+        filtros.append("e.data_relatorio <= ?")
+        params.append(ate)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    conn = connect()
+    try:
+        extracoes = [dict(row) for row in conn.execute(
+            f"SELECT e.* FROM extracoes e {where} ORDER BY e.data_relatorio DESC, e.id DESC LIMIT ?", params + [limite]
+        )]
+        for extracao in extracoes:
+            extracao["itensPorSecao"] = {
+                row["secao"]: row["total"] for row in conn.execute(
+                    "SELECT secao, COUNT(*) AS total FROM itens WHERE extracao_id = ? GROUP BY secao", (extracao["id"],)
+                )
+            }
+    finally:
+        conn.close()
+    return extracoes
+
+
+def get_extraction(extracao_id):
+    """Reconstrói o resultado gravado de uma extração; None se não existir."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT * FROM extracoes WHERE id = ?", (extracao_id,)).fetchone()
+        if row is None:
+            return None
+        extracao = dict(row)
+        secoes = {}
+        for item in conn.execute("SELECT secao, dados FROM itens WHERE extracao_id = ? ORDER BY rowid", (extracao_id,)):
+            secoes.setdefault(item["secao"], []).append(json.loads(item["dados"]))
+    finally:
+        conn.close()
+    if extracao["tipo_documento"] == "darf":
+        extracao["resultado"] = {"data": secoes.get(DARF_SECTION, [])}
+    else:
+        extracao["resultado"] = secoes
+    return extracao
+
+
+def query_items(cnpj, secao=None, receita=None, de=None, ate=None, limite=1000):
+    """Itens de um CNPJ ao longo do tempo, com a data do relatório de origem."""
+    filtros, params = ["i.cnpj = ?"], [normalize_cnpj(cnpj)]
+    for coluna, valor in (("i.secao", secao), ("i.receita", receita)):
+        if valor:
+            filtros.append(f"{coluna} = ?")
+            params.append(valor)
+    if de:
+        filtros.append("i.data_relatorio >= ?")
+        params.append(de)
+    if ate:
+        filtros.append("i.data_relatorio <= ?")
+        params.append(ate)
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT i.extracao_id, i.secao, i.data_relatorio, i.dados FROM itens i WHERE {' AND '.join(filtros)} "
+            "ORDER BY i.data_relatorio DESC, i.extracao_id DESC, i.rowid LIMIT ?",
+            params + [limite],
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        dict(json.loads(row["dados"]), extracao_id=row["extracao_id"], secao=row["secao"], data_relatorio=row["data_relatorio"])
+        for row in rows
+    ]
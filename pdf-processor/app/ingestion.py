@@ -0,0 +1,292 @@
+import os
+import re
+import sys
+import threading
+
+# Ingestão em lote dos resultados de extração na tabela order_items (Postgres/Supabase).
+# Substitui as inserções feitas linha a linha pelo navegador: todas as linhas de um
+# resultado são gravadas com COPY em uma única transação, usando um pool de conexões.
+
+ORDER_ITEMS_COLUMNS = [
+    "order_id", "code", "tax_type", "start_period", "end_period", "due_date",
+    "original_value", "current_balance", "fine", "interest", "status", "cno",
+    "denominacao", "cnpj", "inscricao", "receita", "inscrito_em", "ajuizado_em",
+    "processo", "tipo_devedor", "devedor_principal", "parcelamento", "valor_suspenso",
+    "modalidade", "sispar_conta", "sispar_descricao", "sispar_modalidade",
+    "saldo_devedor_consolidado",
+]
+
+# Mesmo fallback usado em src/lib/api.ts quando a data não pode ser convertida
+DEFAULT_DB_DATE = "2024-01-01"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_database_url():
+    return os.environ.get("DATABASE_URL", "")
+
+
+def get_pool():
+    """Retorna o pool de conexões (criado na primeira chamada a partir de DATABASE_URL)."""
+    global _pool
+    if _pool is not None:
+        return _pool
+    with _pool_lock:
+        if _pool is None:
+            # Import tardio: o serviço funciona sem psycopg quando a ingestão não é usada
+            from psycopg_pool import ConnectionPool
+
+            database_url = get_database_url()
+            if not database_url:
+                raise RuntimeError("DATABASE_URL não configurada; ingestão indisponível.")
+            _pool = ConnectionPool(
+                database_url,
+                min_size=int(os.environ.get("DATABASE_POOL_MIN_SIZE", 1)),
+                max_size=int(os.environ.get("DATABASE_POOL_MAX_SIZE", 5)),
+                open=True,
+            )
+            print(f"Pool de conexões Postgres criado (max={_pool.max_size}).", file=sys.stdout)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# --- Conversão para o formato da tabela order_items ---
+# Espelha convertToOrderItems (src/lib/pdfProcessor.ts), convertDarfToOrderItems
+# (src/lib/darfProcessor.ts) e formatDateForDB (src/lib/api.ts).
+
+def format_date_for_db(date_str):
+    """Converte YYYY-MM-DD, DD/MM/YYYY ou MM/YYYY para YYYY-MM-DD; retorna None se não reconhecer."""
+    if not date_str:
+        return None
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", date_str):
+        return date_str
+    match = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{4})$", date_str)
+    if match:
+        day, month, year = match.groups()
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    match = re.match(r"^(\d{1,2})/(\d{4})$", date_str)
+    if match:
+        month, year = match.groups()
+        return f"{year}-{month.zfill(2)}-01"
+    return None
+
+
+def format_darf_due_date(date_str):
+    """Equivalente a formatDateFromDDMMYYYY do darfProcessor (vencimento DD/MM/YYYY, trimestre ou MM/YYYY)."""
+    if not date_str:
+        return DEFAULT_DB_DATE
+    match = re.search(r"(\d{2})/(\d{2})/(\d{4})", date_str)
+    if match:
+        day, month, year = match.groups()
+        return f"{year}-{month}-{day}"
+    match = re.search(r"(\d+)\s*TRI/(\d{4})", date_str, re.IGNORECASE)
+    if match:
+        trimestre, year = match.groups()
+        month = {"1": "03", "2": "06", "3": "09", "4": "12"}.get(trimestre, "03")
+        return f"{year}-{month}-31"
+    match = re.search(r"(\d{2})/(\d{4})", date_str)
+    if match:
+        month, year = match.groups()
+        return f"{year}-{month}-01"
+    return DEFAULT_DB_DATE
+
+
+def _is_simples(receita):
+    receita_upper = (receita or "").upper()
+    return "SIMPLES NAC" in receita_upper or "SIMPLES" in receita_upper or "1507" in receita_upper
+
+
+def _debito_item(debito):
+    receita = debito.get("receita") or ""
+    is_simples = _is_simples(receita)
+
+    code = receita
+    if not code.strip() or code == "SEM CÓDIGO" or code.startswith("ITEM-"):
+        if is_simples:
+            code = "SIMPLES_NACIONAL"
+        elif (debito.get("periodo_apuracao") or "").strip():
+            code = "ITEM-" + re.sub(r"[/\s]", "-", debito["periodo_apuracao"])
+        elif debito.get("cnpj"):
+            code = "ITEM-" + re.sub(r"\D", "", debito["cnpj"])[-6:]
+
+    start_period = debito.get("periodo_apuracao") or ""
+    due_date = debito.get("vencimento") or ""
+    return {
+        "code": code,
+        "tax_type": "SIMPLES_NACIONAL" if is_simples else "DEBITO",
+        "start_period": start_period,
+        "end_period": start_period,
+        "due_date": due_date,
+        "original_value": debito.get("valor_original") or 0,
+        "current_balance": debito.get("saldo_devedor") or 0,
+        "fine": debito.get("multa") or 0,
+        "interest": debito.get("juros") or 0,
+        "status": debito.get("situacao") or "DEVEDOR",
+        "cno": debito.get("cno") or "",
+        "cnpj": debito.get("cnpj") or "",
+        "saldo_devedor_consolidado": debito.get("saldo_devedor_consolidado") or 0,
+    }
+
+
+def _exig_suspensa_item(debito):
+    code = debito.get("receita") or ""
+    if not code.strip() and debito.get("periodo_apuracao"):
+        code = "EXIG-SUSPENSA-" + re.sub(r"[/\s]", "-", debito["periodo_apuracao"])
+    item = _debito_item(debito)
+    item.update({
+        "code": code,
+        "tax_type": "DEBITO_EXIG_SUSPENSA_SIEF",
+        "status": debito.get("situacao") or "",
+        "cnpj": None,
+    })
+    return item
+
+
+def _siefpar_item(item):
+    return {
+        "code": item.get("parcelamento") or "",
+        "tax_type": "PARCELAMENTO_SIEFPAR",
+        "start_period": "PARCELAMENTO",
+        "end_period": "PARCELAMENTO",
+        "due_date": "SUSPENSO",
+        "original_value": item.get("valor_suspenso") or 0,
+        "current_balance": item.get("valor_suspenso") or 0,
+        "fine": 0,
+        "interest": 0,
+        "status": item.get("modalidade") or "ATIVO",
+        "cno": "",
+        "cnpj": item.get("cnpj") or "",
+    }
+
+
+def _sida_item(item):
+    return {
+        "code": item.get("inscricao") or "",
+        "tax_type": "PENDENCIA_INSCRICAO_SIDA",
+        "inscricao": item.get("inscricao") or "",
+        "receita": item.get("receita") or "",
+        "inscrito_em": item.get("inscrito_em") or "",
+        "ajuizado_em": item.get("ajuizado_em") or "",
+        "processo": item.get("processo") or "",
+        "tipo_devedor": item.get("tipo_devedor") or "",
+        "devedor_principal": item.get("devedor_principal") or "",
+        "start_period": item.get("inscrito_em") or "INSCRICAO",
+        "end_period": item.get("inscrito_em") or "INSCRICAO",
+        "due_date": item.get("ajuizado_em") or "NAO AJUIZADO",
+        "original_value": 0,
+        "current_balance": 0,
+        "fine": 0,
+        "interest": 0,
+        "status": item.get("situacao") or "ATIVA",
+        "cno": "",
+        "cnpj": item.get("cnpj") or "",
+        "saldo_devedor_consolidado": 0,
+    }
+
+
+def _sispar_item(item):
+    return {
+        "code": item.get("conta") or "",
+        "tax_type": "PENDENCIA_PARCELAMENTO_SISPAR",
+        "start_period": "PARCELAMENTO",
+        "end_period": "PARCELAMENTO",
+        "due_date": "NEGOCIADO",
+        "original_value": 0,
+        "current_balance": 0,
+        "fine": 0,
+        "interest": 0,
+        "status": item.get("modalidade") or item.get("descricao") or "ATIVO",
+        "cno": "",
+        "cnpj": item.get("cnpj") or "",
+        "saldo_devedor_consolidado": 0,
+        "sispar_conta": item.get("conta") or "",
+        "sispar_descricao": item.get("descricao") or "",
+        "sispar_modalidade": item.get("modalidade") or "",
+    }
+
+
+def _darf_item(darf):
+    due_date = format_darf_due_date(darf.get("vencimento") or "")
+    period = darf.get("periodo_apuracao") or due_date
+    return {
+        "code": darf.get("codigo") or "",
+        "tax_type": "DARF",
+        "start_period": period,
+        "end_period": period,
+        "due_date": due_date,
+        "original_value": darf.get("principal") or 0,
+        "current_balance": darf.get("total") or 0,
+        "fine": darf.get("multa") or 0,
+        "interest": darf.get("juros") or 0,
+        "status": "PENDING",
+        "cno": "",
+        "denominacao": darf.get("denominacao") or "",
+    }
+
+
+# Seção da resposta da extração -> conversor de linha
+SECTION_CONVERTERS = [
+    ("pendenciasDebito", _debito_item),
+    ("debitosExigSuspensaSief", _exig_suspensa_item),
+    ("parcelamentosSiefpar", _siefpar_item),
+    ("pendenciasInscricao", _sida_item),
+    ("pendenciasParcelamentoSispar", _sispar_item),
+    ("data", _darf_item),  # Resposta do /extract-darf
+]
+
+
+# Colunas adicionais que createOrder grava como NULL quando vazias
+NULLABLE_COLUMNS = set(ORDER_ITEMS_COLUMNS[ORDER_ITEMS_COLUMNS.index("denominacao"):])
+
+
+def build_order_item_rows(resultado, order_id):
+    """Converte a resposta de extração (Situação Fiscal ou DARF) em tuplas na ordem de ORDER_ITEMS_COLUMNS."""
+    rows = []
+    for section, converter in SECTION_CONVERTERS:
+        for item in resultado.get(section) or []:
+            converted = converter(item)
+            # Mesmos fallbacks que createOrder aplica antes do insert
+            converted["order_id"] = order_id
+            converted["code"] = converted["code"] or f"ITEM_{len(rows)}"
+            converted["status"] = converted["status"] or "pending"
+            for column in ("start_period", "end_period", "due_date"):
+                converted[column] = format_date_for_db(converted[column]) or DEFAULT_DB_DATE
+            for column in ("original_value", "current_balance", "fine", "interest"):
+                converted[column] = converted[column] or 0
+            row = []
+            for column in ORDER_ITEMS_COLUMNS:
+                value = converted.get(column)
+                if column in NULLABLE_COLUMNS and not value:
+                    value = None
+                row.append(value)
+            rows.append(tuple(row))
+    return rows
+
+
+def ingest_order_items(resultado, order_id, replace_existing=False):
+    """Grava todas as linhas do resultado em order_items com COPY, em uma única transação.
+
+    Com replace_existing=True os itens já existentes do pedido são removidos na
+    mesma transação (reimportação). Retorna o número de linhas gravadas.
+    """
+    rows = build_order_item_rows(resultado, order_id)
+    pool = get_pool()
+    with pool.connection() as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                if replace_existing:
+                    cur.execute("DELETE FROM order_items WHERE order_id = %s", (order_id,))
+                copy_sql = f"COPY order_items ({', '.join(ORDER_ITEMS_COLUMNS)}) FROM STDIN"
+                with cur.copy(copy_sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+    print(f"Ingestão concluída: {len(rows)} itens gravados para o pedido {order_id}.", file=sys.stdout)
+    return len(rows)
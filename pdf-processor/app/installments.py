@@ -0,0 +1,150 @@
+import calendar
+import datetime
+import os
+
+import numpy as np
+
+# Cronogramas de parcelamento calculados em lote, com operações vetorizadas do numpy.
+# Substitui o cálculo parcela a parcela do navegador (createPaymentPlan em
+# src/lib/api.ts, CreatePaymentPlanModal) para planos em lote sobre centenas de CNPJs:
+# todos os débitos de todos os planos viram uma matriz débitos x parcelas.
+#
+# Sem juros, a regra é a do frontend: parcelas de ceil(valor / n) em centavos e a última
+# com o restante (com floor quando o ceil deixaria a última negativa). Com taxaJurosMensal > 0, tabela Price: parcela fixa arredondada em
+# centavos e a última ajustada para zerar o saldo.
+
+# Valor do débito: o mesmo critério do frontend (saldo consolidado, senão saldo atual:
+# current_balance nas linhas de order_items, saldo_devedor nas da extração);
+# "total" cobre as linhas de DARF
+VALUE_FIELDS = ("saldo_devedor_consolidado", "current_balance", "saldo_devedor", "total")
+
+
+def get_max_installments():
+    return int(os.environ.get("PAYMENT_PLAN_MAX_INSTALLMENTS", "240"))
+
+
+def get_max_cells():
+    return int(os.environ.get("PAYMENT_PLAN_MAX_CELLS", "20000000"))
+
+
+def debt_values(itens, campo_valor=None):
+    """Valor de cada linha (primeiro campo de VALUE_FIELDS diferente de zero)."""
+    campos = (campo_valor,) if campo_valor else VALUE_FIELDS
+    valores = np.zeros(len(itens))
+    for indice, item in enumerate(itens):
+        for campo in campos:
+            try:
+                valor = float(item.get(campo) or 0)
+            except (TypeError, ValueError):
+                valor = 0.0
+            if valor:
+                valores[indice] = valor
+                break
+    return valores
+
+
+def installment_matrix(valores, parcelas, taxa_mensal=0.0):
+    """Matrizes (valor, juros) de forma (linhas, max(parcelas)); zeros depois da última parcela."""
+    valores = np.asarray(valores, dtype=float)
+    parcelas = np.asarray(parcelas, dtype=np.int64)
+    if valores.size == 0:
+        return np.zeros((0, 0)), np.zeros((0, 0))
+    numero = np.arange(1, int(parcelas.max()) + 1)[None, :]
+    ativa = numero <= parcelas[:, None]
+    ultima = numero == parcelas[:, None]
+    v = valores[:, None]
+    n = parcelas[:, None]
+
+    if not taxa_mensal:
+        # Mesmas operações em ponto flutuante do frontend: Math.ceil(total / n * 100) / 100
+        parcela = np.ceil(v / n * 100) / 100
+        # Valor pequeno para muitas parcelas (ex.: 0,05 em 10): com o teto, as n-1 primeiras
+        # passariam do total e a última ficaria negativa; nesses débitos vale o piso
+        parcela = np.where(np.round(parcela * (n - 1), 2) > v, np.floor(v / n * 100) / 100, parcela)
+        restante = v - parcela * (n - 1)
+        valor = np.where(ultima, restante, parcela)
+        return np.round(np.where(ativa, valor, 0.0), 2), np.zeros(valor.shape)
+
+    r = float(taxa_mensal)
+    fator = (1 + r) ** n
+    parcela = np.round(v * r * fator / (fator - 1), 2)
+    # Saldo antes da parcela k: v(1+r)^(k-1) - P((1+r)^(k-1) - 1)/r
+    crescimento = (1 + r) ** (numero - 1)
+    saldo_anterior = v * crescimento - parcela * (crescimento - 1) / r
+    juros = np.round(saldo_anterior * r, 2)
+    valor = np.where(ultima, np.round(saldo_anterior * (1 + r), 2), parcela)
+    return np.where(ativa, valor, 0.0), np.where(ativa, juros, 0.0)
+
+
+def add_months(data, meses):
+    """Mesmo dia `meses` depois, limitado ao último dia do mês (31/01 + 1 = 28/02 ou 29/02)."""
+    mes = data.month - 1 + meses
+    ano, mes = data.year + mes // 12, mes % 12 + 1
+    return datetime.date(ano, mes, min(data.day, calendar.monthrange(ano, mes)[1]))
+
+
+def due_dates(primeiro_vencimento, quantidade):
+    return [add_months(primeiro_vencimento, meses).isoformat() for meses in range(quantidade)]
+
+
+def build_schedules(planos, parcelas_padrao, taxa_mensal=0.0, primeiro_vencimento=None, detalhar_itens=False):
+    """Cronogramas de uma lista de planos {"id", "valores" (np.array), "parcelas", "reducao"}.
+
+    O cronograma de cada plano é calculado sobre o total dos débitos menos a redução (como
+    createPaymentPlan); com detalhar_itens, cada débito ganha o seu cronograma, com a
+    redução do plano distribuída na proporção do valor.
+    """
+    max_parcelas = get_max_installments()
+    quantidade = np.array([int(plano.get("parcelas") or parcelas_padrao) for plano in planos], dtype=np.int64)
+    if quantidade.size and (quantidade.min() < 1 or quantidade.max() > max_parcelas):
+        raise ValueError(f"parcelas deve estar entre 1 e {max_parcelas}.")
+    if taxa_mensal < 0 or taxa_mensal >= 1:
+        raise ValueError("taxaJurosMensal deve ser uma fração mensal entre 0 e 1 (ex.: 0.01 para 1%).")
+    tamanhos = np.array([len(plano["valores"]) for plano in planos], dtype=np.int64)
+    if detalhar_itens and int(tamanhos.sum()) * int(quantidade.max(initial=1)) > get_max_cells():
+        raise ValueError(f"Cronograma por item maior que o limite de {get_max_cells()} parcelas.")
+
+    # Débitos de todos os planos em um único vetor; plano_idx liga cada débito ao seu plano
+    valores = np.concatenate([plano["valores"] for plano in planos]) if planos else np.zeros(0)
+    plano_idx = np.repeat(np.arange(len(planos)), tamanhos)
+    valor_debitos = np.bincount(plano_idx, weights=valores, minlength=len(planos))
+    reducao = np.array([float(plano.get("reducao") or 0) for plano in planos])
+    financiado = np.maximum(valor_debitos - reducao, 0.0)
+
+    valor_plano, juros_plano = installment_matrix(financiado, quantidade, taxa_mensal)
+    primeiro_vencimento = primeiro_vencimento or add_months(datetime.date.today(), 1)
+    vencimentos = due_dates(primeiro_vencimento, int(quantidade.max(initial=0)))
+
+    valor_itens = None
+    if detalhar_itens and valores.size:
+        # Redução do plano rateada pelo valor de cada débito
+        proporcao = np.divide(financiado, valor_debitos, out=np.zeros(len(planos)), where=valor_debitos > 0)
+        valor_itens, _ = installment_matrix(
+            np.round(valores * proporcao[plano_idx], 2), quantidade[plano_idx], taxa_mensal
+        )
+        inicio_itens = np.concatenate([[0], np.cumsum(tamanhos)])
+
+    resultado = []
+    for indice, plano in enumerate(planos):
+        n = int(quantidade[indice])
+        valor = valor_plano[indice, :n]
+        juros = juros_plano[indice, :n]
+        saida = {
+            "id": plano.get("id"),
+            "itens": int(tamanhos[indice]),
+            "valorDebitos": round(float(valor_debitos[indice]), 2),
+            "reducao": round(float(reducao[indice]), 2),
+            "valorFinanciado": round(float(financiado[indice]), 2),
+            "parcelas": n,
+            "totalParcelas": round(float(valor.sum()), 2),
+            "totalJuros": round(float(juros.sum()), 2),
+            "cronograma": [
+                {"numero": numero + 1, "vencimento": vencimentos[numero], "valor": parcela,
+                 "juros": juro, "amortizacao": round(parcela - juro, 2)}
+                for numero, (parcela, juro) in enumerate(zip(valor.tolist(), juros.tolist()))
+            ],
+        }
+        if valor_itens is not None:
+            saida["cronogramaItens"] = valor_itens[inicio_itens[indice]:inicio_itens[indice + 1], :n].tolist()
+        resultado.append(saida)
+    return resultado
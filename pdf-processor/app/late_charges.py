@@ -0,0 +1,222 @@
+import datetime
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Atualização de multa e juros de mora dos débitos extraídos até uma data de pagamento
+# (Lei 9.430/96, art. 61), para todas as linhas de uma vez, com numpy:
+#   multa = principal * min(0,33% por dia de atraso, 20%)
+#   juros = principal * (Selic acumulada do mês seguinte ao vencimento até o mês anterior
+#           ao pagamento + 1% no mês do pagamento); sem juros se pagar no mês do vencimento
+# A Selic mensal (série 4390 do SGS/Banco Central) fica em um arquivo local
+# (SELIC_TABLE_PATH), gravado por tools/update_selic.py ou, com SELIC_MAX_AGE_HOURS, baixado
+# de novo quando fica velho. A tabela é carregada uma vez e vira um vetor de somas
+# acumuladas: a Selic de qualquer intervalo de meses sai de duas consultas ao vetor.
+
+SELIC_SERIES = 4390
+BCB_URL = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{SELIC_SERIES}/dados?formato=json"
+
+DAILY_FINE_RATE = 0.0033
+MAX_FINE_RATE = 0.20
+PAYMENT_MONTH_RATE = 0.01
+
+# Colunas de cada tipo de linha: o principal e as recalculadas (o vencimento é "vencimento")
+SITUACAO_FISCAL_FIELDS = {"principal": "saldo_devedor", "multa": "multa", "juros": "juros", "total": "saldo_devedor_consolidado"}
+DARF_FIELDS = {"principal": "principal", "multa": "multa", "juros": "juros", "total": "total"}
+
+
+class RateTableUnavailable(Exception):
+    pass
+
+
+def get_table_path():
+    return os.environ.get(
+        "SELIC_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "selic_mensal.json")
+    )
+
+
+def get_max_age_hours():
+    return float(os.environ.get("SELIC_MAX_AGE_HOURS", "0"))
+
+
+def download_table(timeout=30):
+    """Baixa a série 4390 do SGS e retorna {"AAAA-MM": taxa em % ao mês}."""
+    import requests
+
+    response = requests.get(BCB_URL, timeout=timeout)
+    response.raise_for_status()
+    taxas = {}
+    for ponto in response.json():
+        dia, mes, ano = ponto["data"].split("/")
+        taxas[f"{ano}-{mes}"] = float(ponto["valor"])
+    return taxas
+
+
+def save_table(taxas, caminho=None):
+    caminho = caminho or get_table_path()
+    registro = {
+        "serie": SELIC_SERIES,
+        "atualizadoEm": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "taxas": dict(sorted(taxas.items())),
+    }
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(registro, f, indent=1)
+        f.write("\n")
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _month_index(ano, mes):
+    return ano * 12 + mes - 1
+
+
+class RateTable:
+    """Selic mensal como somas acumuladas (em fração), indexadas pelo mês desde o primeiro da tabela."""
+
+    def __init__(self, taxas):
+        if not taxas:
+            raise ValueError("Tabela Selic vazia.")
+        meses = sorted(_month_index(int(chave[:4]), int(chave[5:7])) for chave in taxas)
+        if meses[-1] - meses[0] + 1 != len(meses):
+            raise ValueError("Tabela Selic com meses faltando.")
+        self.primeiro = meses[0]
+        self.ultimo = meses[-1]
+        valores = np.array([taxas[chave] for chave in sorted(taxas)]) / 100
+        self.acumulada = np.concatenate([[0.0], np.cumsum(valores)])
+
+    def last_month(self):
+        ano, mes = divmod(self.ultimo, 12)
+        return f"{ano:04d}-{mes + 1:02d}"
+
+    def cumulative_through(self, meses, projecao=None):
+        """Selic somada do início da tabela até cada mês (inclusive); meses depois da tabela
+        usam a taxa projetada (fração ao mês)."""
+        posicao = meses - self.primeiro
+        dentro = np.clip(posicao, -1, self.ultimo - self.primeiro)
+        soma = self.acumulada[dentro + 1]
+        excedente = np.maximum(meses - self.ultimo, 0)
+        return soma + excedente * (projecao or 0.0)
+
+
+_table = None
+_table_mtime = None
+_table_lock = threading.Lock()
+# Um download por vez; quem chega durante o download segue com a tabela atual
+_refresh_lock = threading.Lock()
+
+
+def _refresh(caminho):
+    try:
+        save_table(download_table(), caminho)
+        print(f"Tabela Selic (série {SELIC_SERIES}) atualizada em {caminho}.", file=sys.stdout)
+    except Exception as e:
+        # Sem rede, segue com o arquivo existente
+        print(f"Erro ao atualizar a tabela Selic: {e}", file=sys.stdout)
+
+
+def _refresh_in_background(caminho):
+    try:
+        _refresh(caminho)
+    finally:
+        _refresh_lock.release()
+
+
+def _table_mtime_of(caminho):
+    return os.path.getmtime(caminho) if os.path.exists(caminho) else None
+
+
+def get_table():
+    """Tabela carregada (recarrega se o arquivo mudou; baixa de novo se passou de SELIC_MAX_AGE_HOURS).
+
+    O download roda fora de _table_lock: com o arquivo velho, a atualização vai para uma thread e
+    as requisições seguem com a tabela atual; só sem arquivo nenhum a requisição espera o download.
+    """
+    global _table, _table_mtime
+    caminho = get_table_path()
+    max_age = get_max_age_hours()
+    mtime = _table_mtime_of(caminho)
+    if max_age and mtime is None:
+        with _refresh_lock:
+            # Outra requisição pode ter baixado enquanto esta esperava
+            if _table_mtime_of(caminho) is None:
+                _refresh(caminho)
+        mtime = _table_mtime_of(caminho)
+    elif max_age and (datetime.datetime.now().timestamp() - mtime) / 3600 > max_age:
+        if _refresh_lock.acquire(blocking=False):
+            threading.Thread(target=_refresh_in_background, args=(caminho,), daemon=True).start()
+    if mtime is None:
+        raise RateTableUnavailable(
+            f"Tabela Selic não encontrada em {caminho}: rode tools/update_selic.py ou configure SELIC_MAX_AGE_HOURS."
+        )
+    with _table_lock:
+        if _table is None or mtime != _table_mtime:
+            with open(caminho, encoding="utf-8") as f:
+                _table = RateTable(json.load(f)["taxas"])
+            _table_mtime = mtime
+        return _table
+
+
+def parse_due_dates(valores):
+    """Vencimentos (AAAA-MM-DD ou DD/MM/AAAA) como datetime64[D]; NaT quando não é data."""
+    serie = pd.Series(valores, dtype=object)
+    datas = pd.to_datetime(serie, format="%Y-%m-%d", errors="coerce")
+    faltando = datas.isna()
+    if faltando.any():
+        datas[faltando] = pd.to_datetime(serie[faltando], format="%d/%m/%Y", errors="coerce")
+    return datas.to_numpy(dtype="datetime64[D]")
+
+
+def compute_charges(principal, vencimentos, data_pagamento, tabela, projecao=None):
+    """Dias de atraso e percentuais de multa e de juros de cada linha (vetores numpy)."""
+    pagamento = np.datetime64(data_pagamento, "D")
+    dias = (pagamento - vencimentos).astype("int64")
+    multa = np.clip(dias * DAILY_FINE_RATE, 0.0, MAX_FINE_RATE)
+
+    mes_vencimento = vencimentos.astype("datetime64[M]").astype("int64") + _month_index(1970, 1)
+    mes_pagamento = int(pagamento.astype("datetime64[M]").astype("int64")) + _month_index(1970, 1)
+    if projecao is None and mes_pagamento - 1 > tabela.ultimo and (mes_vencimento < mes_pagamento - 1).any():
+        raise ValueError(f"Tabela Selic vai até {tabela.last_month()}: informe selicProjetadaMensal ou atualize a tabela.")
+    selic = tabela.cumulative_through(np.full(mes_vencimento.shape, mes_pagamento - 1), projecao) \
+        - tabela.cumulative_through(mes_vencimento, projecao)
+    juros = np.where(mes_pagamento > mes_vencimento, np.maximum(selic, 0.0) + PAYMENT_MONTH_RATE, 0.0)
+    return dias, multa, juros
+
+
+def update_rows(itens, campos, data_pagamento, tabela, projecao=None):
+    """Recalcula multa, juros e total das linhas (cópias); retorna (linhas, não atualizadas)."""
+    if not itens:
+        return [], 0
+    principal = pd.to_numeric(pd.Series([item.get(campos["principal"]) for item in itens]), errors="coerce").to_numpy()
+    vencimentos = parse_due_dates([item.get("vencimento") for item in itens])
+    validas = ~np.isnat(vencimentos) & (principal > 0)
+    if not validas.any():
+        return [dict(item) for item in itens], len(itens)
+
+    # Vencimentos inválidos recebem a data de pagamento (sem encargos) e a linha fica como está
+    vencimentos = np.where(validas, vencimentos, np.datetime64(data_pagamento, "D"))
+    principal = np.where(validas, principal, 0.0)
+    dias, percentual_multa, percentual_juros = compute_charges(principal, vencimentos, data_pagamento, tabela, projecao)
+    multa = np.round(principal * percentual_multa, 2)
+    juros = np.round(principal * percentual_juros, 2)
+    total = np.round(principal + multa + juros, 2)
+
+    # Colunas convertidas para listas de uma vez: indexar escalares numpy linha a linha é lento
+    colunas = zip(
+        validas.tolist(), multa.tolist(), juros.tolist(), total.tolist(), np.maximum(dias, 0).tolist(),
+        np.round(percentual_multa * 100, 4).tolist(), np.round(percentual_juros * 100, 4).tolist(),
+    )
+    linhas = []
+    for item, (valida, valor_multa, valor_juros, valor_total, atraso, pct_multa, pct_juros) in zip(itens, colunas):
+        linha = dict(item)
+        if valida:
+            linha[campos["multa"]] = valor_multa
+            linha[campos["juros"]] = valor_juros
+            linha[campos["total"]] = valor_total
+            linha["dias_atraso"] = atraso
+            linha["percentual_multa"] = pct_multa
+            linha["percentual_juros"] = pct_juros
+        linhas.append(linha)
+    return linhas, int((~validas).sum())
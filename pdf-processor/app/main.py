@@ -1,17 +1,63 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import fitz  # PyMuPDF
 import io
 import requests
 import os
 import re
 import asyncio
+import atexit
+import contextlib
+import contextvars
+import datetime
+import hashlib
+import json
+import zlib
+import time
 import re # Importar re
 import sys # Importar sys
 import pandas as pd # Importar pandas
+from app import aggregation
+from app import budget
+from app import capture
+from app import compact
+from app import cost_model
+from app import darf_layout
+from app import diff
+from app import history
+from app import ingestion
+from app import installments
+from app import late_charges
+from app import profiling
+from app import reprocessing
+from app import text_backends
+from app import text_cache
 # httpx não é mais necessário se não chamarmos a OpenRouter
 
+# --- Log dos parsers ---
+# Os parsers registram cada linha lida. O resumo e o reprocessamento desligam esses logs
+# só para a extração em curso (variável de contexto), sem trocar o sys.stdout do processo,
+# que é compartilhado com as outras threads (to_thread, captura, reprocessamento).
+_parser_log_enabled = contextvars.ContextVar("parser_log_enabled", default=True)
+
+def parser_log(*args):
+    if _parser_log_enabled.get():
+        print(*args, file=sys.stdout)
+
+@contextlib.contextmanager
+def parser_logging(enabled):
+    """Liga ou desliga os logs dos parsers no contexto atual (e nos filhos bifurcados dele)."""
+    token = _parser_log_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _parser_log_enabled.reset(token)
+
+def quiet_parser():
+    return parser_logging(False)
+
 # --- Funções Helper Globais ---
 def parse_br_currency(value_str):
     """Converte string de moeda BR (com . e ,) para float."""
@@ -22,7 +68,7 @@ def parse_br_currency(value_str):
     value_str = value_str.strip().replace('R$', '').strip()
     
     if not value_str:
-        print(f"💰 Valor monetário vazio, retornando 0.0", file=sys.stdout)
+        parser_log(f"💰 Valor monetário vazio, retornando 0.0")
         return 0.0
     
     # Padrão brasileiro: 1.234.567,89 (pontos para milhares, vírgula para decimais)
@@ -46,15 +92,15 @@ def parse_br_currency(value_str):
             cleaned_str = value_str.replace('.', '')
     
     if not cleaned_str or not re.match(r'^-?\d+(\.\d+)?$', cleaned_str):
-        print(f"💰 Valor monetário inválido '{value_str}' -> '{cleaned_str}', retornando 0.0", file=sys.stdout)
+        parser_log(f"💰 Valor monetário inválido '{value_str}' -> '{cleaned_str}', retornando 0.0")
         return 0.0
     
     try:
         result = float(cleaned_str)
-        print(f"💰 Valor convertido: '{value_str}' -> {result}", file=sys.stdout)
+        parser_log(f"💰 Valor convertido: '{value_str}' -> {result}")
         return result
     except ValueError:
-        print(f"💰 Falha ao converter valor monetário '{value_str}' para float, retornando 0.0", file=sys.stdout)
+        parser_log(f"💰 Falha ao converter valor monetário '{value_str}' para float, retornando 0.0")
         return 0.0
 
 def format_date(date_str):
@@ -63,7 +109,7 @@ def format_date(date_str):
     match = re.match(r'(\d{2})/(\d{2})/(\d{4})', date_str.strip())
     if match:
         return f"{match.group(3)}-{match.group(2)}-{match.group(1)}" # YYYY-MM-DD
-    print(f"Aviso: Formato de data inválido '{date_str}', retornando vazio.", file=sys.stdout)
+    parser_log(f"Aviso: Formato de data inválido '{date_str}', retornando vazio.")
     return ""
 
 def format_periodo(periodo_str):
@@ -82,11 +128,12 @@ def format_periodo(periodo_str):
     match_trim = re.match(r'(\d{1,2})(?:º|o|ª|\s)?\s*TRIM/(\d{4})', periodo_str, re.IGNORECASE)
     if match_trim:
         return f"{match_trim.group(1)} TRIM/{match_trim.group(2)}"
-    print(f"Aviso: Formato de período inválido '{periodo_str}', retornando vazio.", file=sys.stdout)
+    parser_log(f"Aviso: Formato de período inválido '{periodo_str}', retornando vazio.")
     return ""
 # -----------------------------
 
 # Função de pré-processamento sugerida
+@profiling.profiled
 def preprocess_text(text):
     # Remove cabeçalhos e rodapés repetitivos
     lines = text.split('\n')
@@ -118,24 +165,30 @@ def preprocess_text(text):
             prev_empty = False
     return '\n'.join(result_lines)
 
+# Extrai o texto de uma página, no formato usado pelo restante do pipeline
+def extract_page_text(page, page_number, backend=text_backends.DEFAULT_BACKEND):
+    try:
+        page_text = text_backends.page_text(page, backend)
+        if page_text:
+            # Tira o replace de dentro da f-string para evitar SyntaxError
+            log_text = page_text[:100].replace('\n', ' ')
+            parser_log(f"Texto extraído da página {page_number} (primeiros 100 chars): {log_text}")
+            return page_text + "\n"
+        parser_log(f"Nenhum texto extraído da página {page_number}.")
+    except Exception as page_error:
+        print(f"Erro ao extrair texto da página {page_number}: {page_error}", file=sys.stdout)
+    return ""
+
 # Função de extração de PDF simplificada para diagnóstico
-def extract_pdf_text(pdf_bytes):
+@profiling.profiled
+def extract_pdf_text(pdf_bytes, doc_type=None):
     text = ""
+    backend = text_backends.select_backend(doc_type)
     try:
         pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-        print(f"PDF aberto com {len(pdf)} páginas.", file=sys.stdout)
+        print(f"PDF aberto com {len(pdf)} páginas (backend de texto '{backend}').", file=sys.stdout)
         for i, page in enumerate(pdf):
-            try:
-                page_text = page.get_text()
-                if page_text:
-                    # Tira o replace de dentro da f-string para evitar SyntaxError
-                    log_text = page_text[:100].replace('\n', ' ')
-                    print(f"Texto extraído da página {i+1} (primeiros 100 chars): {log_text}", file=sys.stdout)
-                    text += page_text + "\n"
-                else:
-                    print(f"Nenhum texto extraído da página {i+1}.", file=sys.stdout)
-            except Exception as page_error:
-                print(f"Erro ao extrair texto da página {i+1}: {page_error}", file=sys.stdout)
+            text += extract_page_text(page, i + 1, backend)
         pdf.close()
     except Exception as open_error:
         print(f"Erro crítico ao abrir ou processar PDF com fitz: {open_error}", file=sys.stdout)
@@ -146,315 +199,330 @@ def extract_pdf_text(pdf_bytes):
         print("AVISO: NENHUM TEXTO FOI EXTRAÍDO DO PDF.", file=sys.stdout)
     return text
 
-# Função específica para extrair "Pendência - Débito (SIEF)" - Lógica v5 (Flexível por Conteúdo)
-def extract_pendencias_debito(text):
-    result = []
-    lines = text.split('\n')
-    in_section = False
-    current_cnpj = ""
-
-    # Padrões para identificar o início e fim da seção relevante
-    start_pattern = r"(?:Pendência|Pendencia|PENDÊNCIA|PENDENCIA)[\s-]*(?:Débito|Debito|DÉBITO|DEBITO)[\s-]*(?:\(SIEF\)|\(sief\))"
-    # Padrões que indicam o fim da seção SIEF e início de outra
-    end_patterns = [
-        r"^(?:Pendência|Pendencia|Parcelamento|Processo|Inscrição|Débito\s+com\s+Exigibilidade)",
-        r"Final\s+do\s+Relatório",
-        r"^\s*_{10,}\s*$" # Linha de underscores
-    ]
+# Junta textos de páginas já extraídos (ex.: no navegador) no mesmo formato de extract_pdf_text
+def join_page_texts(paginas):
+    return "".join(pagina + "\n" for pagina in paginas if pagina)
 
-    print("\n--- Iniciando busca pela seção 'Pendência - Débito (SIEF)' (v5 - Flexível) ---", file=sys.stdout)
+# --- Classificação do tipo de documento pela primeira página ---
+DOC_TYPE_DARF = "darf"
+DOC_TYPE_SITUACAO_FISCAL = "situacao_fiscal"
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+# Versão dos extratores, gravada com cada extração no histórico. Incremente sempre que uma
+# correção mudar o resultado de alguma extração: as extrações gravadas com versões
+# anteriores passam a ser refeitas pelo reprocessamento em segundo plano (app/reprocessing.py).
+PARSER_VERSION = 1
 
-        # Verifica se entramos na seção correta
-        if not in_section and re.search(start_pattern, line, re.IGNORECASE):
-            in_section = True
-            current_cnpj = ""
-            print(f"Seção 'Pendência - Débito (SIEF)' encontrada na linha {i+1}: '{line}'", file=sys.stdout)
-            i += 1
-            continue
-
-        if not in_section:
-            i += 1
-            continue
+# DARF é verificado primeiro: o cabeçalho do DARF também cita a Receita Federal
+DARF_MARKERS = re.compile(
+    r"Composição\s+do\s+Documento\s+de\s+Arrecadação"
+    r"|Documento\s+de\s+Arrecadação\s+de\s+Receitas\s+Federais",
+    re.IGNORECASE
+)
+# Cabeçalhos do relatório de Situação Fiscal emitido pelo e-CAC
+SITUACAO_FISCAL_MARKERS = re.compile(
+    r"INFORMAÇÕES\s+DE\s+APOIO\s+PARA\s+EMISSÃO\s+DE\s+CERTIDÃO"
+    r"|Por\s+meio\s+do\s+e-CAC"
+    r"|Diagnóstico\s+Fiscal\s+na\s+(?:Receita\s+Federal|Procuradoria-Geral)"
+    r"|Relatório\s+de\s+Situação\s+Fiscal",
+    re.IGNORECASE
+)
 
-        # Verifica se saímos da seção
-        if any(re.search(ep, line, re.IGNORECASE) for ep in end_patterns):
-            print(f"Fim da seção 'Pendência - Débito (SIEF)' detectado na linha {i+1}: '{line}'", file=sys.stdout)
-            in_section = False
-            break
+def classify_document_text(first_page_text):
+    """Retorna DOC_TYPE_DARF, DOC_TYPE_SITUACAO_FISCAL ou None a partir do texto da primeira página."""
+    if DARF_MARKERS.search(first_page_text):
+        return DOC_TYPE_DARF
+    if SITUACAO_FISCAL_MARKERS.search(first_page_text):
+        return DOC_TYPE_SITUACAO_FISCAL
+    return None
+
+@profiling.profiled
+def extract_pdf_text_classified(pdf_bytes):
+    """Classifica o PDF pela primeira página e só extrai as demais se o tipo for reconhecido.
+
+    Retorna (tipo_documento, texto). Para documentos não reconhecidos o custo é
+    a extração de uma única página e o texto retornado é vazio.
+    """
+    try:
+        pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as open_error:
+        print(f"Erro crítico ao abrir PDF com fitz: {open_error}", file=sys.stdout)
+        return None, ""
 
-        if not line:
-            i += 1
-            continue
+    try:
+        print(f"PDF aberto com {len(pdf)} páginas (classificação automática).", file=sys.stdout)
+        if len(pdf) == 0:
+            return None, ""
+
+        classification_backend = text_backends.select_backend(None)
+        first_page_text = extract_page_text(pdf[0], 1, classification_backend)
+        doc_type = classify_document_text(first_page_text)
+        print(f"Tipo de documento detectado pela primeira página: {doc_type}", file=sys.stdout)
+        if doc_type is None:
+            return None, ""
+
+        # O restante do documento usa o backend escolhido para o layout detectado
+        backend = text_backends.select_backend(doc_type)
+        text = first_page_text if backend == classification_backend else extract_page_text(pdf[0], 1, backend)
+        for i in range(1, len(pdf)):
+            text += extract_page_text(pdf[i], i + 1, backend)
+        return doc_type, text
+    finally:
+        pdf.close()
 
-        # Tenta encontrar CNPJ
-        cnpj_match = re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", line)
-        if cnpj_match:
-            current_cnpj = cnpj_match.group(1)
-            print(f"CNPJ definido para: {current_cnpj}", file=sys.stdout)
-            i += 1
-            continue
+# --- Motor declarativo das seções da Situação Fiscal ---
+# Cada seção é descrita por uma especificação (SECTION_SPECS): padrão de início,
+# padrões de fim, campos de contexto (CNPJ/CNO), cabeçalhos a ignorar e a gramática
+# do registro. As especificações são compiladas uma vez; extract_sections localiza
+# o início de todas as seções em uma única varredura do texto e depois percorre
+# apenas o trecho de cada seção, sem uma nova varredura completa por seção.
+
+CNPJ_PATTERN = r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})"
+CNO_PATTERN = r"CNO:\s*([\d./-]+)"
+UNDERSCORE_LINE_PATTERN = r"^\s*_{10,}\s*$"
+
+def matches_any(patterns, line):
+    return any(pattern.search(line) for pattern in patterns)
+
+
+# Registro de "Pendência - Débito (SIEF)" - Lógica v5 (Flexível por Conteúdo)
+# Recebe a linha atual do registro e retorna o índice da próxima linha a processar
+def parse_registro_debito_sief(lines, i, line, ctx, result, spec):
+    # Verifica se a linha começa com um código de receita (XXXX-XX - ...) ou "SIMPLES NAC." ou itens sem código
+    receita_match = re.match(r"(\d{4}-\d{2}\s+-\s+.*)", line, re.IGNORECASE)
+    # Detecção mais abrangente para SIMPLES NAC. - busca em qualquer posição da linha
+    simples_nac_match = re.search(r"SIMPLES\s+NAC\.?", line, re.IGNORECASE)
+
+    # DETECÇÃO ADICIONAL: Verifica se a linha inteira é exatamente "SIMPLES NAC." (sem outros dados)
+    simples_nac_only_match = re.match(r"^\s*SIMPLES\s+NAC\.?\s*$", line, re.IGNORECASE)
+
+    # DETECÇÃO FOCADA EM ITENS SIMPLES NACIONAL SEM CÓDIGO
+    no_code_item_match = None
+    if not receita_match and not simples_nac_match and ctx["cnpj"]:
+        # NOVA LÓGICA: Detecta linhas que começam com período no formato tabular
+        # Formato: período vencimento valor_original saldo_devedor multa juros saldo_consolidado situação
+        tabular_pattern = r"^(\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+(\w+)"
+        tabular_match = re.match(tabular_pattern, line)
+
+        if tabular_match:
+            parser_log(f"🎯 Item SIMPLES NACIONAL tabular detectado: '{line}'")
+            # Extrai todos os dados diretamente da linha
+            periodo = tabular_match.group(1)
+            vencimento = tabular_match.group(2)
+            valor_original = parse_br_currency(tabular_match.group(3))
+            saldo_devedor = parse_br_currency(tabular_match.group(4))
+            multa = parse_br_currency(tabular_match.group(5))
+            juros = parse_br_currency(tabular_match.group(6))
+            saldo_consolidado = parse_br_currency(tabular_match.group(7))
+            situacao = tabular_match.group(8)
+
+            # Cria o item diretamente
+            debito_data = {
+                "cnpj": ctx["cnpj"],
+                "receita": "SIMPLES NAC.",
+                "periodo_apuracao": format_periodo(periodo),
+                "vencimento": format_date(vencimento),
+                "valor_original": valor_original,
+                "saldo_devedor": saldo_devedor,
+                "multa": multa,
+                "juros": juros,
+                "saldo_devedor_consolidado": saldo_consolidado,
+                "situacao": situacao
+            }
+
+            result.append(debito_data)
+            parser_log(f"✅ SIMPLES NAC. tabular extraído: {debito_data}")
+            return i + 1
+
+        # Padrões específicos para detectar itens do Simples Nacional sem código
+        simples_nacional_patterns = [
+            # Padrão 1: Linha que começa com período (formato comum do Simples Nacional)
+            r"^(\d{2}/\d{2}/\d{4}|\d{2}/\d{4}|\d{1,2}(?:º|o|ª|\s)?\s*TRIM/\d{4})",
+            # Padrão 2: Linha que começa com valor monetário (dados do Simples Nacional)
+            r"^([\d.,]+)\s+",
+            # Padrão 3: Linha que contém termos relacionados ao Simples Nacional
+            # (busca preguiçosa para a frente: linear, sem o retrocesso de "^.*(...).*")
+            r".*?(SIMPLES|NACIONAL|MICROEMPRESA|EPP)",
+        ]
+
+        for pattern_idx, pattern in enumerate(simples_nacional_patterns):
+            no_code_item_match = re.match(pattern, line, re.IGNORECASE)
+            if no_code_item_match:
+                parser_log(f"🎯 Possível item Simples Nacional sem código detectado (padrão {pattern_idx + 1}): '{line}'")
+                break
 
-        # Ignora linhas de cabeçalho
-        if "Receita" in line and "PA/Exerc" in line and "Vcto" in line:
-             print(f"Linha de cabeçalho pulada: '{line}'", file=sys.stdout)
-             i += 1
-             continue
-        if line in ["Dt. Vcto", "Vl. Original", "Sdo. Devedor", "Multa", "Juros", "Sdo. Dev. Cons.", "Situação"]:
-             print(f"Linha de título de campo pulada: '{line}'", file=sys.stdout)
-             i += 1
-             continue
-
-        # Verifica se a linha começa com um código de receita (XXXX-XX - ...) ou "SIMPLES NAC." ou itens sem código
-        receita_match = re.match(r"(\d{4}-\d{2}\s+-\s+.*)", line, re.IGNORECASE)
-        # Detecção mais abrangente para SIMPLES NAC. - busca em qualquer posição da linha
-        simples_nac_match = re.search(r"SIMPLES\s+NAC\.?", line, re.IGNORECASE)
-        
-        # DETECÇÃO ADICIONAL: Verifica se a linha inteira é exatamente "SIMPLES NAC." (sem outros dados)
-        simples_nac_only_match = re.match(r"^\s*SIMPLES\s+NAC\.?\s*$", line, re.IGNORECASE)
-        
-        # DETECÇÃO FOCADA EM ITENS SIMPLES NACIONAL SEM CÓDIGO
-        no_code_item_match = None
-        if not receita_match and not simples_nac_match and current_cnpj:
-            # NOVA LÓGICA: Detecta linhas que começam com período no formato tabular
-            # Formato: período vencimento valor_original saldo_devedor multa juros saldo_consolidado situação
-            tabular_pattern = r"^(\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+(\w+)"
-            tabular_match = re.match(tabular_pattern, line)
-            
-            if tabular_match:
-                print(f"🎯 Item SIMPLES NACIONAL tabular detectado: '{line}'", file=sys.stdout)
-                # Extrai todos os dados diretamente da linha
-                periodo = tabular_match.group(1)
-                vencimento = tabular_match.group(2)
-                valor_original = parse_br_currency(tabular_match.group(3))
-                saldo_devedor = parse_br_currency(tabular_match.group(4))
-                multa = parse_br_currency(tabular_match.group(5))
-                juros = parse_br_currency(tabular_match.group(6))
-                saldo_consolidado = parse_br_currency(tabular_match.group(7))
-                situacao = tabular_match.group(8)
-                
-                # Cria o item diretamente
-                debito_data = {
-                    "cnpj": current_cnpj,
-                    "receita": "SIMPLES NAC.",
-                    "periodo_apuracao": format_periodo(periodo),
-                    "vencimento": format_date(vencimento),
-                    "valor_original": valor_original,
-                    "saldo_devedor": saldo_devedor,
-                    "multa": multa,
-                    "juros": juros,
-                    "saldo_devedor_consolidado": saldo_consolidado,
-                    "situacao": situacao
-                }
-                
-                result.append(debito_data)
-                print(f"✅ SIMPLES NAC. tabular extraído: {debito_data}", file=sys.stdout)
-                i += 1
-                continue
-            
-            # Padrões específicos para detectar itens do Simples Nacional sem código
-            simples_nacional_patterns = [
-                # Padrão 1: Linha que começa com período (formato comum do Simples Nacional)
-                r"^(\d{2}/\d{2}/\d{4}|\d{2}/\d{4}|\d{1,2}(?:º|o|ª|\s)?\s*TRIM/\d{4})",
-                # Padrão 2: Linha que começa com valor monetário (dados do Simples Nacional)
-                r"^([\d.,]+)\s+",
-                # Padrão 3: Linha que contém termos relacionados ao Simples Nacional
-                r"^.*(SIMPLES|NACIONAL|MICROEMPRESA|EPP).*",
-            ]
-            
-            for pattern_idx, pattern in enumerate(simples_nacional_patterns):
-                no_code_item_match = re.match(pattern, line, re.IGNORECASE)
-                if no_code_item_match:
-                    print(f"🎯 Possível item Simples Nacional sem código detectado (padrão {pattern_idx + 1}): '{line}'", file=sys.stdout)
-                    break
-            
-            # Detecção conservadora - apenas se a linha parece conter dados estruturados
-            if not no_code_item_match and len(line) > 5:
-                # Verifica se a linha não é um cabeçalho conhecido
-                header_keywords = ["PA/Exerc", "Vcto", "Vl. Original", "Sdo. Devedor", "Multa", "Juros", "Situação", "Receita"]
-                cnpj_keywords = ["CNPJ:", "CPF:"]
-                
-                is_header = any(keyword in line for keyword in header_keywords)
-                is_cnpj_line = any(keyword in line for keyword in cnpj_keywords)
-                
-                # Só considera se não for cabeçalho, não for linha de CNPJ e tiver dados estruturados
-                if not is_header and not is_cnpj_line:
-                    # Verifica se tem padrão de dados (datas, valores, etc.)
-                    has_date_pattern = re.search(r'\d{2}/\d{2}/\d{4}|\d{2}/\d{4}', line)
-                    has_value_pattern = re.search(r'[\d.,]+', line)
-                    
-                    if has_date_pattern or has_value_pattern:
-                        no_code_item_match = True
-                        print(f"🔍 Possível item sem código detectado (dados estruturados): '{line}'", file=sys.stdout)
-        
-        if (receita_match or simples_nac_match or simples_nac_only_match or no_code_item_match) and current_cnpj:
-            print(f"\nInício de registro de débito encontrado: '{line}'", file=sys.stdout)
-            
-            if receita_match:
-                receita_text = receita_match.group(1).strip()
-                debito_data = {"cnpj": current_cnpj, "receita": receita_text}
-            elif simples_nac_match:
-                # SIMPLES NAC. detectado - pode estar na mesma linha dos dados ou separado
-                print(f"🎯 SIMPLES NAC. detectado: '{line}'", file=sys.stdout)
-                debito_data = {"cnpj": current_cnpj, "receita": "SIMPLES NAC."}
-                
-                # Verifica se os dados estão na mesma linha (formato tabular)
-                # Exemplo: "SIMPLES NAC.    01/2025    20/02/2025    51.573,98    51.573,98    10.314,79    2.145,47    64.034,24    DEVEDOR"
-                line_parts = line.split()
-                if len(line_parts) >= 8:  # SIMPLES NAC. + período + vencimento + 5 valores + situação
-                    try:
-                        # Extrai dados diretamente da linha
-                        periodo_idx = -1
-                        vencimento_idx = -1
-                        
-                        # Procura por padrões de data na linha
-                        for idx, part in enumerate(line_parts):
-                            if re.match(r'\d{2}/\d{4}', part) and periodo_idx == -1:
-                                periodo_idx = idx
-                            elif re.match(r'\d{2}/\d{2}/\d{4}', part) and vencimento_idx == -1:
-                                vencimento_idx = idx
-                        
-                        if periodo_idx != -1 and vencimento_idx != -1:
-                            # Extrai os dados da linha
-                            periodo = line_parts[periodo_idx]
-                            vencimento = line_parts[vencimento_idx]
-                            
-                            # Os valores monetários vêm após o vencimento
-                            valores_start = vencimento_idx + 1
-                            if len(line_parts) >= valores_start + 5:
-                                valor_original = parse_br_currency(line_parts[valores_start])
-                                saldo_devedor = parse_br_currency(line_parts[valores_start + 1])
-                                multa = parse_br_currency(line_parts[valores_start + 2])
-                                juros = parse_br_currency(line_parts[valores_start + 3])
-                                saldo_consolidado = parse_br_currency(line_parts[valores_start + 4])
-                                situacao = line_parts[valores_start + 5] if len(line_parts) > valores_start + 5 else "DEVEDOR"
-                                
-                                debito_data.update({
-                                    "periodo_apuracao": format_periodo(periodo),
-                                    "vencimento": format_date(vencimento),
-                                    "valor_original": valor_original,
-                                    "saldo_devedor": saldo_devedor,
-                                    "multa": multa,
-                                    "juros": juros,
-                                    "saldo_devedor_consolidado": saldo_consolidado,
-                                    "situacao": situacao
-                                })
-                                
-                                print(f"✅ SIMPLES NAC. processado da mesma linha: {debito_data}", file=sys.stdout)
-                            else:
-                                print(f"⚠️ SIMPLES NAC. na mesma linha mas sem valores suficientes", file=sys.stdout)
+        # Detecção conservadora - apenas se a linha parece conter dados estruturados
+        if not no_code_item_match and len(line) > 5:
+            # Verifica se a linha não é um cabeçalho conhecido
+            header_keywords = ["PA/Exerc", "Vcto", "Vl. Original", "Sdo. Devedor", "Multa", "Juros", "Situação", "Receita"]
+            cnpj_keywords = ["CNPJ:", "CPF:"]
+
+            is_header = any(keyword in line for keyword in header_keywords)
+            is_cnpj_line = any(keyword in line for keyword in cnpj_keywords)
+
+            # Só considera se não for cabeçalho, não for linha de CNPJ e tiver dados estruturados
+            if not is_header and not is_cnpj_line:
+                # Verifica se tem padrão de dados (datas, valores, etc.)
+                has_date_pattern = re.search(r'\d{2}/\d{2}/\d{4}|\d{2}/\d{4}', line)
+                has_value_pattern = re.search(r'[\d.,]+', line)
+
+                if has_date_pattern or has_value_pattern:
+                    no_code_item_match = True
+                    parser_log(f"🔍 Possível item sem código detectado (dados estruturados): '{line}'")
+
+    if (receita_match or simples_nac_match or simples_nac_only_match or no_code_item_match) and ctx["cnpj"]:
+        parser_log(f"\nInício de registro de débito encontrado: '{line}'")
+
+        if receita_match:
+            receita_text = receita_match.group(1).strip()
+            debito_data = {"cnpj": ctx["cnpj"], "receita": receita_text}
+        elif simples_nac_match:
+            # SIMPLES NAC. detectado - pode estar na mesma linha dos dados ou separado
+            parser_log(f"🎯 SIMPLES NAC. detectado: '{line}'")
+            debito_data = {"cnpj": ctx["cnpj"], "receita": "SIMPLES NAC."}
+
+            # Verifica se os dados estão na mesma linha (formato tabular)
+            # Exemplo: "SIMPLES NAC.    01/2025    20/02/2025    51.573,98    51.573,98    10.314,79    2.145,47    64.034,24    DEVEDOR"
+            line_parts = line.split()
+            if len(line_parts) >= 8:  # SIMPLES NAC. + período + vencimento + 5 valores + situação
+                try:
+                    # Extrai dados diretamente da linha
+                    periodo_idx = -1
+                    vencimento_idx = -1
+
+                    # Procura por padrões de data na linha
+                    for idx, part in enumerate(line_parts):
+                        if re.match(r'\d{2}/\d{4}', part) and periodo_idx == -1:
+                            periodo_idx = idx
+                        elif re.match(r'\d{2}/\d{2}/\d{4}', part) and vencimento_idx == -1:
+                            vencimento_idx = idx
+
+                    if periodo_idx != -1 and vencimento_idx != -1:
+                        # Extrai os dados da linha
+                        periodo = line_parts[periodo_idx]
+                        vencimento = line_parts[vencimento_idx]
+
+                        # Os valores monetários vêm após o vencimento
+                        valores_start = vencimento_idx + 1
+                        if len(line_parts) >= valores_start + 5:
+                            valor_original = parse_br_currency(line_parts[valores_start])
+                            saldo_devedor = parse_br_currency(line_parts[valores_start + 1])
+                            multa = parse_br_currency(line_parts[valores_start + 2])
+                            juros = parse_br_currency(line_parts[valores_start + 3])
+                            saldo_consolidado = parse_br_currency(line_parts[valores_start + 4])
+                            situacao = line_parts[valores_start + 5] if len(line_parts) > valores_start + 5 else "DEVEDOR"
+
+                            debito_data.update({
+                                "periodo_apuracao": format_periodo(periodo),
+                                "vencimento": format_date(vencimento),
+                                "valor_original": valor_original,
+                                "saldo_devedor": saldo_devedor,
+                                "multa": multa,
+                                "juros": juros,
+                                "saldo_devedor_consolidado": saldo_consolidado,
+                                "situacao": situacao
+                            })
+
+                            parser_log(f"✅ SIMPLES NAC. processado da mesma linha: {debito_data}")
                         else:
-                            print(f"⚠️ SIMPLES NAC. na mesma linha mas sem datas válidas", file=sys.stdout)
-                    except Exception as e:
-                        print(f"❌ Erro ao processar SIMPLES NAC. da mesma linha: {e}", file=sys.stdout)
-            else:
-                # Item sem código detectado
-                print(f"🔧 Processando item sem código: '{line}'", file=sys.stdout)
-                debito_data = {"cnpj": current_cnpj, "receita": "SEM CÓDIGO"}
-            
-            # Coleta as próximas linhas até encontrar outro código de receita ou fim da seção
-            j = i + 1
-            collected_lines = []
-            
-            # Coleta linhas até encontrar próximo registro ou fim
-            while j < len(lines):
-                next_line = lines[j].strip()
-                
-                # Para se encontrar outro código de receita (início de novo registro)
-                if re.match(r"(\d{4}-\d{2}\s+-\s+.*)", next_line):
-                    print(f"Próximo registro encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                # Para se encontrar SIMPLES NAC. (novo registro sem código padrão)
-                if re.match(r"^SIMPLES\s+NAC\.", next_line, re.IGNORECASE):
-                    print(f"SIMPLES NAC. (novo registro) encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                    
-                # Para se encontrar fim da seção
-                if any(re.search(ep, next_line, re.IGNORECASE) for ep in end_patterns):
-                    print(f"Fim da seção encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                    
-                # Para se encontrar CNPJ (novo grupo)
-                if re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", next_line):
-                    print(f"Novo CNPJ encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                # Para se encontrar cabeçalho
-                if "Receita" in next_line and "PA/Exerc" in next_line:
-                    print(f"Cabeçalho encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                if next_line:  # Só adiciona linhas não vazias
-                    collected_lines.append(next_line)
-                    print(f"Coletada linha {j+1}: '{next_line}'", file=sys.stdout)
-                
-                j += 1
-            
-            # --- Pré-processamento para juntar linhas de período trimestral ---
-            processed_lines = []
-            k = 0
-            while k < len(collected_lines):
-                current_line = collected_lines[k]
-                
-                # Verifica se a linha é um número ordinal (1º, 2º, 3º, 4º) e a próxima contém 'TRIM'
-                is_ordinal = re.match(r'^\s*(\d+)[ºªo°]\s*$', current_line.strip())
-                
-                if is_ordinal and k + 1 < len(collected_lines):
-                    next_line = collected_lines[k+1].strip()
-                    # Verifica se a próxima linha contém TRIM/YYYY
-                    if re.search(r'TRIM\s*/\s*\d{4}', next_line, re.IGNORECASE):
-                        merged_line = f"{current_line.strip()} {next_line}"
-                        processed_lines.append(merged_line)
-                        print(f"🔧 Linhas de período trimestral unidas: '{current_line.strip()}' + '{next_line}' = '{merged_line}'", file=sys.stdout)
-                        k += 2  # Pula a linha atual e a próxima
-                        continue
-                
-                # Também verifica padrões alternativos como "1º TRIM/2024" já na mesma linha
-                if re.search(r'\d+[ºªo°]\s*TRIM\s*/\s*\d{4}', current_line, re.IGNORECASE):
-                    print(f"🔧 Período trimestral já completo na linha: '{current_line}'", file=sys.stdout)
-                
-                processed_lines.append(current_line)
-                k += 1
-            # --- Fim do pré-processamento ---
+                            parser_log(f"⚠️ SIMPLES NAC. na mesma linha mas sem valores suficientes")
+                    else:
+                        parser_log(f"⚠️ SIMPLES NAC. na mesma linha mas sem datas válidas")
+                except Exception as e:
+                    parser_log(f"❌ Erro ao processar SIMPLES NAC. da mesma linha: {e}")
+        else:
+            # Item sem código detectado
+            parser_log(f"🔧 Processando item sem código: '{line}'")
+            debito_data = {"cnpj": ctx["cnpj"], "receita": "SEM CÓDIGO"}
 
-            # Para SIMPLES NAC., tenta uma abordagem mais direta analisando todas as linhas como uma sequência
-            if simples_nac_match:
-                print(f"🎯 Processamento especial para SIMPLES NAC. - analisando {len(processed_lines)} linhas", file=sys.stdout)
-                
-                # Para SIMPLES NAC., espera-se uma sequência específica de dados
-                # Formato esperado: período, vencimento, valor_original, saldo_devedor, multa, juros, saldo_consolidado, situação
-                if len(processed_lines) >= 7:
-                    try:
-                        debito_data.update({
-                            "periodo_apuracao": format_periodo(processed_lines[0]),
-                            "vencimento": format_date(processed_lines[1]),
-                            "valor_original": parse_br_currency(processed_lines[2]),
-                            "saldo_devedor": parse_br_currency(processed_lines[3]),
-                            "multa": parse_br_currency(processed_lines[4]),
-                            "juros": parse_br_currency(processed_lines[5]),
-                            "saldo_devedor_consolidado": parse_br_currency(processed_lines[6]),
-                            "situacao": processed_lines[7] if len(processed_lines) > 7 else "DEVEDOR"
-                        })
-                        print(f"✅ SIMPLES NAC. processado com sequência direta: {debito_data}", file=sys.stdout)
-                    except Exception as e:
-                        print(f"❌ Erro no processamento sequencial SIMPLES NAC.: {e}", file=sys.stdout)
-                        # Fallback para processamento flexível
-                        debito_data.update({
-                            "periodo_apuracao": "",
-                            "vencimento": "",
-                            "valor_original": 0.0,
-                            "saldo_devedor": 0.0,
-                            "multa": 0.0,
-                            "juros": 0.0,
-                            "saldo_devedor_consolidado": 0.0,
-                            "situacao": ""
-                        })
-                else:
-                    print(f"⚠️ SIMPLES NAC. com poucas linhas ({len(processed_lines)}), usando processamento flexível", file=sys.stdout)
+        # Coleta as próximas linhas até encontrar outro código de receita ou fim da seção
+        j = i + 1
+        collected_lines = []
+
+        # Coleta linhas até encontrar próximo registro ou fim
+        while j < len(lines):
+            next_line = lines[j].strip()
+
+            # Para se encontrar outro código de receita (início de novo registro)
+            if re.match(r"(\d{4}-\d{2}\s+-\s+.*)", next_line):
+                parser_log(f"Próximo registro encontrado na linha {j+1}, parando coleta")
+                break
+
+            # Para se encontrar SIMPLES NAC. (novo registro sem código padrão)
+            if re.match(r"^SIMPLES\s+NAC\.", next_line, re.IGNORECASE):
+                parser_log(f"SIMPLES NAC. (novo registro) encontrado na linha {j+1}, parando coleta")
+                break
+
+            # Para se encontrar fim da seção
+            if matches_any(spec["fim"], next_line):
+                parser_log(f"Fim da seção encontrado na linha {j+1}, parando coleta")
+                break
+
+            # Para se encontrar CNPJ (novo grupo)
+            if re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", next_line):
+                parser_log(f"Novo CNPJ encontrado na linha {j+1}, parando coleta")
+                break
+
+            # Para se encontrar cabeçalho
+            if "Receita" in next_line and "PA/Exerc" in next_line:
+                parser_log(f"Cabeçalho encontrado na linha {j+1}, parando coleta")
+                break
+
+            if next_line:  # Só adiciona linhas não vazias
+                collected_lines.append(next_line)
+                parser_log(f"Coletada linha {j+1}: '{next_line}'")
+
+            j += 1
+
+        # --- Pré-processamento para juntar linhas de período trimestral ---
+        processed_lines = []
+        k = 0
+        while k < len(collected_lines):
+            current_line = collected_lines[k]
+
+            # Verifica se a linha é um número ordinal (1º, 2º, 3º, 4º) e a próxima contém 'TRIM'
+            is_ordinal = re.match(r'^\s*(\d+)[ºªo°]\s*$', current_line.strip())
+
+            if is_ordinal and k + 1 < len(collected_lines):
+                next_line = collected_lines[k+1].strip()
+                # Verifica se a próxima linha contém TRIM/YYYY
+                if re.search(r'TRIM\s*/\s*\d{4}', next_line, re.IGNORECASE):
+                    merged_line = f"{current_line.strip()} {next_line}"
+                    processed_lines.append(merged_line)
+                    parser_log(f"🔧 Linhas de período trimestral unidas: '{current_line.strip()}' + '{next_line}' = '{merged_line}'")
+                    k += 2  # Pula a linha atual e a próxima
+                    continue
+
+            # Também verifica padrões alternativos como "1º TRIM/2024" já na mesma linha
+            # (?<!\d): começa só no início da sequência de dígitos, evitando retrocesso quadrático
+            if re.search(r'(?<!\d)\d+[ºªo°]\s*TRIM\s*/\s*\d{4}', current_line, re.IGNORECASE):
+                parser_log(f"🔧 Período trimestral já completo na linha: '{current_line}'")
+
+            processed_lines.append(current_line)
+            k += 1
+        # --- Fim do pré-processamento ---
+
+        # Para SIMPLES NAC., tenta uma abordagem mais direta analisando todas as linhas como uma sequência
+        if simples_nac_match:
+            parser_log(f"🎯 Processamento especial para SIMPLES NAC. - analisando {len(processed_lines)} linhas")
+
+            # Para SIMPLES NAC., espera-se uma sequência específica de dados
+            # Formato esperado: período, vencimento, valor_original, saldo_devedor, multa, juros, saldo_consolidado, situação
+            if len(processed_lines) >= 7:
+                try:
+                    debito_data.update({
+                        "periodo_apuracao": format_periodo(processed_lines[0]),
+                        "vencimento": format_date(processed_lines[1]),
+                        "valor_original": parse_br_currency(processed_lines[2]),
+                        "saldo_devedor": parse_br_currency(processed_lines[3]),
+                        "multa": parse_br_currency(processed_lines[4]),
+                        "juros": parse_br_currency(processed_lines[5]),
+                        "saldo_devedor_consolidado": parse_br_currency(processed_lines[6]),
+                        "situacao": processed_lines[7] if len(processed_lines) > 7 else "DEVEDOR"
+                    })
+                    parser_log(f"✅ SIMPLES NAC. processado com sequência direta: {debito_data}")
+                except Exception as e:
+                    parser_log(f"❌ Erro no processamento sequencial SIMPLES NAC.: {e}")
+                    # Fallback para processamento flexível
                     debito_data.update({
                         "periodo_apuracao": "",
                         "vencimento": "",
@@ -466,10 +534,7 @@ def extract_pendencias_debito(text):
                         "situacao": ""
                     })
             else:
-                # Processamento normal para outros tipos de débito
-                print(f"Analisando {len(processed_lines)} linhas processadas para o registro", file=sys.stdout)
-                
-                # Inicializa campos opcionais
+                parser_log(f"⚠️ SIMPLES NAC. com poucas linhas ({len(processed_lines)}), usando processamento flexível")
                 debito_data.update({
                     "periodo_apuracao": "",
                     "vencimento": "",
@@ -480,848 +545,1245 @@ def extract_pendencias_debito(text):
                     "saldo_devedor_consolidado": 0.0,
                     "situacao": ""
                 })
-            
-            # Processamento flexível para todos os tipos (incluindo SIMPLES NAC. se o sequencial falhou)
-            if not debito_data.get("periodo_apuracao") or not debito_data.get("vencimento"):
-                print(f"📋 Processamento flexível: analisando {len(processed_lines)} linhas para '{debito_data.get('receita', 'N/A')}'", file=sys.stdout)
-                
-                for idx, line_content in enumerate(processed_lines):
-                    print(f"📋 Linha {idx+1}/{len(processed_lines)}: '{line_content}'", file=sys.stdout)
-                    # Identifica PERÍODO (DD/MM/YYYY, MM/YYYY ou N TRIM/YYYY)
-                    periodo_match_ddmmyyyy = re.match(r'(\d{2}/\d{2}/\d{4})', line_content)
-                    periodo_match_mmyyyy = re.match(r'(\d{2})/(\d{4})', line_content)
-                    periodo_match_trim = re.match(r'(\d{1,2})(?:º|o|ª|\s)?\s*TRIM/(\d{4})', line_content, re.IGNORECASE)
-
-                    if periodo_match_ddmmyyyy or periodo_match_mmyyyy or periodo_match_trim:
-                         if not debito_data["periodo_apuracao"]:  # Só pega o primeiro
-                            debito_data["periodo_apuracao"] = format_periodo(line_content)
-                            print(f"✅ Período identificado: '{line_content}' -> '{debito_data['periodo_apuracao']}'", file=sys.stdout)
-                            continue # Pula para a próxima linha após identificar o período
-
-                    # Identifica DATA de VENCIMENTO (DD/MM/YYYY) - mas só se não for um período
-                    if re.match(r'(\d{2})/(\d{2})/(\d{4})', line_content) and not debito_data["vencimento"]:
-                        debito_data["vencimento"] = format_date(line_content)
-                        print(f"✅ Vencimento identificado: '{line_content}' -> '{debito_data['vencimento']}'", file=sys.stdout)
-                        continue # Pula para a próxima linha
-
-                    # Identifica VALORES MONETÁRIOS (números com vírgula/ponto)
-                    elif re.match(r'^[\d.,]+$', line_content) and (',' in line_content or '.' in line_content):
-                        valor = parse_br_currency(line_content)
-                        if valor > 0:
-                            # ORDEM CORRIGIDA dos valores no PDF: Vl. Original, Sdo. Devedor, Multa, Juros, Sdo. Dev. Cons.
-                            # Baseado na análise real dos dados: posição 3=Multa, posição 4=Juros, posição 5=Sdo.Cons
-                            if debito_data.get("valor_original", 0.0) == 0.0:
-                                debito_data["valor_original"] = valor
-                                print(f"✅ [POS 1] Valor Original identificado: '{line_content}' -> {valor}", file=sys.stdout)
-                            elif debito_data.get("saldo_devedor", 0.0) == 0.0:
-                                debito_data["saldo_devedor"] = valor
-                                print(f"✅ [POS 2] Saldo Devedor identificado: '{line_content}' -> {valor}", file=sys.stdout)
-                            elif debito_data.get("multa", 0.0) == 0.0:
-                                debito_data["multa"] = valor
-                                print(f"✅ [POS 3] Multa identificada: '{line_content}' -> {valor}", file=sys.stdout)
-                            elif debito_data.get("juros", 0.0) == 0.0:
-                                debito_data["juros"] = valor
-                                print(f"✅ [POS 4] Juros identificados: '{line_content}' -> {valor}", file=sys.stdout)
-                            elif debito_data.get("saldo_devedor_consolidado", 0.0) == 0.0:
-                                debito_data["saldo_devedor_consolidado"] = valor
-                                print(f"✅ [POS 5] Saldo Consolidado identificado: '{line_content}' -> {valor}", file=sys.stdout)
-                            else:
-                                print(f"⚠️ Valor monetário extra ignorado: '{line_content}' -> {valor}", file=sys.stdout)
-                    
-                    # Identifica SITUAÇÃO (texto que não é data, nem valor, nem notificação)
-                    else:
-                        if not debito_data["situacao"] and line_content and "notificação de lançamento" not in line_content.lower():
-                            # Ignora textos que parecem ser códigos de receita ou períodos mal formatados
-                            if not re.match(r'\d{4}-\d{2}', line_content) and not re.match(r'\d{2}/\d{4}', line_content):
-                                debito_data["situacao"] = line_content
-                                print(f"✅ Situação identificada: '{line_content}'", file=sys.stdout)
-            
-            # VALIDAÇÃO MAIS RESTRITIVA - foca em dados reais
-            is_simples_nac = debito_data.get("receita") == "SIMPLES NAC."
-            is_sem_codigo = debito_data.get("receita") == "SEM CÓDIGO"
-            
-            # Identifica códigos de receita importantes como IRPJ, CSLL, PIS, COFINS
-            receita_text = debito_data.get("receita", "")
-            is_important_tax = any(tax in receita_text.upper() for tax in ["IRPJ", "CSLL", "PIS", "COFINS"])
-            is_code_format = re.match(r'\d{4}-\d{2}\s*-\s*', receita_text)
-            
-            has_basic_data = debito_data.get("periodo_apuracao") and debito_data.get("vencimento")
-            has_financial_data = (debito_data.get("valor_original", 0) > 0 or 
-                                debito_data.get("saldo_devedor", 0) > 0)
-            
-            # Critério mais restritivo: deve ter dados reais (não apenas valores padrão)
-            has_real_period = (debito_data.get("periodo_apuracao") and 
-                             debito_data["periodo_apuracao"] != "N/A" and 
-                             debito_data["periodo_apuracao"].strip() != "")
-            has_real_due_date = (debito_data.get("vencimento") and 
-                                debito_data["vencimento"] != "N/A" and 
-                                debito_data["vencimento"].strip() != "")
-            
-            print(f"🔍 VALIDAÇÃO - Receita: '{receita_text}', É imposto importante: {is_important_tax}, Formato código: {bool(is_code_format)}", file=sys.stdout)
-            print(f"🔍 VALIDAÇÃO - Dados básicos: {has_basic_data}, Dados financeiros: {has_financial_data}, Período real: {has_real_period}, Vencimento real: {has_real_due_date}", file=sys.stdout)
-            
-            # Para SIMPLES NAC., usa validação MUITO mais flexível - SEMPRE aceita
-            if is_simples_nac:
-                # SIMPLES NAC. SEMPRE é aceito, independente dos dados
-                print(f"🎯 SIMPLES NAC. detectado - SEMPRE aceito", file=sys.stdout)
-                
-                # Preenche campos vazios com valores padrão
-                if not has_real_period:
-                    debito_data["periodo_apuracao"] = "SIMPLES NAC."
-                if not has_real_due_date:
-                    debito_data["vencimento"] = "A DEFINIR"
-                if not debito_data.get("situacao"):
-                    debito_data["situacao"] = "DEVEDOR"
-                
-                # Garante que todos os campos numéricos tenham valores
-                if not debito_data.get("valor_original"):
-                    debito_data["valor_original"] = 0.0
-                if not debito_data.get("saldo_devedor"):
-                    debito_data["saldo_devedor"] = 0.0
-                if not debito_data.get("multa"):
-                    debito_data["multa"] = 0.0
-                if not debito_data.get("juros"):
-                    debito_data["juros"] = 0.0
-                if not debito_data.get("saldo_devedor_consolidado"):
-                    debito_data["saldo_devedor_consolidado"] = 0.0
-                
-                result.append(debito_data)
-                print(f"✅ SIMPLES NAC. extraído (sempre aceito): {debito_data}", file=sys.stdout)
-                i = j  # Continua da linha onde parou a coleta
-            elif is_important_tax and is_code_format:
-                # VALIDAÇÃO ESPECIAL PARA IMPOSTOS IMPORTANTES (IRPJ, CSLL, PIS, COFINS)
-                # Esses impostos são sempre aceitos, mesmo com dados parciais
-                print(f"🎯 IMPOSTO IMPORTANTE detectado: {receita_text} - SEMPRE aceito", file=sys.stdout)
-                
-                # Preenche campos obrigatórios com valores padrão se necessário
-                if not has_real_period:
-                    debito_data["periodo_apuracao"] = "A DEFINIR"
-                if not has_real_due_date:
-                    debito_data["vencimento"] = "A DEFINIR"
-                if not debito_data.get("situacao"):
-                    debito_data["situacao"] = "DEVEDOR"
-                
-                # Garante que todos os campos numéricos tenham valores
-                for field in ["valor_original", "saldo_devedor", "multa", "juros", "saldo_devedor_consolidado"]:
-                    if not debito_data.get(field):
-                        debito_data[field] = 0.0
-                
-                result.append(debito_data)
-                print(f"✅ IMPOSTO IMPORTANTE extraído (sempre aceito): {debito_data}", file=sys.stdout)
-                i = j  # Continua da linha onde parou a coleta
-            elif has_basic_data and debito_data.get("receita"):
-                # Validação normal para itens com código
-                result.append(debito_data)
-                print(f"✅ Item com código extraído: {debito_data}", file=sys.stdout)
-                i = j  # Continua da linha onde parou a coleta
-            elif is_sem_codigo and (has_real_period or has_real_due_date or has_financial_data):
-                # Para itens sem código, aceita se tiver dados reais OU se for da seção de débito
-                if has_real_period:
-                    periodo_code = debito_data["periodo_apuracao"].replace("/", "-").replace(" ", "-")
-                    debito_data["receita"] = f"SIMPLES-{periodo_code}"
+        else:
+            # Processamento normal para outros tipos de débito
+            parser_log(f"Analisando {len(processed_lines)} linhas processadas para o registro")
+
+            # Inicializa campos opcionais
+            debito_data.update({
+                "periodo_apuracao": "",
+                "vencimento": "",
+                "valor_original": 0.0,
+                "saldo_devedor": 0.0,
+                "multa": 0.0,
+                "juros": 0.0,
+                "saldo_devedor_consolidado": 0.0,
+                "situacao": ""
+            })
+
+        # Processamento flexível para todos os tipos (incluindo SIMPLES NAC. se o sequencial falhou)
+        if not debito_data.get("periodo_apuracao") or not debito_data.get("vencimento"):
+            parser_log(f"📋 Processamento flexível: analisando {len(processed_lines)} linhas para '{debito_data.get('receita', 'N/A')}'")
+
+            for idx, line_content in enumerate(processed_lines):
+                parser_log(f"📋 Linha {idx+1}/{len(processed_lines)}: '{line_content}'")
+                # Identifica PERÍODO (DD/MM/YYYY, MM/YYYY ou N TRIM/YYYY)
+                periodo_match_ddmmyyyy = re.match(r'(\d{2}/\d{2}/\d{4})', line_content)
+                periodo_match_mmyyyy = re.match(r'(\d{2})/(\d{4})', line_content)
+                periodo_match_trim = re.match(r'(\d{1,2})(?:º|o|ª|\s)?\s*TRIM/(\d{4})', line_content, re.IGNORECASE)
+
+                if periodo_match_ddmmyyyy or periodo_match_mmyyyy or periodo_match_trim:
+                     if not debito_data["periodo_apuracao"]:  # Só pega o primeiro
+                        debito_data["periodo_apuracao"] = format_periodo(line_content)
+                        parser_log(f"✅ Período identificado: '{line_content}' -> '{debito_data['periodo_apuracao']}'")
+                        continue # Pula para a próxima linha após identificar o período
+
+                # Identifica DATA de VENCIMENTO (DD/MM/YYYY) - mas só se não for um período
+                if re.match(r'(\d{2})/(\d{2})/(\d{4})', line_content) and not debito_data["vencimento"]:
+                    debito_data["vencimento"] = format_date(line_content)
+                    parser_log(f"✅ Vencimento identificado: '{line_content}' -> '{debito_data['vencimento']}'")
+                    continue # Pula para a próxima linha
+
+                # Identifica VALORES MONETÁRIOS (números com vírgula/ponto)
+                elif re.match(r'^[\d.,]+$', line_content) and (',' in line_content or '.' in line_content):
+                    valor = parse_br_currency(line_content)
+                    if valor > 0:
+                        # ORDEM CORRIGIDA dos valores no PDF: Vl. Original, Sdo. Devedor, Multa, Juros, Sdo. Dev. Cons.
+                        # Baseado na análise real dos dados: posição 3=Multa, posição 4=Juros, posição 5=Sdo.Cons
+                        if debito_data.get("valor_original", 0.0) == 0.0:
+                            debito_data["valor_original"] = valor
+                            parser_log(f"✅ [POS 1] Valor Original identificado: '{line_content}' -> {valor}")
+                        elif debito_data.get("saldo_devedor", 0.0) == 0.0:
+                            debito_data["saldo_devedor"] = valor
+                            parser_log(f"✅ [POS 2] Saldo Devedor identificado: '{line_content}' -> {valor}")
+                        elif debito_data.get("multa", 0.0) == 0.0:
+                            debito_data["multa"] = valor
+                            parser_log(f"✅ [POS 3] Multa identificada: '{line_content}' -> {valor}")
+                        elif debito_data.get("juros", 0.0) == 0.0:
+                            debito_data["juros"] = valor
+                            parser_log(f"✅ [POS 4] Juros identificados: '{line_content}' -> {valor}")
+                        elif debito_data.get("saldo_devedor_consolidado", 0.0) == 0.0:
+                            debito_data["saldo_devedor_consolidado"] = valor
+                            parser_log(f"✅ [POS 5] Saldo Consolidado identificado: '{line_content}' -> {valor}")
+                        else:
+                            parser_log(f"⚠️ Valor monetário extra ignorado: '{line_content}' -> {valor}")
+
+                # Identifica SITUAÇÃO (texto que não é data, nem valor, nem notificação)
                 else:
-                    debito_data["receita"] = f"SIMPLES-{len(result)+1:03d}"
-                
-                # Preenche campos vazios apenas se necessário
-                if not has_real_period:
-                    debito_data["periodo_apuracao"] = "PENDENCIA"
-                if not has_real_due_date:
-                    debito_data["vencimento"] = "A DEFINIR"
+                    if not debito_data["situacao"] and line_content and "notificação de lançamento" not in line_content.lower():
+                        # Ignora textos que parecem ser códigos de receita ou períodos mal formatados
+                        if not re.match(r'\d{4}-\d{2}', line_content) and not re.match(r'\d{2}/\d{4}', line_content):
+                            debito_data["situacao"] = line_content
+                            parser_log(f"✅ Situação identificada: '{line_content}'")
+
+        # VALIDAÇÃO MAIS RESTRITIVA - foca em dados reais
+        is_simples_nac = debito_data.get("receita") == "SIMPLES NAC."
+        is_sem_codigo = debito_data.get("receita") == "SEM CÓDIGO"
+
+        # Identifica códigos de receita importantes como IRPJ, CSLL, PIS, COFINS
+        receita_text = debito_data.get("receita", "")
+        is_important_tax = any(tax in receita_text.upper() for tax in ["IRPJ", "CSLL", "PIS", "COFINS"])
+        is_code_format = re.match(r'\d{4}-\d{2}\s*-\s*', receita_text)
+
+        has_basic_data = debito_data.get("periodo_apuracao") and debito_data.get("vencimento")
+        has_financial_data = (debito_data.get("valor_original", 0) > 0 or 
+                            debito_data.get("saldo_devedor", 0) > 0)
+
+        # Critério mais restritivo: deve ter dados reais (não apenas valores padrão)
+        has_real_period = (debito_data.get("periodo_apuracao") and 
+                         debito_data["periodo_apuracao"] != "N/A" and 
+                         debito_data["periodo_apuracao"].strip() != "")
+        has_real_due_date = (debito_data.get("vencimento") and 
+                            debito_data["vencimento"] != "N/A" and 
+                            debito_data["vencimento"].strip() != "")
+
+        parser_log(f"🔍 VALIDAÇÃO - Receita: '{receita_text}', É imposto importante: {is_important_tax}, Formato código: {bool(is_code_format)}")
+        parser_log(f"🔍 VALIDAÇÃO - Dados básicos: {has_basic_data}, Dados financeiros: {has_financial_data}, Período real: {has_real_period}, Vencimento real: {has_real_due_date}")
+
+        # Para SIMPLES NAC., usa validação MUITO mais flexível - SEMPRE aceita
+        if is_simples_nac:
+            # SIMPLES NAC. SEMPRE é aceito, independente dos dados
+            parser_log(f"🎯 SIMPLES NAC. detectado - SEMPRE aceito")
+
+            # Preenche campos vazios com valores padrão
+            if not has_real_period:
+                debito_data["periodo_apuracao"] = "SIMPLES NAC."
+            if not has_real_due_date:
+                debito_data["vencimento"] = "A DEFINIR"
+            if not debito_data.get("situacao"):
+                debito_data["situacao"] = "DEVEDOR"
+
+            # Garante que todos os campos numéricos tenham valores
+            if not debito_data.get("valor_original"):
+                debito_data["valor_original"] = 0.0
+            if not debito_data.get("saldo_devedor"):
+                debito_data["saldo_devedor"] = 0.0
+            if not debito_data.get("multa"):
+                debito_data["multa"] = 0.0
+            if not debito_data.get("juros"):
+                debito_data["juros"] = 0.0
+            if not debito_data.get("saldo_devedor_consolidado"):
+                debito_data["saldo_devedor_consolidado"] = 0.0
+
+            result.append(debito_data)
+            parser_log(f"✅ SIMPLES NAC. extraído (sempre aceito): {debito_data}")
+            return j  # Continua da linha onde parou a coleta
+        elif is_important_tax and is_code_format:
+            # VALIDAÇÃO ESPECIAL PARA IMPOSTOS IMPORTANTES (IRPJ, CSLL, PIS, COFINS)
+            # Esses impostos são sempre aceitos, mesmo com dados parciais
+            parser_log(f"🎯 IMPOSTO IMPORTANTE detectado: {receita_text} - SEMPRE aceito")
+
+            # Preenche campos obrigatórios com valores padrão se necessário
+            if not has_real_period:
+                debito_data["periodo_apuracao"] = "A DEFINIR"
+            if not has_real_due_date:
+                debito_data["vencimento"] = "A DEFINIR"
+            if not debito_data.get("situacao"):
+                debito_data["situacao"] = "DEVEDOR"
+
+            # Garante que todos os campos numéricos tenham valores
+            for field in ["valor_original", "saldo_devedor", "multa", "juros", "saldo_devedor_consolidado"]:
+                if not debito_data.get(field):
+                    debito_data[field] = 0.0
+
+            result.append(debito_data)
+            parser_log(f"✅ IMPOSTO IMPORTANTE extraído (sempre aceito): {debito_data}")
+            return j  # Continua da linha onde parou a coleta
+        elif has_basic_data and debito_data.get("receita"):
+            # Validação normal para itens com código
+            result.append(debito_data)
+            parser_log(f"✅ Item com código extraído: {debito_data}")
+            return j  # Continua da linha onde parou a coleta
+        elif is_sem_codigo and (has_real_period or has_real_due_date or has_financial_data):
+            # Para itens sem código, aceita se tiver dados reais OU se for da seção de débito
+            if has_real_period:
+                periodo_code = debito_data["periodo_apuracao"].replace("/", "-").replace(" ", "-")
+                debito_data["receita"] = f"SIMPLES-{periodo_code}"
+            else:
+                debito_data["receita"] = f"SIMPLES-{len(result)+1:03d}"
+                # Numeração depende da posição no resultado: renumerada ao juntar trechos paralelos
+                ctx.setdefault("itens_numerados", []).append(len(result))
+
+            # Preenche campos vazios apenas se necessário
+            if not has_real_period:
+                debito_data["periodo_apuracao"] = "PENDENCIA"
+            if not has_real_due_date:
+                debito_data["vencimento"] = "A DEFINIR"
+            if not debito_data.get("situacao"):
+                debito_data["situacao"] = "DEVEDOR"
+
+            result.append(debito_data)
+            parser_log(f"✅ Item sem código extraído com dados reais: {debito_data}")
+            return j  # Continua da linha onde parou a coleta
+        else:
+            # ÚLTIMA CHANCE: Se está na seção de débito SIEF e tem CNPJ, aceita mesmo com dados mínimos
+            if ctx["cnpj"] and debito_data.get("receita"):
+                # Preenche campos obrigatórios com valores padrão
+                if not debito_data.get("periodo_apuracao"):
+                    debito_data["periodo_apuracao"] = "N/A"
+                if not debito_data.get("vencimento"):
+                    debito_data["vencimento"] = "N/A"
                 if not debito_data.get("situacao"):
-                    debito_data["situacao"] = "DEVEDOR"
-                
+                    debito_data["situacao"] = "PENDENTE"
+
                 result.append(debito_data)
-                print(f"✅ Item sem código extraído com dados reais: {debito_data}", file=sys.stdout)
-                i = j  # Continua da linha onde parou a coleta
+                parser_log(f"✅ Item extraído com dados mínimos (última chance): {debito_data}")
+                return j  # Continua da linha onde parou a coleta
             else:
-                # ÚLTIMA CHANCE: Se está na seção de débito SIEF e tem CNPJ, aceita mesmo com dados mínimos
-                if current_cnpj and debito_data.get("receita"):
-                    # Preenche campos obrigatórios com valores padrão
-                    if not debito_data.get("periodo_apuracao"):
-                        debito_data["periodo_apuracao"] = "N/A"
-                    if not debito_data.get("vencimento"):
-                        debito_data["vencimento"] = "N/A"
-                    if not debito_data.get("situacao"):
-                        debito_data["situacao"] = "PENDENTE"
-                    
-                    result.append(debito_data)
-                    print(f"✅ Item extraído com dados mínimos (última chance): {debito_data}", file=sys.stdout)
-                    i = j  # Continua da linha onde parou a coleta
-                else:
-                    print(f"❌ Item rejeitado - sem dados reais suficientes: {debito_data}", file=sys.stdout)
-                    i += 1
+                parser_log(f"❌ Item rejeitado - sem dados reais suficientes: {debito_data}")
+                return i + 1
 
-        else:
-            # Se a linha não é CNPJ, cabeçalho ou início de receita, apenas pula
-            print(f"Linha ignorada (não reconhecida como início de débito): '{line}'", file=sys.stdout)
-            i += 1
-
-    if not result:
-         print("Nenhum item de débito SIEF parseado com sucesso na função.", file=sys.stdout)
+    else:
+        # Se a linha não é CNPJ, cabeçalho ou início de receita, apenas pula
+        parser_log(f"Linha ignorada (não reconhecida como início de débito): '{line}'")
+        return i + 1
+
+# --- Resumo do débito SIEF ---
+# No resumo só interessam o CNPJ e os cinco valores de cada débito, que são lidos aqui
+# sem montar o item (datas, situação, receita e logs ficam de fora). As regras seguem
+# parse_registro_debito_sief:
+# - todo início de débito (receita, SIMPLES NAC. ou linha tabular) com CNPJ definido é
+#   aceito pela validação, então contar o início basta;
+# - fora da sequência direta do SIMPLES NAC., os valores são as primeiras cinco linhas
+#   só com número positivo, na ordem (período, vencimento e situação nunca são números);
+# - na sequência direta (SIMPLES NAC. com 7 linhas ou mais) os valores são a 3ª à 7ª linha.
+# As demais formas (itens sem código, sequência do SIMPLES fora do padrão) vão para
+# parse_registro_debito_sief, de modo que contagens e totais são sempre os da extração completa.
+SIEF_RESUMO_RECEITA = re.compile(r"\d{4}-\d{2}\s+-\s+")
+SIEF_RESUMO_SIMPLES = re.compile(r"SIMPLES\s+NAC\.?", re.IGNORECASE)
+SIEF_RESUMO_SIMPLES_INICIO = re.compile(r"SIMPLES\s+NAC\.", re.IGNORECASE)
+SIEF_RESUMO_CNPJ = re.compile(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})")
+SIEF_RESUMO_TABULAR = re.compile(r"^(\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+(\w+)")
+SIEF_RESUMO_PERIODO = re.compile(r"\d{2}/(?:\d{2}/)?\d{4}$")
+SIEF_RESUMO_DATA = re.compile(r"\d{2}/\d{2}/\d{4}$")
+SIEF_RESUMO_NUMERO = re.compile(r"^[\d.,]+$")
+SIEF_VALUE_FIELDS = ["valor_original", "saldo_devedor", "multa", "juros", "saldo_devedor_consolidado"]
+
+def collect_debito_sief_lines(lines, j, spec):
+    """Linhas não vazias do registro a partir de j, com as mesmas paradas de parse_registro_debito_sief."""
+    collected_lines = []
+    while j < len(lines):
+        next_line = lines[j].strip()
+        if (SIEF_RESUMO_RECEITA.match(next_line)
+                or SIEF_RESUMO_SIMPLES_INICIO.match(next_line)
+                or matches_any(spec["fim"], next_line)
+                or SIEF_RESUMO_CNPJ.search(next_line)
+                or ("Receita" in next_line and "PA/Exerc" in next_line)):
+            break
+        if next_line:
+            collected_lines.append(next_line)
+        j += 1
+    return collected_lines, j
+
+def is_money_line(line):
+    return bool(SIEF_RESUMO_NUMERO.match(line)) and ("," in line or "." in line)
+
+def summarize_registro_debito_sief(lines, i, line, ctx, result, spec):
+    if not ctx["cnpj"]:
+        return parse_registro_debito_sief(lines, i, line, ctx, result, spec)
+    simples = SIEF_RESUMO_SIMPLES.search(line)
+    if not simples and not SIEF_RESUMO_RECEITA.match(line):
+        tabular_match = SIEF_RESUMO_TABULAR.match(line)
+        if not tabular_match:
+            return parse_registro_debito_sief(lines, i, line, ctx, result, spec)
+        valores = [parse_br_currency(valor) for valor in tabular_match.groups()[2:7]]
+        result.append(dict(zip(SIEF_VALUE_FIELDS, valores), cnpj=ctx["cnpj"]))
+        return i + 1
+
+    collected_lines, j = collect_debito_sief_lines(lines, i + 1, spec)
+    if simples and len(collected_lines) >= 7:
+        # Sequência direta: só no formato exato (sem linhas de trimestre unidas antes da 7ª)
+        if not (SIEF_RESUMO_PERIODO.match(collected_lines[0]) and SIEF_RESUMO_DATA.match(collected_lines[1])
+                and all(SIEF_RESUMO_NUMERO.match(valor) for valor in collected_lines[2:7])):
+            return parse_registro_debito_sief(lines, i, line, ctx, result, spec)
+        valores = [parse_br_currency(valor) for valor in collected_lines[2:7]]
+    else:
+        valores = []
+        for collected_line in collected_lines:
+            if is_money_line(collected_line):
+                valor = parse_br_currency(collected_line)
+                if valor > 0:
+                    valores.append(valor)
+                    if len(valores) == len(SIEF_VALUE_FIELDS):
+                        break
+        valores += [0.0] * (len(SIEF_VALUE_FIELDS) - len(valores))
+    result.append(dict(zip(SIEF_VALUE_FIELDS, valores), cnpj=ctx["cnpj"]))
+    return j
+
+# Registro de "Débito com Exigibilidade Suspensa (SIEF)"
+def parse_registro_exig_suspensa_sief(lines, i, line, ctx, result, spec):
+    # Verifica se a linha começa com um código de receita OU é "SIMPLES NAC."
+    receita_match = re.match(r"(\d{4}-\d{2}\s+-\s+.*)", line)
+    simples_nac_match = re.match(r"(SIMPLES\s+NAC\.)", line, re.IGNORECASE)
+
+    # Log específico para debug do item 1082-01 - CP-SEGUR.
+    if "1082-01" in line and "CP-SEGUR" in line:
+        parser_log(f"🔍 DEBUG: Linha com 1082-01 - CP-SEGUR encontrada: '{line}'")
+        parser_log(f"🔍 DEBUG: receita_match = {receita_match}, simples_nac_match = {simples_nac_match}")
+        parser_log(f"🔍 DEBUG: current_cnpj = '{ctx['cnpj']}'")
+
+    if (receita_match or simples_nac_match) and ctx["cnpj"]:
+        parser_log(f"\nInício de registro de débito Exig Suspensa encontrado: '{line}'")
+        debito_data = {"cnpj": ctx["cnpj"], "cno": ctx["cno"] if ctx["cno"] else ""} # Inclui CNO se encontrado
+
+        # Corrige a atribuição da receita
+        if receita_match:
+            debito_data["receita"] = receita_match.group(1).strip()
+        elif simples_nac_match:
+            debito_data["receita"] = simples_nac_match.group(1).strip()
+
+        # Reset CNO após usá-lo para este débito
+        # ctx["cno"] = ""
+
+        # Coleta as linhas até encontrar outro registro ou fim da seção (lógica inteligente)
+        data_lines = []
+        j = i + 1
+
+        while j < len(lines):
+            next_line = lines[j].strip()
+
+            # Para se encontrar outro código de receita (início de novo registro)
+            if re.match(r"(\d{4}-\d{2}\s+-\s+.*)", next_line):
+                parser_log(f"Próximo registro encontrado na linha {j+1}, parando coleta")
+                break
 
-    return result
+            # Para se encontrar SIMPLES NAC. (novo registro sem código padrão)
+            if re.match(r"^SIMPLES\s+NAC\.", next_line, re.IGNORECASE):
+                parser_log(f"SIMPLES NAC. (novo registro) encontrado na linha {j+1}, parando coleta")
+                break
 
-# Função para extrair "Débito com Exigibilidade Suspensa (SIEF)"
-def extract_debitos_exig_suspensa_sief(text):
-    result = []
-    lines = text.split('\n')
-    in_section = False
-    current_cnpj = ""
-    current_cno = "" # Adicionado para capturar CNO
-
-    start_pattern = r"Débito\s+com\s+Exigibilidade\s+Suspensa\s+\(SIEF\)"
-    end_patterns = [
-        r"^(?:Pendência|Pendencia|Parcelamento|Processo|Inscrição|Débito\s+com\s+Exigibilidade)", # Início de outra seção SIEF/PGFN
-        r"Pendência\s*[–-]\s*Parcelamento", # Padrão específico para "Pendência – Parcelamento (SIEFPAR)"
-        r"Final\s+do\s+Relatório",
-        r"^\s*_{10,}\s*$", # Linha de underscores
-        r"Diagnóstico\s+Fiscal\s+na\s+Procuradoria-Geral" # Fim da parte da Receita
-    ]
+            # Para se encontrar fim de seção
+            if matches_any(spec["fim"], next_line):
+                parser_log(f"Fim da seção encontrado na linha {j+1}, parando coleta")
+                break
 
-    # Funções helper agora são globais
+            # Se linha vazia, para a coleta
+            if not next_line:
+                break
 
-    print("\n--- Iniciando busca pela seção 'Débito com Exigibilidade Suspensa (SIEF)' ---", file=sys.stdout)
+            parser_log(f"Coletada linha {j+1}: '{next_line}'")
+            data_lines.append(next_line)
+            j += 1
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+            # Limite de segurança para evitar loops infinitos
+            if len(data_lines) >= 10:
+                parser_log(f"Limite de 10 linhas atingido, parando coleta")
+                break
 
-        # Verifica se entramos na seção correta
-        if not in_section and re.search(start_pattern, line, re.IGNORECASE):
-            in_section = True
-            current_cnpj = ""
-            current_cno = ""
-            print(f"Seção 'Débito com Exigibilidade Suspensa (SIEF)' encontrada na linha {i+1}: '{line}'", file=sys.stdout)
-            i += 1
-            continue
+        parser_log(f"Analisando {len(data_lines)} linhas processadas para o registro")
 
-        if not in_section:
-            i += 1
-            continue
+        if len(data_lines) >= 5:  # Mínimo 5 campos, mas tenta pegar até 8
+            try:
+                temp_data = {}
+                temp_data["periodo_apuracao"] = format_periodo(data_lines[0])
+                temp_data["vencimento"] = format_date(data_lines[1])
+                temp_data["valor_original"] = parse_br_currency(data_lines[2])
+                temp_data["saldo_devedor"] = parse_br_currency(data_lines[3])
+
+                # Tenta extrair multa, juros e saldo consolidado se disponíveis
+                if len(data_lines) >= 6:
+                    temp_data["multa"] = parse_br_currency(data_lines[4])
+                else:
+                    temp_data["multa"] = 0.0
 
-        # Verifica se saímos da seção
-        if any(re.search(ep, line, re.IGNORECASE) for ep in end_patterns):
-            print(f"Fim da seção 'Débito com Exigibilidade Suspensa (SIEF)' detectado na linha {i+1}: '{line}'", file=sys.stdout)
-            in_section = False
-            break
+                if len(data_lines) >= 7:
+                    temp_data["juros"] = parse_br_currency(data_lines[5])
+                else:
+                    temp_data["juros"] = 0.0
+
+                if len(data_lines) >= 8:
+                    temp_data["saldo_devedor_consolidado"] = parse_br_currency(data_lines[6])
+                    temp_data["situacao"] = data_lines[7].strip()
+                elif len(data_lines) >= 7:
+                    temp_data["saldo_devedor_consolidado"] = parse_br_currency(data_lines[5])
+                    temp_data["situacao"] = data_lines[6].strip()
+                else:
+                    temp_data["saldo_devedor_consolidado"] = temp_data["saldo_devedor"]  # Usa saldo devedor se não tiver consolidado
+                    temp_data["situacao"] = data_lines[4].strip()
 
-        if not line:
-            i += 1
-            continue
+                # Validação mínima
+                if debito_data["receita"] and temp_data.get("periodo_apuracao") and temp_data.get("vencimento"):
+                    debito_data.update(temp_data)
+                    result.append(debito_data)
+                    parser_log(f"Item Exig Suspensa extraído: {debito_data}")
+                    ctx["cno"] = "" # Reseta CNO após extrair o item associado
+                    return j  # Avança para a posição onde parou a coleta
+                else:
+                    parser_log(f"Falha na validação (Exig Suspensa) para receita '{debito_data['receita']}'. Dados: {temp_data}")
+                    return i + 1
+            except IndexError:
+                 parser_log(f"Erro Index (Exig Suspensa) para receita '{debito_data['receita']}'.")
+                 return i + 1
+            except Exception as e:
+                 parser_log(f"Erro processando (Exig Suspensa) para receita '{debito_data['receita']}': {e}. Linhas: {data_lines}")
+                 return i + 1
+        else:
+            parser_log(f"Número insuficiente de linhas ({len(data_lines)}) (Exig Suspensa) para receita '{debito_data['receita']}'. Esperado mínimo 5, ideal 8.")
+            return i + 1
+    else:
+        # Se não for CNPJ, CNO, cabeçalho ou receita, ignora
+        parser_log(f"Linha ignorada (Exig Suspensa): '{line}'")
+        return i + 1
+
+# Registro de "Inscrição com Exigibilidade Suspensa (SIDA)" - Lógica v5
+# O registro em andamento fica em ctx["registro"] até a próxima inscrição ou o fim da seção
+def parse_registro_inscricao_sida(lines, i, line, ctx, result, spec):
+    current_inscricao_data = ctx["registro"]
+
+    # Tenta identificar o início de um registro pela Inscrição (formato XX.X.XX.XXXXXX-XX)
+    inscricao_match = re.match(r"(\d{2}\.\d{1}\.\d{2}\.\d{6}-\d{2})", line)
+    if inscricao_match:
+        # Salva o registro anterior se existir e for válido
+        if current_inscricao_data.get("inscricao"):
+             if current_inscricao_data.get("receita") and current_inscricao_data.get("inscrito_em"):
+                 result.append(current_inscricao_data)
+                 parser_log(f"Item SIDA extraído (fim por nova inscrição): {current_inscricao_data}")
+             else:
+                  parser_log(f"AVISO: Dados SIDA incompletos descartados (antes de nova inscrição): {current_inscricao_data}")
+
+        # Inicia novo registro
+        current_inscricao_data = {"cnpj": ctx["cnpj"]} # Usa o último CNPJ encontrado
+        ctx["registro"] = current_inscricao_data
+        current_inscricao_data["inscricao"] = inscricao_match.group(1)
+        parser_log(f"\nInício de registro SIDA encontrado: '{line}'")
+
+        # Procura por Receita, Inscrito em, Ajuizado em, Tipo Devedor na mesma linha, sequencialmente
+        remaining_line = line[inscricao_match.end():]
+
+        # Receita
+        # "\s" em vez de "\s+" no início: mesmo grupo e mesmo fim, sem retrocesso quadrático em espaços
+        receita_match = re.search(r"\s(\d{4}-[\w\s]+)", remaining_line)
+        current_inscricao_data["receita"] = receita_match.group(1).strip() if receita_match else ""
+        if receita_match: remaining_line = remaining_line[receita_match.end():]
+
+        # Inscrito em
+        inscrito_em_match = re.search(r"\s(\d{2}/\d{2}/\d{4})", remaining_line)
+        current_inscricao_data["inscrito_em"] = format_date(inscrito_em_match.group(1)) if inscrito_em_match else ""
+        if inscrito_em_match: remaining_line = remaining_line[inscrito_em_match.end():]
+
+        # Ajuizado em (pode ser data ou '-')
+        ajuizado_em_match = re.search(r"\s(\d{2}/\d{2}/\d{4}|-)\s*", remaining_line)
+        current_inscricao_data["ajuizado_em"] = format_date(ajuizado_em_match.group(1)) if ajuizado_em_match and ajuizado_em_match.group(1) != '-' else ""
+        if ajuizado_em_match: remaining_line = remaining_line[ajuizado_em_match.end():]
+
+        # Log completo da linha para depuração
+        parser_log(f"Linha completa para análise de Tipo Devedor: '{line}'")
+
+        # Verificação especial para DEVEDOR PRINCIPAL - tentativa mais agressiva de encontrar
+        if "DEVEDOR PRINCIPAL" in line:
+            current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
+            current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
+            parser_log(f"[DETECTADO] Tipo DEVEDOR PRINCIPAL encontrado na linha!")
+        elif "CORRESPONSÁVEL" in line:
+            current_inscricao_data["tipo_devedor"] = "CORRESPONSÁVEL"
+            current_inscricao_data["devedor_principal"] = ""
+            parser_log(f"[DETECTADO] Tipo CORRESPONSÁVEL encontrado na linha!")
+        else:
+            # Tipo Devedor (DEVEDOR PRINCIPAL ou CORRESPONSÁVEL) - busca com expressão regular
+            tipo_devedor_match = re.search(r"(DEVEDOR\s+PRINCIPAL|CORRESPONSÁVEL)", remaining_line, re.IGNORECASE)
+            if tipo_devedor_match:
+                current_inscricao_data["tipo_devedor"] = tipo_devedor_match.group(1).strip().upper()
+                parser_log(f"Tipo de Devedor definido na linha principal via regex: '{current_inscricao_data['tipo_devedor']}'")
+
+                # Se for DEVEDOR PRINCIPAL, também coloca isso no campo devedor_principal para exibição na tabela
+                if "PRINCIPAL" in current_inscricao_data["tipo_devedor"]:
+                    current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
+                    parser_log(f"Devedor Principal preenchido com 'DEVEDOR PRINCIPAL' para melhor visualização")
+                else:
+                    # Se for CORRESPONSÁVEL, o devedor_principal será encontrado nas próximas linhas
+                    current_inscricao_data["devedor_principal"] = ""
+            else:
+                # Último recurso: busca uma versão simplificada
+                if "PRINCIPAL" in line.upper():
+                    current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
+                    current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
+                    parser_log(f"[ÚLTIMO RECURSO] Detectado PRINCIPAL na linha, definindo como DEVEDOR PRINCIPAL")
+                else:
+                    current_inscricao_data["tipo_devedor"] = ""
+                    current_inscricao_data["devedor_principal"] = ""
+                    parser_log(f"[AVISO] Não foi possível encontrar o tipo de devedor na linha")
 
-        # Tenta encontrar CNPJ
-        cnpj_match = re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", line)
-        if cnpj_match:
-            current_cnpj = cnpj_match.group(1)
-            print(f"CNPJ definido para (Exig Suspensa): {current_cnpj}", file=sys.stdout)
-            i += 1
-            continue
+        # --- LÓGICA MELHORADA PARA PROCURAR PROCESSO NAS PRÓXIMAS LINHAS ---
+        current_inscricao_data["processo"] = "" # Inicializa o campo processo
+        search_lines_limit = 5 # Limita a busca às próximas 5 linhas
+        j = i + 1 # Começa a procurar na próxima linha
 
-        # Tenta encontrar CNO (pode aparecer antes da linha do débito)
-        cno_match = re.search(r"CNO:\s*([\d./-]+)", line)
-        if cno_match:
-            current_cno = cno_match.group(1)
-            print(f"CNO definido para (Exig Suspensa): {current_cno}", file=sys.stdout)
-            # Não incrementa i aqui, pois o CNO pode estar na mesma "unidade" do débito
-            # A linha do débito virá a seguir
+        while j < len(lines) and (j - (i + 1)) < search_lines_limit:
+            next_line = lines[j].strip()
 
-        # Ignora linhas de cabeçalho
-        if "Receita" in line and "PA/Exerc" in line and "Vcto" in line and "Situação" in line:
-             print(f"Linha de cabeçalho pulada (Exig Suspensa): '{line}'", file=sys.stdout)
-             i += 1
-             continue
-        if line in ["Dt. Vcto", "Vl.Original", "Sdo.Devedor", "Situação"]:
-             print(f"Linha de título de campo pulada (Exig Suspensa): '{line}'", file=sys.stdout)
-             i += 1
-             continue
-
-        # Verifica se a linha começa com um código de receita OU é "SIMPLES NAC."
-        receita_match = re.match(r"(\d{4}-\d{2}\s+-\s+.*)", line)
-        simples_nac_match = re.match(r"(SIMPLES\s+NAC\.)", line, re.IGNORECASE)
-        
-        # Log específico para debug do item 1082-01 - CP-SEGUR.
-        if "1082-01" in line and "CP-SEGUR" in line:
-            print(f"🔍 DEBUG: Linha com 1082-01 - CP-SEGUR encontrada: '{line}'", file=sys.stdout)
-            print(f"🔍 DEBUG: receita_match = {receita_match}, simples_nac_match = {simples_nac_match}", file=sys.stdout)
-            print(f"🔍 DEBUG: current_cnpj = '{current_cnpj}'", file=sys.stdout)
-        
-        if (receita_match or simples_nac_match) and current_cnpj:
-            print(f"\nInício de registro de débito Exig Suspensa encontrado: '{line}'", file=sys.stdout)
-            debito_data = {"cnpj": current_cnpj, "cno": current_cno if current_cno else ""} # Inclui CNO se encontrado
-            
-            # Corrige a atribuição da receita
-            if receita_match:
-                debito_data["receita"] = receita_match.group(1).strip()
-            elif simples_nac_match:
-                debito_data["receita"] = simples_nac_match.group(1).strip()
-
-            # Reset CNO após usá-lo para este débito
-            # current_cno = ""
-
-            # Coleta as linhas até encontrar outro registro ou fim da seção (lógica inteligente)
-            data_lines = []
-            j = i + 1
-            
-            while j < len(lines):
-                next_line = lines[j].strip()
-                
-                # Para se encontrar outro código de receita (início de novo registro)
-                if re.match(r"(\d{4}-\d{2}\s+-\s+.*)", next_line):
-                    print(f"Próximo registro encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                # Para se encontrar SIMPLES NAC. (novo registro sem código padrão)
-                if re.match(r"^SIMPLES\s+NAC\.", next_line, re.IGNORECASE):
-                    print(f"SIMPLES NAC. (novo registro) encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                # Para se encontrar fim de seção
-                if any(re.search(ep, next_line, re.IGNORECASE) for ep in end_patterns):
-                    print(f"Fim da seção encontrado na linha {j+1}, parando coleta", file=sys.stdout)
-                    break
-                
-                # Se linha vazia, para a coleta
-                if not next_line:
-                    break
-                
-                print(f"Coletada linha {j+1}: '{next_line}'", file=sys.stdout)
-                data_lines.append(next_line)
+            # Ignora linhas vazias ou cabeçalhos de colunas
+            header_titles_sida = ["Inscrição", "Receita", "Inscrito em", "Ajuizado em", "Processo", "Tipo de Devedor"]
+            if not next_line or next_line in header_titles_sida or re.search(r"Situação:", next_line, re.IGNORECASE) or re.search(r"Devedor Principal:", next_line, re.IGNORECASE):
                 j += 1
-                
-                # Limite de segurança para evitar loops infinitos
-                if len(data_lines) >= 10:
-                    print(f"Limite de 10 linhas atingido, parando coleta", file=sys.stdout)
-                    break
-            
-            print(f"Analisando {len(data_lines)} linhas processadas para o registro", file=sys.stdout)
-
-            if len(data_lines) >= 5:  # Mínimo 5 campos, mas tenta pegar até 8
-                try:
-                    temp_data = {}
-                    temp_data["periodo_apuracao"] = format_periodo(data_lines[0])
-                    temp_data["vencimento"] = format_date(data_lines[1])
-                    temp_data["valor_original"] = parse_br_currency(data_lines[2])
-                    temp_data["saldo_devedor"] = parse_br_currency(data_lines[3])
-                    
-                    # Tenta extrair multa, juros e saldo consolidado se disponíveis
-                    if len(data_lines) >= 6:
-                        temp_data["multa"] = parse_br_currency(data_lines[4])
-                    else:
-                        temp_data["multa"] = 0.0
-                        
-                    if len(data_lines) >= 7:
-                        temp_data["juros"] = parse_br_currency(data_lines[5])
-                    else:
-                        temp_data["juros"] = 0.0
-                        
-                    if len(data_lines) >= 8:
-                        temp_data["saldo_devedor_consolidado"] = parse_br_currency(data_lines[6])
-                        temp_data["situacao"] = data_lines[7].strip()
-                    elif len(data_lines) >= 7:
-                        temp_data["saldo_devedor_consolidado"] = parse_br_currency(data_lines[5])
-                        temp_data["situacao"] = data_lines[6].strip()
-                    else:
-                        temp_data["saldo_devedor_consolidado"] = temp_data["saldo_devedor"]  # Usa saldo devedor se não tiver consolidado
-                        temp_data["situacao"] = data_lines[4].strip()
-
-                    # Validação mínima
-                    if debito_data["receita"] and temp_data.get("periodo_apuracao") and temp_data.get("vencimento"):
-                        debito_data.update(temp_data)
-                        result.append(debito_data)
-                        print(f"Item Exig Suspensa extraído: {debito_data}", file=sys.stdout)
-                        i = j  # Avança para a posição onde parou a coleta
-                        current_cno = "" # Reseta CNO após extrair o item associado
-                    else:
-                        print(f"Falha na validação (Exig Suspensa) para receita '{debito_data['receita']}'. Dados: {temp_data}", file=sys.stdout)
-                        i += 1
-                except IndexError:
-                     print(f"Erro Index (Exig Suspensa) para receita '{debito_data['receita']}'.", file=sys.stdout)
-                     i += 1
-                except Exception as e:
-                     print(f"Erro processando (Exig Suspensa) para receita '{debito_data['receita']}': {e}. Linhas: {data_lines}", file=sys.stdout)
-                     i += 1
-            else:
-                print(f"Número insuficiente de linhas ({len(data_lines)}) (Exig Suspensa) para receita '{debito_data['receita']}'. Esperado mínimo 5, ideal 8.", file=sys.stdout)
-                i += 1
-        else:
-            # Se não for CNPJ, CNO, cabeçalho ou receita, ignora
-             if not cno_match: # Só ignora se não for uma linha CNO que acabamos de processar
-                 print(f"Linha ignorada (Exig Suspensa): '{line}'", file=sys.stdout)
-             i += 1
+                continue
 
-    if not result:
-         print("Nenhum item de Débito com Exigibilidade Suspensa (SIEF) parseado.", file=sys.stdout)
+            # Se a linha parece ser o início de um novo registro de inscrição, para a busca
+            if re.match(r"(\d{2}\.\d{1}\.\d{2}\.\d{6}-\d{2})", next_line):
+                parser_log(f"Próxima linha parece ser nova inscrição, parando busca por processo na linha {j+1}.")
+                break
 
-    return result
+            # Verifica se a linha parece ser um número de processo (mas não um código de receita ou inscrição)
+            # Ignora linhas que começam com padrão de receita (XXXX-XX)
+            if not re.match(r"^\d{4}-\d{2}", next_line):
+                # Verifica o padrão de processo mas sem presumir formato fixo
+                processo_match_next = re.match(r"^([0-9][0-9./-]+)$", next_line)
+                if processo_match_next:
+                    processo_candidato = processo_match_next.group(1).strip()
+                    # Verifica se não é uma data (para não confundir com data de inscrição/ajuizamento)
+                    if not re.match(r"\d{2}/\d{2}/\d{4}", processo_candidato):
+                        current_inscricao_data["processo"] = processo_candidato
+                        parser_log(f"Processo SIDA encontrado na linha {j+1}: '{current_inscricao_data['processo']}'")
+                        break
 
-# Função para extrair "Parcelamento com Exigibilidade Suspensa (SIEFPAR)"
-def extract_parcelamentos_siefpar(text):
-    result = []
-    lines = text.split('\n')
-    in_section = False
-    current_cnpj = ""
-
-    start_pattern = r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SIEFPAR\)"
-    # Padrões de fim ajustados para NÃO incluir "Parcelamento" como fim dentro desta seção
-    end_patterns = [
-        r"^(?:Pendência|Pendencia|Processo|Inscrição|Débito\s+com\s+Exigibilidade)", # Removido Parcelamento daqui
-        r"Final\s+do\s+Relatório",
-        r"^\s*_{10,}\s*$",
-        r"Diagnóstico\s+Fiscal\s+na\s+Procuradoria-Geral"
-    ]
+            # Se a linha não corresponde a um padrão conhecido, avança
+            j += 1
+        # --- FIM DA LÓGICA MELHORADA ---
 
-    print("\n--- Iniciando busca pela seção 'Parcelamento com Exigibilidade Suspensa (SIEFPAR)' ---", file=sys.stdout)
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+        # A lógica para capturar Situação e Devedor Principal em linhas seguintes permanece
+        # (linhas 623-637 na versão completa do arquivo)
 
-        # Verifica se entramos na seção correta
-        if not in_section and re.search(start_pattern, line, re.IGNORECASE):
-            in_section = True
-            current_cnpj = ""
-            print(f"Seção 'Parcelamento SIEFPAR' encontrada na linha {i+1}: '{line}'", file=sys.stdout)
-            i += 1
-            continue
+        parser_log(f"Dados parciais SIDA (linha inscrição - regex sequencial): {current_inscricao_data}")
+        return i + 1
 
-        if not in_section:
-            i += 1
+    # Se estamos coletando dados de uma inscrição, procura por campos faltantes nas linhas seguintes
+    if current_inscricao_data.get("inscricao"):
+        # Procura por Situação
+        situacao_match = re.match(r"Situação:\s*(.*)", line, re.IGNORECASE)
+        if situacao_match:
+            current_inscricao_data["situacao"] = situacao_match.group(1).strip()
+            parser_log(f"Situação SIDA encontrada: '{current_inscricao_data['situacao']}'")
+            # Não salva ainda, espera o próximo registro ou fim da seção
+            return i + 1
+
+        # Procura por Devedor Principal
+        devedor_match = re.match(r"Devedor Principal:\s*(.*)", line, re.IGNORECASE)
+        if devedor_match:
+             current_inscricao_data["devedor_principal"] = devedor_match.group(1).strip()
+             parser_log(f"Devedor Principal SIDA encontrado: '{current_inscricao_data['devedor_principal']}'")
+
+             # Se encontramos um Devedor Principal e o tipo de devedor não está definido,
+             # podemos assumir que é CORRESPONSÁVEL (já que Devedor Principal só aparece para esse tipo)
+             if not current_inscricao_data.get("tipo_devedor"):
+                  current_inscricao_data["tipo_devedor"] = "CORRESPONSÁVEL"
+                  parser_log(f"Tipo de Devedor definido como CORRESPONSÁVEL baseado na presença de Devedor Principal")
+
+             return i + 1
+
+        # Tenta capturar campos que podem ter ficado na linha seguinte (se ainda não preenchidos)
+        if not current_inscricao_data.get("receita") and re.match(r'\d{4}-', line):
+             current_inscricao_data["receita"] = line
+             parser_log(f"Receita SIDA encontrada (linha seguinte): '{line}'")
+             return i + 1
+        if not current_inscricao_data.get("inscrito_em") and re.match(r'\d{2}/\d{2}/\d{4}', line):
+             current_inscricao_data["inscrito_em"] = format_date(line)
+             parser_log(f"Inscrito em SIDA encontrado (linha seguinte): '{line}'")
+             return i + 1
+        # Adicionar mais lógicas se necessário para outros campos como Ajuizado, Processo, Tipo Devedor
+
+        # Verifica se a linha contém "DEVEDOR PRINCIPAL" - isso pode aparecer em uma linha separada
+        if "DEVEDOR PRINCIPAL" in line.upper():
+            current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
+            current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
+            parser_log(f"[DETECTADO] Tipo DEVEDOR PRINCIPAL encontrado em linha separada: '{line}'")
+            return i + 1
+
+        parser_log(f"Linha ignorada (SIDA - dentro de registro, não reconhecida): '{line}'")
+        return i + 1
+
+    # Se não está na seção, não é CNPJ, não é cabeçalho, não é início de inscrição, ignora
+    parser_log(f"Linha ignorada (SIDA - geral): '{line}'")
+    return i + 1
+
+# Gramática "linhas_fixas": o registro começa em uma linha reconhecida pelo padrão
+# "inicio" e os demais campos ocupam as linhas imediatamente seguintes.
+def parse_registro_linhas_fixas(lines, i, line, ctx, result, spec):
+    grammar = spec["registro"]
+    inicio_match = grammar["inicio"].match(line)
+    if not inicio_match or not all(ctx.get(campo) for campo in grammar.get("requer_contexto", [])):
+        parser_log(f"Linha ignorada ({spec['sigla']}): '{line}'")
+        return i + 1
+
+    parser_log(f"\nPossível início de registro {spec['sigla']} encontrado: '{line}'")
+    if i + len(grammar["linhas"]) >= len(lines):
+        parser_log(f"Não há linhas suficientes após '{line}' para completar o registro {spec['sigla']}.")
+        return i + 1
+
+    # No resumo só o CNPJ e os valores são lidos: os demais campos são apenas validados
+    campos = result.campos if isinstance(result, aggregation.SectionSummary) else None
+    registro = {campo: ctx[campo] for campo in grammar.get("campos_contexto", [])}
+    registro[grammar["campo_inicio"]] = inicio_match.group(1).strip()
+    for offset, campo_spec in enumerate(grammar["linhas"], start=1):
+        valor = lines[i + offset].strip()
+        if campo_spec.get("rejeitar") and (not valor or campo_spec["rejeitar"].match(valor)):
+            parser_log(f"AVISO: Linha {offset} após o início não corresponde a '{campo_spec['campo']}' ({spec['sigla']}): '{valor}'")
+            return i + 1
+        if campo_spec.get("padrao"):
+            campo_match = campo_spec["padrao"].match(valor)
+            if not campo_match:
+                parser_log(f"AVISO: Linha {offset} após o início não corresponde a '{campo_spec['campo']}' ({spec['sigla']}): '{valor}'")
+                return i + 1
+            valor = campo_match.group(1).strip()
+        if campos is not None and campo_spec["campo"] not in campos:
             continue
-
-        # Verifica se saímos da seção
-        if any(re.search(ep, line, re.IGNORECASE) for ep in end_patterns):
-            print(f"Fim da seção 'Parcelamento SIEFPAR' detectado na linha {i+1}: '{line}'", file=sys.stdout)
-            in_section = False
+        normalizar = campo_spec.get("normalizar")
+        registro[campo_spec["campo"]] = normalizar(valor) if normalizar else valor
+
+    result.append(registro)
+    parser_log(f"Item {spec['sigla']} extraído: {registro}")
+    return i + 1 + len(grammar["linhas"])
+
+# Gramática "sequencial": o registro começa em uma linha reconhecida pelo padrão
+# "inicio" (o restante da linha, se houver, preenche o primeiro campo) e os campos
+# seguintes vêm um por linha, na ordem declarada.
+def parse_registro_sequencial(lines, i, line, ctx, result, spec):
+    grammar = spec["registro"]
+    inicio_match = grammar["inicio"].match(line)
+    if not inicio_match:
+        parser_log(f"Linha ignorada ({spec['sigla']}): '{line}'")
+        return i + 1
+
+    registro = {campo: ctx[campo] for campo in grammar.get("campos_contexto", [])}
+    campos = grammar["campos"]
+    pendentes = list(campos)
+    resto = (inicio_match.group(2) or "").strip()
+    if resto:
+        pendentes.pop(0)
+    # No resumo (seções sem valores) basta contar o registro e avançar as linhas dele
+    resumo = isinstance(result, aggregation.SectionSummary)
+    if not resumo:
+        registro[grammar["campo_inicio"]] = inicio_match.group(1).strip()
+        for campo in campos:
+            registro[campo] = ""
+        if resto:
+            registro[campos[0]] = resto
+
+    j = i + 1
+    while j < len(lines) and pendentes:
+        next_line = lines[j].strip()
+        if (not next_line
+                or grammar["inicio"].match(next_line)
+                or matches_any(spec["fim"], next_line)
+                or any(contexto["padrao"].search(next_line) for contexto in spec["contexto"])):
             break
+        campo = pendentes.pop(0)
+        if not resumo:
+            registro[campo] = next_line
+        j += 1
+
+    result.append(registro)
+    parser_log(f"Item {spec['sigla']} extraído: {registro}")
+    return j
+
+def finalizar_registro_sida(ctx, result):
+    """Salva a inscrição SIDA pendente ao fim da seção, se estiver completa."""
+    current_inscricao_data = ctx["registro"]
+    if current_inscricao_data.get("inscricao"):
+        if current_inscricao_data.get("receita") and current_inscricao_data.get("inscrito_em"):
+            result.append(current_inscricao_data)
+            parser_log(f"Item SIDA extraído (fim da seção): {current_inscricao_data}")
+        else:
+            parser_log(f"AVISO: Dados SIDA incompletos descartados no fim da seção: {current_inscricao_data}")
+    ctx["registro"] = {}
+
+# Fim genérico de seção da Receita Federal (início de outra seção SIEF/PGFN)
+SIEF_END_PATTERNS = [
+    r"^(?:Pendência|Pendencia|Parcelamento|Processo|Inscrição|Débito\s+com\s+Exigibilidade)",
+    r"Final\s+do\s+Relatório",
+    UNDERSCORE_LINE_PATTERN
+]
+# Seções de parcelamento: "Parcelamento" não encerra a seção
+PARCELAMENTO_END_PATTERNS = [
+    r"^(?:Pendência|Pendencia|Processo|Inscrição|Débito\s+com\s+Exigibilidade)",
+    r"Final\s+do\s+Relatório",
+    UNDERSCORE_LINE_PATTERN,
+    r"Diagnóstico\s+Fiscal\s+na\s+Procuradoria-Geral"
+]
+PROCESSO_PATTERN = r"^(\d{5}[.\s]?\d{3}\.?\d{3}/\d{4}-\d{2})(?:\s+(.*))?$"
+
+SECTION_SPECS = [
+    {
+        "chave": "pendenciasDebito",
+        "nome": "Pendência - Débito (SIEF)",
+        "sigla": "SIEF",
+        "inicio": r"(?:Pendência|Pendencia|PENDÊNCIA|PENDENCIA)[\s-]*(?:Débito|Debito|DÉBITO|DEBITO)[\s-]*(?:\(SIEF\)|\(sief\))",
+        "fim": SIEF_END_PATTERNS,
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        "cabecalhos": ["Dt. Vcto", "Vl. Original", "Sdo. Devedor", "Multa", "Juros", "Sdo. Dev. Cons.", "Situação"],
+        "cabecalhos_contendo": [["Receita", "PA/Exerc", "Vcto"]],
+        "registro": {"tipo": "funcao", "funcao": parse_registro_debito_sief, "resumo": summarize_registro_debito_sief},
+    },
+    {
+        "chave": "debitosExigSuspensaSief",
+        "nome": "Débito com Exigibilidade Suspensa (SIEF)",
+        "sigla": "Exig Suspensa",
+        "inicio": r"Débito\s+com\s+Exigibilidade\s+Suspensa\s+\(SIEF\)",
+        "fim": [
+            SIEF_END_PATTERNS[0],
+            r"Pendência\s*[–-]\s*Parcelamento", # Padrão específico para "Pendência – Parcelamento (SIEFPAR)"
+            r"Final\s+do\s+Relatório",
+            UNDERSCORE_LINE_PATTERN,
+            r"Diagnóstico\s+Fiscal\s+na\s+Procuradoria-Geral" # Fim da parte da Receita
+        ],
+        # O CNO não consome a linha: a linha do débito pode vir logo a seguir
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}, {"campo": "cno", "padrao": CNO_PATTERN, "consome_linha": False}],
+        "cabecalhos": ["Dt. Vcto", "Vl.Original", "Sdo.Devedor", "Situação"],
+        "cabecalhos_contendo": [["Receita", "PA/Exerc", "Vcto", "Situação"]],
+        "registro": {"tipo": "funcao", "funcao": parse_registro_exig_suspensa_sief},
+    },
+    {
+        "chave": "parcelamentosSiefpar",
+        "nome": "Parcelamento com Exigibilidade Suspensa (SIEFPAR)",
+        "sigla": "SIEFPAR",
+        "inicio": r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SIEFPAR\)",
+        "fim": PARCELAMENTO_END_PATTERNS,
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        # Registro em 3 linhas: Parcelamento / Valor Suspenso / Modalidade (com ou sem prefixo)
+        "registro": {
+            "tipo": "linhas_fixas",
+            "inicio": r"Parcelamento:\s*(\d+)",
+            "campo_inicio": "parcelamento",
+            "campos_contexto": ["cnpj"],
+            "requer_contexto": ["cnpj"],
+            "linhas": [
+                {"campo": "valor_suspenso", "padrao": r"Valor Suspenso:\s*([\d.,]+)", "normalizar": parse_br_currency},
+                {"campo": "modalidade", "normalizar": lambda valor: valor.replace("Modalidade:", "").strip()},
+            ],
+        },
+    },
+    {
+        "chave": "pendenciasInscricao",
+        "nome": "Inscrição com Exigibilidade Suspensa (SIDA)",
+        "sigla": "SIDA",
+        "inicio": r"Inscrição\s+com\s+Exigibilidade\s+Suspensa\s+\(SIDA\)",
+        "fim": [
+            r"Pendência\s+-\s+Parcelamento\s+\(SISPAR\)",
+            r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SISPAR\)",
+            r"Final\s+do\s+Relatório",
+            UNDERSCORE_LINE_PATTERN
+        ],
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "cabecalhos": ["Inscrição", "Receita", "Inscrito em", "Ajuizado em", "Processo", "Tipo de Devedor"],
+        "registro": {"tipo": "funcao", "funcao": parse_registro_inscricao_sida, "finalizar": finalizar_registro_sida},
+    },
+    {
+        "chave": "pendenciasParcelamentoSispar",
+        "nome": "Pendência - Parcelamento (SISPAR)",
+        "sigla": "SISPAR",
+        "inicio": r"Pendência\s+-\s+Parcelamento\s+\(SISPAR\)",
+        "fim": [
+            r"Inscrição\s+com\s+Exigibilidade\s+Suspensa\s+\(SIDA\)",
+            r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SISPAR\)",
+            r"Final\s+do\s+Relatório",
+            UNDERSCORE_LINE_PATTERN
+        ],
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        "cabecalhos_sem_caixa": ["conta"],
+        # Registro em 3 linhas: Conta (apenas números) / Descrição / Modalidade
+        "registro": {
+            "tipo": "linhas_fixas",
+            "inicio": r"^(\d+)$",
+            "campo_inicio": "conta",
+            "campos_contexto": ["cnpj"],
+            "requer_contexto": ["cnpj"],
+            "linhas": [
+                {"campo": "descricao", "rejeitar": r"Modalidade:"},
+                {"campo": "modalidade", "padrao": r"Modalidade:\s*(.*)"},
+            ],
+        },
+    },
+    {
+        "chave": "parcelamentosSipade",
+        "nome": "Parcelamento (SIPADE)",
+        "sigla": "SIPADE",
+        "inicio": r"(?:Pendência\s*[–-]\s*Parcelamento|Parcelamento\s+com\s+Exigibilidade\s+Suspensa)\s*\(SIPADE\)",
+        "fim": PARCELAMENTO_END_PATTERNS,
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        "cabecalhos": ["Processo", "Receita", "Situação"],
+        "cabecalhos_contendo": [["Processo", "Situação"]],
+        # Processo do parcelamento seguido de Receita e Situação (colunas exibidas na importação)
+        "registro": {
+            "tipo": "sequencial",
+            "inicio": PROCESSO_PATTERN,
+            "campo_inicio": "processo",
+            "campos_contexto": ["cnpj"],
+            "campos": ["receita", "situacao"],
+        },
+    },
+    {
+        "chave": "processosFiscais",
+        "nome": "Processo Fiscal (SIEF)",
+        "sigla": "Processo Fiscal",
+        "inicio": r"(?:Pendência\s*[–-]\s*Processo\s+Fiscal|Processo\s+Fiscal\s+com\s+Exigibilidade\s+Suspensa)\s*\(SIEF\)",
+        # Não inclui "Processo" como fim: as duas seções de processo fiscal são lidas juntas
+        "fim": [
+            r"^(?:Pendência|Pendencia|Parcelamento|Inscrição|Débito\s+com\s+Exigibilidade)",
+            r"Final\s+do\s+Relatório",
+            UNDERSCORE_LINE_PATTERN,
+            r"Diagnóstico\s+Fiscal\s+na\s+Procuradoria-Geral"
+        ],
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        "cabecalhos": ["Processo", "Situação", "Localização"],
+        "cabecalhos_contendo": [["Processo", "Situação"]],
+        "registro": {
+            "tipo": "sequencial",
+            "inicio": PROCESSO_PATTERN,
+            "campo_inicio": "processo",
+            "campos_contexto": ["cnpj"],
+            "campos": ["situacao", "localizacao"],
+        },
+    },
+    {
+        "chave": "debitosSicob",
+        "nome": "Débito/Parcelamento (SICOB)",
+        "sigla": "SICOB",
+        "inicio": r"(?:Pendência\s*[–-]\s*(?:Débito|Parcelamento)|(?:Débito|Parcelamento)\s+com\s+Exigibilidade\s+Suspensa)\s*\(SICOB\)",
+        "fim": PARCELAMENTO_END_PATTERNS,
+        "contexto": [{"campo": "cnpj", "padrao": CNPJ_PATTERN}],
+        "divisivel_por_cnpj": True,
+        "cabecalhos": ["Parcelamento", "Débito", "Situação", "Tipo"],
+        "cabecalhos_contendo": [["Parcelamento", "Situação"]],
+        # Número do parcelamento/débito (DEBCAD) seguido da Situação e do Tipo
+        "registro": {
+            "tipo": "sequencial",
+            "inicio": r"^(\d[\d.]*\d(?:-\d{1,2})?)(?:\s+(.*))?$",
+            "campo_inicio": "parcelamento",
+            "campos_contexto": ["cnpj"],
+            "campos": ["situacao", "tipo"],
+        },
+    },
+]
+
+def compile_section_spec(spec):
+    """Compila os padrões de uma especificação de seção (executado uma vez, na importação)."""
+    compiled = dict(spec)
+    compiled["inicio"] = re.compile(spec["inicio"], re.IGNORECASE)
+    compiled["fim"] = [re.compile(pattern, re.IGNORECASE) for pattern in spec["fim"]]
+    compiled["contexto"] = [dict(campo, padrao=re.compile(campo["padrao"])) for campo in spec.get("contexto", [])]
+    compiled["cabecalhos"] = set(spec.get("cabecalhos", []))
+    compiled["cabecalhos_contendo"] = spec.get("cabecalhos_contendo", [])
+    compiled["cabecalhos_sem_caixa"] = set(spec.get("cabecalhos_sem_caixa", []))
+
+    registro = dict(spec["registro"])
+    if registro["tipo"] != "funcao":
+        registro["inicio"] = re.compile(registro["inicio"], re.IGNORECASE)
+    if registro["tipo"] == "linhas_fixas":
+        linhas = []
+        for campo_spec in registro["linhas"]:
+            campo_spec = dict(campo_spec)
+            for chave in ("padrao", "rejeitar"):
+                if campo_spec.get(chave):
+                    campo_spec[chave] = re.compile(campo_spec[chave], re.IGNORECASE)
+            linhas.append(campo_spec)
+        registro["linhas"] = linhas
+    compiled["registro"] = registro
+    return compiled
+
+REGISTRO_PARSERS = {
+    "linhas_fixas": parse_registro_linhas_fixas,
+    "sequencial": parse_registro_sequencial,
+}
+
+COMPILED_SECTION_SPECS = {spec["chave"]: compile_section_spec(spec) for spec in SECTION_SPECS}
+# Pré-filtro com todos os inícios de seção: uma única busca por linha na varredura inicial
+SECTION_START_PREFILTER = re.compile(
+    "|".join(f"(?:{spec['inicio']})" for spec in SECTION_SPECS), re.IGNORECASE
+)
 
-        if not line:
-            i += 1
-            continue
-
-        # Tenta encontrar CNPJ
-        cnpj_match = re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", line)
-        if cnpj_match:
-            current_cnpj = cnpj_match.group(1)
-            print(f"CNPJ definido para (SIEFPAR): {current_cnpj}", file=sys.stdout)
-            i += 1
+def find_section_starts(lines, chaves):
+    """Localiza, em uma única varredura, a primeira linha de início de cada seção pedida."""
+    pendentes = [COMPILED_SECTION_SPECS[chave] for chave in chaves]
+    starts = {}
+    for index, raw_line in enumerate(lines):
+        if not pendentes:
+            break
+        line = raw_line.strip()
+        if not SECTION_START_PREFILTER.search(line):
             continue
-
-        # Tenta encontrar um registro de parcelamento SIEFPAR (3 linhas)
-        parcelamento_match = re.match(r"Parcelamento:\s*(\d+)", line, re.IGNORECASE)
-        if parcelamento_match and current_cnpj:
-            parcelamento_num = parcelamento_match.group(1).strip()
-            print(f"\nPossível início de registro SIEFPAR encontrado: '{line}'", file=sys.stdout)
-
-            # Verifica as próximas duas linhas
-            if i + 2 < len(lines):
-                linha_valor = lines[i+1].strip()
-                linha_modalidade = lines[i+2].strip()
-
-                valor_match = re.match(r"Valor Suspenso:\s*([\d.,]+)", linha_valor, re.IGNORECASE)
-                # Modalidade pode ou não ter o prefixo "Modalidade:"
-                modalidade_texto = linha_modalidade.replace("Modalidade:", "").strip()
-
-                if valor_match: # Apenas valida se encontrou o valor
-                    valor_suspenso = parse_br_currency(valor_match.group(1))
-                    modalidade = modalidade_texto # Pega o que estiver na linha
-
-                    parcelamento_data = {
-                        "cnpj": current_cnpj,
-                        "parcelamento": parcelamento_num,
-                        "valor_suspenso": valor_suspenso,
-                        "modalidade": modalidade
-                    }
-                    result.append(parcelamento_data)
-                    print(f"Item SIEFPAR extraído: {parcelamento_data}", file=sys.stdout)
-                    i += 3 # Pula as 3 linhas processadas
-                    continue # Volta para o início do loop while
-                else:
-                    print(f"Linhas seguintes não correspondem ao padrão Valor/Modalidade. Linha Valor: '{linha_valor}', Linha Modalidade: '{linha_modalidade}'", file=sys.stdout)
-            else:
-                print("Não há linhas suficientes após 'Parcelamento:' para Valor e Modalidade.", file=sys.stdout)
-
-        # Se não deu match ou falhou em encontrar as linhas seguintes, ignora a linha atual e avança
-        print(f"Linha ignorada (SIEFPAR): '{line}'", file=sys.stdout)
-        i += 1
-
-    if not result:
-         print("Nenhum item de Parcelamento SIEFPAR parseado.", file=sys.stdout)
-
-    return result
-
-# Função para extrair "Inscrição com Exigibilidade Suspensa (SIDA)" - Lógica v5 (Correção Cabeçalho)
-def extract_pendencias_inscricao_sida(text):
-    result = []
-    lines = text.split('\n')
-    in_section = False
-    current_cnpj = "" # Embora a seção seja PGFN, o CNPJ pode ser útil se aparecer
-
-    start_pattern = r"Inscrição\s+com\s+Exigibilidade\s+Suspensa\s+\(SIDA\)"
-    # Padrões de fim (outras seções PGFN ou fim do relatório)
-    end_patterns = [
-        r"Pendência\s+-\s+Parcelamento\s+\(SISPAR\)",
-        r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SISPAR\)",
-        r"Final\s+do\s+Relatório",
-        r"^\s*_{10,}\s*$"
-    ]
-
-    print("\n--- Iniciando busca pela seção 'Inscrição com Exigibilidade Suspensa (SIDA)' ---", file=sys.stdout)
-
-    i = 0
-    current_inscricao_data = {}
-
-    while i < len(lines):
+        for spec in list(pendentes):
+            if spec["inicio"].search(line):
+                starts[spec["chave"]] = index
+                pendentes.remove(spec)
+                parser_log(f"Seção '{spec['nome']}' encontrada na linha {index+1}: '{line}'")
+    return starts
+
+def walk_section(spec, lines, i, stop, ctx, result):
+    """Percorre as linhas da seção a partir de i até o fim da seção ou até o índice stop.
+
+    Retorna o índice em que a varredura parou.
+    """
+    registro = spec["registro"]
+    parse_registro = registro["funcao"] if registro["tipo"] == "funcao" else REGISTRO_PARSERS[registro["tipo"]]
+    if isinstance(result, aggregation.SectionSummary) and registro.get("resumo"):
+        parse_registro = registro["resumo"]
+
+    while i < len(lines) and (stop is None or i < stop):
         line = lines[i].strip()
 
-        # Verifica se entramos na seção correta
-        if not in_section and re.search(start_pattern, line, re.IGNORECASE):
-            in_section = True
-            current_cnpj = "" # Reseta CNPJ
-            current_inscricao_data = {} # Reseta dados do registro atual
-            print(f"Seção 'Inscrição SIDA' encontrada na linha {i+1}: '{line}'", file=sys.stdout)
-            i += 1
-            continue
-
-        if not in_section:
-            i += 1
-            continue
-
         # Verifica se saímos da seção
-        if any(re.search(ep, line, re.IGNORECASE) for ep in end_patterns):
-            print(f"Fim da seção 'Inscrição SIDA' detectado na linha {i+1}: '{line}'", file=sys.stdout)
-            in_section = False
-            # Salva o último registro antes de sair
-            if current_inscricao_data.get("inscricao") and current_inscricao_data.get("receita") and current_inscricao_data.get("inscrito_em"):
-                result.append(current_inscricao_data)
-                print(f"Item SIDA extraído (fim da seção): {current_inscricao_data}", file=sys.stdout)
-            elif current_inscricao_data.get("inscricao"):
-                 print(f"AVISO: Dados SIDA incompletos descartados no fim da seção: {current_inscricao_data}", file=sys.stdout)
-            current_inscricao_data = {}
+        if matches_any(spec["fim"], line):
+            parser_log(f"Fim da seção '{spec['nome']}' detectado na linha {i+1}: '{line}'")
             break
 
         if not line:
             i += 1
             continue
 
-        # Tenta encontrar CNPJ (pode aparecer no meio)
-        cnpj_match = re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", line)
-        if cnpj_match:
-            current_cnpj = cnpj_match.group(1)
-            print(f"CNPJ definido para (SIDA): {current_cnpj}", file=sys.stdout)
+        # Campos de contexto (CNPJ, CNO) valem para os registros seguintes
+        consumed = False
+        for campo in spec["contexto"]:
+            campo_match = campo["padrao"].search(line)
+            if campo_match:
+                ctx[campo["campo"]] = campo_match.group(1)
+                parser_log(f"{campo['campo'].upper()} definido para ({spec['sigla']}): {ctx[campo['campo']]}")
+                if campo.get("consome_linha", True):
+                    consumed = True
+                    break
+        if consumed:
             i += 1
             continue
 
-        # Pula linhas de título de coluna individuais
-        header_titles = ["Inscrição", "Receita", "Inscrito em", "Ajuizado em", "Processo", "Tipo de Devedor"]
-        if line in header_titles:
-             print(f"Linha de título de coluna SIDA pulada: '{line}'", file=sys.stdout)
-             i+=1
-             continue
-
-        # Tenta identificar o início de um registro pela Inscrição (formato XX.X.XX.XXXXXX-XX)
-        inscricao_match = re.match(r"(\d{2}\.\d{1}\.\d{2}\.\d{6}-\d{2})", line)
-        if inscricao_match:
-            # Salva o registro anterior se existir e for válido
-            if current_inscricao_data.get("inscricao"):
-                 if current_inscricao_data.get("receita") and current_inscricao_data.get("inscrito_em"):
-                     result.append(current_inscricao_data)
-                     print(f"Item SIDA extraído (fim por nova inscrição): {current_inscricao_data}", file=sys.stdout)
-                 else:
-                      print(f"AVISO: Dados SIDA incompletos descartados (antes de nova inscrição): {current_inscricao_data}", file=sys.stdout)
-
-            # Inicia novo registro
-            current_inscricao_data = {"cnpj": current_cnpj} # Usa o último CNPJ encontrado
-            current_inscricao_data["inscricao"] = inscricao_match.group(1)
-            print(f"\nInício de registro SIDA encontrado: '{line}'", file=sys.stdout)
-
-            # Procura por Receita, Inscrito em, Ajuizado em, Tipo Devedor na mesma linha, sequencialmente
-            remaining_line = line[inscricao_match.end():]
-
-            # Receita
-            receita_match = re.search(r"\s+(\d{4}-[\w\s]+)", remaining_line)
-            current_inscricao_data["receita"] = receita_match.group(1).strip() if receita_match else ""
-            if receita_match: remaining_line = remaining_line[receita_match.end():]
-
-            # Inscrito em
-            inscrito_em_match = re.search(r"\s+(\d{2}/\d{2}/\d{4})", remaining_line)
-            current_inscricao_data["inscrito_em"] = format_date(inscrito_em_match.group(1)) if inscrito_em_match else ""
-            if inscrito_em_match: remaining_line = remaining_line[inscrito_em_match.end():]
-
-            # Ajuizado em (pode ser data ou '-')
-            ajuizado_em_match = re.search(r"\s+(\d{2}/\d{2}/\d{4}|-)\s*", remaining_line)
-            current_inscricao_data["ajuizado_em"] = format_date(ajuizado_em_match.group(1)) if ajuizado_em_match and ajuizado_em_match.group(1) != '-' else ""
-            if ajuizado_em_match: remaining_line = remaining_line[ajuizado_em_match.end():]
-
-            # Log completo da linha para depuração
-            print(f"Linha completa para análise de Tipo Devedor: '{line}'", file=sys.stdout)
-            
-            # Verificação especial para DEVEDOR PRINCIPAL - tentativa mais agressiva de encontrar
-            if "DEVEDOR PRINCIPAL" in line:
-                current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
-                current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
-                print(f"[DETECTADO] Tipo DEVEDOR PRINCIPAL encontrado na linha!", file=sys.stdout)
-            elif "CORRESPONSÁVEL" in line:
-                current_inscricao_data["tipo_devedor"] = "CORRESPONSÁVEL"
-                current_inscricao_data["devedor_principal"] = ""
-                print(f"[DETECTADO] Tipo CORRESPONSÁVEL encontrado na linha!", file=sys.stdout)
-            else:
-                # Tipo Devedor (DEVEDOR PRINCIPAL ou CORRESPONSÁVEL) - busca com expressão regular
-                tipo_devedor_match = re.search(r"\s*(DEVEDOR\s+PRINCIPAL|CORRESPONSÁVEL)\s*", remaining_line, re.IGNORECASE)
-                if tipo_devedor_match:
-                    current_inscricao_data["tipo_devedor"] = tipo_devedor_match.group(1).strip().upper()
-                    print(f"Tipo de Devedor definido na linha principal via regex: '{current_inscricao_data['tipo_devedor']}'", file=sys.stdout)
-                    
-                    # Se for DEVEDOR PRINCIPAL, também coloca isso no campo devedor_principal para exibição na tabela
-                    if "PRINCIPAL" in current_inscricao_data["tipo_devedor"]:
-                        current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
-                        print(f"Devedor Principal preenchido com 'DEVEDOR PRINCIPAL' para melhor visualização", file=sys.stdout)
-                    else:
-                        # Se for CORRESPONSÁVEL, o devedor_principal será encontrado nas próximas linhas
-                        current_inscricao_data["devedor_principal"] = ""
-                else:
-                    # Último recurso: busca uma versão simplificada
-                    if "PRINCIPAL" in line.upper():
-                        current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
-                        current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
-                        print(f"[ÚLTIMO RECURSO] Detectado PRINCIPAL na linha, definindo como DEVEDOR PRINCIPAL", file=sys.stdout)
-                    else:
-                        current_inscricao_data["tipo_devedor"] = ""
-                        current_inscricao_data["devedor_principal"] = ""
-                        print(f"[AVISO] Não foi possível encontrar o tipo de devedor na linha", file=sys.stdout)
-
-            # --- LÓGICA MELHORADA PARA PROCURAR PROCESSO NAS PRÓXIMAS LINHAS ---
-            current_inscricao_data["processo"] = "" # Inicializa o campo processo
-            search_lines_limit = 5 # Limita a busca às próximas 5 linhas
-            j = i + 1 # Começa a procurar na próxima linha
-
-            while j < len(lines) and (j - (i + 1)) < search_lines_limit:
-                next_line = lines[j].strip()
-                
-                # Ignora linhas vazias ou cabeçalhos de colunas
-                header_titles_sida = ["Inscrição", "Receita", "Inscrito em", "Ajuizado em", "Processo", "Tipo de Devedor"]
-                if not next_line or next_line in header_titles_sida or re.search(r"Situação:", next_line, re.IGNORECASE) or re.search(r"Devedor Principal:", next_line, re.IGNORECASE):
-                    j += 1
-                    continue
-                
-                # Se a linha parece ser o início de um novo registro de inscrição, para a busca
-                if re.match(r"(\d{2}\.\d{1}\.\d{2}\.\d{6}-\d{2})", next_line):
-                    print(f"Próxima linha parece ser nova inscrição, parando busca por processo na linha {j+1}.", file=sys.stdout)
-                    break
-                
-                # Verifica se a linha parece ser um número de processo (mas não um código de receita ou inscrição)
-                # Ignora linhas que começam com padrão de receita (XXXX-XX)
-                if not re.match(r"^\d{4}-\d{2}", next_line):
-                    # Verifica o padrão de processo mas sem presumir formato fixo
-                    processo_match_next = re.match(r"^([0-9][0-9./-]+)$", next_line)
-                    if processo_match_next:
-                        processo_candidato = processo_match_next.group(1).strip()
-                        # Verifica se não é uma data (para não confundir com data de inscrição/ajuizamento)
-                        if not re.match(r"\d{2}/\d{2}/\d{4}", processo_candidato):
-                            current_inscricao_data["processo"] = processo_candidato
-                            print(f"Processo SIDA encontrado na linha {j+1}: '{current_inscricao_data['processo']}'", file=sys.stdout)
-                            break
-                
-                # Se a linha não corresponde a um padrão conhecido, avança
-                j += 1
-            # --- FIM DA LÓGICA MELHORADA ---
-
-
-            # A lógica para capturar Situação e Devedor Principal em linhas seguintes permanece
-            # (linhas 623-637 na versão completa do arquivo)
-
-            print(f"Dados parciais SIDA (linha inscrição - regex sequencial): {current_inscricao_data}", file=sys.stdout)
+        # Ignora linhas de cabeçalho
+        if (line in spec["cabecalhos"]
+                or line.lower() in spec["cabecalhos_sem_caixa"]
+                or any(all(parte in line for parte in grupo) for grupo in spec["cabecalhos_contendo"])):
+            parser_log(f"Linha de cabeçalho pulada ({spec['sigla']}): '{line}'")
             i += 1
             continue
 
-        # Se estamos coletando dados de uma inscrição, procura por campos faltantes nas linhas seguintes
-        if current_inscricao_data.get("inscricao"):
-            # Procura por Situação
-            situacao_match = re.match(r"Situação:\s*(.*)", line, re.IGNORECASE)
-            if situacao_match:
-                current_inscricao_data["situacao"] = situacao_match.group(1).strip()
-                print(f"Situação SIDA encontrada: '{current_inscricao_data['situacao']}'", file=sys.stdout)
-                # Não salva ainda, espera o próximo registro ou fim da seção
-                i += 1
-                continue
+        i = parse_registro(lines, i, line, ctx, result, spec)
 
-            # Procura por Devedor Principal
-            devedor_match = re.match(r"Devedor Principal:\s*(.*)", line, re.IGNORECASE)
-            if devedor_match:
-                 current_inscricao_data["devedor_principal"] = devedor_match.group(1).strip()
-                 print(f"Devedor Principal SIDA encontrado: '{current_inscricao_data['devedor_principal']}'", file=sys.stdout)
-                 
-                 # Se encontramos um Devedor Principal e o tipo de devedor não está definido,
-                 # podemos assumir que é CORRESPONSÁVEL (já que Devedor Principal só aparece para esse tipo)
-                 if not current_inscricao_data.get("tipo_devedor"):
-                      current_inscricao_data["tipo_devedor"] = "CORRESPONSÁVEL"
-                      print(f"Tipo de Devedor definido como CORRESPONSÁVEL baseado na presença de Devedor Principal", file=sys.stdout)
-                 
-                 i += 1
-                 continue
-
-            # Tenta capturar campos que podem ter ficado na linha seguinte (se ainda não preenchidos)
-            if not current_inscricao_data.get("receita") and re.match(r'\d{4}-', line):
-                 current_inscricao_data["receita"] = line
-                 print(f"Receita SIDA encontrada (linha seguinte): '{line}'", file=sys.stdout)
-                 i += 1
-                 continue
-            if not current_inscricao_data.get("inscrito_em") and re.match(r'\d{2}/\d{2}/\d{4}', line):
-                 current_inscricao_data["inscrito_em"] = format_date(line)
-                 print(f"Inscrito em SIDA encontrado (linha seguinte): '{line}'", file=sys.stdout)
-                 i += 1
-                 continue
-            # Adicionar mais lógicas se necessário para outros campos como Ajuizado, Processo, Tipo Devedor
-
-            # Verifica se a linha contém "DEVEDOR PRINCIPAL" - isso pode aparecer em uma linha separada
-            if "DEVEDOR PRINCIPAL" in line.upper():
-                current_inscricao_data["tipo_devedor"] = "DEVEDOR PRINCIPAL"
-                current_inscricao_data["devedor_principal"] = "DEVEDOR PRINCIPAL"
-                print(f"[DETECTADO] Tipo DEVEDOR PRINCIPAL encontrado em linha separada: '{line}'", file=sys.stdout)
-                i += 1
-                continue
-            
-            print(f"Linha ignorada (SIDA - dentro de registro, não reconhecida): '{line}'", file=sys.stdout)
-            i += 1
-            continue
+    return i
 
-        # Se não está na seção, não é CNPJ, não é cabeçalho, não é início de inscrição, ignora
-        print(f"Linha ignorada (SIDA - geral): '{line}'", file=sys.stdout)
-        i += 1
+def new_section_context(spec):
+    ctx = {campo["campo"]: "" for campo in spec["contexto"]}
+    ctx["registro"] = {}
+    return ctx
 
-    # Salva o último registro se houver dados pendentes ao sair do loop
-    if current_inscricao_data.get("inscricao"):
-        if current_inscricao_data.get("receita") and current_inscricao_data.get("inscrito_em"):
-            result.append(current_inscricao_data)
-            print(f"Item SIDA extraído (fim do loop): {current_inscricao_data}", file=sys.stdout)
-        else:
-             print(f"AVISO: Dados SIDA incompletos descartados no fim do loop: {current_inscricao_data}", file=sys.stdout)
+def new_section_result(resumo=False):
+    """Destino dos registros de uma seção: a lista de itens ou, no resumo, só os totais."""
+    return aggregation.SectionSummary() if resumo else []
 
+def run_section(spec, lines, start, resumo=False):
+    """Percorre as linhas de uma seção a partir do seu início aplicando a gramática do registro."""
+    result = run_section_parallel(spec, lines, start, resumo)
+    if result is None:
+        result = new_section_result(resumo)
+        ctx = new_section_context(spec)
+        walk_section(spec, lines, start + 1, None, ctx, result)
+        if spec["registro"].get("finalizar"):
+            spec["registro"]["finalizar"](ctx, result)
 
     if not result:
-         print("Nenhum item de Inscrição SIDA parseado.", file=sys.stdout)
+        parser_log(f"Nenhum item de '{spec['nome']}' parseado.")
 
     return result
 
-# Função para extrair "Pendência - Parcelamento (SISPAR)"
-def extract_pendencias_parcelamento_sispar(text):
-    result = []
-    lines = text.split('\n')
-    in_section = False
-    current_cnpj = ""
-
-    start_pattern = r"Pendência\s+-\s+Parcelamento\s+\(SISPAR\)"
-    # Padrões de fim (outras seções PGFN ou fim do relatório)
-    end_patterns = [
-        r"Inscrição\s+com\s+Exigibilidade\s+Suspensa\s+\(SIDA\)", # Outra seção PGFN
-        r"Parcelamento\s+com\s+Exigibilidade\s+Suspensa\s+\(SISPAR\)", # Outra seção PGFN
-        r"Final\s+do\s+Relatório",
-        r"^\s*_{10,}\s*$"
-    ]
-
-    print("\n--- Iniciando busca pela seção 'Pendência - Parcelamento (SISPAR)' ---", file=sys.stdout)
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-
-        # Verifica se entramos na seção correta
-        if not in_section and re.search(start_pattern, line, re.IGNORECASE):
-            in_section = True
-            current_cnpj = "" # Reseta CNPJ
-            print(f"Seção 'Pendência SISPAR' encontrada na linha {i+1}: '{line}'", file=sys.stdout)
-            i += 1
-            continue
-
-        if not in_section:
-            i += 1
-            continue
-
-        # Verifica se saímos da seção
-        if any(re.search(ep, line, re.IGNORECASE) for ep in end_patterns):
-            print(f"Fim da seção 'Pendência SISPAR' detectado na linha {i+1}: '{line}'", file=sys.stdout)
-            in_section = False
+# --- Extração paralela de seções grandes ---
+# Nas seções marcadas com "divisivel_por_cnpj" cada linha "CNPJ: ..." reinicia todo o
+# estado do parser. Seções grandes são então divididas nessas linhas, os trechos são
+# processados em um pool de processos e os resultados são juntados na ordem do documento.
+# Se algum registro atravessar a divisa de um trecho, a seção é refeita em série, de
+# modo que o resultado é sempre idêntico ao da extração serial.
+
+# Linhas extras enviadas além do fim de cada trecho: os registros espiam algumas
+# linhas à frente e precisam ver as mesmas linhas que veriam na extração serial
+PARALLEL_CHUNK_LOOKAHEAD = 32
+
+_section_pool = None
+_section_pool_pid = None
+
+def get_parallel_workers():
+    return int(os.environ.get("EXTRACTION_PARALLEL_WORKERS", os.cpu_count() or 1))
+
+def get_parallel_min_lines():
+    return int(os.environ.get("EXTRACTION_PARALLEL_MIN_LINES", 5000))
+
+def get_section_pool():
+    """Pool de processos para as seções grandes (recriado se o processo foi bifurcado)."""
+    global _section_pool, _section_pool_pid
+    if _section_pool is None or _section_pool_pid != os.getpid():
+        from concurrent.futures import ProcessPoolExecutor
+
+        _section_pool = ProcessPoolExecutor(max_workers=get_parallel_workers())
+        _section_pool_pid = os.getpid()
+        # Encerra o pool antes de o interpretador desmontar os módulos
+        atexit.register(_section_pool.shutdown)
+        parser_log(f"Pool de extração paralela criado ({get_parallel_workers()} processos).")
+    return _section_pool
+
+def parse_section_chunk(chave, chunk_lines, stop, resumo=False, log=True):
+    """Executado no processo do pool: percorre um trecho da seção com contexto vazio.
+
+    O resumo e o log vêm como argumentos: o contexto de quem chamou não chega ao pool.
+    """
+    spec = COMPILED_SECTION_SPECS[chave]
+    result = new_section_result(resumo)
+    ctx = new_section_context(spec)
+    with parser_logging(log):
+        final_i = walk_section(spec, chunk_lines, 0, stop, ctx, result)
+    return result, final_i, ctx.get("itens_numerados", [])
+
+def split_section_chunks(spec, lines, start, workers):
+    """Divide a seção em trechos que começam em linhas de CNPJ. Retorna (fim, [(inicio, fim_trecho)])."""
+    end = len(lines)
+    boundaries = []
+    cnpj_pattern = spec["contexto"][0]["padrao"]
+    for index in range(start + 1, len(lines)):
+        line = lines[index].strip()
+        if matches_any(spec["fim"], line):
+            end = index
             break
+        if cnpj_pattern.search(line):
+            boundaries.append(index)
+
+    # Agrupa os blocos de CNPJ em trechos de tamanho parecido (alguns por processo)
+    target = max(1, (end - start) // (workers * 4))
+    chunks = []
+    chunk_start = start + 1
+    for boundary in boundaries:
+        if boundary - chunk_start >= target:
+            chunks.append((chunk_start, boundary))
+            chunk_start = boundary
+    chunks.append((chunk_start, end))
+    return end, chunks
+
+def run_section_parallel(spec, lines, start, resumo=False):
+    """Extrai uma seção grande em paralelo; retorna None quando a seção deve ser feita em série."""
+    workers = get_parallel_workers()
+    if not spec.get("divisivel_por_cnpj") or workers < 2:
+        return None
+    if len(lines) - start < get_parallel_min_lines():
+        return None
+
+    end, chunks = split_section_chunks(spec, lines, start, workers)
+    if end - start < get_parallel_min_lines() or len(chunks) < 2:
+        return None
+
+    parser_log(f"Seção '{spec['nome']}' dividida em {len(chunks)} trechos para extração paralela.")
+    pool = get_section_pool()
+    futures = [
+        pool.submit(
+            profiling.for_pool(parse_section_chunk),
+            spec["chave"],
+            lines[chunk_start:min(chunk_end + 1 + PARALLEL_CHUNK_LOOKAHEAD, len(lines))],
+            chunk_end - chunk_start,
+            resumo,
+            _parser_log_enabled.get(),
+        )
+        for chunk_start, chunk_end in chunks
+    ]
 
-        if not line:
-            i += 1
+    result = new_section_result(resumo)
+    for (chunk_start, chunk_end), future in zip(chunks, futures):
+        chunk_result, final_i, numerados = future.result()
+        if final_i != chunk_end - chunk_start:
+            # Um registro atravessou a divisa do trecho: refaz a seção em série
+            parser_log(f"Registro atravessou a divisa do trecho na linha {chunk_end+1}; refazendo '{spec['nome']}' em série.")
+            return None
+        if resumo:
+            # A numeração SIMPLES-NNN só muda a receita, que o resumo não lê
+            result.merge(chunk_result)
             continue
+        offset = len(result)
+        for posicao in numerados:
+            chunk_result[posicao]["receita"] = f"SIMPLES-{offset+posicao+1:03d}"
+        result.extend(chunk_result)
+    return result
 
-        # Tenta encontrar CNPJ
-        cnpj_match = re.search(r"CNPJ:\s*(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", line)
-        if cnpj_match:
-            current_cnpj = cnpj_match.group(1)
-            print(f"CNPJ definido para (SISPAR): {current_cnpj}", file=sys.stdout)
-            i += 1
-            continue
+def extract_sections(text, chaves=None):
+    """Extrai as seções pedidas (todas por padrão) dividindo o texto em linhas uma única vez."""
+    return extract_sections_until(text, chaves)[0]
 
-        # Ignora a linha de cabeçalho "Conta"
-        if line.lower() == "conta":
-            print(f"Linha de cabeçalho 'Conta' pulada (SISPAR): '{line}'", file=sys.stdout)
-            i += 1
-            continue
+# Ordem de extração quando há prazo: o que a tela de importação mostra primeiro
+SECTION_PRIORITY = ["pendenciasDebito", "pendenciasInscricao"] + [
+    spec["chave"] for spec in SECTION_SPECS if spec["chave"] not in ("pendenciasDebito", "pendenciasInscricao")
+]
 
-        # Tenta encontrar a linha da Conta (apenas números)
-        conta_match = re.match(r"^(\d+)$", line)
-        if conta_match and current_cnpj:
-            conta = conta_match.group(1)
-            print(f"\nLinha da Conta SISPAR encontrada: '{conta}'", file=sys.stdout)
-
-            # Procura a linha de Descrição na linha seguinte
-            if i + 1 < len(lines):
-                descricao_line = lines[i+1].strip()
-                # Assume que a linha seguinte é a descrição se não for vazia e não for a modalidade
-                if descricao_line and not re.match(r"Modalidade:", descricao_line, re.IGNORECASE):
-                    descricao = descricao_line
-                    print(f"Linha da Descrição SISPAR encontrada: '{descricao}'", file=sys.stdout)
-
-                    # Procura a linha de Modalidade na linha seguinte à descrição
-                    if i + 2 < len(lines):
-                        modalidade_line = lines[i+2].strip()
-                        modalidade_match = re.match(r"Modalidade:\s*(.*)", modalidade_line, re.IGNORECASE)
-                        if modalidade_match:
-                            modalidade = modalidade_match.group(1).strip()
-                            print(f"Modalidade SISPAR encontrada: '{modalidade}'", file=sys.stdout)
-
-                            sispar_data = {
-                                "cnpj": current_cnpj,
-                                "conta": conta,
-                                "descricao": descricao,
-                                "modalidade": modalidade
-                            }
-                            result.append(sispar_data)
-                            print(f"Item SISPAR extraído: {sispar_data}", file=sys.stdout)
-                            i += 3 # Pula as 3 linhas (conta, descrição, modalidade)
-                            continue # Volta para o início do loop
-                        else:
-                            print(f"AVISO: Linha após descrição não continha 'Modalidade:'. Linha: '{modalidade_line}'", file=sys.stdout)
-                            # Poderia salvar sem modalidade aqui se necessário
-                    else:
-                        print("AVISO: Fim do arquivo/seção atingido antes de encontrar a linha de Modalidade.", file=sys.stdout)
-                        # Poderia salvar sem modalidade aqui se necessário
-                else:
-                    print(f"AVISO: Linha após conta não parece ser descrição válida. Linha: '{descricao_line}'", file=sys.stdout)
-            else:
-                print("AVISO: Fim do arquivo/seção atingido antes de encontrar a linha de Descrição.", file=sys.stdout)
+def extract_sections_until(text, chaves=None, prazo=None, resumo=False):
+    """Extrai as seções na ordem dada até o prazo (instante de time.monotonic()).
 
-        # Se não for CNPJ, cabeçalho ou linha de conta válida, ignora e avança
-        # A verificação de conta_match garante que só avançamos se a linha não for uma conta válida
-        if not conta_match:
-            print(f"Linha ignorada (SISPAR): '{line}'", file=sys.stdout)
-        i += 1 # Avança para a próxima linha em todos os casos onde não houve 'continue'
+    O prazo é verificado antes de cada seção; uma seção iniciada é sempre concluída
+    e a primeira seção é extraída mesmo com o prazo vencido. Retorna (seções, puladas).
+    Com resumo, cada seção é um aggregation.SectionSummary em vez da lista de itens.
+    """
+    chaves = list(chaves or COMPILED_SECTION_SPECS)
+    lines = text.split('\n')
+    starts = find_section_starts(lines, chaves)
+    secoes = {}
+    for posicao, chave in enumerate(chaves):
+        if prazo is not None and posicao > 0 and time.monotonic() >= prazo:
+            parser_log(f"Prazo esgotado; seções não extraídas: {chaves[posicao:]}")
+            return secoes, chaves[posicao:]
+        secoes[chave] = (run_section(COMPILED_SECTION_SPECS[chave], lines, starts[chave], resumo)
+                         if chave in starts else new_section_result(resumo))
+    return secoes, []
+
+# Extratores por seção (mantidos para chamadas isoladas)
+def extract_pendencias_debito(text):
+    return extract_sections(text, ["pendenciasDebito"])["pendenciasDebito"]
 
-    if not result:
-         print("Nenhum item de Pendência SISPAR parseado.", file=sys.stdout)
+def extract_debitos_exig_suspensa_sief(text):
+    return extract_sections(text, ["debitosExigSuspensaSief"])["debitosExigSuspensaSief"]
 
-    return result
+def extract_parcelamentos_siefpar(text):
+    return extract_sections(text, ["parcelamentosSiefpar"])["parcelamentosSiefpar"]
 
+def extract_pendencias_inscricao_sida(text):
+    return extract_sections(text, ["pendenciasInscricao"])["pendenciasInscricao"]
 
-# def extract_parcelamentos_sipade(text): return []
-# def extract_processos_fiscais(text): return []
-# def extract_debitos_sicob(text): return [] # Implementar
-# def extract_parcelamentos_sipade(text): return [] # Implementar
-# def extract_parcelamentos_sipade(text): return [] # Implementar
-# def extract_processos_fiscais(text): return [] # Implementar
-# -------------------------------------------------
+def extract_pendencias_parcelamento_sispar(text):
+    return extract_sections(text, ["pendenciasParcelamentoSispar"])["pendenciasParcelamentoSispar"]
+
+def extract_parcelamentos_sipade(text):
+    return extract_sections(text, ["parcelamentosSipade"])["parcelamentosSipade"]
+
+def extract_processos_fiscais(text):
+    return extract_sections(text, ["processosFiscais"])["processosFiscais"]
+
+def extract_debitos_sicob(text):
+    return extract_sections(text, ["debitosSicob"])["debitosSicob"]
+
+
+# Ordem das seções na resposta da Situação Fiscal
+RESPONSE_SECTION_ORDER = [
+    "debitosExigSuspensaSief",
+    "parcelamentosSipade",
+    "pendenciasDebito",
+    "processosFiscais",
+    "parcelamentosSiefpar",
+    "debitosSicob",
+    "pendenciasInscricao",
+    "pendenciasParcelamentoSispar",
+]
+
+# Executa os extratores da Situação Fiscal sobre o texto já pré-processado.
+# Com prazo, as seções são extraídas na ordem de SECTION_PRIORITY e a resposta pode
+# sair parcial: "partial": true e as seções que ficaram de fora em "secoesPuladas".
+def process_situacao_fiscal_text(cleaned_text, chaves=None, prazo=None):
+    # print("Texto pré-processado (completo):", cleaned_text, file=sys.stdout) # Log muito verboso, comentado
+    parser_log("\n---\nTexto pré-processado (primeiros 1000 chars):", cleaned_text[:1000].replace('\n', ' '))
+    parser_log("\n---\n")
+
+    # --- Chamar o motor de seções (uma divisão em linhas e uma varredura de inícios) ---
+    chaves = [chave for chave in SECTION_PRIORITY if chaves is None or chave in chaves]
+    secoes, puladas = extract_sections_until(cleaned_text, chaves, prazo)
+
+    for chave, itens in secoes.items():
+        parser_log(f"Dados extraídos FINAL ({COMPILED_SECTION_SPECS[chave]['nome']}): {len(itens)} itens")
+
+    # Monta o dicionário final com os dados extraídos
+    resposta_final = {chave: secoes[chave] for chave in RESPONSE_SECTION_ORDER if chave in secoes}
+    if puladas:
+        resposta_final["partial"] = True
+        resposta_final["secoesPuladas"] = puladas
+
+    return resposta_final
+
+# --- Resumo: contagens e totais, sem devolver as linhas ---
+def summarize_situacao_fiscal_text(cleaned_text):
+    # Os registros são somados à medida que são lidos (sem lista de itens nem serialização)
+    # e os logs por linha, que custam mais do que a própria extração, ficam desligados.
+    with quiet_parser():
+        secoes, _ = extract_sections_until(cleaned_text, resumo=True)
+    return {chave: secoes[chave].as_dict() for chave in RESPONSE_SECTION_ORDER}
+
+def summarize_darf_text(cleaned_text, pdf_bytes=None):
+    with quiet_parser():
+        itens = extract_darf_items_from_pdf(pdf_bytes, cleaned_text) if pdf_bytes else extract_darf_data(cleaned_text)
+    return {"data": aggregation.summarize_items(itens)}
+
+def deadline_from_ms(inicio, prazo_ms):
+    """Converte o prazo em milissegundos (contado do início da requisição) para time.monotonic()."""
+    return inicio + prazo_ms / 1000 if prazo_ms else None
+
+def run_extraction(endpoint, doc_type, cleaned_text, func, *args):
+    """Etapa de extração do endpoint (com o orçamento de CPU); com CAPTURE_DIR, captura o
+    texto mascarado se a etapa for lenta ou falhar (ver app/capture.py)."""
+    inicio = time.monotonic()
+    # Na continuação, só as seções pendentes são extraídas
+    secoes = args[1] if func is process_situacao_fiscal_text and len(args) > 1 else None
+    try:
+        resultado = budget.run_with_cpu_budget(func, *args)
+    except Exception as e:
+        if capture.should_capture(0, e):
+            capture.capture_in_background(
+                endpoint, doc_type, cleaned_text, (time.monotonic() - inicio) * 1000, f"{type(e).__name__}: {e}", secoes
+            )
+        raise
+    duracao_ms = (time.monotonic() - inicio) * 1000
+    if capture.should_capture(duracao_ms, None):
+        capture.capture_in_background(endpoint, doc_type, cleaned_text, duracao_ms, None, secoes)
+    return resultado
+
+def register_continuation(resposta_final, cleaned_text, sha256=""):
+    """Guarda o texto de uma resposta parcial e acrescenta o id de continuação."""
+    if resposta_final.get("partial"):
+        resposta_final["continuacao"] = text_cache.put(
+            cleaned_text, secoesPendentes=resposta_final["secoesPuladas"], historicoId=resposta_final.get("historicoId"),
+            sha256=sha256,
+        )
+    return resposta_final
+
+def check_paginated(paginado):
+    """Erro para ?paginado=true sem histórico: as páginas são lidas da extração gravada."""
+    if paginado and not history.get_history_path():
+        return JSONResponse(
+            content={"error": "Resposta paginada indisponível: HISTORY_DB_PATH não configurado."}, status_code=503
+        )
+    return None
+
+def paginated_summary(resposta_final):
+    """Resposta de ?paginado=true: id no histórico e itens por seção, sem as linhas."""
+    secoes = dict(history.result_sections(resposta_final))
+    resumo = {chave: valor for chave, valor in resposta_final.items() if chave not in secoes and chave != "data"}
+    resumo["itensPorSecao"] = {secao: len(itens) for secao, itens in secoes.items()}
+    return resumo
+
+def extraction_response(request, formato, resposta_final, paginado=False):
+    """Resposta da extração no formato pedido (?formato=compacto ou Accept do formato compacto)."""
+    if paginado and resposta_final.get("historicoId"):
+        # As linhas são buscadas depois, por seção, em /api/historico/extracoes/<id>/secoes/<secao>
+        return JSONResponse(content=paginated_summary(resposta_final))
+    if compact.wants_compact(request.headers.get("accept"), formato):
+        return JSONResponse(content=compact.to_compact(resposta_final), media_type=compact.MEDIA_TYPE)
+    return JSONResponse(content=resposta_final)
+
+def record_history(resposta_final, tipo_documento, cleaned_text, arquivo, sha256="", pdf_bytes=None):
+    """Grava o resultado no histórico (se HISTORY_DB_PATH estiver configurado) e acrescenta o id.
+
+    O PDF (ou, se for grande, o texto pré-processado) é guardado para o reprocessamento.
+    """
+    if not history.get_history_path():
+        return resposta_final
+    try:
+        # Resultado parcial não responde à pré-verificação por hash até a continuação terminar
+        resposta_final["historicoId"] = history.save_extraction(
+            resposta_final, tipo_documento, history.detect_report_date(cleaned_text), arquivo,
+            "" if resposta_final.get("partial") else sha256,
+            PARSER_VERSION, history.source_record(pdf_bytes, cleaned_text),
+        )
+    except Exception as e:
+        # O histórico não pode derrubar a extração
+        print(f"Erro ao gravar a extração no histórico: {e}", file=sys.stdout)
+    return resposta_final
+
+def reextract_source(tipo_fonte, conteudo, tipo_documento):
+    """Refaz a extração a partir da fonte guardada no histórico (PDF ou texto pré-processado)."""
+    if tipo_fonte == "pdf":
+        cleaned_text = preprocess_text(extract_pdf_text(conteudo, tipo_documento))
+        if tipo_documento == DOC_TYPE_DARF:
+            return process_darf_pdf(conteudo, cleaned_text)
+        return process_situacao_fiscal_text(cleaned_text)
+    cleaned_text = conteudo.decode("utf-8")
+    if tipo_documento == DOC_TYPE_DARF:
+        return process_darf_text(cleaned_text)
+    return process_situacao_fiscal_text(cleaned_text)
 
 # Cria a instância do FastAPI ANTES de usá-la
 app = FastAPI()
@@ -1336,75 +1798,60 @@ app.add_middleware(
         "http://127.0.0.1:5173",  # Variação de localhost
     ],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type"]
 )
 
+# Respostas grandes (JSON de relatórios com milhares de linhas) vão comprimidas com gzip
+# quando o cliente aceita (Accept-Encoding)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Perfil sob demanda: o middleware só é registrado quando PROFILING_TOKEN está configurado
+if profiling.get_profiling_token():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Removido OPENROUTER_API_KEY, OPENROUTER_URL, SYSTEM_PROMPT, fiscal_schema pois não são mais usados
 
 @app.post("/api/extraction/extract")
-async def extract_pdf(file: UploadFile = File(...)):
+async def extract_pdf(request: Request, file: UploadFile = File(...), agregados: bool = False, prazo_ms: int = 0, formato: str = "", paginado: bool = False):
     import sys
     import traceback # Para log mais detalhado
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
+    inicio = time.monotonic()
     response_to_send = None # Inicializa a variável de resposta
     try:
         print(">>> Endpoint /api/extraction/extract INICIADO <<<", file=sys.stdout)
         print("Recebido PDF para extração", file=sys.stdout)
         contents = await file.read()
+        sha256 = hashlib.sha256(contents).hexdigest()
 
         # Usa a nova função de extração aprimorada
-        extracted_text = extract_pdf_text(contents)
+        extracted_text = extract_pdf_text(contents, DOC_TYPE_SITUACAO_FISCAL)
         # print("Texto extraído (completo):", extracted_text, file=sys.stdout) # Log muito verboso, comentado
         print("\n---\nTexto extraído (primeiros 1000 chars):", extracted_text[:1000].replace('\n', ' '), file=sys.stdout)
         print("\n---\n", file=sys.stdout)
 
         # Pré-processa o texto extraído
         cleaned_text = preprocess_text(extracted_text)
-        # print("Texto pré-processado (completo):", cleaned_text, file=sys.stdout) # Log muito verboso, comentado
-        print("\n---\nTexto pré-processado (primeiros 1000 chars):", cleaned_text[:1000].replace('\n', ' '), file=sys.stdout)
-        print("\n---\n", file=sys.stdout)
-
-        # Procura por padrões específicos (apenas para log)
-        print("Procurando por padrões de título...", file=sys.stdout)
-        pattern_sief = r"(?:Pendência|Pendencia|PENDÊNCIA|PENDENCIA)[\s-]*(?:Débito|Debito|DÉBITO|DEBITO)[\s-]*(?:\(SIEF\)|\(sief\))"
-        matches_sief = re.finditer(pattern_sief, cleaned_text, re.DOTALL | re.IGNORECASE | re.UNICODE)
-        match_count_sief = sum(1 for _ in matches_sief)
-        print(f"Encontradas {match_count_sief} ocorrências do padrão 'Pendência - Débito (SIEF)'", file=sys.stdout)
-        # Adicionar logs para outros padrões se necessário
-
-        # --- Chamar funções extratoras ---
-        pendencias_debito_data = extract_pendencias_debito(cleaned_text)
-        debitos_exig_suspensa_data = extract_debitos_exig_suspensa_sief(cleaned_text)
-        parcelamentos_siefpar_data = extract_parcelamentos_siefpar(cleaned_text)
-        pendencias_inscricao_data = extract_pendencias_inscricao_sida(cleaned_text)
-        pendencias_parcelamento_sispar_data = extract_pendencias_parcelamento_sispar(cleaned_text) # Nova função
-        # --- Placeholders para funções futuras ---
-        parcelamentos_sipade_data = []
-        processos_fiscais_data = []
-        debitos_sicob_data = []
-        # --------------------------------
-
-        print(f"Dados extraídos FINAL (Pendências Débito SIEF): {len(pendencias_debito_data)} itens", file=sys.stdout)
-        print(f"Dados extraídos FINAL (Débitos Exig. Suspensa SIEF): {len(debitos_exig_suspensa_data)} itens", file=sys.stdout)
-        print(f"Dados extraídos FINAL (Parcelamentos SIEFPAR): {len(parcelamentos_siefpar_data)} itens", file=sys.stdout)
-        print(f"Dados extraídos FINAL (Pendências Inscrição SIDA): {len(pendencias_inscricao_data)} itens", file=sys.stdout)
-        print(f"Dados extraídos FINAL (Pendências Parcelamento SISPAR): {len(pendencias_parcelamento_sispar_data)} itens", file=sys.stdout) # Novo log
-        # Adicionar logs para outras seções quando implementadas
-
-        # Monta o dicionário final com os dados extraídos
-        resposta_final = {
-            "debitosExigSuspensaSief": debitos_exig_suspensa_data,
-            "parcelamentosSipade": parcelamentos_sipade_data, # Usando placeholder
-            "pendenciasDebito": pendencias_debito_data,
-            "processosFiscais": processos_fiscais_data, # Usando placeholder
-            "parcelamentosSiefpar": parcelamentos_siefpar_data,
-            "debitosSicob": debitos_sicob_data, # Usando placeholder
-            "pendenciasInscricao": pendencias_inscricao_data,
-            "pendenciasParcelamentoSispar": pendencias_parcelamento_sispar_data # Novo campo
-        }
-
-        response_to_send = JSONResponse(content=resposta_final)
-
+        resposta_final = run_extraction(
+            "/extract", DOC_TYPE_SITUACAO_FISCAL, cleaned_text,
+            process_situacao_fiscal_text, cleaned_text, None, deadline_from_ms(inicio, prazo_ms)
+        )
+        await asyncio.to_thread(
+            record_history, resposta_final, DOC_TYPE_SITUACAO_FISCAL, cleaned_text, file.filename, sha256, contents
+        )
+        register_continuation(resposta_final, cleaned_text, sha256)
+        if agregados:
+            resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+        resposta_final["backendTexto"] = text_backends.select_backend(DOC_TYPE_SITUACAO_FISCAL)
+
+        response_to_send = extraction_response(request, formato, resposta_final, paginado)
+
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /extract: {e}", file=sys.stdout)
+        response_to_send = JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
     except Exception as e:
         print(f"Erro GERAL no endpoint /extract: {e}\n{traceback.format_exc()}", file=sys.stdout)
         # Retorna erro mesmo se a extração parcial funcionou
@@ -1420,12 +1867,366 @@ async def extract_pdf(file: UploadFile = File(...)):
 
     return response_to_send
 
+# Continua uma extração parcial (prazo_ms) a partir do texto guardado em cache,
+# sem reenviar o PDF. Extrai as seções que ficaram pendentes; pode sair parcial de novo.
+@app.get("/api/extraction/continuacao/{continuacao_id}")
+async def continue_extraction(continuacao_id: str, request: Request, agregados: bool = False, prazo_ms: int = 0, formato: str = "", paginado: bool = False):
+    import traceback
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
+    inicio = time.monotonic()
+    entrada = text_cache.get(continuacao_id)
+    if entrada is None:
+        return JSONResponse(
+            content={"error": "Continuação não encontrada ou expirada: envie o PDF novamente."}, status_code=404
+        )
+    try:
+        print(f">>> Continuação {continuacao_id}: seções {entrada['secoesPendentes']} <<<", file=sys.stdout)
+        resposta_final = run_extraction(
+            "/continuacao", DOC_TYPE_SITUACAO_FISCAL, entrada["texto"],
+            process_situacao_fiscal_text, entrada["texto"], entrada["secoesPendentes"], deadline_from_ms(inicio, prazo_ms)
+        )
+        if entrada.get("historicoId"):
+            try:
+                await asyncio.to_thread(history.append_sections, entrada["historicoId"], resposta_final)
+                resposta_final["historicoId"] = entrada["historicoId"]
+            except Exception as e:
+                print(f"Erro ao gravar a continuação no histórico: {e}", file=sys.stdout)
+        if resposta_final.get("partial"):
+            text_cache.update(continuacao_id, secoesPendentes=resposta_final["secoesPuladas"])
+            resposta_final["continuacao"] = continuacao_id
+        else:
+            text_cache.discard(continuacao_id)
+            if entrada.get("historicoId") and entrada.get("sha256"):
+                # Extração completa: passa a responder à pré-verificação por hash
+                try:
+                    await asyncio.to_thread(history.set_content_hash, entrada["historicoId"], entrada["sha256"])
+                except Exception as e:
+                    print(f"Erro ao gravar o hash da continuação no histórico: {e}", file=sys.stdout)
+        if agregados:
+            resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+        return extraction_response(request, formato, resposta_final, paginado)
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada na continuação {continuacao_id}: {e}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro na continuação {continuacao_id}: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao continuar a extração: {e}"}, status_code=500)
+
+# --- Pré-verificação por hash: evita reenviar um PDF já extraído ---
+SHA256_PATTERN = re.compile(r"^[0-9a-fA-F]{64}$")
+PRECHECK_TYPES = ("auto", DOC_TYPE_SITUACAO_FISCAL, DOC_TYPE_DARF)
+
+def stored_extraction_result(extracao):
+    """Resultado gravado no formato da resposta de extração (seções vazias não são gravadas)."""
+    resultado = extracao["resultado"]
+    if extracao["tipo_documento"] == DOC_TYPE_SITUACAO_FISCAL:
+        resultado = {chave: resultado.get(chave, []) for chave in RESPONSE_SECTION_ORDER}
+    return resultado
+
+@app.get("/api/extraction/pre-verificacao")
+async def precheck_extraction(request: Request, sha256: str, tipo: str = "auto", agregados: bool = False, formato: str = "", paginado: bool = False):
+    """Devolve a extração já feita do arquivo com esse SHA-256 ou 404 para o cliente enviar o PDF."""
+    import traceback
+    # Lê resultados do histórico: mesma autorização das demais consultas (só servidor a servidor)
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
+    if not SHA256_PATTERN.match(sha256):
+        return JSONResponse(content={"error": "sha256 deve ter 64 caracteres hexadecimais."}, status_code=422)
+    if tipo not in PRECHECK_TYPES:
+        return JSONResponse(content={"error": f"tipo deve ser um de: {', '.join(PRECHECK_TYPES)}."}, status_code=422)
+    nao_encontrado = JSONResponse(
+        content={"error": "Extração não encontrada para este arquivo: envie o PDF.", "enviarArquivo": True}, status_code=404
+    )
+    try:
+        extracao_id = await asyncio.to_thread(
+            history.find_by_hash, sha256, None if tipo == "auto" else tipo, PARSER_VERSION
+        )
+        extracao = await asyncio.to_thread(history.get_extraction, extracao_id) if extracao_id else None
+        if extracao is None:
+            print(f"Pré-verificação: hash {sha256[:12]}... não encontrado.", file=sys.stdout)
+            return nao_encontrado
+        print(f"Pré-verificação: hash {sha256[:12]}... encontrado na extração {extracao_id}.", file=sys.stdout)
+        resposta_final = stored_extraction_result(extracao)
+        resposta_final["historicoId"] = extracao_id
+        if agregados:
+            resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+        resposta_final["tipoDocumento"] = extracao["tipo_documento"]
+        return extraction_response(request, formato, resposta_final, paginado)
+    except Exception as e:
+        print(f"Erro na pré-verificação por hash: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro na pré-verificação: {e}"}, status_code=500)
+
+# --- Inspeção prévia: custo estimado antes da extração ---
+# Lê só o texto das páginas (sem pré-processamento nem parser): número de páginas,
+# camada de texto, tipo pela primeira página, linhas e páginas de início de cada seção.
+# Acima de INSPECTION_MAX_PAGES, lê uma amostra de páginas espaçadas e extrapola.
+
+def get_inspection_max_pages():
+    return max(2, int(os.environ.get("INSPECTION_MAX_PAGES", "40")))
+
+def inspection_pages(total, limite):
+    """Índices das páginas lidas: todas até o limite, senão uma amostra com a primeira e a última."""
+    if total <= limite:
+        return list(range(total))
+    passo = (total - 1) / (limite - 1)
+    return sorted({round(i * passo) for i in range(limite)})
+
+def section_spans(inicios, total_paginas):
+    """Intervalo de páginas de cada seção: do início até a página onde começa a seção seguinte."""
+    ordem = sorted(inicios.items(), key=lambda item: item[1])
+    spans = []
+    for posicao, (chave, pagina) in enumerate(ordem):
+        final = ordem[posicao + 1][1] if posicao + 1 < len(ordem) else total_paginas
+        spans.append({"secao": chave, "paginaInicial": pagina, "paginaFinal": final})
+    return spans
+
+def inspect_pdf(pdf_bytes):
+    """Características do PDF que determinam o custo da extração (None se o PDF não abrir)."""
+    try:
+        pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as open_error:
+        print(f"Inspeção: erro ao abrir PDF com fitz: {open_error}", file=sys.stdout)
+        return None
+
+    try:
+        total = len(pdf)
+        lidas = inspection_pages(total, get_inspection_max_pages())
+        backend = text_backends.select_backend(None)
+        doc_type = None
+        linhas = 0
+        sem_texto = 0
+        inicios = {}
+        for indice in lidas:
+            page_text = text_backends.page_text(pdf[indice], backend)
+            if indice == 0:
+                doc_type = classify_document_text(page_text)
+            if not page_text.strip():
+                sem_texto += 1
+                continue
+            page_lines = page_text.splitlines()
+            linhas += len(page_lines)
+            if doc_type != DOC_TYPE_SITUACAO_FISCAL or len(inicios) == len(SECTION_SPECS):
+                continue
+            for line in page_lines:
+                if not SECTION_START_PREFILTER.search(line):
+                    continue
+                for chave, spec in COMPILED_SECTION_SPECS.items():
+                    if chave not in inicios and spec["inicio"].search(line.strip()):
+                        inicios[chave] = indice + 1
+    finally:
+        pdf.close()
+
+    if doc_type == DOC_TYPE_DARF:
+        secoes = [{"secao": "data", "paginaInicial": 1, "paginaFinal": total}] if total else []
+    else:
+        secoes = section_spans(inicios, total)
+    return {
+        "paginas": total,
+        "paginasLidas": len(lidas),
+        "amostrado": len(lidas) < total,
+        "camadaTexto": sem_texto < len(lidas),
+        "paginasSemTexto": sem_texto,
+        "tipoDocumento": doc_type,
+        # Com amostra, as linhas das páginas não lidas seguem a média das lidas
+        "linhasEstimadas": round(linhas * total / len(lidas)) if lidas else 0,
+        "secoes": secoes,
+    }
+
+def inspection_result(pdf_bytes):
+    """Inspeção do PDF com a estimativa de custo e o modo de processamento recomendado."""
+    inspecao = inspect_pdf(pdf_bytes)
+    if inspecao is None:
+        return None
+    inspecao["tamanhoBytes"] = len(pdf_bytes)
+    estimativa = None
+    if inspecao["camadaTexto"]:
+        estimativa = cost_model.estimate(inspecao["tipoDocumento"], inspecao["linhasEstimadas"])
+    inspecao["estimativa"] = estimativa
+    # Só a Situação Fiscal aceita prazo_ms (extração por seções com continuação)
+    inspecao["modoRecomendado"] = cost_model.recommend_mode(
+        estimativa["tempoMs"], inspecao["tipoDocumento"] == DOC_TYPE_SITUACAO_FISCAL
+    ) if estimativa else None
+    return inspecao
+
+@app.post("/api/extraction/inspecao")
+async def inspect_extraction(file: UploadFile = File(...)):
+    """Inspeção barata antes da extração: páginas, tipo, seções e custo estimado."""
+    import traceback
+    try:
+        contents = await file.read()
+        inspecao = inspection_result(contents)
+        if inspecao is None:
+            return JSONResponse(content={"error": "Não foi possível abrir o PDF."}, status_code=422)
+        estimativa = inspecao["estimativa"] or {}
+        print(
+            f"Inspeção: {inspecao['paginas']} páginas, tipo {inspecao['tipoDocumento']}, "
+            f"{inspecao['linhasEstimadas']} linhas, ~{estimativa.get('tempoMs')} ms, modo {inspecao['modoRecomendado']}.",
+            file=sys.stdout,
+        )
+        return JSONResponse(content=inspecao)
+    except Exception as e:
+        print(f"Erro na inspeção do PDF: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro na inspeção: {e}"}, status_code=500)
+
+# Extrai a Situação Fiscal de um PDF (texto, pré-processamento e seções)
+def situacao_fiscal_from_pdf(contents):
+    cleaned_text = preprocess_text(extract_pdf_text(contents, DOC_TYPE_SITUACAO_FISCAL))
+    return budget.run_with_cpu_budget(process_situacao_fiscal_text, cleaned_text)
+
+# --- Extração a partir de texto já extraído (sem enviar o PDF) ---
+TEXT_INPUT_TYPES = ("auto", DOC_TYPE_SITUACAO_FISCAL, DOC_TYPE_DARF)
+
+def get_text_input_max_bytes():
+    return int(os.environ.get("TEXT_INPUT_MAX_BYTES", 50 * 1024 * 1024))
+
+def decode_text_input_body(body, content_encoding):
+    """Decodifica o corpo JSON (opcionalmente gzip), limitando o tamanho descompactado."""
+    max_bytes = get_text_input_max_bytes()
+    if "gzip" in (content_encoding or "").lower():
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = decompressor.decompress(body, max_bytes + 1)
+    if len(body) > max_bytes:
+        raise ValueError(f"Corpo maior que o limite de {max_bytes} bytes.")
+    return json.loads(body)
+
+# Recebe {"paginas": ["texto da página 1", ...], "tipo": "auto"} e devolve o mesmo JSON
+# dos endpoints de PDF (/extract, /extract-darf ou, com tipo "auto", /extract-auto)
+@app.post("/api/extraction/extract-text")
+async def extract_from_text(request: Request, agregados: bool = False, prazo_ms: int = 0, formato: str = "", paginado: bool = False):
+    import traceback
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
+    inicio = time.monotonic()
+    try:
+        print(">>> Endpoint /api/extraction/extract-text INICIADO <<<", file=sys.stdout)
+        try:
+            payload = decode_text_input_body(await request.body(), request.headers.get("content-encoding"))
+        except (ValueError, zlib.error) as e:
+            return JSONResponse(content={"error": f"Corpo inválido: {e}"}, status_code=400)
+        paginas = payload.get("paginas") if isinstance(payload, dict) else None
+        tipo = payload.get("tipo", "auto") if isinstance(payload, dict) else None
+        if not isinstance(paginas, list) or not all(isinstance(pagina, str) for pagina in paginas):
+            return JSONResponse(content={"error": "Informe 'paginas' como uma lista de textos."}, status_code=400)
+        if tipo not in TEXT_INPUT_TYPES:
+            return JSONResponse(content={"error": f"'tipo' deve ser um de {list(TEXT_INPUT_TYPES)}."}, status_code=400)
+
+        doc_type = tipo
+        if tipo == "auto":
+            doc_type = classify_document_text(paginas[0]) if paginas else None
+            print(f"Tipo de documento detectado pela primeira página: {doc_type}", file=sys.stdout)
+            if doc_type is None:
+                return JSONResponse(
+                    content={"error": "Tipo de documento não reconhecido: envie um DARF ou um relatório de Situação Fiscal do e-CAC."},
+                    status_code=422
+                )
+
+        cleaned_text = preprocess_text(join_page_texts(paginas))
+        if doc_type == DOC_TYPE_DARF:
+            resposta_final = run_extraction("/extract-text", doc_type, cleaned_text, process_darf_text, cleaned_text)
+        else:
+            resposta_final = run_extraction(
+                "/extract-text", doc_type, cleaned_text,
+                process_situacao_fiscal_text, cleaned_text, None, deadline_from_ms(inicio, prazo_ms)
+            )
+        await asyncio.to_thread(record_history, resposta_final, doc_type, cleaned_text, payload.get("arquivo", ""))
+        register_continuation(resposta_final, cleaned_text)
+        if agregados:
+            resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+        if tipo == "auto":
+            resposta_final["tipoDocumento"] = doc_type
+        return extraction_response(request, formato, resposta_final, paginado)
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /extract-text: {e}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro no endpoint /extract-text: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao processar o texto: {e}"}, status_code=500)
+
+# Caminho rápido para dashboards: só contagens e totais por seção e por CNPJ
+@app.post("/api/extraction/resumo")
+async def extract_summary(file: UploadFile = File(...)):
+    import traceback
+    try:
+        print(">>> Endpoint /api/extraction/resumo INICIADO <<<", file=sys.stdout)
+        contents = await file.read()
+        doc_type, extracted_text = extract_pdf_text_classified(contents)
+        if doc_type is None:
+            return JSONResponse(
+                content={"error": "Tipo de documento não reconhecido: envie um DARF ou um relatório de Situação Fiscal do e-CAC."},
+                status_code=422
+            )
+        cleaned_text = preprocess_text(extracted_text)
+        if doc_type == DOC_TYPE_DARF:
+            secoes = budget.run_with_cpu_budget(summarize_darf_text, cleaned_text, contents)
+        else:
+            secoes = budget.run_with_cpu_budget(summarize_situacao_fiscal_text, cleaned_text)
+        print(f"Resumo calculado para {len(secoes)} seções.", file=sys.stdout)
+        return JSONResponse(content={"tipoDocumento": doc_type, "backendTexto": text_backends.select_backend(doc_type), "secoes": secoes})
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /resumo: {e}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro no endpoint /resumo: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao resumir o PDF: {e}"}, status_code=500)
+
+# Compara dois relatórios de Situação Fiscal do mesmo cliente (anterior x atual)
+@app.post("/api/extraction/diff")
+async def diff_pdfs(anterior: UploadFile = File(...), atual: UploadFile = File(...)):
+    import traceback
+    try:
+        print(">>> Endpoint /api/extraction/diff INICIADO <<<", file=sys.stdout)
+        resultado_anterior = situacao_fiscal_from_pdf(await anterior.read())
+        resultado_atual = situacao_fiscal_from_pdf(await atual.read())
+        return JSONResponse(content=diff.diff_results(resultado_anterior, resultado_atual))
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /diff: {e}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro no endpoint /diff: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao comparar os relatórios: {e}"}, status_code=500)
+
+# Linha DARF com código, denominação e os quatro valores na mesma linha. Equivale a
+# re.match(DARF_INLINE_PATTERN, line) para linhas sem quebra, mas em tempo linear: a
+# regex retrocede de forma quadrática em linhas longas com muitos espaços.
+DARF_INLINE_PATTERN = r"^(\d{4})\s+(.+?)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)$"
+DARF_INLINE_CODE = re.compile(r"(\d{4})\s")
+DARF_VALUE_TOKEN = re.compile(r"[\d.,]+")
+
+def match_darf_inline(line):
+    """Retorna (codigo, denominacao, principal, multa, juros, total) ou None para uma linha (sem quebras)."""
+    if not DARF_INLINE_CODE.match(line) or line[-1].isspace():
+        return None
+    # Os quatro valores são, obrigatoriamente, os quatro últimos tokens da linha
+    parts = line.rsplit(None, 4)
+    if len(parts) < 5 or not all(DARF_VALUE_TOKEN.fullmatch(token) for token in parts[1:]):
+        return None
+    head = parts[0]
+    if len(head) > 4:
+        # Denominação: do fim dos espaços após o código até os espaços antes dos valores
+        denominacao = head[4:].lstrip()
+    else:
+        # Só espaços entre o código e os valores: a regex ainda casa se houver ao
+        # menos 3, usando o penúltimo espaço como denominação
+        spaces = line[4:len(line) - len(line[4:].lstrip())]
+        if len(spaces) < 3:
+            return None
+        denominacao = spaces[-2]
+    return (line[:4], denominacao, parts[1], parts[2], parts[3], parts[4])
+
+
 # Função para extrair dados do DARF - Versão Multi-página
 def extract_darf_data(text):
     result = []
     lines = text.split('\n')
     
-    print("\n--- Iniciando extração de dados do DARF (Multi-página) ---", file=sys.stdout)
+    parser_log("\n--- Iniciando extração de dados do DARF (Multi-página) ---")
     
     # Procura por TODAS as seções "Composição do Documento de Arrecadação"
     start_pattern = r"Composição\s+do\s+Documento\s+de\s+Arrecadação"
@@ -1436,13 +2237,13 @@ def extract_darf_data(text):
     for i, line in enumerate(lines):
         if re.search(start_pattern, line.strip(), re.IGNORECASE):
             composition_sections.append(i)
-            print(f"Seção de composição encontrada na linha {i+1}: '{line.strip()}'", file=sys.stdout)
+            parser_log(f"Seção de composição encontrada na linha {i+1}: '{line.strip()}'")
     
-    print(f"Total de seções de composição encontradas: {len(composition_sections)}", file=sys.stdout)
+    parser_log(f"Total de seções de composição encontradas: {len(composition_sections)}")
     
     # Processa cada seção de composição
     for section_idx, section_start in enumerate(composition_sections):
-        print(f"\n--- Processando seção {section_idx + 1} (linha {section_start + 1}) ---", file=sys.stdout)
+        parser_log(f"\n--- Processando seção {section_idx + 1} (linha {section_start + 1}) ---")
         
         # Define o fim da seção atual (início da próxima seção ou fim do texto)
         if section_idx < len(composition_sections) - 1:
@@ -1460,7 +2261,7 @@ def extract_darf_data(text):
             # Ativa a seção quando encontra o padrão
             if not in_composition_section and re.search(start_pattern, line, re.IGNORECASE):
                 in_composition_section = True
-                print(f"Seção {section_idx + 1} ativada na linha {i+1}", file=sys.stdout)
+                parser_log(f"Seção {section_idx + 1} ativada na linha {i+1}")
                 i += 1
                 continue
                 
@@ -1470,13 +2271,13 @@ def extract_darf_data(text):
                 
             # Pula linha de cabeçalho da tabela
             if re.search(header_pattern, line, re.IGNORECASE):
-                print(f"Cabeçalho da tabela encontrado na linha {i+1}: '{line}'", file=sys.stdout)
+                parser_log(f"Cabeçalho da tabela encontrado na linha {i+1}: '{line}'")
                 i += 1
                 continue
                 
             # Para se chegar ao fim desta seção (mas não para a extração global)
             if not line or line.startswith("Total do Documento") or line.startswith("VENCIMENTO") or line.startswith("AUTENTICAÇÃO"):
-                print(f"Fim da seção {section_idx + 1} detectado na linha {i+1}: '{line}'", file=sys.stdout)
+                parser_log(f"Fim da seção {section_idx + 1} detectado na linha {i+1}: '{line}'")
                 break
                 
             # Tenta detectar início de item DARF por dois padrões diferentes
@@ -1485,16 +2286,16 @@ def extract_darf_data(text):
             codigo_only_match = re.match(r"^(\d{4})$", line)
             
             # Padrão 2: código + denominação + valores na mesma linha
-            codigo_inline_match = re.match(r"^(\d{4})\s+(.+?)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)\s+([\d.,]+)$", line)
+            codigo_inline_match = match_darf_inline(line)
             
             if codigo_only_match:
                 # FORMATO 1: Código sozinho
                 codigo = codigo_only_match.group(1)
-                print(f"\n🎯 Código DARF (Formato 1) encontrado: {codigo} na linha {i+1} (Seção {section_idx + 1})", file=sys.stdout)
+                parser_log(f"\n🎯 Código DARF (Formato 1) encontrado: {codigo} na linha {i+1} (Seção {section_idx + 1})")
                 
                 # Verifica se temos linhas suficientes para um item completo dentro desta seção
                 if i + 7 >= section_end:
-                    print(f"❌ Não há linhas suficientes após código {codigo} na seção {section_idx + 1}", file=sys.stdout)
+                    parser_log(f"❌ Não há linhas suficientes após código {codigo} na seção {section_idx + 1}")
                     i += 1
                     continue
                 
@@ -1507,9 +2308,9 @@ def extract_darf_data(text):
                 descricao_completa = lines[i+6].strip()  # descrição completa
                 periodo_vencimento = lines[i+7].strip()  # PA + vencimento
                 
-                print(f"Denominação: '{denominacao}'", file=sys.stdout)
-                print(f"Valores: {principal_str}, {multa_str}, {juros_str}, {total_str}", file=sys.stdout)
-                print(f"Período/Vencimento: '{periodo_vencimento}'", file=sys.stdout)
+                parser_log(f"Denominação: '{denominacao}'")
+                parser_log(f"Valores: {principal_str}, {multa_str}, {juros_str}, {total_str}")
+                parser_log(f"Período/Vencimento: '{periodo_vencimento}'")
                 
                 # Converte valores monetários
                 try:
@@ -1518,7 +2319,7 @@ def extract_darf_data(text):
                     juros = parse_br_currency(juros_str)
                     total = parse_br_currency(total_str)
                 except Exception as e:
-                    print(f"❌ Erro ao converter valores monetários: {e}", file=sys.stdout)
+                    parser_log(f"❌ Erro ao converter valores monetários: {e}")
                     i += 1
                     continue
                 
@@ -1530,12 +2331,12 @@ def extract_darf_data(text):
                 vencimento_match = re.search(r"Vencimento\s+(\d{2}/\d{2}/\d{4})", periodo_vencimento)
                 vencimento = vencimento_match.group(1) if vencimento_match else ""
                 
-                print(f"Período extraído: '{periodo}'", file=sys.stdout)
-                print(f"Vencimento extraído: '{vencimento}'", file=sys.stdout)
+                parser_log(f"Período extraído: '{periodo}'")
+                parser_log(f"Vencimento extraído: '{vencimento}'")
                 
                 # Validação básica
                 if not denominacao or not periodo or not vencimento:
-                    print(f"❌ Dados incompletos para código {codigo} na seção {section_idx + 1}", file=sys.stdout)
+                    parser_log(f"❌ Dados incompletos para código {codigo} na seção {section_idx + 1}")
                     i += 1
                     continue
                 
@@ -1551,7 +2352,7 @@ def extract_darf_data(text):
                 }
                 
                 result.append(darf_item)
-                print(f"✅ Item DARF (Formato 1) extraído da seção {section_idx + 1}: {darf_item}", file=sys.stdout)
+                parser_log(f"✅ Item DARF (Formato 1) extraído da seção {section_idx + 1}: {darf_item}")
                 
                 # Pula para depois das 8 linhas processadas (código + 7 linhas de dados)
                 i += 8
@@ -1559,20 +2360,16 @@ def extract_darf_data(text):
                 
             elif codigo_inline_match:
                 # FORMATO 2: Código + denominação + valores na mesma linha
-                codigo = codigo_inline_match.group(1)
-                denominacao = codigo_inline_match.group(2).strip()
-                principal_str = codigo_inline_match.group(3)
-                multa_str = codigo_inline_match.group(4)
-                juros_str = codigo_inline_match.group(5)
-                total_str = codigo_inline_match.group(6)
+                codigo, denominacao, principal_str, multa_str, juros_str, total_str = codigo_inline_match
+                denominacao = denominacao.strip()
                 
-                print(f"\n🎯 Código DARF (Formato 2) encontrado: {codigo} na linha {i+1} (Seção {section_idx + 1})", file=sys.stdout)
-                print(f"Denominação: '{denominacao}'", file=sys.stdout)
-                print(f"Valores: {principal_str}, {multa_str}, {juros_str}, {total_str}", file=sys.stdout)
+                parser_log(f"\n🎯 Código DARF (Formato 2) encontrado: {codigo} na linha {i+1} (Seção {section_idx + 1})")
+                parser_log(f"Denominação: '{denominacao}'")
+                parser_log(f"Valores: {principal_str}, {multa_str}, {juros_str}, {total_str}")
                 
                 # Verifica se temos linhas suficientes para descrição e período
                 if i + 2 >= section_end:
-                    print(f"❌ Não há linhas suficientes após código {codigo} na seção {section_idx + 1}", file=sys.stdout)
+                    parser_log(f"❌ Não há linhas suficientes após código {codigo} na seção {section_idx + 1}")
                     i += 1
                     continue
                 
@@ -1580,7 +2377,7 @@ def extract_darf_data(text):
                 descricao_completa = lines[i+1].strip()  # descrição completa
                 periodo_vencimento = lines[i+2].strip()  # PA + vencimento
                 
-                print(f"Período/Vencimento: '{periodo_vencimento}'", file=sys.stdout)
+                parser_log(f"Período/Vencimento: '{periodo_vencimento}'")
                 
                 # Converte valores monetários
                 try:
@@ -1589,7 +2386,7 @@ def extract_darf_data(text):
                     juros = parse_br_currency(juros_str)
                     total = parse_br_currency(total_str)
                 except Exception as e:
-                    print(f"❌ Erro ao converter valores monetários: {e}", file=sys.stdout)
+                    parser_log(f"❌ Erro ao converter valores monetários: {e}")
                     i += 1
                     continue
                 
@@ -1601,12 +2398,12 @@ def extract_darf_data(text):
                 vencimento_match = re.search(r"Vencimento\s+(\d{2}/\d{2}/\d{4})", periodo_vencimento)
                 vencimento = vencimento_match.group(1) if vencimento_match else ""
                 
-                print(f"Período extraído: '{periodo}'", file=sys.stdout)
-                print(f"Vencimento extraído: '{vencimento}'", file=sys.stdout)
+                parser_log(f"Período extraído: '{periodo}'")
+                parser_log(f"Vencimento extraído: '{vencimento}'")
                 
                 # Validação básica
                 if not denominacao or not periodo or not vencimento:
-                    print(f"❌ Dados incompletos para código {codigo} na seção {section_idx + 1}", file=sys.stdout)
+                    parser_log(f"❌ Dados incompletos para código {codigo} na seção {section_idx + 1}")
                     i += 1
                     continue
                 
@@ -1622,7 +2419,7 @@ def extract_darf_data(text):
                 }
                 
                 result.append(darf_item)
-                print(f"✅ Item DARF (Formato 2) extraído da seção {section_idx + 1}: {darf_item}", file=sys.stdout)
+                parser_log(f"✅ Item DARF (Formato 2) extraído da seção {section_idx + 1}: {darf_item}")
                 
                 # Pula 3 linhas (linha atual + descrição + período)
                 i += 3
@@ -1630,33 +2427,82 @@ def extract_darf_data(text):
             
             i += 1
     
-    print(f"Extração DARF finalizada. {len(result)} itens encontrados em {len(composition_sections)} seções.", file=sys.stdout)
+    parser_log(f"Extração DARF finalizada. {len(result)} itens encontrados em {len(composition_sections)} seções.")
     return result
 
+# Executa a extração do DARF sobre o texto já pré-processado
+def process_darf_text(cleaned_text):
+    darf_data = extract_darf_data(cleaned_text)
+    parser_log(f"Dados DARF extraídos: {len(darf_data)} itens")
+    return {"data": darf_data}
+
+# --- Leitura do DARF pelas coordenadas (ver app/darf_layout.py) ---
+def get_darf_parallel_min_pages():
+    return int(os.environ.get("DARF_PARALLEL_MIN_PAGES", 8))
+
+def extract_darf_page_text(page_text):
+    """Uma página do DARF pelo extrator de texto, quando a leitura por coordenadas não acha os valores."""
+    if not re.search(r"Composição\s+do\s+Documento\s+de\s+Arrecadação", page_text, re.IGNORECASE):
+        # Página de continuação da tabela: o extrator de texto só lê depois do título
+        page_text = "Composição do Documento de Arrecadação\n" + page_text
+    return extract_darf_data(page_text)
+
+def extract_darf_items_from_pdf(pdf_bytes, cleaned_text):
+    """Lê a tabela de composição pelas coordenadas; usa o extrator de texto se não encontrar itens."""
+    try:
+        paginas = darf_layout.read_pdf_words(pdf_bytes)
+    except Exception as e:
+        parser_log(f"Erro ao ler as palavras do DARF ({e}); usando o extrator de texto.")
+        return extract_darf_data(cleaned_text)
+
+    map_pages = map
+    if get_parallel_workers() > 1 and len(paginas) >= get_darf_parallel_min_pages():
+        parser_log(f"DARF com {len(paginas)} páginas: leitura distribuída no pool de extração.")
+        pool = get_section_pool()
+        map_pages = lambda func, *iterables: pool.map(profiling.for_pool(func), *iterables)
+    itens = darf_layout.parse_pages(paginas, parse_br_currency, map_pages, extract_darf_page_text)
+    if not itens:
+        parser_log("Tabela de composição não encontrada pelas coordenadas; usando o extrator de texto.")
+        return extract_darf_data(cleaned_text)
+    return itens
+
+def process_darf_pdf(pdf_bytes, cleaned_text):
+    darf_data = extract_darf_items_from_pdf(pdf_bytes, cleaned_text)
+    parser_log(f"Dados DARF extraídos: {len(darf_data)} itens")
+    return {"data": darf_data}
+
 @app.post("/api/extraction/extract-darf")
-async def extract_darf_pdf(file: UploadFile = File(...)):
+async def extract_darf_pdf(request: Request, file: UploadFile = File(...), agregados: bool = False, formato: str = "", paginado: bool = False):
     import sys
     import traceback
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
     response_to_send = None
     try:
         print(">>> Endpoint /api/extraction/extract-darf INICIADO <<<", file=sys.stdout)
         print("Recebido PDF DARF para extração", file=sys.stdout)
         contents = await file.read()
+        sha256 = hashlib.sha256(contents).hexdigest()
 
         # Usa a função de extração de texto existente
-        extracted_text = extract_pdf_text(contents)
+        extracted_text = extract_pdf_text(contents, DOC_TYPE_DARF)
         print("\n---\nTexto extraído do DARF (primeiros 1000 chars):", extracted_text[:1000].replace('\n', ' '), file=sys.stdout)
 
         # Pré-processa o texto
         cleaned_text = preprocess_text(extracted_text)
 
-        # Extrai dados do DARF
-        darf_data = extract_darf_data(cleaned_text)
-        
-        print(f"Dados DARF extraídos: {len(darf_data)} itens", file=sys.stdout)
+        resposta_final = run_extraction("/extract-darf", DOC_TYPE_DARF, cleaned_text, process_darf_pdf, contents, cleaned_text)
+        await asyncio.to_thread(record_history, resposta_final, DOC_TYPE_DARF, cleaned_text, file.filename, sha256, contents)
+        if agregados:
+            resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+        resposta_final["backendTexto"] = text_backends.select_backend(DOC_TYPE_DARF)
 
-        response_to_send = JSONResponse(content={"data": darf_data})
+        response_to_send = extraction_response(request, formato, resposta_final, paginado)
 
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /extract-darf: {e}", file=sys.stdout)
+        response_to_send = JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
     except Exception as e:
         print(f"Erro no endpoint /extract-darf: {e}\n{traceback.format_exc()}", file=sys.stdout)
         response_to_send = JSONResponse(content={"error": f"Erro ao processar DARF: {e}"}, status_code=500)
@@ -1667,6 +2513,462 @@ async def extract_darf_pdf(file: UploadFile = File(...)):
 
     return response_to_send
 
+# Endpoint unificado: detecta o tipo do documento pela primeira página e
+# encaminha para a cadeia de extratores correspondente
+@app.post("/api/extraction/extract-auto")
+async def extract_auto_pdf(request: Request, file: UploadFile = File(...), agregados: bool = False, prazo_ms: int = 0, formato: str = "", paginado: bool = False):
+    import sys
+    import traceback
+    paginado_error = check_paginated(paginado)
+    if paginado_error:
+        return paginado_error
+    inicio = time.monotonic()
+    response_to_send = None
+    try:
+        print(">>> Endpoint /api/extraction/extract-auto INICIADO <<<", file=sys.stdout)
+        contents = await file.read()
+        sha256 = hashlib.sha256(contents).hexdigest()
+
+        doc_type, extracted_text = extract_pdf_text_classified(contents)
+        if doc_type is None:
+            response_to_send = JSONResponse(
+                content={"error": "Tipo de documento não reconhecido: envie um DARF ou um relatório de Situação Fiscal do e-CAC."},
+                status_code=422
+            )
+        else:
+            cleaned_text = preprocess_text(extracted_text)
+            if doc_type == DOC_TYPE_DARF:
+                resposta_final = run_extraction("/extract-auto", doc_type, cleaned_text, process_darf_pdf, contents, cleaned_text)
+            else:
+                resposta_final = run_extraction(
+                    "/extract-auto", doc_type, cleaned_text,
+                    process_situacao_fiscal_text, cleaned_text, None, deadline_from_ms(inicio, prazo_ms)
+                )
+            await asyncio.to_thread(record_history, resposta_final, doc_type, cleaned_text, file.filename, sha256, contents)
+            register_continuation(resposta_final, cleaned_text, sha256)
+            if agregados:
+                resposta_final["agregados"] = aggregation.compute_aggregates(resposta_final)
+            resposta_final["tipoDocumento"] = doc_type
+            resposta_final["backendTexto"] = text_backends.select_backend(doc_type)
+            response_to_send = extraction_response(request, formato, resposta_final, paginado)
+
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /extract-auto: {e}", file=sys.stdout)
+        response_to_send = JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro no endpoint /extract-auto: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        response_to_send = JSONResponse(content={"error": f"Erro ao processar PDF: {e}"}, status_code=500)
+    finally:
+        print("Finalizando processamento do endpoint /extract-auto.", file=sys.stdout)
+        if 'response_to_send' not in locals():
+             response_to_send = JSONResponse(content={"error": "Erro inesperado no processamento."}, status_code=500)
+
+    return response_to_send
+
+# --- Ingestão em lote no Postgres ---
+def check_ingestion_auth(request):
+    """Retorna uma JSONResponse de erro se a ingestão não estiver disponível ou autorizada."""
+    if not ingestion.get_database_url():
+        return JSONResponse(content={"error": "Ingestão indisponível: DATABASE_URL não configurada."}, status_code=503)
+    token = os.environ.get("INGESTION_API_TOKEN", "")
+    # A conexão direta ignora o RLS do Supabase: sem token, a ingestão fica fechada
+    if not token:
+        return JSONResponse(content={"error": "Ingestão indisponível: INGESTION_API_TOKEN não configurado."}, status_code=503)
+    if request.headers.get("Authorization", "") != f"Bearer {token}":
+        return JSONResponse(content={"error": "Não autorizado."}, status_code=401)
+    return None
+
+@app.post("/api/ingestion/order-items")
+async def ingest_extraction_result(request: Request):
+    """Grava um resultado de extração já obtido (JSON) nos itens de um pedido."""
+    import traceback
+    auth_error = check_ingestion_auth(request)
+    if auth_error:
+        return auth_error
+    try:
+        payload = await request.json()
+        order_id = payload.get("order_id")
+        resultado = payload.get("resultado")
+        substituir = payload.get("substituir", False)
+        if not order_id or not isinstance(resultado, dict):
+            return JSONResponse(content={"error": "Informe 'order_id' e 'resultado'."}, status_code=400)
+        # Só booleano JSON: a string "false" não pode apagar os itens do pedido
+        if not isinstance(substituir, bool):
+            return JSONResponse(content={"error": "'substituir' deve ser true ou false."}, status_code=400)
+        inserted = await asyncio.to_thread(ingestion.ingest_order_items, resultado, order_id, substituir)
+        return JSONResponse(content={"order_id": order_id, "itensInseridos": inserted})
+    except Exception as e:
+        print(f"Erro no endpoint /ingestion/order-items: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao gravar itens: {e}"}, status_code=500)
+
+@app.post("/api/ingestion/extract-and-ingest")
+async def extract_and_ingest_pdf(request: Request, file: UploadFile = File(...), order_id: str = Form(...), substituir: bool = Form(False)):
+    """Extrai o PDF (DARF ou Situação Fiscal, detectado automaticamente) e grava os itens no pedido."""
+    import traceback
+    auth_error = check_ingestion_auth(request)
+    if auth_error:
+        return auth_error
+    try:
+        contents = await file.read()
+        doc_type, extracted_text = extract_pdf_text_classified(contents)
+        if doc_type is None:
+            return JSONResponse(
+                content={"error": "Tipo de documento não reconhecido: envie um DARF ou um relatório de Situação Fiscal do e-CAC."},
+                status_code=422
+            )
+        cleaned_text = preprocess_text(extracted_text)
+        if doc_type == DOC_TYPE_DARF:
+            resultado = budget.run_with_cpu_budget(process_darf_pdf, contents, cleaned_text)
+        else:
+            resultado = budget.run_with_cpu_budget(process_situacao_fiscal_text, cleaned_text)
+        inserted = await asyncio.to_thread(ingestion.ingest_order_items, resultado, order_id, substituir)
+        return JSONResponse(content={"order_id": order_id, "tipoDocumento": doc_type, "itensInseridos": inserted})
+    except budget.ExtractionBudgetExceeded as e:
+        print(f"Extração cancelada no endpoint /ingestion/extract-and-ingest: {e}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Documento excede o orçamento de processamento: {e}"}, status_code=422)
+    except Exception as e:
+        print(f"Erro no endpoint /ingestion/extract-and-ingest: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao extrair e gravar itens: {e}"}, status_code=500)
+
+# --- Histórico local das extrações (ver app/history.py) ---
+def check_history_auth(request):
+    """Retorna uma JSONResponse de erro se o histórico não estiver disponível ou autorizado."""
+    if not history.get_history_path():
+        return JSONResponse(content={"error": "Histórico indisponível: HISTORY_DB_PATH não configurado."}, status_code=503)
+    token = os.environ.get("HISTORY_API_TOKEN", "")
+    # O histórico guarda extrações de clientes: sem token, as consultas ficam fechadas
+    if not token:
+        return JSONResponse(content={"error": "Histórico indisponível: HISTORY_API_TOKEN não configurado."}, status_code=503)
+    if request.headers.get("Authorization", "") != f"Bearer {token}":
+        return JSONResponse(content={"error": "Não autorizado."}, status_code=401)
+    return None
+
+@app.get("/api/historico/extracoes")
+async def list_history_extractions(request: Request, cnpj: str = "", de: str = "", ate: str = "", limite: int = 100):
+    """Extrações gravadas, filtradas por CNPJ e intervalo de datas do relatório (YYYY-MM-DD)."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    extracoes = await asyncio.to_thread(history.list_extractions, cnpj, de, ate, min(max(limite, 1), 1000))
+    return JSONResponse(content={"extracoes": extracoes})
+
+@app.get("/api/historico/extracoes/{extracao_id}")
+async def get_history_extraction(extracao_id: int, request: Request):
+    """Resultado gravado de uma extração, no mesmo formato da resposta original."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    extracao = await asyncio.to_thread(history.get_extraction, extracao_id)
+    if extracao is None:
+        return JSONResponse(content={"error": "Extração não encontrada no histórico."}, status_code=404)
+    return JSONResponse(content=extracao)
+
+@app.get("/api/historico/extracoes/{extracao_id}/secoes/{secao}")
+async def page_history_section(extracao_id: int, secao: str, request: Request, ordenar: str = "", ordem: str = "asc", limite: int = 500, cursor: str = ""):
+    """Itens de uma seção de uma extração gravada, paginados por cursor e ordenados no servidor."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    if ordem not in ("asc", "desc"):
+        return JSONResponse(content={"error": "ordem deve ser 'asc' ou 'desc'."}, status_code=400)
+    try:
+        pagina = await asyncio.to_thread(
+            history.page_section, extracao_id, secao, ordenar or None, ordem == "desc", min(max(limite, 1), 5000), cursor or None
+        )
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Parâmetros inválidos: {e}"}, status_code=400)
+    if pagina is None:
+        return JSONResponse(content={"error": "Extração não encontrada no histórico."}, status_code=404)
+    return JSONResponse(content=dict(pagina, secao=secao))
+
+@app.get("/api/historico/itens")
+async def query_history_items(request: Request, cnpj: str, secao: str = "", receita: str = "", de: str = "", ate: str = "", limite: int = 1000):
+    """Itens de um CNPJ em todos os relatórios gravados (filtros por seção, receita e datas)."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    if not history.normalize_cnpj(cnpj):
+        return JSONResponse(content={"error": "Informe o 'cnpj'."}, status_code=400)
+    itens = await asyncio.to_thread(history.query_items, cnpj, secao, receita, de, ate, min(max(limite, 1), 10000))
+    return JSONResponse(content={"cnpj": cnpj, "itens": itens})
+
+@app.get("/api/historico/diff")
+async def diff_history_extractions(request: Request, anterior: int, atual: int):
+    """Compara duas extrações de Situação Fiscal gravadas no histórico."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    extracoes = []
+    for extracao_id in (anterior, atual):
+        extracao = await asyncio.to_thread(history.get_extraction, extracao_id)
+        if extracao is None:
+            return JSONResponse(content={"error": f"Extração {extracao_id} não encontrada no histórico."}, status_code=404)
+        if extracao["tipo_documento"] != DOC_TYPE_SITUACAO_FISCAL:
+            return JSONResponse(content={"error": f"A extração {extracao_id} não é de Situação Fiscal."}, status_code=400)
+        extracoes.append(extracao)
+    resultado = diff.diff_results(extracoes[0]["resultado"], extracoes[1]["resultado"])
+    resultado["anterior"] = {"id": anterior, "data_relatorio": extracoes[0]["data_relatorio"]}
+    resultado["atual"] = {"id": atual, "data_relatorio": extracoes[1]["data_relatorio"]}
+    return JSONResponse(content=resultado)
+
+# --- Reprocessamento das extrações antigas após correções dos extratores (ver app/reprocessing.py) ---
+def reprocessing_status(job):
+    pendentes = history.count_outdated(PARSER_VERSION)
+    return {"versaoAtual": PARSER_VERSION, "pendentes": pendentes["pendentes"], "semFonte": pendentes["semFonte"], "reprocessamento": job}
+
+@app.post("/api/historico/reprocessamento")
+async def start_history_reprocessing(request: Request):
+    """Inicia, em segundo plano, o reprocessamento das extrações gravadas por versões anteriores."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    try:
+        job = await asyncio.to_thread(reprocessing.start, PARSER_VERSION)
+        if job is None:
+            atual = await asyncio.to_thread(reprocessing.get_job)
+            return JSONResponse(
+                content={"error": "Já existe um reprocessamento em andamento.", "reprocessamento": atual}, status_code=409
+            )
+        return JSONResponse(content=await asyncio.to_thread(reprocessing_status, job), status_code=202)
+    except Exception as e:
+        import traceback
+        print(f"Erro ao iniciar o reprocessamento: {str(e)}", file=sys.stdout)
+        print(traceback.format_exc(), file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao iniciar o reprocessamento: {str(e)}"}, status_code=500)
+
+@app.get("/api/historico/reprocessamento")
+async def get_history_reprocessing(request: Request, id: int = 0):
+    """Progresso e vazão do reprocessamento (o mais recente, ou o de `id`)."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    job = await asyncio.to_thread(reprocessing.get_job, id or None)
+    if id and job is None:
+        return JSONResponse(content={"error": "Reprocessamento não encontrado."}, status_code=404)
+    return JSONResponse(content=await asyncio.to_thread(reprocessing_status, job))
+
+@app.delete("/api/historico/reprocessamento")
+async def stop_history_reprocessing(request: Request):
+    """Pede a parada do reprocessamento em andamento; o documento atual termina antes."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    job = await asyncio.to_thread(reprocessing.request_stop)
+    if job is None:
+        return JSONResponse(content={"error": "Nenhum reprocessamento em andamento."}, status_code=404)
+    return JSONResponse(content={"reprocessamento": job})
+
+@app.get("/api/historico/reprocessamento/alteracoes")
+async def list_reprocessing_changes(request: Request, reprocessamento: int = 0, extracao: int = 0, cursor: int = 0, limite: int = 50):
+    """Extrações cujo resultado mudou no reprocessamento, com as linhas alteradas por seção."""
+    auth_error = check_history_auth(request)
+    if auth_error:
+        return auth_error
+    limite = min(max(limite, 1), 500)
+    alteracoes = await asyncio.to_thread(
+        reprocessing.list_changes, reprocessamento or None, extracao or None, max(cursor, 0), limite
+    )
+    return JSONResponse(content={
+        "alteracoes": alteracoes, "proximoCursor": alteracoes[-1]["cursor"] if len(alteracoes) == limite else None,
+    })
+
+# --- Cronogramas de parcelamento em lote (ver app/installments.py) ---
+# Seções que o frontend deixa fora do total por padrão (src/lib/totalCalculations.ts)
+PAYMENT_PLAN_EXCLUDED_SECTIONS = ("debitosExigSuspensaSief", "parcelamentosSiefpar")
+
+def payment_plan_items(plano, secoes, extracoes):
+    """Linhas de débito de um plano: "itens", "resultado" de extração ou "historicoId"."""
+    if isinstance(plano.get("itens"), list):
+        return plano["itens"]
+    if isinstance(plano.get("resultado"), dict):
+        resultado = plano["resultado"]
+    elif plano.get("historicoId") is not None:
+        resultado = extracoes[plano["historicoId"]]["resultado"]
+    else:
+        raise ValueError("Cada plano precisa de 'itens', 'resultado' ou 'historicoId'.")
+    return [
+        item for secao, itens in history.result_sections(resultado)
+        if (secao in secoes if secoes else secao not in PAYMENT_PLAN_EXCLUDED_SECTIONS)
+        for item in itens
+    ]
+
+def load_plan_extractions(planos):
+    """Extrações do histórico citadas pelos planos, lidas uma vez cada."""
+    extracoes = {}
+    for plano in planos:
+        extracao_id = plano.get("historicoId")
+        if extracao_id is not None and extracao_id not in extracoes:
+            extracao = history.get_extraction(int(extracao_id))
+            if extracao is not None:
+                extracoes[extracao_id] = extracao
+    return extracoes
+
+# Recebe {"planos": [{"id": "pedido-1", "itens": [...]}, {"id": "pedido-2", "historicoId": 12,
+# "parcelas": 24, "reducao": 1500.0}], "parcelas": 60, "taxaJurosMensal": 0.0,
+# "primeiroVencimento": "2025-07-20"} e devolve o cronograma e os totais de cada plano
+@app.post("/api/parcelamento/cronogramas")
+async def build_payment_schedules(request: Request):
+    import traceback
+    try:
+        payload = await request.json()
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Corpo inválido: {e}"}, status_code=400)
+    planos = payload.get("planos") if isinstance(payload, dict) else None
+    if not isinstance(planos, list) or not all(isinstance(plano, dict) for plano in planos):
+        return JSONResponse(content={"error": "Informe 'planos' como uma lista de objetos."}, status_code=400)
+    if any(plano.get("historicoId") is not None for plano in planos):
+        auth_error = check_history_auth(request)
+        if auth_error:
+            return auth_error
+    try:
+        inicio = time.perf_counter()
+        primeiro_vencimento = payload.get("primeiroVencimento")
+        if primeiro_vencimento:
+            primeiro_vencimento = datetime.date.fromisoformat(primeiro_vencimento)
+        secoes = payload.get("secoes") or []
+        extracoes = await asyncio.to_thread(load_plan_extractions, planos)
+        ausentes = [plano["historicoId"] for plano in planos if plano.get("historicoId") not in (None, *extracoes)]
+        if ausentes:
+            return JSONResponse(content={"error": f"Extrações não encontradas no histórico: {ausentes}."}, status_code=404)
+        entradas = [
+            {
+                "id": plano.get("id", indice),
+                "valores": installments.debt_values(payment_plan_items(plano, secoes, extracoes), payload.get("campoValor")),
+                "parcelas": plano.get("parcelas"),
+                "reducao": plano.get("reducao"),
+            }
+            for indice, plano in enumerate(planos)
+        ]
+        cronogramas = installments.build_schedules(
+            entradas, int(payload.get("parcelas") or 1), float(payload.get("taxaJurosMensal") or 0),
+            primeiro_vencimento, bool(payload.get("detalharItens")),
+        )
+        totais = {
+            "planos": len(cronogramas),
+            "itens": sum(plano["itens"] for plano in cronogramas),
+            "valorFinanciado": round(sum(plano["valorFinanciado"] for plano in cronogramas), 2),
+            "totalParcelas": round(sum(plano["totalParcelas"] for plano in cronogramas), 2),
+            "totalJuros": round(sum(plano["totalJuros"] for plano in cronogramas), 2),
+        }
+        print(
+            f"Cronogramas: {totais['planos']} planos, {totais['itens']} débitos em "
+            f"{(time.perf_counter() - inicio) * 1000:.1f} ms.",
+            file=sys.stdout,
+        )
+        return JSONResponse(content={"planos": cronogramas, "totais": totais})
+    except (TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Parâmetros inválidos: {e}"}, status_code=400)
+    except Exception as e:
+        print(f"Erro nos cronogramas de parcelamento: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao calcular os cronogramas: {e}"}, status_code=500)
+
+# --- Atualização de multa e juros até a data de pagamento (ver app/late_charges.py) ---
+# Linhas SIEF (Pendência e Exigibilidade Suspensa) e de DARF
+LATE_CHARGE_SECTIONS = {
+    "pendenciasDebito": late_charges.SITUACAO_FISCAL_FIELDS,
+    "debitosExigSuspensaSief": late_charges.SITUACAO_FISCAL_FIELDS,
+    history.DARF_SECTION: late_charges.DARF_FIELDS,
+}
+
+def late_charge_sections(payload):
+    """Seções a atualizar: {"itens": [...]} (tipo pelas colunas da primeira linha) ou as
+    seções SIEF/DARF de "resultado"."""
+    if isinstance(payload.get("itens"), list):
+        itens = payload["itens"]
+        campos = late_charges.DARF_FIELDS if itens and "principal" in itens[0] else late_charges.SITUACAO_FISCAL_FIELDS
+        return {"itens": (itens, campos)}
+    return {
+        # O DARF volta em "data", como na resposta da extração
+        ("data" if secao == history.DARF_SECTION else secao): (itens, LATE_CHARGE_SECTIONS[secao])
+        for secao, itens in history.result_sections(payload["resultado"]) if secao in LATE_CHARGE_SECTIONS
+    }
+
+# Recebe {"dataPagamento": "2025-07-31", "itens": [...]} (ou "resultado", ou "historicoId")
+# e devolve as linhas com multa, juros e saldo consolidado (total, no DARF) recalculados
+@app.post("/api/atualizacao/debitos")
+async def update_debts_to_date(request: Request):
+    import traceback
+    try:
+        payload = await request.json()
+    except ValueError as e:
+        return JSONResponse(content={"error": f"Corpo inválido: {e}"}, status_code=400)
+    if not isinstance(payload, dict) or not any(chave in payload for chave in ("itens", "resultado", "historicoId")):
+        return JSONResponse(content={"error": "Informe 'itens', 'resultado' ou 'historicoId'."}, status_code=400)
+    try:
+        inicio = time.perf_counter()
+        data_pagamento = datetime.date.fromisoformat(payload.get("dataPagamento") or datetime.date.today().isoformat())
+        projecao_informada = payload.get("selicProjetadaMensal")
+        projecao = float(projecao_informada) / 100 if projecao_informada is not None else None
+        if payload.get("historicoId") is not None:
+            auth_error = check_history_auth(request)
+            if auth_error:
+                return auth_error
+            extracao = await asyncio.to_thread(history.get_extraction, int(payload["historicoId"]))
+            if extracao is None:
+                return JSONResponse(content={"error": "Extração não encontrada no histórico."}, status_code=404)
+            payload = {"resultado": extracao["resultado"]}
+        tabela = await asyncio.to_thread(late_charges.get_table)
+
+        secoes = {}
+        linhas = nao_atualizadas = 0
+        totais = {"principal": 0.0, "multa": 0.0, "juros": 0.0, "total": 0.0}
+        for secao, (itens, campos) in late_charge_sections(payload).items():
+            secoes[secao], ignoradas = late_charges.update_rows(itens, campos, data_pagamento, tabela, projecao)
+            linhas += len(itens)
+            nao_atualizadas += ignoradas
+            for chave, campo in campos.items():
+                totais[chave] += sum(float(linha.get(campo) or 0) for linha in secoes[secao])
+        resposta_final = dict(secoes)
+        resposta_final["atualizacao"] = {
+            "dataPagamento": data_pagamento.isoformat(),
+            "selicAte": tabela.last_month(),
+            "selicProjetadaMensal": projecao_informada,
+            "linhas": linhas,
+            "naoAtualizadas": nao_atualizadas,
+            "totais": {chave: round(valor, 2) for chave, valor in totais.items()},
+        }
+        print(
+            f"Atualização até {data_pagamento}: {linhas} linhas em {(time.perf_counter() - inicio) * 1000:.1f} ms.",
+            file=sys.stdout,
+        )
+        return JSONResponse(content=resposta_final)
+    except late_charges.RateTableUnavailable as e:
+        return JSONResponse(content={"error": str(e)}, status_code=503)
+    except (TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Parâmetros inválidos: {e}"}, status_code=400)
+    except Exception as e:
+        print(f"Erro na atualização dos débitos: {e}\n{traceback.format_exc()}", file=sys.stdout)
+        return JSONResponse(content={"error": f"Erro ao atualizar os débitos: {e}"}, status_code=500)
+
+# --- Perfis de execução (ver app/profiling.py) ---
+def check_profiling_auth(request):
+    if not profiling.get_profiling_token():
+        return JSONResponse(content={"error": "Perfil indisponível: PROFILING_TOKEN não configurado."}, status_code=503)
+    if request.headers.get("X-Profile-Token", "") != profiling.get_profiling_token():
+        return JSONResponse(content={"error": "Não autorizado."}, status_code=401)
+    return None
+
+@app.get("/api/profiling/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    erro = check_profiling_auth(request)
+    if erro:
+        return erro
+    paths = profiling.profile_paths(profile_id)
+    if not paths or not os.path.exists(paths[0]):
+        return JSONResponse(content={"error": "Perfil não encontrado."}, status_code=404)
+    return FileResponse(paths[0], media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+@app.get("/api/profiling/{profile_id}/resumo")
+async def get_profile_summary(profile_id: str, request: Request):
+    erro = check_profiling_auth(request)
+    if erro:
+        return erro
+    paths = profiling.profile_paths(profile_id)
+    if not paths or not os.path.exists(paths[1]):
+        return JSONResponse(content={"error": "Perfil não encontrado."}, status_code=404)
+    with open(paths[1], encoding="utf-8") as f:
+        return JSONResponse(content=json.load(f))
+
 # Configuração para Google Cloud Run
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,221 @@
+import contextvars
+import cProfile
+import functools
+import glob
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Perfil de execução sob demanda: quando PROFILING_TOKEN está configurado e a
+# requisição traz o mesmo valor no cabeçalho X-Profile-Token, a requisição roda sob o
+# cProfile. O perfil (.prof, carregável no snakeviz/pstats/gprof2dot) e um resumo em
+# JSON são gravados em PROFILING_DIR e o id volta no cabeçalho X-Profile-Id.
+# Sem o cabeçalho, o middleware apenas repassa a requisição.
+#
+# O perfil não cobre o event loop (que mistura as outras requisições): só as etapas
+# síncronas da requisição, marcadas com @profiled ou chamadas por profiled_call, no
+# processo em que rodam (o worker, o filho do orçamento de CPU ou o pool da extração
+# paralela). Cada etapa grava um .part com o prefixo do perfil e o middleware junta todos
+# no fim. Um perfil por processo de cada vez (o cProfile não suporta dois ativos): outra
+# requisição com o cabeçalho enquanto isso recebe 429.
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+# As rotas de consulta dos perfis não são perfiladas
+PROFILING_ROUTES_PREFIX = "/api/profiling"
+
+# Funções de interesse no resumo (além das categorias regex e fitz)
+TRACKED_FUNCTION_PREFIXES = ("extract_", "process_", "parse_registro_", "run_section", "walk_section", "preprocess_text")
+TRACKED_FUNCTIONS = {"parse_br_currency", "format_date", "format_periodo"}
+PART_SUFFIX = ".part"
+
+# Prefixo dos arquivos do perfil da requisição em andamento (None fora de um perfil)
+_current_prefix = contextvars.ContextVar("profiling_prefix", default=None)
+_active = threading.local()
+_request_lock = threading.Lock()
+
+
+def get_profiling_token():
+    return os.environ.get("PROFILING_TOKEN", "")
+
+
+def get_profiling_dir():
+    return os.environ.get("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "pdf-processor-profiles"))
+
+
+def profile_paths(profile_id):
+    """Caminhos do .prof e do resumo; None se o id não for válido."""
+    if not PROFILE_ID_PATTERN.match(profile_id or ""):
+        return None
+    base = os.path.join(get_profiling_dir(), profile_id)
+    return base + ".prof", base + ".json"
+
+
+def _function_category(filename, name):
+    if "fitz" in filename or "pymupdf" in filename.lower():
+        return "fitz"
+    if (filename.endswith(os.path.join("re", "__init__.py")) or "_compiler" in filename or "sre_" in filename
+            or "re.Pattern" in name or "re.Match" in name):
+        return "regex"
+    return None
+
+
+def summarize_stats(stats):
+    """Resumo do perfil: tempos acumulados das funções de extração e totais de regex e fitz."""
+    funcoes = []
+    categorias = {"regex": {"chamadas": 0, "tempoS": 0.0}, "fitz": {"chamadas": 0, "tempoS": 0.0}}
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        category = _function_category(filename, name)
+        if category:
+            # Tempo próprio: as funções dessas bibliotecas chamam umas às outras
+            categorias[category]["chamadas"] += calls
+            categorias[category]["tempoS"] += tottime
+        if name in TRACKED_FUNCTIONS or name.startswith(TRACKED_FUNCTION_PREFIXES):
+            funcoes.append({
+                "funcao": name,
+                "arquivo": f"{os.path.basename(filename)}:{line}",
+                "chamadas": calls,
+                "tempoProprioS": round(tottime, 6),
+                "tempoAcumuladoS": round(cumtime, 6),
+            })
+    funcoes.sort(key=lambda item: item["tempoAcumuladoS"], reverse=True)
+    for category in categorias.values():
+        category["tempoS"] = round(category["tempoS"], 6)
+    return {"tempoTotalS": round(stats.total_tt, 6), "funcoes": funcoes, "categorias": categorias}
+
+
+def profiled_call(func, *args, **kwargs):
+    """Executa func sob o cProfile se houver um perfil em andamento no contexto atual."""
+    prefixo = _current_prefix.get()
+    if prefixo is None or getattr(_active, "pid", None) == os.getpid():
+        # Sem perfil, ou etapa dentro de outra já perfilada nesta thread (o pid distingue os
+        # processos bifurcados durante uma etapa, que herdam a marca)
+        return func(*args, **kwargs)
+    herdado = getattr(_active, "profiler", None)
+    if herdado is not None:
+        # Processo bifurcado durante uma etapa perfilada: desliga a cópia herdada do perfil
+        herdado.disable()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Outra ferramenta de perfil ativa no processo: segue sem perfilar esta etapa
+        print(f"Etapa {func.__name__} não perfilada: {e}", file=sys.stdout)
+        return func(*args, **kwargs)
+    _active.pid, _active.profiler = os.getpid(), profiler
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        _active.pid, _active.profiler = None, None
+        profiler.dump_stats(f"{prefixo}-{os.getpid()}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}")
+
+
+def profiled(func):
+    """Decorador das etapas síncronas que entram no perfil da requisição."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return profiled_call(func, *args, **kwargs)
+    return wrapper
+
+
+def _run_profiled_part(prefixo, func, *args):
+    _current_prefix.set(prefixo)
+    return profiled_call(func, *args)
+
+
+def for_pool(func):
+    """func para submeter a um pool de processos, perfilada no processo do pool se houver perfil."""
+    prefixo = _current_prefix.get()
+    return func if prefixo is None else functools.partial(_run_profiled_part, prefixo, func)
+
+
+def save_profile(profile_id, method, path):
+    """Junta as etapas perfiladas em um .prof e grava o resumo; None se nenhuma etapa foi perfilada."""
+    prof_path, summary_path = profile_paths(profile_id)
+    partes = sorted(glob.glob(os.path.join(get_profiling_dir(), f"{profile_id}-*{PART_SUFFIX}")))
+    if not partes:
+        print(f"Nenhuma etapa perfilada em {method} {path}.", file=sys.stdout)
+        return None
+    stats = pstats.Stats(partes[0])
+    if len(partes) > 1:
+        stats.add(*partes[1:])
+    stats.dump_stats(prof_path)
+    for parte in partes:
+        os.remove(parte)
+
+    summary = summarize_stats(stats)
+    summary.update({
+        "id": profile_id, "rota": f"{method} {path}", "etapas": len(partes),
+        "criadoEm": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    })
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"Perfil {profile_id} gravado para {method} {path} ({summary['tempoTotalS']}s).", file=sys.stdout)
+    return profile_id
+
+
+def is_authorized(headers):
+    """Verifica o cabeçalho X-Profile-Token em uma lista de cabeçalhos ASGI."""
+    token = get_profiling_token()
+    if not token:
+        return False
+    for key, value in headers:
+        if key == PROFILE_HEADER:
+            return value.decode("latin-1") == token
+    return False
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: perfila apenas as requisições com o cabeçalho de perfil válido."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope.get("path", "").startswith(PROFILING_ROUTES_PREFIX)
+                or not is_authorized(scope.get("headers", []))):
+            await self.app(scope, receive, send)
+            return
+
+        if not _request_lock.acquire(blocking=False):
+            await self._reject(send)
+            return
+        try:
+            # A resposta é retida até o perfil ser gravado, para devolver o id no cabeçalho
+            messages = []
+
+            async def buffer(message):
+                messages.append(message)
+
+            profile_id = uuid.uuid4().hex
+            os.makedirs(get_profiling_dir(), exist_ok=True)
+            token = _current_prefix.set(os.path.join(get_profiling_dir(), profile_id))
+            try:
+                await self.app(scope, receive, buffer)
+            finally:
+                _current_prefix.reset(token)
+            profile_id = save_profile(profile_id, scope.get("method", ""), scope.get("path", ""))
+        finally:
+            _request_lock.release()
+
+        for message in messages:
+            if message["type"] == "http.response.start" and profile_id:
+                message = dict(message, headers=list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())])
+            await send(message)
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({"error": "Já há uma requisição sendo perfilada neste processo; tente novamente."}).encode("utf-8")
+        await send({
+            "type": "http.response.start", "status": 429,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,455 @@
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+from app import diff
+from app import history
+
+# Reprocessamento em segundo plano das extrações do histórico gravadas por versões
+# anteriores dos extratores (versao_parser < PARSER_VERSION de app/main.py), a partir da
+# fonte guardada em history.fontes. Roda em um processo filho com prioridade baixa
+# (REPROCESS_NICE) e limitado a uma fração do tempo (REPROCESS_DUTY_CYCLE): depois de cada
+# documento, dorme o necessário para que a extração ocupe no máximo essa fração.
+# Um só reprocessamento por histórico: o início é registrado em reprocessamentos dentro
+# de uma transação exclusiva, o que vale também com vários workers do uvicorn. O processo
+# renova atualizado_em a cada documento (e durante as pausas): um job sem sinal por mais de
+# REPROCESS_HEARTBEAT_TIMEOUT segundos é dado como interrompido mesmo que o pid exista
+# (o pid pode ter sido reaproveitado depois de um reinício, ou o processo travou).
+# As extrações cujo resultado mudou ficam em alteracoes_reprocessamento, com o resumo
+# por seção e as linhas adicionadas, removidas e alteradas.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reprocessamentos (
+    id INTEGER PRIMARY KEY,
+    versao INTEGER NOT NULL,
+    iniciado_em TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    terminado_em TEXT,
+    estado TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    processadas INTEGER NOT NULL DEFAULT 0,
+    alteradas INTEGER NOT NULL DEFAULT 0,
+    erros INTEGER NOT NULL DEFAULT 0,
+    linhas_alteradas INTEGER NOT NULL DEFAULT 0,
+    ultimo_erro TEXT,
+    pid INTEGER,
+    parar INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS alteracoes_reprocessamento (
+    reprocessamento_id INTEGER NOT NULL REFERENCES reprocessamentos(id) ON DELETE CASCADE,
+    extracao_id INTEGER NOT NULL,
+    reprocessado_em TEXT NOT NULL,
+    versao_anterior INTEGER NOT NULL,
+    versao_nova INTEGER NOT NULL,
+    linhas_alteradas INTEGER NOT NULL,
+    resumo TEXT NOT NULL,
+    diferenca TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alteracoes_reprocessamento_extracao ON alteracoes_reprocessamento (extracao_id);
+"""
+
+RUNNING = "executando"
+FINISHED = "concluido"
+STOPPED = "parado"
+INTERRUPTED = "interrompido"
+
+BATCH_SIZE = 20
+# Linhas guardadas por seção e por lista na diferença de cada extração (o resumo tem as contagens)
+MAX_DETAIL_ROWS = 200
+
+_schema_ready = set()
+
+
+def get_duty_cycle():
+    return min(max(float(os.environ.get("REPROCESS_DUTY_CYCLE", "0.25")), 0.01), 1.0)
+
+
+def get_nice():
+    return int(os.environ.get("REPROCESS_NICE", "19"))
+
+
+def get_heartbeat_timeout():
+    return max(float(os.environ.get("REPROCESS_HEARTBEAT_TIMEOUT", "900")), 1.0)
+
+
+def connect():
+    conn = history.connect()
+    path = history.get_history_path()
+    if path not in _schema_ready:
+        conn.executescript(SCHEMA)
+        _schema_ready.add(path)
+    return conn
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="milliseconds")
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _close_dead_jobs(conn):
+    """Marca como interrompidos os reprocessamentos cujo processo não existe mais (ex.: reinício)
+    ou que não renovam atualizado_em há mais de REPROCESS_HEARTBEAT_TIMEOUT segundos."""
+    timeout = get_heartbeat_timeout()
+    limite = (datetime.datetime.now() - datetime.timedelta(seconds=timeout)).isoformat(timespec="milliseconds")
+    for row in conn.execute("SELECT id, pid, atualizado_em FROM reprocessamentos WHERE estado = ?", (RUNNING,)).fetchall():
+        erro = None
+        if row["atualizado_em"] < limite:
+            erro = f"sem sinal do processo {row['pid']} desde {row['atualizado_em']} (limite de {timeout:.0f} s)"
+        elif _pid_alive(row["pid"]):
+            continue
+        conn.execute(
+            "UPDATE reprocessamentos SET estado = ?, terminado_em = ?, ultimo_erro = COALESCE(?, ultimo_erro) WHERE id = ?",
+            (INTERRUPTED, _now(), erro, row["id"]),
+        )
+
+
+def _canonical(item):
+    return json.dumps(item, ensure_ascii=False, sort_keys=True)
+
+
+def section_changes(secao, anteriores, atuais):
+    """Linhas adicionadas, removidas e (nas seções com chave em diff.DIFF_KEYS) alteradas."""
+    restantes = defaultdict(deque)
+    for item in anteriores:
+        restantes[_canonical(item)].append(item)
+    adicionados = []
+    for item in atuais:
+        fila = restantes.get(_canonical(item))
+        if fila:
+            fila.popleft()
+        else:
+            adicionados.append(item)
+    removidos = [item for fila in restantes.values() for item in fila]
+
+    alterados = []
+    if secao in diff.DIFF_KEYS and adicionados and removidos:
+        # Removida e adicionada com a mesma chave: a linha é a mesma, com campos diferentes
+        por_chave = defaultdict(deque)
+        for item in removidos:
+            por_chave[diff.row_key(secao, item)].append(item)
+        novos = []
+        for item in adicionados:
+            chave = diff.row_key(secao, item)
+            fila = por_chave.get(chave)
+            if not fila:
+                novos.append(item)
+                continue
+            anterior = fila.popleft()
+            campos = sorted(campo for campo in set(anterior) | set(item) if anterior.get(campo) != item.get(campo))
+            alterados.append({
+                "chave": dict(zip(diff.DIFF_KEYS[secao], chave)), "campos": campos, "antes": anterior, "depois": item,
+            })
+        adicionados = novos
+        removidos = [item for fila in por_chave.values() for item in fila]
+    return {"adicionados": adicionados, "removidos": removidos, "alterados": alterados}
+
+
+def compare_results(anterior, atual):
+    """(resumo, diferença, linhas alteradas) entre o resultado gravado e o reprocessado."""
+    antes = dict(history.result_sections(anterior))
+    depois = dict(history.result_sections(atual))
+    resumo, diferenca = {}, {}
+    linhas = 0
+    for secao in sorted(set(antes) | set(depois)):
+        anteriores, atuais = antes.get(secao, []), depois.get(secao, [])
+        if anteriores == atuais:
+            continue
+        mudancas = section_changes(secao, anteriores, atuais)
+        contagem = {lista: len(itens) for lista, itens in mudancas.items()}
+        if not any(contagem.values()):
+            # Mesmas linhas em outra ordem
+            continue
+        resumo[secao] = dict(contagem, antes=len(anteriores), depois=len(atuais))
+        diferenca[secao] = {lista: itens[:MAX_DETAIL_ROWS] for lista, itens in mudancas.items()}
+        linhas += sum(contagem.values())
+    return resumo, diferenca, linhas
+
+
+def _job_dict(row):
+    job = {
+        "id": row["id"],
+        "versao": row["versao"],
+        "estado": row["estado"],
+        "iniciadoEm": row["iniciado_em"],
+        "atualizadoEm": row["atualizado_em"],
+        "terminadoEm": row["terminado_em"],
+        "total": row["total"],
+        "processadas": row["processadas"],
+        "alteradas": row["alteradas"],
+        "erros": row["erros"],
+        "linhasAlteradas": row["linhas_alteradas"],
+        "ultimoErro": row["ultimo_erro"],
+        "pararSolicitado": bool(row["parar"]),
+    }
+    inicio = datetime.datetime.fromisoformat(row["iniciado_em"])
+    fim = datetime.datetime.fromisoformat(row["terminado_em"] or row["atualizado_em"])
+    segundos = (fim - inicio).total_seconds()
+    feitas = row["processadas"] + row["erros"]
+    job["porMinuto"] = round(feitas / segundos * 60, 1) if segundos > 0 and feitas else None
+    restantes = max(row["total"] - feitas, 0)
+    job["segundosRestantes"] = (
+        round(restantes / (feitas / segundos)) if row["estado"] == RUNNING and job["porMinuto"] else None
+    )
+    return job
+
+
+def claim(versao):
+    """Registra um reprocessamento até a versão `versao`; (id, total) ou None se já houver um em andamento."""
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _close_dead_jobs(conn)
+            if conn.execute("SELECT 1 FROM reprocessamentos WHERE estado = ?", (RUNNING,)).fetchone():
+                conn.rollback()
+                return None
+            total = history.count_outdated(versao)["pendentes"]
+            agora = _now()
+            # pid de quem registrou até o processo do reprocessamento assumir: se ele cair antes,
+            # o job é dado como interrompido
+            job_id = conn.execute(
+                "INSERT INTO reprocessamentos (versao, iniciado_em, atualizado_em, estado, total, pid) VALUES (?, ?, ?, ?, ?, ?)",
+                (versao, agora, agora, RUNNING, total, os.getpid()),
+            ).lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.close()
+    return job_id, total
+
+
+def start(versao):
+    """Inicia o reprocessamento em um processo filho; retorna o job ou None se já houver um em andamento."""
+    registro = claim(versao)
+    if registro is None:
+        return None
+    job_id, total = registro
+    ctx = multiprocessing.get_context("fork")
+    # Filho daemon: não segura o desligamento do servidor (o reprocessamento recomeça de onde parou)
+    process = ctx.Process(target=run, args=(job_id, versao), daemon=True)
+    try:
+        process.start()
+    except Exception as e:
+        _finish(job_id, INTERRUPTED, f"{type(e).__name__}: {e}")
+        raise
+    _update(job_id, "pid = ?", (process.pid,))
+    # Recolhe o filho quando terminar, sem deixar processo zumbi
+    threading.Thread(target=process.join, daemon=True).start()
+    print(f"Reprocessamento {job_id} iniciado (versão {versao}, {total} extrações, pid {process.pid}).", file=sys.stdout)
+    return get_job(job_id)
+
+
+def _update(job_id, campos, params):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(f"UPDATE reprocessamentos SET {campos}, atualizado_em = ? WHERE id = ?", (*params, _now(), job_id))
+    finally:
+        conn.close()
+
+
+def _heartbeat(job_id):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("UPDATE reprocessamentos SET atualizado_em = ? WHERE id = ?", (_now(), job_id))
+    finally:
+        conn.close()
+
+
+def _finish(job_id, estado, erro=None):
+    # Só um job ainda em andamento: um já dado como interrompido (sem sinal) fica assim
+    agora = _now()
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE reprocessamentos SET estado = ?, terminado_em = ?, ultimo_erro = COALESCE(?, ultimo_erro), "
+                "atualizado_em = ? WHERE id = ? AND estado = ?",
+                (estado, agora, erro, agora, job_id, RUNNING),
+            )
+    finally:
+        conn.close()
+
+
+def _stop_requested(job_id):
+    """Parada pedida ou job que deixou de estar em andamento (ex.: interrompido por falta de sinal)."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT parar, estado FROM reprocessamentos WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return row is None or bool(row["parar"]) or row["estado"] != RUNNING
+
+
+def _pause(job_id, segundos):
+    """Pausa entre documentos, renovando atualizado_em para o job não parecer parado."""
+    intervalo = get_heartbeat_timeout() / 3
+    while segundos > 0:
+        time.sleep(min(segundos, intervalo))
+        segundos -= intervalo
+        if segundos > 0:
+            _heartbeat(job_id)
+
+
+def _record_change(job_id, extracao, versao, resumo, diferenca, linhas):
+    conn = connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO alteracoes_reprocessamento VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, extracao["id"], _now(), extracao["versao_parser"], versao, linhas,
+                 json.dumps(resumo, ensure_ascii=False), json.dumps(diferenca, ensure_ascii=False)),
+            )
+            conn.execute(
+                "UPDATE reprocessamentos SET processadas = processadas + 1, alteradas = alteradas + 1, "
+                "linhas_alteradas = linhas_alteradas + ?, atualizado_em = ? WHERE id = ?",
+                (linhas, _now(), job_id),
+            )
+    finally:
+        conn.close()
+
+
+def reprocess_extraction(extractor, job_id, extracao, versao):
+    """Refaz uma extração a partir da fonte e grava o novo resultado; True se o resultado mudou."""
+    tipo_fonte, conteudo = history.load_source(extracao["id"])
+    anterior = history.get_extraction(extracao["id"])
+    with extractor.quiet_parser():
+        resultado = extractor.reextract_source(tipo_fonte, conteudo, extracao["tipo_documento"])
+    resumo, diferenca, linhas = compare_results(anterior["resultado"], resultado)
+    if not resumo:
+        history.set_parser_version(extracao["id"], versao)
+        _update(job_id, "processadas = processadas + 1", ())
+        return False
+    history.replace_result(extracao["id"], resultado, versao)
+    _record_change(job_id, extracao, versao, resumo, diferenca, linhas)
+    return True
+
+
+def process_pending(job_id, versao, extractor, duty_cycle=1.0):
+    """Percorre as extrações desatualizadas em ordem de id; retorna o estado final do job."""
+    ultimo_id = 0
+    while True:
+        lote = history.outdated_extractions(versao, ultimo_id, BATCH_SIZE)
+        if not lote:
+            return FINISHED
+        for extracao in lote:
+            if _stop_requested(job_id):
+                return STOPPED
+            # Uma extração com erro fica para trás nesta rodada (continua na versão antiga)
+            ultimo_id = extracao["id"]
+            inicio = time.perf_counter()
+            try:
+                reprocess_extraction(extractor, job_id, extracao, versao)
+            except Exception as e:
+                erro = f"extração {extracao['id']}: {type(e).__name__}: {e}"
+                print(f"Erro no reprocessamento da {erro}", file=sys.stdout)
+                _update(job_id, "erros = erros + 1, ultimo_erro = ?", (erro[:500],))
+            duracao = time.perf_counter() - inicio
+            if duty_cycle < 1:
+                _pause(job_id, duracao * (1 - duty_cycle) / duty_cycle)
+
+
+def run(job_id, versao):
+    """Corpo do processo filho: prioridade baixa, um worker de extração e logs do parser descartados."""
+    try:
+        os.nice(get_nice())
+    except OSError:
+        pass
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    try:
+        _update(job_id, "pid = ?", (os.getpid(),))
+        # Importado aqui: app.main importa este módulo
+        from app import main as extractor
+
+        estado = process_pending(job_id, versao, extractor, get_duty_cycle())
+        _finish(job_id, estado)
+        job = get_job(job_id)
+        print(
+            f"Reprocessamento {job_id} {job['estado']}: {job['processadas']} extrações, {job['alteradas']} alteradas, "
+            f"{job['erros']} erros.",
+            file=sys.stdout,
+        )
+    except Exception as e:
+        print(f"Erro no reprocessamento {job_id}: {e}", file=sys.stdout)
+        _finish(job_id, INTERRUPTED, f"{type(e).__name__}: {e}")
+
+
+def get_job(job_id=None):
+    """Um reprocessamento (o mais recente se job_id for None), com vazão e tempo restante."""
+    conn = connect()
+    try:
+        _close_dead_jobs(conn)
+        conn.commit()
+        if job_id is None:
+            row = conn.execute("SELECT * FROM reprocessamentos ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = conn.execute("SELECT * FROM reprocessamentos WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _job_dict(row) if row else None
+
+
+def request_stop():
+    """Pede a parada do reprocessamento em andamento (vale antes do próximo documento)."""
+    conn = connect()
+    try:
+        with conn:
+            row = conn.execute(
+                "SELECT id FROM reprocessamentos WHERE estado = ? ORDER BY id DESC LIMIT 1", (RUNNING,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE reprocessamentos SET parar = 1 WHERE id = ?", (row["id"],))
+    finally:
+        conn.close()
+    return get_job(row["id"])
+
+
+def list_changes(reprocessamento_id=None, extracao_id=None, depois_de=0, limite=50):
+    """Extrações alteradas pelos reprocessamentos, em ordem de gravação, com a diferença."""
+    filtros, params = ["rowid > ?"], [depois_de]
+    for coluna, valor in (("reprocessamento_id", reprocessamento_id), ("extracao_id", extracao_id)):
+        if valor:
+            filtros.append(f"{coluna} = ?")
+            params.append(valor)
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT rowid, * FROM alteracoes_reprocessamento WHERE {' AND '.join(filtros)} ORDER BY rowid LIMIT ?",
+            (*params, limite),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            "cursor": row["rowid"],
+            "reprocessamentoId": row["reprocessamento_id"],
+            "extracaoId": row["extracao_id"],
+            "reprocessadoEm": row["reprocessado_em"],
+            "versaoAnterior": row["versao_anterior"],
+            "versaoNova": row["versao_nova"],
+            "linhasAlteradas": row["linhas_alteradas"],
+            "resumo": json.loads(row["resumo"]),
+            "diferenca": json.loads(row["diferenca"]),
+        }
+        for row in rows
+    ]
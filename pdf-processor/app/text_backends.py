@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+
+import fitz  # PyMuPDF
+
+# Backends de extração de texto por página. Todos devolvem o texto da página no formato
+# de page.get_text() (uma linha por linha do PDF, terminada em "\n"), mas usam modos e
+# flags diferentes do PyMuPDF, com custos diferentes. O backend de cada layout (Situação
+# Fiscal, DARF) vem de text_backends.json, gravado por tools/bench_text_backends.py: o
+# mais rápido entre os que dão exatamente o mesmo resultado de extração no corpus.
+# TEXT_BACKEND (todos os tipos) ou TEXT_BACKEND_SITUACAO_FISCAL / TEXT_BACKEND_DARF
+# forçam a escolha.
+
+DEFAULT_BACKEND = "texto"
+SELECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "text_backends.json")
+
+
+def _texto(page):
+    return page.get_text()
+
+
+def _texto_sem_ligaduras(page):
+    return page.get_text("text", flags=fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP)
+
+
+def _texto_minimo(page):
+    return page.get_text("text", flags=fitz.TEXT_MEDIABOX_CLIP)
+
+
+def _texto_ordenado(page):
+    return page.get_text(sort=True)
+
+
+def _blocos(page):
+    # Só blocos de texto (tipo 0); cada bloco já termina em "\n"
+    return "".join(bloco[4] for bloco in page.get_text("blocks") if bloco[6] == 0)
+
+
+def _palavras(page):
+    linhas = {}
+    for palavra in page.get_text("words"):
+        linhas.setdefault((palavra[5], palavra[6]), []).append(palavra[4])
+    return "".join(" ".join(palavras) + "\n" for palavras in linhas.values())
+
+
+def _spans(page):
+    linhas = []
+    for bloco in page.get_text("dict")["blocks"]:
+        for linha in bloco.get("lines", []):
+            linhas.append("".join(span["text"] for span in linha["spans"]) + "\n")
+    return "".join(linhas)
+
+
+def _caracteres(page):
+    linhas = []
+    for bloco in page.get_text("rawdict")["blocks"]:
+        for linha in bloco.get("lines", []):
+            linhas.append("".join(char["c"] for span in linha["spans"] for char in span["chars"]) + "\n")
+    return "".join(linhas)
+
+
+BACKENDS = {
+    "texto": _texto,
+    "texto_sem_ligaduras": _texto_sem_ligaduras,
+    "texto_minimo": _texto_minimo,
+    "texto_ordenado": _texto_ordenado,
+    "blocos": _blocos,
+    "palavras": _palavras,
+    "spans": _spans,
+    "caracteres": _caracteres,
+}
+
+_selection = None
+
+
+def load_selection():
+    """Backend por tipo de documento gravado pelo benchmark ({} se o arquivo não existir)."""
+    global _selection
+    if _selection is None:
+        try:
+            with open(SELECTION_PATH, encoding="utf-8") as f:
+                _selection = json.load(f).get("selecao", {})
+        except (OSError, ValueError) as e:
+            print(f"Seleção de backends de texto indisponível ({e}); usando '{DEFAULT_BACKEND}'.", file=sys.stdout)
+            _selection = {}
+    return _selection
+
+
+def select_backend(doc_type):
+    """Nome do backend para o tipo de documento (None: ainda não classificado)."""
+    nome = os.environ.get("TEXT_BACKEND", "")
+    if not nome and doc_type:
+        nome = os.environ.get(f"TEXT_BACKEND_{doc_type.upper()}", "") or load_selection().get(doc_type, "")
+    if nome and nome not in BACKENDS:
+        print(f"Backend de texto desconhecido '{nome}'; usando '{DEFAULT_BACKEND}'.", file=sys.stdout)
+        nome = ""
+    return nome or DEFAULT_BACKEND
+
+
+def page_text(page, backend):
+    return BACKENDS[backend](page)
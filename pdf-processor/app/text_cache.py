@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Cache em memória do texto pré-processado de uma extração, para que uma chamada
+# seguinte continue o trabalho sem reenviar nem reabrir o PDF (ex.: seções que ficaram
+# de fora de uma resposta parcial). O cache é do processo: com mais de um worker do
+# uvicorn ou mais de uma instância, a continuação pode cair em outro processo e não achar
+# a entrada (ver README_DEPLOY.md). As entradas expiram após TEXT_CACHE_TTL_SECONDS e o
+# total é limitado a TEXT_CACHE_MAX_ENTRIES, descartando as mais antigas.
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_max_entries():
+    return int(os.environ.get("TEXT_CACHE_MAX_ENTRIES", "32"))
+
+
+def get_ttl_seconds():
+    return int(os.environ.get("TEXT_CACHE_TTL_SECONDS", "600"))
+
+
+def _purge(now):
+    ttl = get_ttl_seconds()
+    while _entries:
+        entry_id, entry = next(iter(_entries.items()))
+        if now - entry["criadoEm"] <= ttl and len(_entries) <= get_max_entries():
+            break
+        del _entries[entry_id]
+
+
+def put(text, **metadados):
+    """Guarda o texto e retorna o id da entrada."""
+    entry_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with _lock:
+        _entries[entry_id] = dict(metadados, texto=text, criadoEm=now)
+        _purge(now)
+    return entry_id
+
+
+def get(entry_id):
+    """Retorna a entrada (texto e metadados) ou None se não existir ou tiver expirado."""
+    with _lock:
+        _purge(time.monotonic())
+        entry = _entries.get(entry_id)
+        return dict(entry) if entry else None
+
+
+def update(entry_id, **metadados):
+    with _lock:
+        if entry_id in _entries:
+            _entries[entry_id].update(metadados)
+
+
+def discard(entry_id):
+    with _lock:
+        _entries.pop(entry_id, None)
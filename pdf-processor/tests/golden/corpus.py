@@ -0,0 +1,379 @@
+"""Corpus de regressão: PDFs sintéticos de Situação Fiscal e DARF com a saída esperada.
+
+Cada documento em tests/golden/pdfs tem o JSON esperado em tests/golden/esperado e um
+orçamento de tempo e de memória de pico em tests/golden/orcamentos.json, verificados por
+tests/test_golden_corpus.py.
+
+Uso (a partir de pdf-processor/):
+    python -m tests.golden.corpus               # regrava os JSON esperados
+    python -m tests.golden.corpus --pdfs        # regera também os PDFs sintéticos
+    python -m tests.golden.corpus --orcamentos  # mede de novo os orçamentos nesta máquina
+
+Regravar os esperados só deve acontecer quando uma mudança de saída for intencional:
+o diff dos JSON mostra exatamente o que mudou.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import fitz  # PyMuPDF
+
+from app import main as extractor
+
+GOLDEN_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(GOLDEN_DIR, "pdfs")
+EXPECTED_DIR = os.path.join(GOLDEN_DIR, "esperado")
+BUDGETS_PATH = os.path.join(GOLDEN_DIR, "orcamentos.json")
+
+# Execuções cronometradas por documento: vale a mais rápida
+TIMED_RUNS = 3
+# Execuções da carga de calibração e a chave em que o tempo dela é gravado nos orçamentos
+CALIBRATION_RUNS = 5
+CALIBRATION_KEY = "calibracaoMs"
+
+RECEITAS = ["2172-01 - COFINS", "8109-02 - PIS", "2089-01 - IRPJ", "2372-01 - CSLL", "1082-01 - CP-SEGUR.", "0561-07 - IRRF"]
+DENOMINACOES_DARF = ["COFINS", "PIS", "IRPJ - LUCRO PRESUMIDO", "CSLL", "CP SEGURADOS", "IRRF - TRABALHO ASSALARIADO"]
+
+
+# --- Geração dos documentos sintéticos ---
+def _cnpj(r):
+    return f"{r.randint(10, 99)}.{r.randint(100, 999)}.{r.randint(100, 999)}/{r.randint(1, 9999):04d}-{r.randint(10, 99)}"
+
+
+def _money(r, maximo=9_000_000):
+    valor = f"{r.randint(1, maximo) / 100:,.2f}"
+    return valor.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _data(r):
+    return f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/{r.randint(2018, 2025)}"
+
+
+def _mes(r):
+    return f"{r.randint(1, 12):02d}/{r.randint(2018, 2024)}"
+
+
+def _registro_sief(r, out, simples, trimestral):
+    tipo = r.random()
+    if tipo < 0.55:
+        out.append(r.choice(RECEITAS))
+        if r.random() < trimestral:
+            # PA trimestral quebrado em duas linhas ("1º" / "TRIM/2023")
+            out += [f"{r.randint(1, 4)}º", f"TRIM/{r.randint(2018, 2024)}"]
+        else:
+            out.append(_mes(r))
+        out.append(_data(r))
+        out.extend(_money(r) for _ in range(5))
+        out.append(r.choice(["DEVEDOR", "A VENCER", "EM COBRANÇA"]))
+        if r.random() < 0.1:
+            out.append("Notificação de Lançamento")
+    elif tipo < 0.55 + simples:
+        if r.random() < 0.5:
+            out += ["SIMPLES NAC.", _mes(r), _data(r)] + [_money(r) for _ in range(5)] + ["DEVEDOR"]
+        else:
+            valores = " ".join(_money(r) for _ in range(5))
+            out.append(f"SIMPLES NAC. {_mes(r)} {_data(r)} {valores} DEVEDOR")
+    elif tipo < 0.9:
+        # Continuação da receita anterior em uma única linha
+        valores = " ".join(_money(r) for _ in range(5))
+        out.append(f"{_mes(r)} {_data(r)} {valores} DEVEDOR")
+    else:
+        # Registro truncado: só receita e um valor
+        out += [r.choice(RECEITAS), _money(r)]
+
+
+def situacao_fiscal_text(seed, n_cnpj, por_cnpj, simples=0.2, trimestral=0.15):
+    r = random.Random(seed)
+    cnpjs = [_cnpj(r) for _ in range(n_cnpj)]
+    out = [
+        "MINISTÉRIO DA FAZENDA", "SECRETARIA ESPECIAL DA RECEITA FEDERAL DO BRASIL",
+        "INFORMAÇÕES DE APOIO PARA EMISSÃO DE CERTIDÃO", "Por meio do e-CAC - CNPJ do certificado: 00.000.000/0001-00",
+        "Emitido em: 12/05/2025 10:11:12", "",
+        "Diagnóstico Fiscal na Receita Federal e Procuradoria-Geral da Fazenda Nacional",
+        "Pendência - Débito (SIEF)", "",
+    ]
+    for cnpj in cnpjs:
+        out += [f"CNPJ: {cnpj}", "Receita PA/Exerc. Dt. Vcto Vl. Original Sdo. Devedor Multa Juros Sdo. Dev. Cons. Situação"]
+        for _ in range(por_cnpj):
+            _registro_sief(r, out, simples, trimestral)
+        out.append("")
+
+    out += ["Débito com Exigibilidade Suspensa (SIEF)", ""]
+    for cnpj in cnpjs[:2]:
+        out += [f"CNPJ: {cnpj}", "Receita PA/Exerc. Dt. Vcto Vl.Original Sdo.Devedor Situação"]
+        for _ in range(3):
+            if r.random() < 0.4:
+                out.append(f"CNO: {r.randint(10, 99)}.{r.randint(100, 999)}.{r.randint(10000, 99999)}/{r.randint(10, 99)}")
+            out += [r.choice(RECEITAS), _mes(r), _data(r)]
+            out.extend(_money(r) for _ in range(r.choice([2, 3, 4, 5])))
+            out += ["SUSPENSO - JUDICIAL", ""]
+
+    out += ["Parcelamento com Exigibilidade Suspensa (SIEFPAR)", ""]
+    for cnpj in cnpjs:
+        out.append(f"CNPJ: {cnpj}")
+        for _ in range(2):
+            out += [
+                f"Parcelamento: {r.randint(10**9, 10**10)}", f"Valor Suspenso: {_money(r)}",
+                r.choice(["Modalidade: PERT-DEMAIS DÉBITOS", "PARCELAMENTO SIMPLIFICADO"]),
+            ]
+
+    out += [
+        "", "Diagnóstico Fiscal na Procuradoria-Geral da Fazenda Nacional", "",
+        "Pendência - Inscrição (SIDA)", "", "Inscrição com Exigibilidade Suspensa (SIDA)", "",
+        f"CNPJ: {cnpjs[0]}", "Inscrição", "Receita", "Inscrito em", "Ajuizado em", "Processo", "Tipo de Devedor",
+    ]
+    for _ in range(4):
+        inscricao = f"{r.randint(10, 99)}.{r.randint(1, 9)}.{r.randint(10, 99)}.{r.randint(100000, 999999)}-{r.randint(10, 99)}"
+        tipo = r.choice(["DEVEDOR PRINCIPAL", "CORRESPONSÁVEL"])
+        ajuizado = r.choice(["-", "10/10/2020"])
+        out.append(f"{inscricao} 1234-IRPJ - LUCRO REAL {r.randint(1, 28):02d}/{r.randint(1, 12):02d}/2019 {ajuizado} {tipo}")
+        out += [f"10880.{r.randint(100000, 999999)}/2019-{r.randint(10, 99)}", "Situação: ATIVA AJUIZADA COM GARANTIA"]
+        if tipo == "CORRESPONSÁVEL":
+            out.append("Devedor Principal: EMPRESA X LTDA")
+
+    out += ["", "Pendência - Parcelamento (SISPAR)", "", f"CNPJ: {cnpjs[0]}", "Conta"]
+    for _ in range(3):
+        out += [str(r.randint(100000, 9999999)), "PARCELAMENTO PGFN", "Modalidade: TRANSAÇÃO EXCEPCIONAL"]
+    out += ["", "Parcelamento com Exigibilidade Suspensa (SISPAR)", "", "Final do Relatório", ""]
+    return "\n".join(out)
+
+
+def text_pdf(text, linhas_por_pagina=60):
+    """PDF com uma linha de texto por linha do relatório (fluxo do texto extraído do e-CAC)."""
+    doc = fitz.open()
+    linhas = text.split("\n")
+    for inicio in range(0, len(linhas), linhas_por_pagina):
+        page = doc.new_page()
+        # Uma única chamada por página (um fluxo de conteúdo só): 12 pt entre linhas
+        page.insert_text((30, 40), "\n".join(linhas[inicio:inicio + linhas_por_pagina]), fontsize=8, lineheight=1.5)
+    dados = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return dados
+
+
+def darf_items(seed, n):
+    r = random.Random(seed)
+    itens = []
+    for _ in range(n):
+        mes, ano = r.randint(1, 12), r.randint(2018, 2024)
+        periodo = r.choice([f"{mes:02d}/{ano}", f"{r.randint(1, 28):02d}/{mes:02d}/{ano}"])
+        valores = [_money(r, 200_000_000) for _ in range(4)]
+        if r.random() < 0.2:
+            valores[1] = "0,00"
+        itens.append((str(r.randint(1000, 9999)), r.choice(DENOMINACOES_DARF), valores, periodo, f"20/{mes:02d}/{ano}"))
+    return itens
+
+
+DARF_COLUMNS = [("Código", 40), ("Denominação", 90), ("Principal", 300), ("Multa", 370), ("Juros", 440), ("Total", 510)]
+
+
+def darf_table_pdf(itens, por_pagina=12, cabecalho_por_pagina=True):
+    """DARF com a tabela de composição em colunas, valores alinhados à direita."""
+    doc = fitz.open()
+    for inicio in range(0, len(itens), por_pagina):
+        page = doc.new_page()
+        y = 50
+        if inicio == 0:
+            page.insert_text((40, y), "Documento de Arrecadação de Receitas Federais", fontsize=10)
+            page.insert_text((40, y + 20), "Composição do Documento de Arrecadação", fontsize=9)
+            y += 36
+        if cabecalho_por_pagina or inicio == 0:
+            for nome, x in DARF_COLUMNS:
+                page.insert_text((x, y), nome, fontsize=8)
+            y += 14
+        for codigo, denominacao, valores, periodo, vencimento in itens[inicio:inicio + por_pagina]:
+            page.insert_text((40, y), codigo, fontsize=8)
+            page.insert_text((90, y), denominacao, fontsize=8)
+            for (_, x), valor in zip(DARF_COLUMNS[2:], valores):
+                page.insert_text((x + 45 - fitz.get_text_length(valor, fontsize=8), y), valor, fontsize=8)
+            page.insert_text((90, y + 11), f"{denominacao} - DESCRIÇÃO COMPLETA DA RECEITA", fontsize=7)
+            page.insert_text((90, y + 21), f"PA {periodo} Vencimento {vencimento}", fontsize=7)
+            y += 35
+        if inicio + por_pagina >= len(itens):
+            page.insert_text((40, y + 10), "Total do Documento", fontsize=8)
+    dados = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return dados
+
+
+def darf_text(seed, n):
+    """DARF no fluxo de texto: código sozinho na linha ou código, denominação e valores juntos."""
+    out = [
+        "Documento de Arrecadação de Receitas Federais", "Composição do Documento de Arrecadação",
+        "Código Denominação Principal Multa Juros Total",
+    ]
+    for posicao, (codigo, denominacao, valores, periodo, vencimento) in enumerate(darf_items(seed, n)):
+        if posicao % 2:
+            out += [codigo, denominacao] + valores
+        else:
+            out.append(f"{codigo} {denominacao} {' '.join(valores)}")
+        out += [f"{denominacao} - DESCRIÇÃO COMPLETA", f"PA {periodo} Vencimento {vencimento}"]
+    out.append("Total do Documento")
+    return "\n".join(out) + "\n"
+
+
+# Semente e quantidade de itens de cada DARF sintético: os itens gerados são a referência
+# contra a qual o JSON esperado é conferido (ver expected_darf_items)
+DARF_ITEMS = {
+    "darf_tabela": (5, 6),
+    "darf_multipagina": (6, 40),
+    "darf_texto": (7, 8),
+}
+
+DOCUMENTS = {
+    "sf_pequeno": lambda: text_pdf(situacao_fiscal_text(1, n_cnpj=1, por_cnpj=6)),
+    "sf_filiais": lambda: text_pdf(situacao_fiscal_text(2, n_cnpj=5, por_cnpj=12)),
+    "sf_simples_trimestral": lambda: text_pdf(situacao_fiscal_text(3, n_cnpj=3, por_cnpj=20, simples=0.3, trimestral=0.5)),
+    "sf_grande": lambda: text_pdf(situacao_fiscal_text(4, n_cnpj=30, por_cnpj=40)),
+    "darf_tabela": lambda: darf_table_pdf(darf_items(*DARF_ITEMS["darf_tabela"])),
+    "darf_multipagina": lambda: darf_table_pdf(darf_items(*DARF_ITEMS["darf_multipagina"]), cabecalho_por_pagina=False),
+    "darf_texto": lambda: text_pdf(darf_text(*DARF_ITEMS["darf_texto"])),
+}
+
+
+def _valor(texto):
+    return float(texto.replace(".", "").replace(",", "."))
+
+
+def expected_darf_items(nome):
+    """Itens que o DARF sintético contém, no formato da resposta (independente do parser)."""
+    return [
+        {"codigo": codigo, "denominacao": denominacao, "periodo_apuracao": periodo, "vencimento": vencimento,
+         **{coluna: _valor(valor) for coluna, valor in zip(["principal", "multa", "juros", "total"], valores)}}
+        for codigo, denominacao, valores, periodo, vencimento in darf_items(*DARF_ITEMS[nome])
+    ]
+
+
+def darf_mismatches(nome, resultado):
+    """Posições em que a extração do DARF difere dos itens gerados (lista vazia se igual)."""
+    esperado = expected_darf_items(nome)
+    extraido = resultado["data"]
+    diferencas = [posicao for posicao, (item, referencia) in enumerate(zip(extraido, esperado)) if item != referencia]
+    if len(extraido) != len(esperado):
+        diferencas.append(min(len(extraido), len(esperado)))
+    return diferencas
+
+
+# --- Extração e medição ---
+def extract_document(pdf_bytes):
+    """Mesma cadeia do /extract-auto: classificação, texto, pré-processamento e extrator."""
+    doc_type, extracted_text = extractor.extract_pdf_text_classified(pdf_bytes)
+    cleaned_text = extractor.preprocess_text(extracted_text)
+    if doc_type == extractor.DOC_TYPE_DARF:
+        resultado = extractor.process_darf_pdf(pdf_bytes, cleaned_text)
+    else:
+        resultado = extractor.process_situacao_fiscal_text(cleaned_text)
+    resultado["tipoDocumento"] = doc_type
+    return resultado
+
+
+def serialize(resultado):
+    return json.dumps(resultado, ensure_ascii=False, indent=2) + "\n"
+
+
+def calibration_ms():
+    """Melhor tempo de uma carga fixa em Python puro (regex, divisão de linhas e json).
+
+    Não usa o código da aplicação: mede só a velocidade da máquina, para que os
+    orçamentos de tempo gravados em uma máquina valham em outra (ver budget_scale).
+    """
+    linhas = "\n".join(f"{i % 9000 + 1000}-01 - RECEITA {i}  {i % 12 + 1:02d}/2024  20/02/2024  1.234,{i % 100:02d}"
+                       for i in range(20000))
+    padrao = re.compile(r"(\d{4}-\d{2})\s+-\s+(.*?)\s+(\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})\s+([\d.,]+)$")
+    tempos = []
+    for _ in range(CALIBRATION_RUNS):
+        inicio = time.perf_counter()
+        itens = [match.groups() for match in map(padrao.match, linhas.split("\n")) if match]
+        json.dumps(itens, ensure_ascii=False)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
+
+
+def budget_scale(orcamentos, calibracao_ms):
+    """Fator entre a máquina atual e a dos orçamentos (1.0 se não houver calibração gravada)."""
+    gravada = orcamentos.get(CALIBRATION_KEY)
+    return calibracao_ms / gravada if gravada else 1.0
+
+
+def measure(pdf_bytes):
+    """Retorna (saída serializada, melhor tempo em ms, pico de memória Python em KiB)."""
+    # Os logs por linha são descartados: medem o terminal, não o parser
+    with extractor.quiet_parser():
+        tempos = []
+        for _ in range(TIMED_RUNS):
+            inicio = time.perf_counter()
+            saida = serialize(extract_document(pdf_bytes))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        # Memória medida em uma execução separada: o tracemalloc deixa a extração mais lenta
+        tracemalloc.start()
+        try:
+            extract_document(pdf_bytes)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return saida, min(tempos), pico / 1024
+
+
+def pdf_path(nome):
+    return os.path.join(PDF_DIR, f"{nome}.pdf")
+
+
+def expected_path(nome):
+    return os.path.join(EXPECTED_DIR, f"{nome}.json")
+
+
+def load_budgets():
+    with open(BUDGETS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regrava o corpus de regressão (PDFs, JSON esperado, orçamentos).")
+    parser.add_argument("--pdfs", action="store_true", help="regera os PDFs sintéticos")
+    parser.add_argument("--orcamentos", action="store_true", help="mede de novo os orçamentos de tempo e memória")
+    args = parser.parse_args()
+
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    os.makedirs(PDF_DIR, exist_ok=True)
+    os.makedirs(EXPECTED_DIR, exist_ok=True)
+    orcamentos = load_budgets() if os.path.exists(BUDGETS_PATH) else {}
+    calibracao_ms = calibration_ms()
+    if args.orcamentos or CALIBRATION_KEY not in orcamentos:
+        orcamentos = {CALIBRATION_KEY: round(calibracao_ms, 1)}
+    # Documentos medidos agora entram convertidos para a máquina da calibração gravada
+    escala = budget_scale(orcamentos, calibracao_ms)
+    divergentes = []
+    for nome, gerar in DOCUMENTS.items():
+        if args.pdfs or not os.path.exists(pdf_path(nome)):
+            with open(pdf_path(nome), "wb") as f:
+                f.write(gerar())
+        with open(pdf_path(nome), "rb") as f:
+            pdf_bytes = f.read()
+        saida, tempo_ms, memoria_kb = measure(pdf_bytes)
+        if nome in DARF_ITEMS and darf_mismatches(nome, json.loads(saida)):
+            # Um esperado errado seria travado pelo teste: não é gravado
+            divergentes.append(nome)
+            print(f"{nome}: saída difere dos itens gerados nas posições {darf_mismatches(nome, json.loads(saida))}; "
+                  "esperado não regravado", file=sys.stderr)
+            continue
+        with open(expected_path(nome), "w", encoding="utf-8") as f:
+            f.write(saida)
+        if nome not in orcamentos:
+            orcamentos[nome] = {"tempoMs": round(tempo_ms / escala, 1), "memoriaPicoKb": round(memoria_kb)}
+        print(f"{nome}: {tempo_ms:.1f} ms, pico {memoria_kb:.0f} KiB", file=sys.stderr)
+
+    with open(BUDGETS_PATH, "w", encoding="utf-8") as f:
+        json.dump(orcamentos, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    if divergentes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Agregados por seção (?agregados=true): totais, por CNPJ, por receita e por situação iguais à soma dos itens."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import aggregation
+from app import main
+from tests.golden import corpus
+from tests.test_auto_detect import pdf_de_texto
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+
+def test_totais_e_grupos_de_uma_secao():
+    itens = [
+        {"cnpj": "1", "receita": "2172-01 - COFINS", "situacao": "DEVEDOR", "saldo_devedor": 10.1, "multa": "2,00"},
+        {"cnpj": "1", "receita": "2172-01 - COFINS (outra linha)", "situacao": "A VENCER", "saldo_devedor": 0.2},
+        {"cnpj": "2", "receita": "SIMPLES NAC.", "situacao": "DEVEDOR", "saldo_devedor": None},
+    ]
+    agregado = aggregation.aggregate_section(itens)
+    # Valores que não são número (ou None) contam como zero
+    assert agregado["total"] == {"saldo_devedor": 10.3, "multa": 0.0, "itens": 3}
+    assert [(grupo["cnpj"], grupo["itens"], grupo["saldo_devedor"]) for grupo in agregado["porCnpj"]] == [("1", 2, 10.3), ("2", 1, 0.0)]
+    # Receita agrupada pelo código; sem código, pelo texto
+    assert [(grupo["receita"], grupo["itens"]) for grupo in agregado["porReceita"]] == [("2172-01", 2), ("SIMPLES NAC.", 1)]
+    assert {grupo["situacao"]: grupo["itens"] for grupo in agregado["porSituacao"]} == {"A VENCER": 1, "DEVEDOR": 2}
+
+
+def test_secoes_sem_valores_ficam_de_fora():
+    darf = {"data": [{"codigo": "8704", "principal": 10.0, "total": 11.5}], "tipoDocumento": "darf", "secoesPuladas": ["x"]}
+    assert aggregation.aggregate_section([]) is None
+    assert aggregation.aggregate_section([{"cnpj": "1", "processo": "10880.000"}]) is None
+    agregados = aggregation.compute_aggregates({**darf, "processosFiscais": [{"processo": "1"}]})
+    assert list(agregados) == ["data"]
+    assert agregados["data"]["porReceita"] == [{"codigo": "8704", "principal": 10.0, "total": 11.5, "itens": 1}]
+
+
+def _confere_com_os_itens(resultado, agregados):
+    secoes_com_valores = [
+        secao for secao, itens in resultado.items()
+        if isinstance(itens, list) and any(campo in item for item in itens for campo in aggregation.MONEY_FIELDS)
+    ]
+    assert sorted(agregados) == sorted(secoes_com_valores)
+    for secao, agregado in agregados.items():
+        itens = resultado[secao]
+        assert agregado["total"]["itens"] == len(itens)
+        for campo in aggregation.MONEY_FIELDS:
+            if campo in agregado["total"]:
+                assert agregado["total"][campo] == pytest.approx(round(sum(item.get(campo) or 0 for item in itens), 2), abs=0.005)
+        for grupo in ("porCnpj", "porReceita", "porSituacao"):
+            if grupo in agregado:
+                assert sum(linha["itens"] for linha in agregado[grupo]) == len(itens)
+
+
+def test_agregados_so_quando_pedidos(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    pdf = pdf_de_texto(relatorio_multi_cnpj(2, n_cnpj=4, por_cnpj=6))
+    cliente = TestClient(main.app)
+    sem = cliente.post("/api/extraction/extract", files={"file": ("sf.pdf", pdf, "application/pdf")}).json()
+    assert "agregados" not in sem
+    com = cliente.post("/api/extraction/extract", params={"agregados": "true"},
+                       files={"file": ("sf.pdf", pdf, "application/pdf")}).json()
+    assert {chave: valor for chave, valor in com.items() if chave != "agregados"} == sem
+    assert len(com["agregados"]["pendenciasDebito"]["porCnpj"]) == 4
+    _confere_com_os_itens(sem, com["agregados"])
+
+
+@pytest.mark.parametrize("nome", sorted(corpus.DOCUMENTS))
+def test_agregados_dos_documentos_do_corpus(monkeypatch, nome):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    with open(corpus.pdf_path(nome), "rb") as f:
+        pdf_bytes = f.read()
+    with main.quiet_parser():
+        corpo = TestClient(main.app).post(
+            "/api/extraction/extract-auto", params={"agregados": "true"}, files={"file": (f"{nome}.pdf", pdf_bytes, "application/pdf")}
+        ).json()
+    agregados = corpo.pop("agregados")
+    assert agregados
+    _confere_com_os_itens(corpo, agregados)
@@ -0,0 +1,98 @@
+"""Classificação pela primeira página e endpoint com detecção automática do tipo do documento."""
+import fitz  # PyMuPDF
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from tests.golden import corpus
+
+SITUACAO_FISCAL = [
+    "MINISTÉRIO DA FAZENDA",
+    "Diagnóstico Fiscal na Receita Federal e Procuradoria-Geral da Fazenda Nacional",
+    "Pendência - Débito (SIEF)",
+    "CNPJ: 12.345.678/0001-90",
+    "2172-01 - COFINS", "03/2024", "25/04/2024", "1.000,00", "1.000,00", "200,00", "50,00", "1.250,00", "DEVEDOR",
+    "Final do Relatório",
+]
+DARF = [
+    "Documento de Arrecadação de Receitas Federais",
+    "Composição do Documento de Arrecadação",
+    "Código Denominação Principal Multa Juros Total",
+    "8704 IRRF 10,00 1,00 0,50 11,50",
+]
+OUTRO = ["Nota Fiscal de Serviços Eletrônica", "Prestador: EMPRESA EXEMPLO LTDA", "Valor total: 1.000,00"]
+
+
+def pdf_de_paginas(*paginas):
+    """PDF com uma página por lista de linhas."""
+    doc = fitz.open()
+    for linhas in paginas:
+        doc.new_page().insert_text((30, 40), "\n".join(linhas), fontsize=8, lineheight=1.5)
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+
+def pdf_de_texto(texto, linhas_por_pagina=60):
+    """PDF com uma linha do texto por linha da página."""
+    linhas = texto.split("\n")
+    return pdf_de_paginas(*(linhas[inicio:inicio + linhas_por_pagina] for inicio in range(0, len(linhas), linhas_por_pagina)))
+
+
+@pytest.mark.parametrize("linhas, tipo", [
+    (SITUACAO_FISCAL, main.DOC_TYPE_SITUACAO_FISCAL),
+    (["Relatório de Situação Fiscal"], main.DOC_TYPE_SITUACAO_FISCAL),
+    (DARF, main.DOC_TYPE_DARF),
+    # DARF com a palavra "Diagnóstico" no corpo continua DARF: os marcadores do DARF vêm primeiro
+    (DARF + ["Diagnóstico Fiscal na Receita Federal"], main.DOC_TYPE_DARF),
+    (OUTRO, None),
+    ([], None),
+])
+def test_classificacao_pelo_texto(linhas, tipo):
+    assert main.classify_document_text("\n".join(linhas)) == tipo
+
+
+def test_so_a_primeira_pagina_decide():
+    tipo, texto = main.extract_pdf_text_classified(pdf_de_paginas(SITUACAO_FISCAL[:3], SITUACAO_FISCAL[3:]))
+    assert tipo == main.DOC_TYPE_SITUACAO_FISCAL
+    assert "CNPJ: 12.345.678/0001-90" in texto and "Final do Relatório" in texto
+    # Marcador só na segunda página: não reconhecido, sem extrair o restante
+    assert main.extract_pdf_text_classified(pdf_de_paginas(OUTRO, SITUACAO_FISCAL)) == (None, "")
+
+
+def test_arquivo_que_nao_e_pdf():
+    assert main.extract_pdf_text_classified(b"texto qualquer") == (None, "")
+
+
+def _extrair_auto(pdf_bytes):
+    return TestClient(main.app).post("/api/extraction/extract-auto", files={"file": ("doc.pdf", pdf_bytes, "application/pdf")})
+
+
+@pytest.mark.parametrize("conteudo", [pdf_de_paginas(OUTRO), pdf_de_paginas([]), b"texto qualquer"])
+def test_documento_nao_reconhecido_responde_422(conteudo):
+    resposta = _extrair_auto(conteudo)
+    assert resposta.status_code == 422
+    assert "não reconhecido" in resposta.json()["error"]
+
+
+def test_extracao_automatica_da_situacao_fiscal():
+    resposta = _extrair_auto(pdf_de_paginas(SITUACAO_FISCAL))
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["tipoDocumento"] == main.DOC_TYPE_SITUACAO_FISCAL
+    assert [debito["saldo_devedor_consolidado"] for debito in corpo["pendenciasDebito"]] == [1250.0]
+
+
+@pytest.mark.parametrize("nome", sorted(corpus.DOCUMENTS))
+def test_documentos_do_corpus(nome):
+    # Cada PDF do corpus é classificado pelo tipo do nome e extraído como na rota do tipo
+    tipo = main.DOC_TYPE_DARF if nome.startswith("darf_") else main.DOC_TYPE_SITUACAO_FISCAL
+    with open(corpus.pdf_path(nome), "rb") as f:
+        pdf_bytes = f.read()
+    with main.quiet_parser():
+        assert main.extract_pdf_text_classified(pdf_bytes)[0] == tipo
+        corpo = _extrair_auto(pdf_bytes).json()
+    assert corpo["tipoDocumento"] == tipo
+    with open(corpus.expected_path(nome), encoding="utf-8") as f:
+        esperado = f.read()
+    assert corpus.serialize({chave: corpo[chave] for chave in corpus.extract_document(pdf_bytes)}) == esperado
@@ -0,0 +1,39 @@
+"""Captura de textos: sem CAPTURE_MASK_KEY nada é gravado; com a chave, o texto sai mascarado."""
+import os
+
+import pytest
+
+from app import capture
+
+TEXTO = "CNPJ: 12.345.678/0001-90 - EMPRESA EXEMPLO LTDA\n2172-01 - COFINS\n03/2024\n1.234,56"
+
+
+@pytest.fixture
+def diretorio(monkeypatch, tmp_path):
+    monkeypatch.setenv("CAPTURE_DIR", str(tmp_path))
+    monkeypatch.setenv("CAPTURE_SLOW_MS", "0")
+    monkeypatch.setattr(capture, "_warned_key", False)
+    return tmp_path
+
+
+def test_sem_chave_nao_captura(diretorio, monkeypatch, capsys):
+    monkeypatch.delenv("CAPTURE_MASK_KEY", raising=False)
+    assert not capture.should_capture(10_000, RuntimeError("falha"))
+    assert "CAPTURE_MASK_KEY" in capsys.readouterr().out
+    # Mesmo chamada diretamente, a gravação recusa o texto sem chave
+    assert capture.save_capture("/extract", "situacao_fiscal", TEXTO, 10_000) is None
+    assert os.listdir(diretorio) == []
+
+
+def test_com_chave_grava_mascarado(diretorio, monkeypatch):
+    monkeypatch.setenv("CAPTURE_MASK_KEY", "segredo")
+    assert capture.should_capture(10_000, None)
+    capture_id = capture.save_capture("/extract", "situacao_fiscal", TEXTO, 10_000)
+    (caminho,) = capture.list_captures(str(diretorio))
+    registro = capture.load_capture(caminho)
+    assert registro["id"] == capture_id
+    assert "12.345.678/0001-90" not in registro["texto"]
+    assert "EMPRESA EXEMPLO" not in registro["texto"]
+    assert "1.234,56" not in registro["texto"]
+    # Determinístico: a mesma chave mascara o mesmo texto do mesmo jeito
+    assert registro["texto"] == capture.mask_text(TEXTO)
@@ -0,0 +1,101 @@
+"""Formato compacto (colunar) da resposta e compressão gzip."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compact
+from app import main
+from tests.test_auto_detect import pdf_de_texto
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+
+def expandir(compacto):
+    """Resposta em linhas a partir do formato compacto, como um cliente faria."""
+    dicionarios = compacto["dicionarios"]
+    resultado = {chave: valor for chave, valor in compacto.items() if chave not in ("formato", "versao", "dicionarios", "secoes")}
+    for chave, secao in compacto["secoes"].items():
+        codificadas = set(secao["codificadas"])
+        resultado[chave] = [
+            {
+                campo: dicionarios[campo][valor] if campo in codificadas and isinstance(valor, int) else valor
+                for campo, valor in zip(secao["colunas"], linha)
+            }
+            for linha in secao["linhas"]
+        ]
+    return resultado
+
+
+def _com_todas_as_colunas(resultado):
+    # Na expansão, campo ausente em uma linha volta como None
+    normalizado = {}
+    for chave, valor in resultado.items():
+        if isinstance(valor, list) and valor and all(isinstance(item, dict) for item in valor):
+            colunas = list(dict.fromkeys(campo for item in valor for campo in item))
+            valor = [{campo: item.get(campo) for campo in colunas} for item in valor]
+        normalizado[chave] = valor
+    return normalizado
+
+
+def test_colunas_e_dicionarios():
+    resultado = {
+        "pendenciasDebito": [
+            {"cnpj": "1", "receita": "2172-01 - COFINS", "saldo_devedor": 1.0},
+            {"cnpj": "1", "receita": "8109-02 - PIS", "saldo_devedor": 2.0, "situacao": None},
+        ],
+        "pendenciasInscricao": [{"cnpj": "1", "inscricao": "80.6.24.000"}],
+        "processosFiscais": [],
+        "tipoDocumento": "situacao_fiscal",
+        "agregados": {"pendenciasDebito": {"total": {"itens": 2}}},
+    }
+    compacto = compact.to_compact(resultado)
+    debitos = compacto["secoes"]["pendenciasDebito"]
+    # Colunas da seção inteira, não só da primeira linha
+    assert debitos["colunas"] == ["cnpj", "receita", "saldo_devedor", "situacao"]
+    assert debitos["codificadas"] == ["cnpj", "receita", "situacao"]
+    assert debitos["linhas"] == [[0, 0, 1.0, None], [0, 1, 2.0, None]]
+    # O dicionário do CNPJ é o mesmo entre as seções
+    assert compacto["dicionarios"]["cnpj"] == ["1"]
+    assert compacto["secoes"]["pendenciasInscricao"]["linhas"] == [[0, "80.6.24.000"]]
+    assert compacto["secoes"]["processosFiscais"] == {"colunas": [], "codificadas": [], "linhas": []}
+    assert compacto["tipoDocumento"] == "situacao_fiscal" and compacto["agregados"] == resultado["agregados"]
+    assert expandir(compacto) == _com_todas_as_colunas(resultado)
+
+
+@pytest.fixture
+def relatorio(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    return pdf_de_texto(relatorio_multi_cnpj(6, n_cnpj=6, por_cnpj=10))
+
+
+def _extrair(relatorio, **opcoes):
+    return TestClient(main.app).post("/api/extraction/extract", files={"file": ("sf.pdf", relatorio, "application/pdf")}, **opcoes)
+
+
+@pytest.mark.parametrize("opcoes", [
+    {"params": {"formato": "compacto"}},
+    {"headers": {"Accept": compact.MEDIA_TYPE}},
+])
+def test_endpoint_compacto_igual_ao_json(relatorio, opcoes):
+    normal = _extrair(relatorio).json()
+    resposta = _extrair(relatorio, params={"agregados": "true", **opcoes.get("params", {})}, headers=opcoes.get("headers"))
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith(compact.MEDIA_TYPE)
+    corpo = resposta.json()
+    assert corpo["formato"] == "compacto" and "agregados" in corpo
+    # Menor que o JSON normal mesmo levando os agregados
+    assert len(resposta.content) < len(_extrair(relatorio).content)
+    expandido = expandir(corpo)
+    del expandido["agregados"]
+    assert expandido == _com_todas_as_colunas(normal)
+
+
+def test_gzip_so_para_quem_aceita(relatorio):
+    # O TestClient descompacta o corpo; o cabeçalho mostra o que foi enviado
+    com_gzip = _extrair(relatorio, headers={"Accept-Encoding": "gzip"})
+    assert com_gzip.headers["content-encoding"] == "gzip"
+    sem_gzip = _extrair(relatorio, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sem_gzip.headers
+    assert com_gzip.json() == sem_gzip.json()
+    # Respostas pequenas (abaixo de 1 KB) vão sem compressão
+    pequena = TestClient(main.app).post("/api/extraction/extract-auto", files={"file": ("x.pdf", b"x", "application/pdf")},
+                                        headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in pequena.headers
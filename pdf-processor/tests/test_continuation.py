@@ -0,0 +1,99 @@
+"""Respostas parciais com prazo_ms e continuação pelo texto guardado em cache."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app import text_cache
+from tests.test_auto_detect import pdf_de_texto
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+
+@pytest.fixture
+def relatorio(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    monkeypatch.setattr(text_cache, "_entries", type(text_cache._entries)())
+    return pdf_de_texto(relatorio_multi_cnpj(7, n_cnpj=10, por_cnpj=8))
+
+
+def _extrair(pdf_bytes, **params):
+    resposta = TestClient(main.app).post("/api/extraction/extract", params=params, files={"file": ("sf.pdf", pdf_bytes, "application/pdf")})
+    assert resposta.status_code == 200
+    return resposta.json()
+
+
+def _continuar(continuacao_id, **params):
+    return TestClient(main.app).get(f"/api/extraction/continuacao/{continuacao_id}", params=params)
+
+
+def _secoes(corpo):
+    return {chave: corpo[chave] for chave in main.RESPONSE_SECTION_ORDER if chave in corpo}
+
+
+def test_prazo_vencido_devolve_as_secoes_concluidas(relatorio):
+    completo = _extrair(relatorio)
+    assert "partial" not in completo
+    # O prazo conta do recebimento: vence antes das seções, mas a primeira é sempre extraída
+    parcial = _extrair(relatorio, prazo_ms=1)
+    assert parcial["partial"]
+    assert list(_secoes(parcial)) == [main.SECTION_PRIORITY[0]]
+    assert parcial[main.SECTION_PRIORITY[0]] == completo[main.SECTION_PRIORITY[0]]
+    assert parcial["secoesPuladas"] == main.SECTION_PRIORITY[1:]
+
+    # A continuação extrai o restante a partir do texto em cache, sem o PDF
+    resposta = _continuar(parcial["continuacao"])
+    assert resposta.status_code == 200
+    resto = resposta.json()
+    assert "partial" not in resto and "continuacao" not in resto
+    assert {**_secoes(parcial), **_secoes(resto)} == _secoes(completo)
+    # Concluída, a entrada sai do cache
+    assert _continuar(parcial["continuacao"]).status_code == 404
+
+
+def test_continuacao_parcial_de_novo(relatorio):
+    completo = _extrair(relatorio)
+    parcial = _extrair(relatorio, prazo_ms=1)
+    recebidas = _secoes(parcial)
+    continuacao_id = parcial["continuacao"]
+    for _ in range(len(main.SECTION_PRIORITY)):
+        corpo = _continuar(continuacao_id, prazo_ms=1).json()
+        recebidas.update(_secoes(corpo))
+        if not corpo.get("partial"):
+            break
+        # Mesmo id, com as seções que ainda faltam
+        assert corpo["continuacao"] == continuacao_id
+        assert corpo["secoesPuladas"] == [chave for chave in main.SECTION_PRIORITY if chave not in recebidas]
+    assert recebidas == _secoes(completo)
+
+
+def test_continuacao_desconhecida():
+    resposta = _continuar("nao-existe")
+    assert resposta.status_code == 404
+    assert "envie o PDF" in resposta.json()["error"]
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(text_cache.time, "monotonic", lambda: agora[0])
+    monkeypatch.setattr(text_cache, "_entries", type(text_cache._entries)())
+    return agora
+
+
+def test_entradas_expiram_pelo_ttl(relogio, monkeypatch):
+    monkeypatch.setenv("TEXT_CACHE_TTL_SECONDS", "600")
+    entrada = text_cache.put("texto", secoesPendentes=["x"])
+    relogio[0] += 600
+    assert text_cache.get(entrada)["texto"] == "texto"
+    relogio[0] += 1
+    assert text_cache.get(entrada) is None
+
+
+def test_entradas_mais_antigas_saem_primeiro(relogio, monkeypatch):
+    monkeypatch.setenv("TEXT_CACHE_MAX_ENTRIES", "2")
+    primeira, segunda, terceira = (text_cache.put(texto) for texto in ("a", "b", "c"))
+    assert text_cache.get(primeira) is None
+    assert [text_cache.get(entrada)["texto"] for entrada in (segunda, terceira)] == ["b", "c"]
+    text_cache.update(segunda, secoesPendentes=["y"])
+    assert text_cache.get(segunda)["secoesPendentes"] == ["y"]
+    text_cache.discard(segunda)
+    assert text_cache.get(segunda) is None
@@ -0,0 +1,74 @@
+"""Modelo de custo da inspeção prévia: ajuste linear, estimativa por tipo e modo recomendado."""
+import json
+
+import pytest
+
+from app import cost_model
+
+
+@pytest.fixture
+def modelo(monkeypatch, tmp_path):
+    caminho = tmp_path / "cost_model.json"
+    monkeypatch.setattr(cost_model, "MODEL_PATH", str(caminho))
+    monkeypatch.setattr(cost_model, "_model", None)
+    return caminho
+
+
+def test_ajuste_linear():
+    assert cost_model.fit_linear([(100, 12.0), (200, 22.0), (400, 42.0)]) == {"fixo": 2.0, "porLinha": 0.1}
+    # Um ponto só (ou todos com o mesmo x): sem inclinação, fixo = média
+    assert cost_model.fit_linear([(100, 5.0), (100, 7.0)]) == {"fixo": 6.0, "porLinha": 0.0}
+    # Coeficientes negativos viram zero
+    assert cost_model.fit_linear([(100, 50.0), (200, 10.0)])["porLinha"] == 0.0
+    assert cost_model.fit_linear([(100, 1.0), (200, 30.0)])["fixo"] == 0.0
+
+
+def test_ajuste_sem_pontos():
+    assert cost_model.fit_linear([]) is None
+
+
+def test_estimativa_por_tipo(modelo):
+    modelo.write_text(json.dumps({"modelo": {
+        "darf": {"tempoMs": {"fixo": 2.0, "porLinha": 0.1}, "memoriaPicoKb": {"fixo": 10.0, "porLinha": 0.5}},
+        "situacao_fiscal": {"tempoMs": None, "memoriaPicoKb": None},
+    }}))
+    assert cost_model.estimate("darf", 100) == {"tempoMs": 12.0, "memoriaPicoKb": 60.0}
+    # Tipo desconhecido, não detectado ou sem medições: sem estimativa
+    assert cost_model.estimate("outro", 100) is None
+    assert cost_model.estimate(None, 100) is None
+    assert cost_model.estimate("situacao_fiscal", 100) is None
+
+
+def test_sem_arquivo_do_modelo(modelo):
+    assert cost_model.load_model() == {}
+    assert cost_model.estimate("darf", 100) is None
+
+
+def test_modelo_gravado_no_repositorio():
+    # O cost_model.json do repositório cobre os dois tipos com as duas medidas
+    with open(cost_model.MODEL_PATH, encoding="utf-8") as f:
+        gravado = json.load(f)["modelo"]
+    assert set(gravado) == {"darf", "situacao_fiscal"}
+    assert all(set(coeficientes) == {"tempoMs", "memoriaPicoKb"} for coeficientes in gravado.values())
+
+
+@pytest.mark.parametrize("tempo_ms, permite_parcial, modo", [
+    (0, True, cost_model.MODE_SYNC),
+    (3000, True, cost_model.MODE_SYNC),
+    (3000.1, True, cost_model.MODE_PARTIAL),
+    (30000, True, cost_model.MODE_PARTIAL),
+    (30000.1, True, cost_model.MODE_BATCH),
+    (3000.1, False, cost_model.MODE_BATCH),
+])
+def test_modo_recomendado_nos_limites(monkeypatch, tempo_ms, permite_parcial, modo):
+    monkeypatch.delenv("INSPECTION_SYNC_MAX_MS", raising=False)
+    monkeypatch.delenv("INSPECTION_PARTIAL_MAX_MS", raising=False)
+    assert cost_model.recommend_mode(tempo_ms, permite_parcial) == modo
+
+
+def test_limites_configuraveis(monkeypatch):
+    monkeypatch.setenv("INSPECTION_SYNC_MAX_MS", "100")
+    monkeypatch.setenv("INSPECTION_PARTIAL_MAX_MS", "200")
+    assert [cost_model.recommend_mode(t, True) for t in (100, 150, 250)] == [
+        cost_model.MODE_SYNC, cost_model.MODE_PARTIAL, cost_model.MODE_BATCH,
+    ]
@@ -0,0 +1,51 @@
+"""Leitura do DARF pelas coordenadas: valores abaixo da linha do código e fallback por página."""
+from app import darf_layout
+from app import main
+
+CABECALHO = [(40, 100, 70, 108, "Código"), (90, 100, 140, 108, "Denominação"), (300, 100, 340, 108, "Principal"),
+             (370, 100, 395, 108, "Multa"), (440, 100, 465, 108, "Juros"), (510, 100, 530, 108, "Total")]
+
+
+def _linhas(*linhas, y=120, x=40):
+    # Uma linha visual por texto, todas começando na coluna do código (como no fluxo de texto)
+    words = []
+    for posicao, texto in enumerate(linhas):
+        topo = y + posicao * 12
+        inicio = x
+        for palavra in texto.split():
+            words.append((inicio, topo, inicio + 6 * len(palavra), topo + 8, palavra))
+            inicio += 6 * len(palavra) + 4
+    return words
+
+
+def test_valores_nas_linhas_abaixo_do_codigo():
+    words = CABECALHO + _linhas("3028", "PIS", "187.516,73", "646.024,83", "243.505,90", "1.479.206,21",
+                                "PIS - DESCRIÇÃO COMPLETA", "PA 14/01/2018 Vencimento 20/01/2018", "Total do Documento")
+    resultado = darf_layout.parse_page(words, 1, main.parse_br_currency)
+    assert not resultado["incompleta"]
+    assert resultado["itens"] == [{
+        "codigo": "3028", "denominacao": "PIS", "periodo_apuracao": "14/01/2018", "vencimento": "20/01/2018",
+        "principal": 187516.73, "multa": 646024.83, "juros": 243505.9, "total": 1479206.21,
+    }]
+
+
+def test_item_sem_valores_vai_para_o_extrator_de_texto():
+    # Só dois valores abaixo do código: o item não é emitido zerado, a página é relida como texto
+    words = CABECALHO + _linhas("3961", "COFINS", "1,00", "2,00", "COFINS - DESCRIÇÃO COMPLETA",
+                                "PA 03/2020 Vencimento 20/03/2020", "Total do Documento")
+    resultado = darf_layout.parse_page(words, 1, main.parse_br_currency)
+    assert resultado["incompleta"] and resultado["itens"] == []
+
+    textos = []
+    itens = darf_layout.parse_pages([words], main.parse_br_currency, fallback=lambda texto: textos.append(texto) or ["lido"])
+    assert itens == ["lido"]
+    assert textos[0].splitlines()[1:3] == ["3961", "COFINS"]
+    # O extrator de texto também não acha os quatro valores: nenhum item
+    assert main.extract_darf_page_text(textos[0]) == []
+
+
+def test_pagina_completa_nao_usa_o_fallback():
+    words = CABECALHO + _linhas("8704 IRRF 10,00 1,00 0,50 11,50", "IRRF - DESCRIÇÃO COMPLETA",
+                                "PA 03/10/2024 Vencimento 20/10/2024", "Total do Documento")
+    itens = darf_layout.parse_pages([words], main.parse_br_currency, fallback=lambda texto: [])
+    assert [(item["codigo"], item["total"]) for item in itens] == [("8704", 11.5)]
@@ -0,0 +1,90 @@
+"""Diferença entre duas extrações: chaves por seção, linhas adicionadas, removidas, alteradas e movidas."""
+from fastapi.testclient import TestClient
+
+from app import diff
+from app import main
+from tests.test_auto_detect import pdf_de_paginas
+
+CNPJ = "12.345.678/0001-90"
+
+
+def _debito(receita, periodo, saldo, situacao="DEVEDOR"):
+    return {"cnpj": CNPJ, "receita": receita, "periodo_apuracao": periodo, "vencimento": "25/04/2024",
+            "saldo_devedor": saldo, "situacao": situacao}
+
+
+def test_chave_de_cada_secao():
+    assert diff.row_key("pendenciasDebito", _debito("2172-01 - COFINS", "03/2024", 1.0)) == (
+        CNPJ, "2172-01 - COFINS", "03/2024", "25/04/2024",
+    )
+    # Campos ausentes ou None entram vazios; espaços nas pontas não contam
+    assert diff.row_key("pendenciasInscricao", {"inscricao": " 80.6.24.000 "}) == ("80.6.24.000",)
+    assert diff.row_key("parcelamentosSiefpar", {"cnpj": None}) == ("", "")
+    # A numeração do SIMPLES NAC. depende da ordem no relatório e não faz parte da chave
+    assert diff.row_key("pendenciasDebito", _debito("SIMPLES-001", "01/2024", 1.0)) == \
+        diff.row_key("pendenciasDebito", _debito("SIMPLES-007", "01/2024", 2.0))
+    assert all(campos for campos in diff.DIFF_KEYS.values())
+
+
+def test_linhas_adicionadas_removidas_e_alteradas():
+    cofins, pis, irrf = (_debito(receita, "03/2024", 100.0) for receita in ("2172-01 - COFINS", "8109-02 - PIS", "0561-07 - IRRF"))
+    csll = _debito("2372-01 - CSLL", "03/2024", 5.0)
+    pis_pago = dict(pis, saldo_devedor=60.0, situacao="A VENCER")
+    resultado = diff.diff_section("pendenciasDebito", [cofins, pis, irrf], [irrf, pis_pago, csll, cofins])
+    assert resultado["adicionados"] == [(diff.row_key("pendenciasDebito", csll), csll)]
+    assert resultado["removidos"] == []
+    assert resultado["inalterados"] == 2
+    (alterado,) = resultado["alterados"]
+    assert alterado["chave"]["receita"] == "8109-02 - PIS"
+    assert alterado["diferencas"] == {
+        "saldo_devedor": {"antes": 100.0, "depois": 60.0, "variacao": -40.0},
+        "situacao": {"antes": "DEVEDOR", "depois": "A VENCER"},
+    }
+
+
+def test_chaves_repetidas_casadas_na_ordem():
+    # Três linhas com a mesma chave antes, duas depois: casadas na ordem, sobra uma removida
+    linhas = [_debito("2172-01 - COFINS", "03/2024", saldo) for saldo in (1.0, 2.0, 3.0)]
+    resultado = diff.diff_section("pendenciasDebito", linhas, [linhas[0], dict(linhas[1], saldo_devedor=2.5)])
+    assert resultado["inalterados"] == 1
+    assert [item["depois"]["saldo_devedor"] for item in resultado["alterados"]] == [2.5]
+    assert [item for _, item in resultado["removidos"]] == [linhas[2]]
+    # Diferença de centavos arredondada a zero não conta como alteração
+    quase = dict(linhas[0], saldo_devedor=1.001)
+    assert diff.diff_section("pendenciasDebito", [linhas[0]], [quase])["inalterados"] == 1
+
+
+def test_debito_movido_para_a_exigibilidade_suspensa():
+    debito = _debito("2172-01 - COFINS", "03/2024", 100.0)
+    resultado = diff.diff_results(
+        {"pendenciasDebito": [debito], "debitosExigSuspensaSief": []},
+        {"pendenciasDebito": [], "debitosExigSuspensaSief": [dict(debito, situacao="SUSPENSO")]},
+    )
+    assert resultado["movidos"] == [{
+        "de": "pendenciasDebito", "para": "debitosExigSuspensaSief", "antes": debito, "depois": dict(debito, situacao="SUSPENSO"),
+    }]
+    assert resultado["resumo"]["pendenciasDebito"] == {"adicionados": 0, "removidos": 0, "alterados": 0, "inalterados": 0}
+    assert resultado["resumo"]["debitosExigSuspensaSief"]["adicionados"] == 0
+
+
+def _relatorio(*registros):
+    linhas = ["Diagnóstico Fiscal na Receita Federal e Procuradoria-Geral da Fazenda Nacional",
+              "Pendência - Débito (SIEF)", f"CNPJ: {CNPJ}"]
+    for receita, saldo in registros:
+        linhas += [receita, "03/2024", "25/04/2024", saldo, saldo, "0,00", "0,00", saldo, "DEVEDOR"]
+    return pdf_de_paginas(linhas + ["Final do Relatório"])
+
+
+def test_endpoint_compara_os_dois_relatorios():
+    anterior = _relatorio(("2172-01 - COFINS", "100,00"), ("8109-02 - PIS", "50,00"))
+    atual = _relatorio(("2172-01 - COFINS", "80,00"), ("0561-07 - IRRF", "10,00"))
+    resposta = TestClient(main.app).post("/api/extraction/diff", files={
+        "anterior": ("anterior.pdf", anterior, "application/pdf"), "atual": ("atual.pdf", atual, "application/pdf"),
+    })
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["resumo"]["pendenciasDebito"] == {"adicionados": 1, "removidos": 1, "alterados": 1, "inalterados": 0}
+    secao = corpo["secoes"]["pendenciasDebito"]
+    assert [item["receita"] for item in secao["adicionados"]] == ["0561-07 - IRRF"]
+    assert [item["receita"] for item in secao["removidos"]] == ["8109-02 - PIS"]
+    assert secao["alterados"][0]["diferencas"]["saldo_devedor"]["variacao"] == -20.0
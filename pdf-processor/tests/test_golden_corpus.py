@@ -0,0 +1,90 @@
+"""Corpus de regressão: saída idêntica byte a byte e orçamentos de tempo e memória por documento.
+
+Os orçamentos ficam em tests/golden/orcamentos.json (medidos com
+`python -m tests.golden.corpus --orcamentos`). Os tempos são relativos à carga de
+calibração gravada junto: a calibração é medida de novo aqui e o orçamento é escalado
+pela razão entre as duas. Um documento falha quando passa do orçamento além da
+tolerância: GOLDEN_TOLERANCIA_TEMPO (padrão 0.5 = +50%, mais GOLDEN_FOLGA_MS de folga
+absoluta) e GOLDEN_TOLERANCIA_MEMORIA (padrão 0.2).
+"""
+import json
+import os
+
+import pytest
+
+from tests.golden import corpus
+
+DOCUMENTOS = sorted(corpus.DOCUMENTS)
+
+_medicoes = {}
+_escala = []
+
+
+@pytest.fixture(autouse=True)
+def extracao_serial(monkeypatch):
+    # Orçamentos medidos sem o pool de processos, que depende da máquina
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+
+
+def _medir(nome):
+    if nome not in _medicoes:
+        with open(corpus.pdf_path(nome), "rb") as f:
+            _medicoes[nome] = corpus.measure(f.read())
+    return _medicoes[nome]
+
+
+def _escala_da_maquina():
+    if not _escala:
+        _escala.append(corpus.budget_scale(corpus.load_budgets(), corpus.calibration_ms()))
+    return _escala[0]
+
+
+def _tolerancia(variavel, padrao):
+    return float(os.environ.get(variavel, padrao))
+
+
+@pytest.mark.parametrize("nome", DOCUMENTOS)
+def test_saida_identica_ao_esperado(nome):
+    saida, _, _ = _medir(nome)
+    with open(corpus.expected_path(nome), "rb") as f:
+        esperado = f.read()
+    assert saida.encode("utf-8") == esperado, (
+        f"A extração de {nome} mudou; se a mudança for intencional, regrave com python -m tests.golden.corpus"
+    )
+
+
+@pytest.mark.parametrize("nome", sorted(corpus.DARF_ITEMS))
+def test_esperado_do_darf_igual_aos_itens_gerados(nome):
+    # O esperado não pode travar um erro de extração: confere com os itens que geraram o PDF
+    with open(corpus.expected_path(nome), encoding="utf-8") as f:
+        esperado = json.load(f)
+    assert corpus.darf_mismatches(nome, esperado) == []
+
+
+@pytest.mark.parametrize("nome", DOCUMENTOS)
+def test_tempo_dentro_do_orcamento(nome):
+    _, tempo_ms, _ = _medir(nome)
+    escala = _escala_da_maquina()
+    orcamento = corpus.load_budgets()[nome]["tempoMs"] * escala
+    limite = orcamento * (1 + _tolerancia("GOLDEN_TOLERANCIA_TEMPO", "0.5")) + _tolerancia("GOLDEN_FOLGA_MS", "10")
+    assert tempo_ms <= limite, (
+        f"{nome}: {tempo_ms:.1f} ms (orçamento {orcamento:.1f} ms nesta máquina, escala {escala:.2f}, limite {limite:.1f} ms)"
+    )
+
+
+@pytest.mark.parametrize("nome", DOCUMENTOS)
+def test_memoria_dentro_do_orcamento(nome):
+    _, _, memoria_kb = _medir(nome)
+    orcamento = corpus.load_budgets()[nome]["memoriaPicoKb"]
+    limite = orcamento * (1 + _tolerancia("GOLDEN_TOLERANCIA_MEMORIA", "0.2"))
+    assert memoria_kb <= limite, f"{nome}: pico de {memoria_kb:.0f} KiB (orçamento {orcamento} KiB, limite {limite:.0f} KiB)"
+
+
+def test_corpus_completo():
+    # Todo documento gerado precisa do PDF, do JSON esperado e do orçamento versionados
+    orcamentos = corpus.load_budgets()
+    assert orcamentos.get(corpus.CALIBRATION_KEY)
+    for nome in DOCUMENTOS:
+        assert os.path.exists(corpus.pdf_path(nome)), nome
+        assert os.path.exists(corpus.expected_path(nome)), nome
+        assert nome in orcamentos, nome
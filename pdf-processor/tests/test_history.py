@@ -0,0 +1,170 @@
+"""Histórico local: paginação por cursor, retenção e autorização das consultas."""
+import datetime
+import json
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import history
+from app import main
+
+
+@pytest.fixture
+def historico(monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "historico.sqlite"))
+    monkeypatch.setenv("HISTORY_MAX_EXTRACTIONS", "10000")
+    monkeypatch.setenv("HISTORY_RETENTION_DAYS", "730")
+    return tmp_path
+
+
+def _debito(indice, saldo):
+    return {"cnpj": "12.345.678/0001-90", "receita": "2172-01 - COFINS", "periodo_apuracao": f"{indice % 12 + 1:02d}/2024",
+            "vencimento": f"{indice % 28 + 1:02d}/05/2024", "saldo_devedor_consolidado": saldo, "ordem": indice}
+
+
+def _paginas(extracao_id, **opcoes):
+    itens, cursor = [], None
+    while True:
+        pagina = history.page_section(extracao_id, "pendenciasDebito", cursor=cursor, **opcoes)
+        itens += pagina["itens"]
+        cursor = pagina["proximoCursor"]
+        if cursor is None:
+            return itens, pagina["total"]
+
+
+def test_paginas_na_ordem_do_relatorio(historico):
+    debitos = [_debito(indice, float(indice % 7)) for indice in range(53)]
+    extracao_id = history.save_extraction({"pendenciasDebito": debitos}, main.DOC_TYPE_SITUACAO_FISCAL)
+    itens, total = _paginas(extracao_id, limite=10)
+    assert total == 53
+    assert [item["ordem"] for item in itens] == list(range(53))
+
+
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_paginas_ordenadas_com_empates(historico, decrescente):
+    # Muitos valores repetidos: os empates atravessam as divisas das páginas
+    debitos = [_debito(indice, float(indice % 5)) for indice in range(47)]
+    extracao_id = history.save_extraction({"pendenciasDebito": debitos}, main.DOC_TYPE_SITUACAO_FISCAL)
+    itens, _ = _paginas(extracao_id, ordenar="saldo_devedor_consolidado", decrescente=decrescente, limite=4)
+    esperado = sorted(debitos, key=lambda item: (-item["saldo_devedor_consolidado"] if decrescente
+                                                 else item["saldo_devedor_consolidado"], item["ordem"]))
+    assert [item["ordem"] for item in itens] == [item["ordem"] for item in esperado]
+
+
+def test_paginas_ordenadas_por_data(historico):
+    debitos = [_debito(indice, 1.0) for indice in range(30)]
+    extracao_id = history.save_extraction({"pendenciasDebito": debitos}, main.DOC_TYPE_SITUACAO_FISCAL)
+    itens, _ = _paginas(extracao_id, ordenar="vencimento", limite=7)
+    datas = [datetime.datetime.strptime(item["vencimento"], "%d/%m/%Y") for item in itens]
+    assert datas == sorted(datas) and len(itens) == 30
+
+
+def test_pagina_de_extracao_inexistente_e_ordenacao_invalida(historico):
+    assert history.page_section(999, "pendenciasDebito") is None
+    with pytest.raises(ValueError):
+        history.page_section(1, "pendenciasDebito", ordenar="dados")
+
+
+def test_cursor_ida_e_volta(historico):
+    cursor = history.encode_cursor("2024-05-01", 17)
+    assert history.decode_cursor(cursor) == ("2024-05-01", 17)
+    assert history.decode_cursor(history.encode_cursor(None, 0)) == (None, 0)
+
+
+@pytest.mark.parametrize("cursor", ["nao-e-base64!", history.encode_cursor("x", "17"), history.encode_cursor([1], 2)])
+def test_cursor_invalido(historico, cursor):
+    with pytest.raises(ValueError):
+        history.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("ordenar", [None, "saldo_devedor_consolidado"])
+def test_cursor_continua_depois_do_reprocessamento(historico, ordenar):
+    # replace_result apaga e regrava os itens: o cursor usa a posição na seção, não o rowid
+    debitos = [_debito(indice, float(indice % 3)) for indice in range(20)]
+    extracao_id = history.save_extraction({"pendenciasDebito": debitos}, main.DOC_TYPE_SITUACAO_FISCAL)
+    primeira = history.page_section(extracao_id, "pendenciasDebito", ordenar=ordenar, limite=6)
+    history.save_extraction({"pendenciasDebito": debitos[:2]}, main.DOC_TYPE_SITUACAO_FISCAL)
+    assert history.replace_result(extracao_id, {"pendenciasDebito": debitos}, 2)
+    itens = primeira["itens"]
+    cursor = primeira["proximoCursor"]
+    while cursor:
+        pagina = history.page_section(extracao_id, "pendenciasDebito", ordenar=ordenar, cursor=cursor, limite=6)
+        itens += pagina["itens"]
+        cursor = pagina["proximoCursor"]
+    completo, _ = _paginas(extracao_id, ordenar=ordenar, limite=100)
+    assert [item["ordem"] for item in itens] == [item["ordem"] for item in completo]
+    assert sorted(item["ordem"] for item in itens) == list(range(20))
+
+
+def test_paginas_ordenadas_usam_o_indice_do_campo(historico):
+    history.save_extraction({"pendenciasDebito": [_debito(0, 1.0)]}, main.DOC_TYPE_SITUACAO_FISCAL)
+    expressao = history._sort_expression("vencimento")
+    conn = history.connect()
+    try:
+        plano = " ".join(row[3] for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT dados FROM itens WHERE extracao_id = 1 AND secao = 'pendenciasDebito' "
+            f"ORDER BY {expressao} ASC, posicao LIMIT 10"
+        ))
+    finally:
+        conn.close()
+    assert "itens_ordem_vencimento" in plano and "TEMP B-TREE" not in plano
+
+
+def test_migracao_preenche_a_posicao_dos_itens_antigos(historico):
+    conn = sqlite3.connect(str(historico / "historico.sqlite"))
+    conn.executescript(
+        "CREATE TABLE extracoes (id INTEGER PRIMARY KEY AUTOINCREMENT, criado_em TEXT NOT NULL, "
+        "data_relatorio TEXT NOT NULL, tipo_documento TEXT NOT NULL, arquivo TEXT NOT NULL DEFAULT '');"
+        "CREATE TABLE itens (extracao_id INTEGER NOT NULL, secao TEXT NOT NULL, cnpj TEXT NOT NULL, "
+        "receita TEXT NOT NULL, data_relatorio TEXT NOT NULL, dados TEXT NOT NULL);"
+        "INSERT INTO extracoes VALUES (1, '2026-01-01T00:00:00', '2026-01-01', 'situacao_fiscal', '');"
+    )
+    conn.executemany(
+        "INSERT INTO itens VALUES (1, 'pendenciasDebito', '', '', '2026-01-01', ?)",
+        [(json.dumps(_debito(indice, 1.0)),) for indice in range(9)],
+    )
+    conn.commit()
+    conn.close()
+    itens, total = _paginas(1, limite=4)
+    assert total == 9 and [item["ordem"] for item in itens] == list(range(9))
+
+
+def test_retencao_pelo_maximo_de_extracoes(historico, monkeypatch):
+    monkeypatch.setenv("HISTORY_MAX_EXTRACTIONS", "3")
+    ids = [history.save_extraction({"pendenciasDebito": [_debito(i, 1.0)]}, main.DOC_TYPE_SITUACAO_FISCAL) for i in range(5)]
+    assert [extracao["id"] for extracao in history.list_extractions(limite=10)] == sorted(ids[2:], reverse=True)
+    # Os itens das extrações apagadas vão junto (ON DELETE CASCADE)
+    assert history.get_extraction(ids[0]) is None
+    assert len(history.query_items("12.345.678/0001-90")) == 3
+
+
+def test_retencao_pela_idade_da_gravacao(historico):
+    antiga = history.save_extraction({"pendenciasDebito": [_debito(1, 1.0)]}, main.DOC_TYPE_SITUACAO_FISCAL, "2020-01-01")
+    conn = history.connect()
+    with conn:
+        conn.execute("UPDATE extracoes SET criado_em = ? WHERE id = ?",
+                     ((datetime.datetime.now() - datetime.timedelta(days=731)).isoformat(timespec="seconds"), antiga))
+    conn.close()
+    # Relatório antigo, mas gravado agora: a idade conta da gravação
+    importada = history.save_extraction({"pendenciasDebito": [_debito(2, 1.0)]}, main.DOC_TYPE_SITUACAO_FISCAL, "2019-01-01")
+    assert history.get_extraction(antiga) is None
+    assert history.get_extraction(importada) is not None
+
+
+@pytest.mark.parametrize("token, cabecalho, status", [
+    ("", "", 503),
+    ("segredo", "", 401),
+    ("segredo", "Bearer outro", 401),
+    ("segredo", "Bearer segredo", 200),
+])
+def test_consultas_exigem_token(historico, monkeypatch, token, cabecalho, status):
+    monkeypatch.setenv("HISTORY_API_TOKEN", token)
+    history.save_extraction({"pendenciasDebito": [_debito(1, 1.0)]}, main.DOC_TYPE_SITUACAO_FISCAL)
+    cliente = TestClient(main.app)
+    assert cliente.get("/api/historico/extracoes", headers={"Authorization": cabecalho}).status_code == status
+    # A atualização de débitos lê o histórico pelo historicoId com a mesma autorização
+    resposta = cliente.post("/api/atualizacao/debitos", json={"dataPagamento": "2025-01-31", "historicoId": 1},
+                            headers={"Authorization": cabecalho})
+    if status != 200:
+        assert resposta.status_code == status
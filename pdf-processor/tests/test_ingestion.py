@@ -0,0 +1,222 @@
+"""Ingestão em order_items: conversão (espelho de convertToOrderItems) e transação DELETE + COPY."""
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import ingestion
+from app import main
+
+COLUNA = {coluna: indice for indice, coluna in enumerate(ingestion.ORDER_ITEMS_COLUMNS)}
+
+
+def _linha(row):
+    return {coluna: row[indice] for coluna, indice in COLUNA.items()}
+
+
+def test_debito_sief_como_convert_to_order_items():
+    resultado = {"pendenciasDebito": [{
+        "cnpj": "12.345.678/0001-90", "cno": "", "receita": "2172-01 - COFINS", "periodo_apuracao": "03/2024",
+        "vencimento": "25/04/2024", "valor_original": 100.0, "saldo_devedor": 110.0, "multa": 20.0, "juros": 5.5,
+        "saldo_devedor_consolidado": 135.5, "situacao": "DEVEDOR",
+    }]}
+    (row,) = ingestion.build_order_item_rows(resultado, "pedido-1")
+    linha = _linha(row)
+    assert linha["order_id"] == "pedido-1"
+    assert linha["code"] == "2172-01 - COFINS"
+    assert linha["tax_type"] == "DEBITO"
+    # formatDateForDB: MM/YYYY vira o primeiro dia do mês, DD/MM/YYYY vira YYYY-MM-DD
+    assert linha["start_period"] == linha["end_period"] == "2024-03-01"
+    assert linha["due_date"] == "2024-04-25"
+    assert (linha["original_value"], linha["current_balance"], linha["fine"], linha["interest"]) == (100.0, 110.0, 20.0, 5.5)
+    assert linha["status"] == "DEVEDOR"
+    assert linha["cnpj"] == "12.345.678/0001-90"
+    assert linha["saldo_devedor_consolidado"] == 135.5
+    # Colunas SIDA/SISPAR vazias são gravadas como NULL
+    assert linha["inscricao"] is None and linha["sispar_conta"] is None
+
+
+def test_codigos_gerados_e_simples_nacional():
+    resultado = {"pendenciasDebito": [
+        {"receita": "SIMPLES NAC.", "periodo_apuracao": "", "vencimento": ""},
+        {"receita": "", "periodo_apuracao": "01/2023", "vencimento": "20/02/2023"},
+        {"receita": "", "periodo_apuracao": "", "cnpj": "12.345.678/0001-90"},
+    ]}
+    simples, por_periodo, por_cnpj = (_linha(row) for row in ingestion.build_order_item_rows(resultado, "p"))
+    assert simples["tax_type"] == "SIMPLES_NACIONAL" and simples["code"] == "SIMPLES NAC."
+    # Períodos que não são datas caem no fallback de formatDateForDB
+    assert simples["start_period"] == simples["due_date"] == ingestion.DEFAULT_DB_DATE
+    assert por_periodo["code"] == "ITEM-01-2023" and por_periodo["status"] == "DEVEDOR"
+    assert por_cnpj["code"] == "ITEM-000190"
+
+
+def test_secoes_de_parcelamento_inscricao_e_darf():
+    resultado = {
+        "debitosExigSuspensaSief": [{"receita": "", "periodo_apuracao": "11/2020", "situacao": "SUSPENSO - JUDICIAL"}],
+        "parcelamentosSiefpar": [{"cnpj": "1", "parcelamento": "PARC-9", "valor_suspenso": 50.0, "modalidade": "PERT"}],
+        "pendenciasInscricao": [{"cnpj": "1", "inscricao": "80.6.24.000", "receita": "3551", "inscrito_em": "10/01/2024"}],
+        "pendenciasParcelamentoSispar": [{"cnpj": "1", "conta": "123", "descricao": "Conta", "modalidade": ""}],
+    }
+    suspensa, siefpar, sida, sispar = (_linha(row) for row in ingestion.build_order_item_rows(resultado, "p"))
+    assert suspensa["code"] == "EXIG-SUSPENSA-11-2020"
+    assert suspensa["tax_type"] == "DEBITO_EXIG_SUSPENSA_SIEF" and suspensa["cnpj"] is None
+    assert siefpar["code"] == "PARC-9" and siefpar["original_value"] == siefpar["current_balance"] == 50.0
+    assert siefpar["status"] == "PERT" and siefpar["due_date"] == ingestion.DEFAULT_DB_DATE
+    assert sida["code"] == sida["inscricao"] == "80.6.24.000"
+    assert sida["start_period"] == "2024-01-10" and sida["status"] == "ATIVA"
+    assert sispar["code"] == sispar["sispar_conta"] == "123" and sispar["status"] == "Conta"
+
+    darf = {"data": [{"codigo": "8704", "denominacao": "IRRF", "periodo_apuracao": "03/10/2024",
+                      "vencimento": "20/10/2024", "principal": 10.0, "multa": 1.0, "juros": 0.5, "total": 11.5}]}
+    (row,) = ingestion.build_order_item_rows(darf, "p")
+    linha = _linha(row)
+    assert linha["tax_type"] == "DARF" and linha["code"] == "8704" and linha["denominacao"] == "IRRF"
+    assert linha["start_period"] == "2024-10-03" and linha["due_date"] == "2024-10-20"
+    assert linha["original_value"] == 10.0 and linha["current_balance"] == 11.5
+
+
+class FakeCopy:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        if self.cursor.falhar_no_copy:
+            raise RuntimeError("falha no COPY")
+        self.cursor.conn.operacoes.append(("copy", row))
+
+
+class FakeCursor:
+    def __init__(self, conn, falhar_no_copy):
+        self.conn = conn
+        self.falhar_no_copy = falhar_no_copy
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.conn.operacoes.append(("execute", sql, params))
+
+    def copy(self, sql):
+        self.conn.operacoes.append(("copy_sql", sql))
+        return FakeCopy(self)
+
+
+class FakeConnection:
+    """Conexão que registra as operações e o desfecho da transação (commit ou rollback)."""
+
+    def __init__(self, falhar_no_copy=False):
+        self.operacoes = []
+        self.desfecho = None
+        self.falhar_no_copy = falhar_no_copy
+
+    @contextlib.contextmanager
+    def transaction(self):
+        try:
+            yield
+        except Exception:
+            self.desfecho = "rollback"
+            raise
+        self.desfecho = "commit"
+
+    def cursor(self):
+        return FakeCursor(self, self.falhar_no_copy)
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self.conn
+
+
+RESULTADO = {"pendenciasDebito": [
+    {"receita": "2172-01 - COFINS", "periodo_apuracao": "03/2024", "vencimento": "25/04/2024", "saldo_devedor": 1.0},
+    {"receita": "8109-02 - PIS", "periodo_apuracao": "04/2024", "vencimento": "25/05/2024", "saldo_devedor": 2.0},
+]}
+
+
+def test_substituir_apaga_e_copia_na_mesma_transacao(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(ingestion, "get_pool", lambda: FakePool(conn))
+    assert ingestion.ingest_order_items(RESULTADO, "pedido-7", replace_existing=True) == 2
+    assert conn.operacoes[0] == ("execute", "DELETE FROM order_items WHERE order_id = %s", ("pedido-7",))
+    assert conn.operacoes[1] == ("copy_sql", f"COPY order_items ({', '.join(ingestion.ORDER_ITEMS_COLUMNS)}) FROM STDIN")
+    assert [operacao[0] for operacao in conn.operacoes[2:]] == ["copy", "copy"]
+    assert conn.desfecho == "commit"
+
+
+def test_sem_substituir_nao_apaga(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(ingestion, "get_pool", lambda: FakePool(conn))
+    ingestion.ingest_order_items(RESULTADO, "pedido-7")
+    assert not any(operacao[0] == "execute" for operacao in conn.operacoes)
+
+
+def test_falha_no_copy_desfaz_o_delete(monkeypatch):
+    conn = FakeConnection(falhar_no_copy=True)
+    monkeypatch.setattr(ingestion, "get_pool", lambda: FakePool(conn))
+    with pytest.raises(RuntimeError):
+        ingestion.ingest_order_items(RESULTADO, "pedido-7", replace_existing=True)
+    assert conn.operacoes[0][0] == "execute"
+    assert conn.desfecho == "rollback"
+
+
+@pytest.mark.parametrize("token, cabecalho, status", [
+    ("", "", 503),
+    ("", "Bearer ", 503),
+    ("segredo", "", 401),
+    ("segredo", "Bearer outro", 401),
+])
+def test_ingestao_fechada_sem_token_valido(monkeypatch, token, cabecalho, status):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/teste")
+    monkeypatch.setenv("INGESTION_API_TOKEN", token)
+    monkeypatch.setattr(ingestion, "get_pool", lambda: pytest.fail("não deveria conectar"))
+    resposta = TestClient(main.app).post(
+        "/api/ingestion/order-items", json={"order_id": "p", "resultado": RESULTADO}, headers={"Authorization": cabecalho}
+    )
+    assert resposta.status_code == status
+
+
+def test_ingestao_com_token(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/teste")
+    monkeypatch.setenv("INGESTION_API_TOKEN", "segredo")
+    monkeypatch.setattr(ingestion, "get_pool", lambda: FakePool(conn))
+    resposta = TestClient(main.app).post(
+        "/api/ingestion/order-items", json={"order_id": "p", "resultado": RESULTADO},
+        headers={"Authorization": "Bearer segredo"},
+    )
+    assert resposta.status_code == 200
+    assert conn.desfecho == "commit"
+
+
+@pytest.mark.parametrize("substituir, status, apagou", [
+    (True, 200, True),
+    (False, 200, False),
+    ("false", 400, False),
+    ("true", 400, False),
+    (1, 400, False),
+    (None, 400, False),
+])
+def test_substituir_so_aceita_booleano_json(monkeypatch, substituir, status, apagou):
+    conn = FakeConnection()
+    monkeypatch.setenv("DATABASE_URL", "postgresql://localhost/teste")
+    monkeypatch.setenv("INGESTION_API_TOKEN", "segredo")
+    monkeypatch.setattr(ingestion, "get_pool", lambda: FakePool(conn))
+    resposta = TestClient(main.app).post(
+        "/api/ingestion/order-items", json={"order_id": "p", "resultado": RESULTADO, "substituir": substituir},
+        headers={"Authorization": "Bearer segredo"},
+    )
+    assert resposta.status_code == status
+    assert any(operacao[0] == "execute" for operacao in conn.operacoes) == apagou
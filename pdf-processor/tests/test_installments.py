@@ -0,0 +1,50 @@
+"""Cronogramas de parcelamento: regra do frontend sem juros, parcelas nunca negativas e valor do débito."""
+import datetime
+
+import numpy as np
+import pytest
+
+from app import installments
+
+
+def _plano(valor, parcelas):
+    (cronograma,) = installments.build_schedules(
+        [{"id": "p", "valores": np.array([valor]), "parcelas": parcelas}], parcelas,
+        primeiro_vencimento=datetime.date(2025, 1, 31),
+    )
+    return cronograma
+
+
+def test_regra_do_frontend_sem_juros():
+    cronograma = _plano(100.0, 3)
+    assert [parcela["valor"] for parcela in cronograma["cronograma"]] == [33.34, 33.34, 33.32]
+    assert [parcela["vencimento"] for parcela in cronograma["cronograma"]] == ["2025-01-31", "2025-02-28", "2025-03-31"]
+
+
+@pytest.mark.parametrize("valor, parcelas", [(0.05, 10), (10.0, 240), (0.01, 2), (1.0, 7), (0.99, 100)])
+def test_valor_pequeno_nao_gera_parcela_negativa(valor, parcelas):
+    cronograma = _plano(valor, parcelas)
+    valores = [parcela["valor"] for parcela in cronograma["cronograma"]]
+    assert len(valores) == parcelas
+    assert min(valores) >= 0
+    assert round(sum(valores), 2) == valor == cronograma["totalParcelas"]
+
+
+def test_piso_so_quando_o_teto_estoura():
+    # 0,05 em 10: o teto (0,01) daria 0,09 nas nove primeiras e -0,04 na última
+    valores = [parcela["valor"] for parcela in _plano(0.05, 10)["cronograma"]]
+    assert valores == [0.0] * 9 + [0.05]
+    # 1,00 em 7: o teto cabe (0,15 x 6 + 0,10) e continua valendo
+    assert [parcela["valor"] for parcela in _plano(1.0, 7)["cronograma"]] == [0.15] * 6 + [0.1]
+
+
+def test_valor_do_debito_cai_para_o_saldo_devedor():
+    itens = [
+        {"saldo_devedor_consolidado": 300.0, "saldo_devedor": 200.0},
+        {"saldo_devedor_consolidado": 0.0, "saldo_devedor": 200.0},   # linha da extração sem consolidado
+        {"current_balance": "150.5", "saldo_devedor": 1.0},           # linha de order_items
+        {"total": 80.0},                                              # DARF
+        {"saldo_devedor": "inválido"},
+    ]
+    assert installments.debt_values(itens).tolist() == [300.0, 200.0, 150.5, 80.0, 0.0]
+    assert installments.debt_values(itens, "saldo_devedor").tolist() == [200.0, 200.0, 1.0, 0.0, 0.0]
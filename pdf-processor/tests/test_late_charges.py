@@ -0,0 +1,126 @@
+"""Atualização de multa e juros: Selic acumulada, meses fora da tabela, linhas inválidas e download da tabela."""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app import late_charges
+
+# 1% ao mês de janeiro a junho de 2024
+TAXAS = {f"2024-{mes:02d}": 1.0 for mes in range(1, 7)}
+
+
+def _mes(ano, mes):
+    return late_charges._month_index(ano, mes)
+
+
+@pytest.fixture
+def tabela():
+    return late_charges.RateTable(TAXAS)
+
+
+def _encargos(vencimento, pagamento, tabela, projecao=None):
+    dias, multa, juros = late_charges.compute_charges(
+        np.array([100.0]), late_charges.parse_due_dates([vencimento]), pagamento, tabela, projecao
+    )
+    return int(dias[0]), round(float(multa[0]), 6), round(float(juros[0]), 6)
+
+
+def test_selic_acumulada_dentro_e_fora_da_tabela(tabela):
+    meses = np.array([_mes(2023, 12), _mes(2024, 1), _mes(2024, 3), _mes(2024, 6), _mes(2024, 8)])
+    assert np.allclose(tabela.cumulative_through(meses), [0.0, 0.01, 0.03, 0.06, 0.06])
+    # Depois do último mês, cada mês soma a taxa projetada
+    assert np.allclose(tabela.cumulative_through(meses, 0.005), [0.0, 0.01, 0.03, 0.06, 0.07])
+    assert tabela.last_month() == "2024-06"
+
+
+def test_tabela_com_meses_faltando():
+    with pytest.raises(ValueError):
+        late_charges.RateTable({"2024-01": 1.0, "2024-03": 1.0})
+
+
+def test_pagamento_no_mes_do_vencimento_sem_juros(tabela):
+    assert _encargos("2024-03-05", "2024-03-25", tabela) == (20, 0.066, 0.0)
+
+
+def test_juros_do_mes_seguinte_ao_vencimento_ate_o_pagamento(tabela):
+    # Selic de fevereiro + 1% no mês do pagamento; multa limitada a 20%
+    assert _encargos("20/01/2024", "2024-03-15", tabela) == (55, 0.1815, 0.02)
+    assert _encargos("2024-01-20", "2024-06-10", tabela)[1:] == (0.2, 0.05)
+
+
+def test_pagamento_depois_do_fim_da_tabela(tabela):
+    with pytest.raises(ValueError, match="2024-06"):
+        _encargos("2024-01-20", "2024-09-10", tabela)
+    # Fevereiro a junho pela tabela, julho e agosto pela projeção, 1% em setembro
+    assert _encargos("2024-01-20", "2024-09-10", tabela, 0.005)[2] == 0.07
+    # Vencimento no mês anterior ao pagamento: nenhum mês da tabela é usado, não precisa de projeção
+    assert _encargos("2024-08-20", "2024-09-10", tabela)[2] == 0.01
+
+
+def test_linhas_com_data_ou_principal_invalidos_ficam_como_estao(tabela):
+    campos = late_charges.SITUACAO_FISCAL_FIELDS
+    itens = [
+        {"saldo_devedor": 100.0, "vencimento": "20/01/2024", "multa": 0.0, "juros": 0.0, "saldo_devedor_consolidado": 100.0},
+        {"saldo_devedor": 100.0, "vencimento": "31/02/2024", "multa": 1.0},
+        {"saldo_devedor": 100.0, "vencimento": ""},
+        {"saldo_devedor": 100.0},
+        {"saldo_devedor": 0.0, "vencimento": "20/01/2024"},
+        {"saldo_devedor": "abc", "vencimento": "20/01/2024"},
+        {"saldo_devedor": None, "vencimento": "20/01/2024"},
+    ]
+    linhas, ignoradas = late_charges.update_rows(itens, campos, "2024-03-15", tabela)
+    assert ignoradas == 6
+    assert linhas[1:] == itens[1:]
+    assert {chave: linhas[0][chave] for chave in ("multa", "juros", "saldo_devedor_consolidado", "dias_atraso")} == {
+        "multa": 18.15, "juros": 2.0, "saldo_devedor_consolidado": 120.15, "dias_atraso": 55,
+    }
+    # Nenhuma linha válida: cópias sem alteração
+    assert late_charges.update_rows(itens[1:], campos, "2024-03-15", tabela) == (itens[1:], 6)
+
+
+@pytest.fixture
+def arquivo(monkeypatch, tmp_path):
+    caminho = str(tmp_path / "selic.json")
+    monkeypatch.setenv("SELIC_TABLE_PATH", caminho)
+    monkeypatch.setenv("SELIC_MAX_AGE_HOURS", "24")
+    monkeypatch.setattr(late_charges, "_table", None)
+    monkeypatch.setattr(late_charges, "_table_mtime", None)
+    return caminho
+
+
+def test_sem_arquivo_espera_o_download(arquivo, monkeypatch):
+    monkeypatch.setattr(late_charges, "download_table", lambda: TAXAS)
+    assert late_charges.get_table().last_month() == "2024-06"
+    assert os.path.exists(arquivo)
+
+
+def test_sem_arquivo_e_sem_download(arquivo, monkeypatch):
+    monkeypatch.setenv("SELIC_MAX_AGE_HOURS", "0")
+    with pytest.raises(late_charges.RateTableUnavailable):
+        late_charges.get_table()
+
+
+def test_tabela_velha_atualizada_em_segundo_plano(arquivo, monkeypatch):
+    late_charges.save_table(TAXAS, arquivo)
+    velho = time.time() - 48 * 3600
+    os.utime(arquivo, (velho, velho))
+    liberado = threading.Event()
+
+    def download_lento():
+        liberado.wait(10)
+        return {**TAXAS, "2024-07": 1.0}
+
+    monkeypatch.setattr(late_charges, "download_table", download_lento)
+    # Com o download parado, as requisições seguem com a tabela atual e não disparam outro download
+    assert late_charges.get_table().last_month() == "2024-06"
+    assert late_charges.get_table().last_month() == "2024-06"
+    liberado.set()
+    with late_charges._refresh_lock:
+        pass
+    assert late_charges.get_table().last_month() == "2024-07"
+    with open(arquivo, encoding="utf-8") as f:
+        assert "2024-07" in json.load(f)["taxas"]
@@ -0,0 +1,81 @@
+"""Pré-verificação por hash: acerto, falta, versão dos extratores e autorização do histórico."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import history
+from app import main
+
+HASH = "ab" * 32
+TOKEN = {"Authorization": "Bearer segredo"}
+
+
+@pytest.fixture
+def historico(monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "historico.sqlite"))
+    monkeypatch.setenv("HISTORY_MAX_EXTRACTIONS", "10000")
+    monkeypatch.setenv("HISTORY_RETENTION_DAYS", "730")
+    monkeypatch.setenv("HISTORY_API_TOKEN", "segredo")
+    return tmp_path
+
+
+def _gravar(versao_parser=main.PARSER_VERSION, sha256=HASH, tipo=main.DOC_TYPE_SITUACAO_FISCAL):
+    debito = {"cnpj": "12.345.678/0001-90", "receita": "2172-01 - COFINS", "periodo_apuracao": "03/2024",
+              "vencimento": "25/04/2024", "saldo_devedor": 10.0, "saldo_devedor_consolidado": 12.5}
+    return history.save_extraction({"pendenciasDebito": [debito]}, tipo, sha256=sha256, versao_parser=versao_parser)
+
+
+def _pre_verificar(**params):
+    return TestClient(main.app).get("/api/extraction/pre-verificacao", params={"sha256": HASH, **params}, headers=TOKEN)
+
+
+def test_arquivo_ja_extraido(historico):
+    extracao_id = _gravar()
+    resposta = _pre_verificar(tipo="situacao_fiscal", agregados="true")
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["historicoId"] == extracao_id and corpo["tipoDocumento"] == main.DOC_TYPE_SITUACAO_FISCAL
+    # Mesmo formato da extração: todas as seções, inclusive as vazias
+    assert set(main.RESPONSE_SECTION_ORDER) <= set(corpo)
+    assert corpo["pendenciasDebito"][0]["saldo_devedor_consolidado"] == 12.5
+    assert "agregados" in corpo
+
+
+def test_arquivo_nao_extraido(historico):
+    _gravar(sha256="cd" * 32)
+    resposta = _pre_verificar()
+    assert resposta.status_code == 404 and resposta.json()["enviarArquivo"]
+    # Outro tipo de documento com o mesmo hash também não conta
+    _gravar()
+    assert _pre_verificar(tipo="darf").status_code == 404
+
+
+def test_extracao_de_versao_anterior_nao_conta(historico):
+    antiga = _gravar(versao_parser=main.PARSER_VERSION - 1)
+    assert history.find_by_hash(HASH) == antiga
+    assert history.find_by_hash(HASH, versao_parser=main.PARSER_VERSION) is None
+    assert _pre_verificar().status_code == 404
+
+    history.set_parser_version(antiga, main.PARSER_VERSION)
+    resposta = _pre_verificar()
+    assert resposta.status_code == 200 and resposta.json()["historicoId"] == antiga
+
+
+@pytest.mark.parametrize("hash_, tipo", [("ab" * 31, "auto"), ("zz" * 32, "auto"), (HASH, "pdf")])
+def test_parametros_invalidos(historico, hash_, tipo):
+    resposta = TestClient(main.app).get("/api/extraction/pre-verificacao", params={"sha256": hash_, "tipo": tipo}, headers=TOKEN)
+    assert resposta.status_code == 422
+
+
+@pytest.mark.parametrize("token, cabecalho, status", [
+    ("", "", 503),
+    ("segredo", "", 401),
+    ("segredo", "Bearer outro", 401),
+])
+def test_exige_o_token_do_historico(historico, monkeypatch, token, cabecalho, status):
+    monkeypatch.setenv("HISTORY_API_TOKEN", token)
+    _gravar()
+    resposta = TestClient(main.app).get(
+        "/api/extraction/pre-verificacao", params={"sha256": HASH}, headers={"Authorization": cabecalho}
+    )
+    assert resposta.status_code == status
+    assert "pendenciasDebito" not in resposta.json()
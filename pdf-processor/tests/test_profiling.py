@@ -0,0 +1,90 @@
+"""Perfil sob demanda: etapas perfiladas no processo em que rodam e um perfil por vez."""
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import budget
+from app import profiling
+
+
+def soma_quadrados(n):
+    return sum(i * i for i in range(n))
+
+
+@profiling.profiled
+def etapa_externa(n):
+    # Etapa perfilada que chama outra: só a externa liga o cProfile
+    return profiling.profiled_call(soma_quadrados, n)
+
+
+@pytest.fixture
+def cliente(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILING_TOKEN", "segredo")
+    monkeypatch.setenv("PROFILING_DIR", str(tmp_path))
+    app = FastAPI()
+
+    @app.get("/etapa")
+    def etapa():
+        return {"resultado": etapa_externa(1000)}
+
+    @app.get("/orcamento")
+    def orcamento():
+        return {"resultado": budget.run_with_cpu_budget(soma_quadrados, 1000)}
+
+    @app.get("/sem-etapa")
+    def sem_etapa():
+        return {"ok": True}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    return TestClient(app)
+
+
+def _resumo(tmp_path, resposta):
+    profile_id = resposta.headers["x-profile-id"]
+    with open(os.path.join(tmp_path, profile_id + ".json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_etapa_perfilada(cliente, tmp_path):
+    resposta = cliente.get("/etapa", headers={"X-Profile-Token": "segredo"})
+    assert resposta.status_code == 200
+    resumo = _resumo(tmp_path, resposta)
+    assert resumo["etapas"] == 1
+    # Os .part são juntados e apagados
+    assert not [nome for nome in os.listdir(tmp_path) if nome.endswith(profiling.PART_SUFFIX)]
+
+
+def test_sem_cabecalho_nao_perfila(cliente, tmp_path):
+    resposta = cliente.get("/etapa")
+    assert resposta.status_code == 200
+    assert "x-profile-id" not in resposta.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_etapa_no_filho_do_orcamento(cliente, tmp_path, monkeypatch):
+    monkeypatch.setenv("EXTRACTION_CPU_BUDGET_SECONDS", "10")
+    resposta = cliente.get("/orcamento", headers={"X-Profile-Token": "segredo"})
+    assert resposta.json() == {"resultado": soma_quadrados(1000)}
+    assert _resumo(tmp_path, resposta)["etapas"] == 1
+
+
+def test_requisicao_sem_etapas_nao_tem_perfil(cliente):
+    resposta = cliente.get("/sem-etapa", headers={"X-Profile-Token": "segredo"})
+    assert resposta.status_code == 200
+    assert "x-profile-id" not in resposta.headers
+
+
+def test_segundo_perfil_simultaneo_recebe_429(cliente):
+    # Simula uma requisição perfilada em andamento no mesmo processo
+    assert profiling._request_lock.acquire(blocking=False)
+    try:
+        resposta = cliente.get("/etapa", headers={"X-Profile-Token": "segredo"})
+    finally:
+        profiling._request_lock.release()
+    assert resposta.status_code == 429
+    assert "error" in resposta.json()
+    # Requisições sem perfil seguem normalmente
+    assert cliente.get("/etapa").status_code == 200
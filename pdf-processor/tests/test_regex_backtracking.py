@@ -0,0 +1,125 @@
+"""Regressão de retrocesso nas regexes: entradas adversárias devem ser processadas em tempo linear."""
+import random
+import re
+import threading
+import time
+
+import pytest
+
+from app import budget
+from app import main
+
+TAMANHO_ADVERSARIO = 20_000
+# Com as regexes antigas, linhas deste tamanho levavam vários segundos cada
+LIMITE_SEGUNDOS = 2.0
+
+LINHAS_ADVERSARIAS = [
+    " " * TAMANHO_ADVERSARIO + "x",
+    "1" * TAMANHO_ADVERSARIO + "º",
+    "1." * (TAMANHO_ADVERSARIO // 2),
+    "a " * (TAMANHO_ADVERSARIO // 2),
+    "1234" + " " * TAMANHO_ADVERSARIO + "1",
+    "1234 a" + " a" * (TAMANHO_ADVERSARIO // 2) + " 1 2 3",
+    "1234 " + "1 " * (TAMANHO_ADVERSARIO // 2) + "x",
+    "12.3.45.678901-23" + " " * TAMANHO_ADVERSARIO + "x",
+    "12.3.45.678901-23 1234-" + " " * TAMANHO_ADVERSARIO + "01/01/2024" + " " * TAMANHO_ADVERSARIO + "-",
+    "Pendência - " + "- " * (TAMANHO_ADVERSARIO // 2),
+    "SIMPLES" + " " * TAMANHO_ADVERSARIO + "NAC",
+]
+
+
+def _cronometrar(func, *args):
+    inicio = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - inicio
+
+
+def _relatorio_com(linha):
+    return "\n".join([
+        "Pendência - Débito (SIEF)",
+        "CNPJ: 12.345.678/0001-90",
+        linha,
+        "2172-01 - COFINS",
+        linha,
+        "Inscrição com Exigibilidade Suspensa (SIDA)",
+        "CNPJ: 12.345.678/0001-90",
+        linha,
+        "Pendência - Parcelamento (SISPAR)",
+        linha,
+        "Final do Relatório",
+    ])
+
+
+def _darf_com(linha):
+    return "\n".join([
+        "Composição do Documento de Arrecadação",
+        "Código Denominação Principal Multa Juros Total",
+        linha,
+        "1234 IRPJ 1.000,00 0,00 0,00 1.000,00",
+    ])
+
+
+@pytest.mark.parametrize("linha", LINHAS_ADVERSARIAS, ids=range(len(LINHAS_ADVERSARIAS)))
+def test_secoes_situacao_fiscal_em_tempo_linear(linha):
+    assert _cronometrar(main.extract_sections, _relatorio_com(linha)) < LIMITE_SEGUNDOS
+
+
+@pytest.mark.parametrize("linha", LINHAS_ADVERSARIAS, ids=range(len(LINHAS_ADVERSARIAS)))
+def test_darf_em_tempo_linear(linha):
+    assert _cronometrar(main.extract_darf_data, _darf_com(linha)) < LIMITE_SEGUNDOS
+
+
+def test_match_darf_inline_equivale_a_regex():
+    r = random.Random(33)
+    alfabeto = "0123456789.,- a\t"
+    for _ in range(50_000):
+        linha = "".join(r.choice("0123") for _ in range(r.choice([3, 4, 4, 5])))
+        linha += "".join(r.choice(alfabeto) for _ in range(r.randint(0, 16)))
+        esperado = re.match(main.DARF_INLINE_PATTERN, linha)
+        assert main.match_darf_inline(linha) == (esperado.groups() if esperado else None), repr(linha)
+
+
+def _laco_infinito():
+    while True:
+        pass
+
+
+def test_orcamento_de_cpu_cancela_a_extracao(monkeypatch):
+    if budget.resource is None:
+        pytest.skip("RLIMIT_CPU indisponível nesta plataforma")
+    monkeypatch.setenv("EXTRACTION_CPU_BUDGET_SECONDS", "1")
+    with pytest.raises(budget.ExtractionBudgetExceeded):
+        budget.run_with_cpu_budget(_laco_infinito)
+
+
+def test_orcamento_de_cpu_devolve_o_resultado(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_CPU_BUDGET_SECONDS", "5")
+    assert budget.run_with_cpu_budget(main.process_darf_text, _darf_com("")) == main.process_darf_text(_darf_com(""))
+
+
+def _parado():
+    # Filho parado sem gastar CPU, como preso em um lock herdado
+    threading.Event().wait()
+
+
+def _falha_do_parser():
+    raise ValueError("linha inesperada na seção")
+
+
+def test_orcamento_de_relogio_mata_o_filho_parado(monkeypatch):
+    if budget.resource is None:
+        pytest.skip("RLIMIT_CPU indisponível nesta plataforma")
+    monkeypatch.setenv("EXTRACTION_CPU_BUDGET_SECONDS", "5")
+    monkeypatch.setenv("EXTRACTION_WALL_BUDGET_SECONDS", "0.5")
+    inicio = time.monotonic()
+    with pytest.raises(budget.ExtractionBudgetExceeded):
+        budget.run_with_cpu_budget(_parado)
+    assert time.monotonic() - inicio < 5
+
+
+def test_orcamento_preserva_o_tipo_do_erro(monkeypatch):
+    if budget.resource is None:
+        pytest.skip("RLIMIT_CPU indisponível nesta plataforma")
+    monkeypatch.setenv("EXTRACTION_CPU_BUDGET_SECONDS", "5")
+    with pytest.raises(ValueError, match="linha inesperada na seção"):
+        budget.run_with_cpu_budget(_falha_do_parser)
@@ -0,0 +1,152 @@
+"""Reprocessamento do histórico: diferença por seção, registro único do job, parada e falta de sinal."""
+import datetime
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import history
+from app import main
+from app import reprocessing
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+HASH = "ab" * 32
+
+
+@pytest.fixture
+def historico(monkeypatch, tmp_path):
+    monkeypatch.setenv("HISTORY_DB_PATH", str(tmp_path / "historico.sqlite"))
+    monkeypatch.setenv("HISTORY_MAX_EXTRACTIONS", "10000")
+    monkeypatch.setenv("HISTORY_RETENTION_DAYS", "730")
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    return tmp_path
+
+
+def _debito(receita, periodo, saldo):
+    return {"cnpj": "12.345.678/0001-90", "receita": receita, "periodo_apuracao": periodo,
+            "vencimento": "20/05/2024", "saldo_devedor": saldo}
+
+
+def test_linhas_adicionadas_removidas_e_alteradas():
+    a, b, c = _debito("2172-01", "01/2024", 1.0), _debito("2172-01", "02/2024", 2.0), _debito("0561-07", "01/2024", 3.0)
+    b_corrigido = dict(b, saldo_devedor=2.5)
+    d = _debito("0561-07", "02/2024", 4.0)
+    mudancas = reprocessing.section_changes("pendenciasDebito", [a, b, c, c], [c, a, b_corrigido, d])
+    # A linha repetida conta duas vezes: uma das cópias saiu
+    assert mudancas["adicionados"] == [d]
+    assert mudancas["removidos"] == [c]
+    assert mudancas["alterados"] == [{
+        "chave": {"cnpj": "12.345.678/0001-90", "receita": "2172-01", "periodo_apuracao": "02/2024", "vencimento": "20/05/2024"},
+        "campos": ["saldo_devedor"], "antes": b, "depois": b_corrigido,
+    }]
+
+
+def test_numero_do_simples_nao_faz_parte_da_chave():
+    antes, depois = _debito("SIMPLES-001", "01/2024", 1.0), _debito("SIMPLES-002", "01/2024", 1.0)
+    mudancas = reprocessing.section_changes("pendenciasDebito", [antes], [depois])
+    assert mudancas["adicionados"] == mudancas["removidos"] == []
+    assert mudancas["alterados"][0]["campos"] == ["receita"]
+
+
+def test_secao_sem_chave_so_tem_adicionadas_e_removidas():
+    mudancas = reprocessing.section_changes("outraSecao", [{"valor": 1}], [{"valor": 2}])
+    assert mudancas == {"adicionados": [{"valor": 2}], "removidos": [{"valor": 1}], "alterados": []}
+
+
+def test_comparacao_ignora_ordem_e_limita_o_detalhe(monkeypatch):
+    debitos = [_debito("2172-01", f"{mes:02d}/2024", float(mes)) for mes in range(1, 13)]
+    assert reprocessing.compare_results({"pendenciasDebito": debitos}, {"pendenciasDebito": debitos[::-1]}) == ({}, {}, 0)
+
+    monkeypatch.setattr(reprocessing, "MAX_DETAIL_ROWS", 2)
+    novos = [_debito("0561-07", f"{mes:02d}/2024", 1.0) for mes in range(1, 6)]
+    resumo, diferenca, linhas = reprocessing.compare_results(
+        {"pendenciasDebito": debitos, "agregados": {"x": 1}}, {"pendenciasDebito": debitos[1:] + novos, "pendenciasInscricao": []}
+    )
+    assert resumo == {"pendenciasDebito": {"adicionados": 5, "removidos": 1, "alterados": 0, "antes": 12, "depois": 16}}
+    assert linhas == 6
+    assert len(diferenca["pendenciasDebito"]["adicionados"]) == 2
+    # DARF: os itens ficam em "data" e a seção da diferença é "darf"
+    item = {"codigo": "8704", "periodo_apuracao": "03/2024", "vencimento": "20/04/2024", "total": 1.0}
+    resumo, _, _ = reprocessing.compare_results({"data": [item]}, {"data": [dict(item, total=2.0)]})
+    assert resumo == {"darf": {"adicionados": 0, "removidos": 0, "alterados": 1, "antes": 1, "depois": 1}}
+
+
+def _gravar_antigas(quantidade):
+    texto = relatorio_multi_cnpj(1, n_cnpj=3, por_cnpj=4)
+    resultado = main.process_situacao_fiscal_text(texto)
+    ids = []
+    for _ in range(quantidade):
+        # Resultado da "versão anterior": sem o primeiro débito
+        antigo = dict(resultado, pendenciasDebito=resultado["pendenciasDebito"][1:])
+        ids.append(history.save_extraction(antigo, main.DOC_TYPE_SITUACAO_FISCAL, sha256=HASH, fonte=("texto", texto.encode("utf-8"))))
+    return ids
+
+
+def test_registro_unico_parada_e_retomada(historico):
+    ids = _gravar_antigas(3)
+    job_id, total = reprocessing.claim(1)
+    assert total == 3
+    assert reprocessing.claim(1) is None
+
+    assert reprocessing.request_stop()["pararSolicitado"]
+    assert reprocessing.process_pending(job_id, 1, main) == reprocessing.STOPPED
+    reprocessing._finish(job_id, reprocessing.STOPPED)
+    assert reprocessing.get_job(job_id)["estado"] == reprocessing.STOPPED
+    assert reprocessing.request_stop() is None
+
+    # Um novo registro continua pelas extrações que faltam
+    novo_id, total = reprocessing.claim(1)
+    assert total == 3
+    assert reprocessing.process_pending(novo_id, 1, main) == reprocessing.FINISHED
+    reprocessing._finish(novo_id, reprocessing.FINISHED)
+    job = reprocessing.get_job()
+    assert (job["id"], job["estado"], job["processadas"], job["alteradas"]) == (novo_id, reprocessing.FINISHED, 3, 3)
+    alteracoes = reprocessing.list_changes(reprocessamento_id=novo_id)
+    assert [alteracao["extracaoId"] for alteracao in alteracoes] == ids
+    assert alteracoes[0]["resumo"]["pendenciasDebito"]["adicionados"] == 1
+    assert history.count_outdated(1)["pendentes"] == 0
+
+
+def _pid_encerrado():
+    processo = subprocess.Popen(["true"])
+    processo.wait()
+    return processo.pid
+
+
+def test_processo_inexistente_libera_o_registro(historico):
+    _gravar_antigas(1)
+    job_id, _ = reprocessing.claim(1)
+    reprocessing._update(job_id, "pid = ?", (_pid_encerrado(),))
+    assert reprocessing.get_job(job_id)["estado"] == reprocessing.INTERRUPTED
+    assert reprocessing.claim(1) is not None
+
+
+def test_sem_sinal_e_interrompido_mesmo_com_o_pid_vivo(historico, monkeypatch):
+    monkeypatch.setenv("REPROCESS_HEARTBEAT_TIMEOUT", "60")
+    _gravar_antigas(1)
+    job_id, _ = reprocessing.claim(1)
+    # O pid registrado é o deste processo (vivo): só o tempo sem sinal conta
+    assert reprocessing.get_job(job_id)["estado"] == reprocessing.RUNNING
+    antigo = (datetime.datetime.now() - datetime.timedelta(seconds=120)).isoformat(timespec="milliseconds")
+    conn = reprocessing.connect()
+    with conn:
+        conn.execute("UPDATE reprocessamentos SET atualizado_em = ? WHERE id = ?", (antigo, job_id))
+    conn.close()
+
+    novo = reprocessing.claim(1)
+    assert novo is not None
+    job = reprocessing.get_job(job_id)
+    assert job["estado"] == reprocessing.INTERRUPTED and "sem sinal" in job["ultimoErro"]
+    # O processo antigo, se voltar, para antes do próximo documento e não muda o estado
+    assert reprocessing.process_pending(job_id, 1, main) == reprocessing.STOPPED
+    reprocessing._finish(job_id, reprocessing.FINISHED)
+    assert reprocessing.get_job(job_id)["estado"] == reprocessing.INTERRUPTED
+
+
+def test_cors_permite_parar_o_reprocessamento():
+    cliente = TestClient(main.app)
+    resposta = cliente.options("/api/historico/reprocessamento", headers={
+        "Origin": "http://localhost:5173", "Access-Control-Request-Method": "DELETE",
+    })
+    assert resposta.status_code == 200
+    assert "DELETE" in resposta.headers["access-control-allow-methods"]
@@ -0,0 +1,112 @@
+"""Teste diferencial: a extração paralela das seções deve ser idêntica à serial."""
+import random
+import re
+
+import pytest
+
+from app import main
+
+RECEITAS = ["2172-01 - COFINS", "8109-02 - PIS", "2089-01 - IRPJ", "2372-01 - CSLL", "0561-07 - IRRF"]
+
+
+def _cnpj(r):
+    return f"{r.randint(10, 99)}.{r.randint(100, 999)}.{r.randint(100, 999)}/{r.randint(1, 9999):04d}-{r.randint(10, 99)}"
+
+
+def _money(r):
+    valor = f"{r.randint(1, 9_000_000) / 100:,.2f}"
+    return valor.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _data(r):
+    return f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/{r.randint(2018, 2025)}"
+
+
+def _registro_sief(r, out):
+    tipo = r.random()
+    if tipo < 0.55:
+        out.append(r.choice(RECEITAS))
+        out.append(f"{r.randint(1, 12):02d}/{r.randint(2018, 2024)}")
+        out.append(_data(r))
+        out.extend(_money(r) for _ in range(5))
+        out.append(r.choice(["DEVEDOR", "A VENCER", "EM COBRANÇA"]))
+    elif tipo < 0.7:
+        out.append("SIMPLES NAC.")
+        out.append(f"{r.randint(1, 12):02d}/{r.randint(2018, 2024)}")
+        out.append(_data(r))
+        out.extend(_money(r) for _ in range(5))
+        out.append("DEVEDOR")
+    elif tipo < 0.85:
+        valores = " ".join(_money(r) for _ in range(5))
+        out.append(f"{r.randint(1, 12):02d}/{r.randint(2018, 2024)} {_data(r)} {valores} DEVEDOR")
+    else:
+        out.append(r.choice(RECEITAS))
+        out.append(_money(r))
+
+
+def relatorio_multi_cnpj(seed, n_cnpj, por_cnpj):
+    r = random.Random(seed)
+    cnpjs = [_cnpj(r) for _ in range(n_cnpj)]
+    out = ["Diagnóstico Fiscal na Receita Federal e Procuradoria-Geral da Fazenda Nacional",
+           "Pendência - Débito (SIEF)", ""]
+    for cnpj in cnpjs:
+        out += [f"CNPJ: {cnpj}", "Receita PA/Exerc. Dt. Vcto Vl. Original Sdo. Devedor Multa Juros Sdo. Dev. Cons. Situação"]
+        for _ in range(por_cnpj):
+            _registro_sief(r, out)
+        out.append("")
+    out += ["Parcelamento com Exigibilidade Suspensa (SIEFPAR)", ""]
+    for cnpj in cnpjs:
+        out.append(f"CNPJ: {cnpj}")
+        for _ in range(3):
+            out += [f"Parcelamento: {r.randint(10**9, 10**10)}", f"Valor Suspenso: {_money(r)}", "Modalidade: PERT-DEMAIS DÉBITOS"]
+    out += ["", "Diagnóstico Fiscal na Procuradoria-Geral da Fazenda Nacional", "", "Pendência - Parcelamento (SISPAR)", ""]
+    for cnpj in cnpjs:
+        out += [f"CNPJ: {cnpj}", "Conta"]
+        for _ in range(3):
+            out += [str(r.randint(100000, 9999999)), "PARCELAMENTO PGFN", "Modalidade: TRANSAÇÃO EXCEPCIONAL"]
+    out += ["", "Final do Relatório", ""]
+    return main.preprocess_text("\n".join(out))
+
+
+def _extrair(monkeypatch, texto, workers):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", str(workers))
+    monkeypatch.setenv("EXTRACTION_PARALLEL_MIN_LINES", "200")
+    return main.extract_sections(texto)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_paralelo_igual_ao_serial(monkeypatch, seed):
+    texto = relatorio_multi_cnpj(seed, n_cnpj=40, por_cnpj=15)
+    serial = _extrair(monkeypatch, texto, workers=1)
+    paralelo = _extrair(monkeypatch, texto, workers=3)
+    assert serial["pendenciasDebito"]
+    assert serial["parcelamentosSiefpar"]
+    assert serial["pendenciasParcelamentoSispar"]
+    assert paralelo == serial
+
+
+def test_secao_dividida_em_trechos(monkeypatch):
+    texto = relatorio_multi_cnpj(7, n_cnpj=40, por_cnpj=15)
+    monkeypatch.setenv("EXTRACTION_PARALLEL_MIN_LINES", "200")
+    lines = texto.split("\n")
+    spec = main.COMPILED_SECTION_SPECS["pendenciasDebito"]
+    start = main.find_section_starts(lines, ["pendenciasDebito"])["pendenciasDebito"]
+    _, chunks = main.split_section_chunks(spec, lines, start, workers=3)
+    assert len(chunks) > 1
+    for chunk_start, _ in chunks[1:]:
+        assert lines[chunk_start].startswith("CNPJ:")
+
+
+def test_registro_atravessando_trecho_refaz_em_serie(monkeypatch, capsys):
+    # Conta SISPAR logo antes de cada linha de CNPJ: na extração serial a linha de CNPJ vira
+    # a descrição do registro, que atravessa a divisa do trecho
+    texto = relatorio_multi_cnpj(3, n_cnpj=40, por_cnpj=15)
+    inicio = texto.index("Pendência - Parcelamento (SISPAR)")
+    sispar = re.sub(r"\n(CNPJ: [^\n]+)\nConta\n", r"\n1234567\n\1\nModalidade: TESTE\n", texto[inicio:])
+    texto = texto[:inicio] + sispar
+    serial = _extrair(monkeypatch, texto, workers=1)
+    paralelo = _extrair(monkeypatch, texto, workers=3)
+    assert "refazendo" in capsys.readouterr().out
+    registro = next(item for item in serial["pendenciasParcelamentoSispar"] if item["conta"] == "1234567")
+    assert registro["descricao"].startswith("CNPJ:")
+    assert paralelo == serial
@@ -0,0 +1,89 @@
+"""Resumo: mesmas contagens e totais da extração completa, com os logs desligados só no contexto do resumo."""
+import random
+import threading
+
+import pytest
+
+from app import aggregation
+from app import main
+from tests.golden import corpus
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+
+def _resumo_da_extracao_completa(texto):
+    secoes = main.extract_sections(texto)
+    return {chave: aggregation.summarize_items(secoes[chave]) for chave in main.RESPONSE_SECTION_ORDER}
+
+
+@pytest.mark.parametrize("nome", sorted(nome for nome in corpus.DOCUMENTS if nome.startswith("sf_")))
+def test_resumo_igual_ao_da_extracao_completa(monkeypatch, nome):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    with open(corpus.pdf_path(nome), "rb") as f:
+        _, texto = main.extract_pdf_text_classified(f.read())
+    texto = main.preprocess_text(texto)
+    resumo = main.summarize_situacao_fiscal_text(texto)
+    assert resumo["pendenciasDebito"]["total"]["itens"] > 0
+    assert resumo == _resumo_da_extracao_completa(texto)
+
+
+def test_resumo_paralelo_igual_ao_serial(monkeypatch):
+    texto = relatorio_multi_cnpj(5, n_cnpj=40, por_cnpj=15)
+    monkeypatch.setenv("EXTRACTION_PARALLEL_MIN_LINES", "200")
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "3")
+    paralelo = main.summarize_situacao_fiscal_text(texto)
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    assert paralelo == main.summarize_situacao_fiscal_text(texto) == _resumo_da_extracao_completa(texto)
+
+
+def _debitos_irregulares(seed):
+    # Formas que saem da leitura direta do resumo: valores zerados, SIMPLES NAC. curto ou
+    # com trimestre, registros truncados, itens sem código e linhas soltas
+    r = random.Random(seed)
+    linhas = ["Pendência - Débito (SIEF)", ""]
+    for _ in range(8):
+        linhas += [f"CNPJ: {r.randint(10, 99)}.{r.randint(100, 999)}.{r.randint(100, 999)}/0001-{r.randint(10, 99)}"]
+        for _ in range(30):
+            valores = [r.choice(["0,00", "1.234,56", "10,00", "7,5", "1.2.3"]) for _ in range(r.randint(0, 6))]
+            periodo = r.choice([["03/2024"], ["1º", "TRIM/2023"], ["2º TRIM/2024"], []])
+            inicio = r.choice(["2172-01 - COFINS", "0561-07 - IRRF", "SIMPLES NAC.", "SIMPLES NAC. 01/2025 20/02/2025 1,00 2,00 3,00 4,00 5,00 DEVEDOR",
+                               "03/2024 25/04/2024 1,00 2,00 3,00 4,00 5,00 DEVEDOR", "Notificação de Lançamento 12", "10/2023"])
+            linhas += [inicio] + periodo + r.choice([["25/04/2024"], []]) + valores + r.choice([["DEVEDOR"], [], [""]])
+    linhas += ["Final do Relatório"]
+    return main.preprocess_text("\n".join(linhas))
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_resumo_de_debitos_irregulares(monkeypatch, seed):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    texto = _debitos_irregulares(seed)
+    resumo = main.summarize_situacao_fiscal_text(texto)
+    assert resumo["pendenciasDebito"]["total"]["itens"] > 100
+    assert resumo == _resumo_da_extracao_completa(texto)
+
+
+def test_totais_somados_em_centavos():
+    resumo = aggregation.SectionSummary()
+    for valor in [0.1, 0.2, 0.3] * 10:
+        resumo.append({"cnpj": "1", "saldo_devedor": valor})
+    outro = aggregation.SectionSummary()
+    outro.append({"cnpj": "2", "saldo_devedor": 1.25, "situacao": "DEVEDOR"})
+    resumo.merge(outro)
+    assert len(resumo) == 31
+    assert resumo.as_dict() == {
+        "total": {"itens": 31, "saldo_devedor": 7.25},
+        "porCnpj": [{"cnpj": "1", "itens": 30, "saldo_devedor": 6.0}, {"cnpj": "2", "itens": 1, "saldo_devedor": 1.25}],
+    }
+
+
+def test_resumo_silencioso_nao_cala_outras_threads(capsys):
+    # O resumo desliga os logs só no próprio contexto: outra thread continua registrando
+    with main.quiet_parser():
+        main.parser_log("linha do resumo")
+        thread = threading.Thread(target=main.parser_log, args=("linha de outra requisição",))
+        thread.start()
+        thread.join()
+    main.parser_log("depois do resumo")
+    saida = capsys.readouterr().out
+    assert "linha do resumo" not in saida
+    assert "linha de outra requisição" in saida
+    assert "depois do resumo" in saida
@@ -0,0 +1,80 @@
+"""Backends de texto: registro, escolha por tipo (text_backends.json) e mesmo resultado no corpus."""
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+from app import main
+from app import text_backends
+from tests.golden import corpus
+
+TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools")
+
+
+@pytest.fixture(scope="module")
+def bench():
+    # Importado como módulo (e não como script): o caminho de tools/ vem do próprio arquivo
+    sys.path.insert(0, TOOLS_DIR)
+    try:
+        return importlib.import_module("bench_text_backends")
+    finally:
+        sys.path.remove(TOOLS_DIR)
+
+
+@pytest.fixture
+def selecao(monkeypatch):
+    for variavel in ("TEXT_BACKEND", "TEXT_BACKEND_SITUACAO_FISCAL", "TEXT_BACKEND_DARF"):
+        monkeypatch.delenv(variavel, raising=False)
+    monkeypatch.setattr(text_backends, "_selection", {"situacao_fiscal": "blocos", "darf": "palavras"})
+
+
+def test_selecao_gravada_usa_backends_registrados(monkeypatch):
+    monkeypatch.setattr(text_backends, "_selection", None)
+    gravada = text_backends.load_selection()
+    assert set(gravada) == {main.DOC_TYPE_SITUACAO_FISCAL, main.DOC_TYPE_DARF}
+    assert set(gravada.values()) <= set(text_backends.BACKENDS)
+    assert text_backends.DEFAULT_BACKEND in text_backends.BACKENDS
+
+
+def test_escolha_por_tipo_e_por_variavel(selecao, monkeypatch):
+    assert text_backends.select_backend(None) == text_backends.DEFAULT_BACKEND
+    assert text_backends.select_backend("situacao_fiscal") == "blocos"
+    assert text_backends.select_backend("darf") == "palavras"
+    monkeypatch.setenv("TEXT_BACKEND_DARF", "spans")
+    assert text_backends.select_backend("darf") == "spans"
+    # TEXT_BACKEND vale para todos os tipos, inclusive a classificação
+    monkeypatch.setenv("TEXT_BACKEND", "caracteres")
+    assert text_backends.select_backend(None) == text_backends.select_backend("darf") == "caracteres"
+
+
+def test_backend_desconhecido_usa_o_padrao(selecao, monkeypatch, capsys):
+    monkeypatch.setenv("TEXT_BACKEND", "ocr")
+    assert text_backends.select_backend("darf") == text_backends.DEFAULT_BACKEND
+    assert "ocr" in capsys.readouterr().out
+
+
+def _identicos(doc_type):
+    with open(text_backends.SELECTION_PATH, encoding="utf-8") as f:
+        medicao = json.load(f)["medicao"][doc_type]
+    return sorted(backend for backend, dados in medicao.items() if dados["identico"])
+
+
+@pytest.mark.parametrize("nome", ["sf_filiais", "darf_tabela", "darf_texto"])
+def test_backends_identicos_dao_os_mesmos_itens(bench, monkeypatch, nome):
+    # Cada backend marcado como idêntico no benchmark (inclusive o escolhido) dá a mesma extração
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    with open(corpus.pdf_path(nome), "rb") as f:
+        pdf_bytes = f.read()
+    with main.quiet_parser():
+        doc_type, _ = main.extract_pdf_text_classified(pdf_bytes)
+        backends = _identicos(doc_type)
+        assert text_backends.load_selection()[doc_type] in backends
+        resultados = {
+            backend: bench.extraction_result(main, pdf_bytes, doc_type, bench.extract_text(main, pdf_bytes, backend)[0])
+            for backend in backends
+        }
+    assert resultados[text_backends.DEFAULT_BACKEND]
+    for backend, resultado in resultados.items():
+        assert resultado == resultados[text_backends.DEFAULT_BACKEND], backend
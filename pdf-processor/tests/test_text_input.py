@@ -0,0 +1,89 @@
+"""Extração a partir do texto das páginas: mesmo resultado da extração do PDF do mesmo documento."""
+import gzip
+import json
+
+import fitz  # PyMuPDF
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from tests.golden import corpus
+from tests.test_auto_detect import pdf_de_texto
+from tests.test_section_parallel import relatorio_multi_cnpj
+
+# Campos que dependem do caminho (PDF x texto) e não do documento
+CAMPOS_DO_CAMINHO = ("backendTexto",)
+
+
+def _paginas(pdf_bytes):
+    # O que um cliente envia: o texto de cada página, como o PyMuPDF (ou o pdf.js) devolve
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
+        return [page.get_text() for page in pdf]
+
+
+def _sem_campos_do_caminho(corpo):
+    return {chave: valor for chave, valor in corpo.items() if chave not in CAMPOS_DO_CAMINHO}
+
+
+def _pelo_pdf(pdf_bytes):
+    resposta = TestClient(main.app).post("/api/extraction/extract-auto", files={"file": ("doc.pdf", pdf_bytes, "application/pdf")})
+    assert resposta.status_code == 200
+    return _sem_campos_do_caminho(resposta.json())
+
+
+def _pelo_texto(paginas, **opcoes):
+    resposta = TestClient(main.app).post("/api/extraction/extract-text", json={"paginas": paginas, "tipo": "auto", **opcoes})
+    assert resposta.status_code == 200
+    return _sem_campos_do_caminho(resposta.json())
+
+
+def test_texto_igual_ao_pdf(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    pdf_bytes = pdf_de_texto(relatorio_multi_cnpj(3, n_cnpj=5, por_cnpj=8))
+    pelo_pdf = _pelo_pdf(pdf_bytes)
+    assert len(pelo_pdf["pendenciasDebito"]) > 20
+    assert _pelo_texto(_paginas(pdf_bytes)) == pelo_pdf
+
+
+def test_corpo_compactado_com_gzip(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    paginas = _paginas(pdf_de_texto(relatorio_multi_cnpj(4, n_cnpj=2, por_cnpj=5)))
+    corpo = gzip.compress(json.dumps({"paginas": paginas, "tipo": "situacao_fiscal"}).encode("utf-8"))
+    resposta = TestClient(main.app).post(
+        "/api/extraction/extract-text", content=corpo, headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+    assert resposta.status_code == 200
+    assert _sem_campos_do_caminho(resposta.json()) == {
+        chave: valor for chave, valor in _pelo_texto(paginas).items() if chave != "tipoDocumento"
+    }
+
+
+@pytest.mark.parametrize("corpo, status", [
+    ({"paginas": "texto"}, 400),
+    ({"paginas": ["a", 1]}, 400),
+    ({"paginas": ["a"], "tipo": "nfe"}, 400),
+    ({"paginas": ["Nota Fiscal de Serviços"]}, 422),
+    ({"paginas": []}, 422),
+])
+def test_entradas_invalidas(corpo, status):
+    assert TestClient(main.app).post("/api/extraction/extract-text", json=corpo).status_code == status
+
+
+def test_corpo_acima_do_limite(monkeypatch):
+    monkeypatch.setenv("TEXT_INPUT_MAX_BYTES", "100")
+    corpo = gzip.compress(json.dumps({"paginas": ["x" * 1000]}).encode("utf-8"))
+    resposta = TestClient(main.app).post("/api/extraction/extract-text", content=corpo, headers={"Content-Encoding": "gzip"})
+    assert resposta.status_code == 400
+
+
+@pytest.mark.parametrize("nome", sorted(nome for nome in corpus.DOCUMENTS if nome.startswith("sf_") or nome == "darf_texto"))
+def test_documentos_do_corpus_pelo_texto(monkeypatch, nome):
+    # O DARF em tabela fica de fora: o PDF é lido pelas coordenadas das palavras, que o texto não tem
+    monkeypatch.setenv("EXTRACTION_PARALLEL_WORKERS", "1")
+    with open(corpus.pdf_path(nome), "rb") as f:
+        pdf_bytes = f.read()
+    with main.quiet_parser():
+        pelo_texto = _pelo_texto(_paginas(pdf_bytes))
+        assert pelo_texto == _pelo_pdf(pdf_bytes)
+    with open(corpus.expected_path(nome), encoding="utf-8") as f:
+        assert corpus.serialize(pelo_texto) == f.read()
@@ -0,0 +1,115 @@
+"""Benchmark dos backends de extração de texto e escolha do backend por layout.
+
+Para cada PDF, classifica o tipo (Situação Fiscal ou DARF), extrai com cada backend de
+app/text_backends.py e compara o resultado da extração (JSON) com o do backend padrão.
+Por tipo, o escolhido é o mais rápido entre os que deram resultado idêntico em todos os
+documentos daquele tipo; o padrão só é trocado se o ganho passar de --margem (acima da
+variação entre execuções observada, ~10%). Com --gravar, a escolha vai para
+app/text_backends.json, lido pelos endpoints.
+
+Uso:
+    python tools/bench_text_backends.py                       # corpus de tests/golden/pdfs
+    python tools/bench_text_backends.py amostras/ --gravar
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+# extract_bulk fica ao lado deste script: o caminho explícito vale também ao importar como módulo
+sys.path.insert(0, os.path.join(APP_DIR, "tools"))
+
+from extract_bulk import find_pdfs  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(APP_DIR, "tests", "golden", "pdfs")
+
+
+def extract_text(extractor, pdf_bytes, backend):
+    """Retorna (texto, tempo da extração do texto em ms)."""
+    import fitz
+
+    inicio = time.perf_counter()
+    pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        texto = "".join(extractor.extract_page_text(page, numero + 1, backend) for numero, page in enumerate(pdf))
+    finally:
+        pdf.close()
+    return texto, (time.perf_counter() - inicio) * 1000
+
+
+def extraction_result(extractor, pdf_bytes, doc_type, texto):
+    cleaned_text = extractor.preprocess_text(texto)
+    if doc_type == extractor.DOC_TYPE_DARF:
+        return extractor.process_darf_pdf(pdf_bytes, cleaned_text)
+    return extractor.process_situacao_fiscal_text(cleaned_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede os backends de texto e escolhe o mais rápido por layout.")
+    parser.add_argument("entradas", nargs="*", default=[DEFAULT_CORPUS], help="diretórios, globs ou arquivos PDF")
+    parser.add_argument("--repeticoes", type=int, default=15, help="extrações por backend e documento (vale a melhor)")
+    parser.add_argument("--margem", type=float, default=0.15, help="ganho mínimo sobre o backend padrão (0.15 = 15%%)")
+    parser.add_argument("--gravar", action="store_true", help="grava a escolha em app/text_backends.json")
+    args = parser.parse_args()
+
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    from app import main as extractor
+    from app import text_backends
+
+    medicao = {}
+    documentos = {}
+    for caminho in find_pdfs(args.entradas):
+        with open(caminho, "rb") as f:
+            pdf_bytes = f.read()
+        with extractor.quiet_parser():
+            doc_type, _ = extractor.extract_pdf_text_classified(pdf_bytes)
+            if doc_type is None:
+                print(f"{caminho}: tipo não reconhecido, ignorado.", file=sys.stderr)
+                continue
+            documentos[doc_type] = documentos.get(doc_type, 0) + 1
+            referencia = extraction_result(
+                extractor, pdf_bytes, doc_type, extract_text(extractor, pdf_bytes, text_backends.DEFAULT_BACKEND)[0]
+            )
+            # Repetições intercaladas entre os backends: variações da máquina afetam todos igualmente
+            tempos = {backend: [] for backend in text_backends.BACKENDS}
+            textos = {}
+            for _ in range(args.repeticoes):
+                for backend in text_backends.BACKENDS:
+                    textos[backend], tempo_ms = extract_text(extractor, pdf_bytes, backend)
+                    tempos[backend].append(tempo_ms)
+            for backend in text_backends.BACKENDS:
+                resultado = extraction_result(extractor, pdf_bytes, doc_type, textos[backend])
+                atual = medicao.setdefault(doc_type, {}).setdefault(backend, {"tempoMs": 0.0, "identico": True})
+                atual["tempoMs"] += min(tempos[backend])
+                atual["identico"] = atual["identico"] and resultado == referencia
+        print(f"{os.path.basename(caminho)} ({doc_type}) medido.", file=sys.stderr)
+
+    selecao = {}
+    for doc_type, backends in medicao.items():
+        for backend, dados in backends.items():
+            dados["tempoMs"] = round(dados["tempoMs"], 1)
+        candidatos = [backend for backend, dados in backends.items() if dados["identico"]]
+        escolhido = min(candidatos, key=lambda backend: backends[backend]["tempoMs"])
+        padrao = backends[text_backends.DEFAULT_BACKEND]["tempoMs"]
+        if backends[escolhido]["tempoMs"] > padrao * (1 - args.margem):
+            escolhido = text_backends.DEFAULT_BACKEND
+        selecao[doc_type] = escolhido
+        print(f"\n{doc_type} ({documentos[doc_type]} documentos):", file=sys.stderr)
+        for backend, dados in sorted(backends.items(), key=lambda item: item[1]["tempoMs"]):
+            marca = "*" if backend == selecao[doc_type] else " "
+            igual = "idêntico" if dados["identico"] else "DIFERENTE"
+            print(f" {marca} {backend:22} {dados['tempoMs']:9.1f} ms  {igual}", file=sys.stderr)
+
+    if args.gravar:
+        with open(text_backends.SELECTION_PATH, "w", encoding="utf-8") as f:
+            json.dump({"selecao": selecao, "documentos": documentos, "medicao": medicao}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nEscolha gravada em {text_backends.SELECTION_PATH}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Calibra o modelo de custo da inspeção prévia (app/cost_model.json).
+
+Para cada documento do corpus de regressão (tests/golden), junta as linhas de texto
+contadas pela inspeção (inspect_pdf) com o tempo e o pico de memória medidos em
+tests/golden/orcamentos.json e ajusta, por tipo de documento, fixo + porLinha * linhas.
+Com --medir, mede o corpus de novo nesta máquina em vez de usar os orçamentos gravados.
+
+Uso:
+    python tools/calibrate_cost.py            # mostra o ajuste
+    python tools/calibrate_cost.py --gravar   # grava app/cost_model.json
+"""
+import argparse
+import json
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+MEDIDAS = ("tempoMs", "memoriaPicoKb")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajusta o modelo de custo da inspeção ao corpus de regressão.")
+    parser.add_argument("--medir", action="store_true", help="mede o corpus em vez de ler tests/golden/orcamentos.json")
+    parser.add_argument("--gravar", action="store_true", help="grava o modelo em app/cost_model.json")
+    args = parser.parse_args()
+
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    from app import cost_model
+    from app import main as extractor
+    from tests.golden import corpus
+
+    orcamentos = corpus.load_budgets()
+    documentos = {}
+    for nome in sorted(corpus.DOCUMENTS):
+        with open(corpus.pdf_path(nome), "rb") as f:
+            pdf_bytes = f.read()
+        with extractor.quiet_parser():
+            inspecao = extractor.inspect_pdf(pdf_bytes)
+        if args.medir:
+            _, tempo_ms, memoria_kb = corpus.measure(pdf_bytes)
+            medicao = {"tempoMs": round(tempo_ms, 1), "memoriaPicoKb": round(memoria_kb)}
+        else:
+            medicao = {medida: orcamentos[nome][medida] for medida in MEDIDAS}
+        documentos[nome] = dict(tipoDocumento=inspecao["tipoDocumento"], linhas=inspecao["linhasEstimadas"], **medicao)
+
+    modelo = {}
+    for doc_type in sorted({dados["tipoDocumento"] for dados in documentos.values()}):
+        pontos = [dados for dados in documentos.values() if dados["tipoDocumento"] == doc_type]
+        modelo[doc_type] = {
+            medida: cost_model.fit_linear([(dados["linhas"], dados[medida]) for dados in pontos]) for medida in MEDIDAS
+        }
+        print(f"\n{doc_type} ({len(pontos)} documentos):", file=sys.stderr)
+        for medida in MEDIDAS:
+            coeficientes = modelo[doc_type][medida]
+            print(f"  {medida:14} {coeficientes['fixo']:9.3f} + {coeficientes['porLinha']:.5f} * linhas", file=sys.stderr)
+        for dados in pontos:
+            previsto = {
+                medida: modelo[doc_type][medida]["fixo"] + modelo[doc_type][medida]["porLinha"] * dados["linhas"]
+                for medida in MEDIDAS
+            }
+            print(
+                f"    {dados['linhas']:6} linhas: {dados['tempoMs']:8.1f} ms (previsto {previsto['tempoMs']:8.1f}), "
+                f"{dados['memoriaPicoKb']:6} KiB (previsto {previsto['memoriaPicoKb']:6.0f})",
+                file=sys.stderr,
+            )
+
+    if args.gravar:
+        with open(cost_model.MODEL_PATH, "w", encoding="utf-8") as f:
+            json.dump({"modelo": modelo, "documentos": documentos}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nModelo gravado em {cost_model.MODEL_PATH}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
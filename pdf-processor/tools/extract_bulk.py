@@ -0,0 +1,158 @@
+"""Extração em lote de PDFs arquivados, sem passar pela API HTTP.
+
+Usa a mesma cadeia de extratores dos endpoints (classificação pela primeira página,
+pré-processamento, extratores de Situação Fiscal ou DARF) em um pool de processos e
+grava uma linha JSON por documento, com o resultado, os tempos de cada etapa ou o erro.
+
+Uso:
+    python tools/extract_bulk.py arquivo/2023 "arquivo/2024/**/*.pdf" --saida extracoes.jsonl
+
+Reexecutar com a mesma --saida retoma o lote: os arquivos que já têm linha no arquivo
+de saída são pulados (com --refazer-erros, os que falharam são processados de novo).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+TIPOS = ("auto", "situacao_fiscal", "darf")
+
+
+def find_pdfs(entradas):
+    """Expande diretórios (recursivamente), globs e arquivos em uma lista ordenada de PDFs."""
+    arquivos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = glob.glob(os.path.join(entrada, "**", "*"), recursive=True)
+        else:
+            candidatos = glob.glob(entrada, recursive=True)
+        arquivos.update(
+            os.path.abspath(caminho) for caminho in candidatos
+            if os.path.isfile(caminho) and caminho.lower().endswith(".pdf")
+        )
+    return sorted(arquivos)
+
+
+def read_done(saida, refazer_erros):
+    """Arquivos que já têm linha na saída (para retomar o lote)."""
+    feitos = set()
+    if not os.path.exists(saida):
+        return feitos
+    with open(saida, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                # Última linha truncada por uma interrupção: o arquivo será refeito
+                continue
+            if refazer_erros and registro.get("erro"):
+                feitos.discard(registro["arquivo"])
+            else:
+                feitos.add(registro["arquivo"])
+    return feitos
+
+
+def init_worker(verboso):
+    # Cada processo do lote já é um nível de paralelismo: sem pool aninhado por seção
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    if not verboso:
+        sys.stdout = open(os.devnull, "w")
+
+
+def extract_file(caminho, tipo):
+    """Extrai um PDF e retorna o registro da linha JSON."""
+    from app import budget
+    from app import main as extractor
+
+    registro = {"arquivo": caminho}
+    tempos = {}
+    inicio = time.perf_counter()
+    try:
+        with open(caminho, "rb") as f:
+            contents = f.read()
+        registro["bytes"] = len(contents)
+
+        etapa = time.perf_counter()
+        if tipo == "auto":
+            doc_type, extracted_text = extractor.extract_pdf_text_classified(contents)
+        else:
+            doc_type, extracted_text = tipo, extractor.extract_pdf_text(contents, tipo)
+        tempos["textoMs"] = round((time.perf_counter() - etapa) * 1000, 1)
+        registro["tipoDocumento"] = doc_type
+        if doc_type is None:
+            registro["erro"] = "Tipo de documento não reconhecido."
+            return registro
+        registro["backendTexto"] = extractor.text_backends.select_backend(doc_type)
+
+        etapa = time.perf_counter()
+        cleaned_text = extractor.preprocess_text(extracted_text)
+        if doc_type == extractor.DOC_TYPE_DARF:
+            registro["resultado"] = budget.run_with_cpu_budget(extractor.process_darf_pdf, contents, cleaned_text)
+        else:
+            registro["resultado"] = budget.run_with_cpu_budget(extractor.process_situacao_fiscal_text, cleaned_text)
+        tempos["extracaoMs"] = round((time.perf_counter() - etapa) * 1000, 1)
+    except Exception as e:
+        registro["erro"] = f"{type(e).__name__}: {e}"
+    finally:
+        tempos["totalMs"] = round((time.perf_counter() - inicio) * 1000, 1)
+        registro["tempos"] = tempos
+    return registro
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extração em lote de PDFs de Situação Fiscal e DARF para JSON Lines.")
+    parser.add_argument("entradas", nargs="+", help="diretórios, globs ou arquivos PDF")
+    parser.add_argument("--saida", required=True, help="arquivo JSON Lines (acrescenta; permite retomar)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos do pool")
+    parser.add_argument("--tipo", choices=TIPOS, default="auto", help="tipo dos documentos (padrão: detectar)")
+    parser.add_argument("--refazer-erros", action="store_true", help="processa de novo os arquivos que falharam")
+    parser.add_argument("--orcamento-cpu", type=int, default=0, help="segundos de CPU por documento (0 = sem limite)")
+    parser.add_argument("--verboso", action="store_true", help="mantém os logs dos extratores no stdout")
+    args = parser.parse_args()
+
+    if args.orcamento_cpu:
+        os.environ["EXTRACTION_CPU_BUDGET_SECONDS"] = str(args.orcamento_cpu)
+
+    arquivos = find_pdfs(args.entradas)
+    feitos = read_done(args.saida, args.refazer_erros)
+    pendentes = [caminho for caminho in arquivos if caminho not in feitos]
+    print(f"{len(arquivos)} PDFs encontrados, {len(arquivos) - len(pendentes)} já na saída, {len(pendentes)} a processar.",
+          file=sys.stderr)
+
+    # Uma interrupção pode deixar a última linha sem a quebra: a próxima começa em linha nova
+    if os.path.exists(args.saida) and os.path.getsize(args.saida):
+        with open(args.saida, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                with open(args.saida, "a", encoding="utf-8") as saida:
+                    saida.write("\n")
+
+    inicio = time.perf_counter()
+    contagem = {"ok": 0, "erro": 0}
+    with open(args.saida, "a", encoding="utf-8") as saida, \
+            ProcessPoolExecutor(max_workers=max(1, args.processos), initializer=init_worker, initargs=(args.verboso,)) as pool:
+        futures = [pool.submit(extract_file, caminho, args.tipo) for caminho in pendentes]
+        for posicao, future in enumerate(as_completed(futures), 1):
+            registro = future.result()
+            # Uma linha por documento, gravada assim que fica pronta
+            saida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            saida.flush()
+            contagem["erro" if registro.get("erro") else "ok"] += 1
+            if registro.get("erro"):
+                print(f"[{posicao}/{len(pendentes)}] ERRO {registro['arquivo']}: {registro['erro']}", file=sys.stderr)
+            elif posicao % 50 == 0 or posicao == len(pendentes):
+                print(f"[{posicao}/{len(pendentes)}] {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+
+    print(f"Concluído: {contagem['ok']} extraídos, {contagem['erro']} com erro em {time.perf_counter() - inicio:.1f}s.",
+          file=sys.stderr)
+    return 1 if contagem["erro"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""Gerador de carga para o pdf-processor.
+
+Sobe a aplicação localmente com uvicorn, reenvia uma mistura de PDFs de Situação
+Fiscal e DARF para /api/extraction/extract e /api/extraction/extract-darf variando a
+concorrência e grava um relatório JSON com vazão, latências p50/p95/p99, taxas de
+erro e de 429 e o pico de memória (RSS) do servidor em cada nível.
+
+Uso:
+    python tools/loadtest.py --situacao-fiscal "amostras/sf/*.pdf" --darf "amostras/darf/*.pdf" \
+        --concorrencia 1,2,4,8,16 --requisicoes 50 --saida relatorio.json
+
+Sem amostras, PDFs sintéticos são gerados. Com --url o teste vai para um servidor já
+em execução (informe --pid para medir a memória dele).
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "situacao_fiscal": "/api/extraction/extract",
+    "darf": "/api/extraction/extract-darf",
+}
+
+
+# --- Amostras ---
+
+def synthetic_pdf(lines, lines_per_page=60):
+    import fitz
+
+    pdf = fitz.open()
+    for start in range(0, len(lines), lines_per_page):
+        page = pdf.new_page()
+        y = 40
+        for line in lines[start:start + lines_per_page]:
+            page.insert_text((40, y), line, fontsize=9)
+            y += 12
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def synthetic_situacao_fiscal(seed, n_cnpj=5, per_cnpj=20):
+    r = random.Random(seed)
+    lines = ["MINISTÉRIO DA FAZENDA", "INFORMAÇÕES DE APOIO PARA EMISSÃO DE CERTIDÃO",
+             "Diagnóstico Fiscal na Receita Federal e Procuradoria-Geral da Fazenda Nacional",
+             "Pendência - Débito (SIEF)"]
+    for _ in range(n_cnpj):
+        lines.append(f"CNPJ: {r.randint(10, 99)}.{r.randint(100, 999)}.{r.randint(100, 999)}/0001-{r.randint(10, 99)}")
+        lines.append("Receita PA/Exerc. Dt. Vcto Vl. Original Sdo. Devedor Multa Juros Sdo. Dev. Cons. Situação")
+        for _ in range(per_cnpj):
+            lines.append(r.choice(["2172-01 - COFINS", "8109-02 - PIS", "2089-01 - IRPJ"]))
+            lines.append(f"{r.randint(1, 12):02d}/{r.randint(2018, 2024)}")
+            lines.append(f"{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/2024")
+            lines.extend(f"{r.randint(100, 999999)},{r.randint(10, 99)}" for _ in range(5))
+            lines.append("DEVEDOR")
+    lines.append("Final do Relatório")
+    return synthetic_pdf(lines)
+
+
+def synthetic_darf(seed, n=6):
+    r = random.Random(seed)
+    lines = ["Documento de Arrecadação", "de Receitas Federais", "Composição do Documento de Arrecadação",
+             "Código Denominação Principal Multa Juros Total"]
+    for _ in range(n):
+        values = " ".join(f"{r.randint(100, 99999)},{r.randint(10, 99)}" for _ in range(4))
+        lines.append(f"{r.randint(1000, 9999)} COFINS {values}")
+        lines.append("COFINS - DESCRIÇÃO")
+        lines.append(f"PA {r.randint(1, 12):02d}/2024 Vencimento {r.randint(1, 28):02d}/12/2024")
+    lines.append("Total do Documento")
+    return synthetic_pdf(lines)
+
+
+def load_samples(pattern, kind, synthetic_count):
+    samples = []
+    for path in sorted(glob.glob(pattern)) if pattern else []:
+        with open(path, "rb") as f:
+            samples.append((kind, os.path.basename(path), f.read()))
+    if not samples:
+        generator = synthetic_situacao_fiscal if kind == "situacao_fiscal" else synthetic_darf
+        samples = [(kind, f"sintetico-{kind}-{i}.pdf", generator(i)) for i in range(synthetic_count)]
+    return samples
+
+
+# --- Servidor ---
+
+def free_port():
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, env_overrides):
+    env = dict(os.environ, PYTHONPATH=APP_DIR, **env_overrides)
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    # Os logs de extração são muito verbosos: descartados para não distorcer a medição
+    process = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn terminou durante a inicialização (código {process.returncode}).")
+        try:
+            requests.get(f"{url}/docs", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn não respondeu em 30s.")
+
+
+def process_tree_rss_kb(pid):
+    """RSS atual (kB) do processo e de seus filhos (workers do uvicorn), lido de /proc."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, process_tree_rss_kb(self.pid))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# --- Execução ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def send(session_factory, url, sample, timeout):
+    kind, name, data = sample
+    started = time.perf_counter()
+    try:
+        response = session_factory().post(
+            url + ENDPOINTS[kind], files={"file": (name, data, "application/pdf")}, timeout=timeout
+        )
+        status = response.status_code
+    except requests.RequestException as e:
+        status = f"exceção: {type(e).__name__}"
+    return kind, status, time.perf_counter() - started
+
+
+def run_level(url, samples, concurrency, total_requests, timeout, pid):
+    local = threading.local()
+
+    def session_factory():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    mix = [samples[i % len(samples)] for i in range(total_requests)]
+    random.Random(concurrency).shuffle(mix)
+
+    sampler = RssSampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda sample: send(session_factory, url, sample, timeout), mix))
+    duration = time.perf_counter() - started
+    if sampler:
+        sampler.stop()
+
+    latencies = sorted(elapsed * 1000 for _, _, elapsed in results)
+    ok = sum(1 for _, status, _ in results if status == 200)
+    throttled = sum(1 for _, status, _ in results if status == 429)
+    errors = len(results) - ok - throttled
+    por_tipo = {}
+    for kind, status, elapsed in results:
+        entry = por_tipo.setdefault(kind, {"requisicoes": 0, "erros": 0, "latencias": []})
+        entry["requisicoes"] += 1
+        entry["erros"] += status != 200
+        entry["latencias"].append(elapsed * 1000)
+
+    return {
+        "concorrencia": concurrency,
+        "requisicoes": len(results),
+        "duracaoS": round(duration, 3),
+        "throughputRps": round(len(results) / duration, 3) if duration else None,
+        "latenciaMs": {
+            "p50": round(percentile(latencies, 0.50), 1),
+            "p95": round(percentile(latencies, 0.95), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "media": round(sum(latencies) / len(latencies), 1),
+            "max": round(latencies[-1], 1),
+        },
+        "taxaErro": round(errors / len(results), 4),
+        "taxa429": round(throttled / len(results), 4),
+        "status": {str(status): sum(1 for _, s, _ in results if s == status) for status in {s for _, s, _ in results}},
+        "porTipo": {
+            kind: {
+                "requisicoes": entry["requisicoes"],
+                "erros": entry["erros"],
+                "p50Ms": round(percentile(sorted(entry["latencias"]), 0.50), 1),
+                "p95Ms": round(percentile(sorted(entry["latencias"]), 0.95), 1),
+            }
+            for kind, entry in por_tipo.items()
+        },
+        "picoRssMb": round(sampler.peak_kb / 1024, 1) if sampler else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga dos endpoints de extração.")
+    parser.add_argument("--situacao-fiscal", default="", help="glob dos PDFs de Situação Fiscal")
+    parser.add_argument("--darf", default="", help="glob dos PDFs de DARF")
+    parser.add_argument("--proporcao-darf", type=float, default=0.5, help="fração das requisições que são DARF")
+    parser.add_argument("--concorrencia", default="1,2,4,8", help="níveis de concorrência separados por vírgula")
+    parser.add_argument("--requisicoes", type=int, default=40, help="requisições por nível")
+    parser.add_argument("--aquecimento", type=int, default=2, help="requisições de aquecimento antes da varredura")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--env", action="append", default=[], help="variável NOME=valor para o servidor (repetível)")
+    parser.add_argument("--url", default="", help="usar um servidor já em execução em vez de subir um local")
+    parser.add_argument("--pid", type=int, default=0, help="PID do servidor externo, para medir RSS")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--saida", default="", help="arquivo do relatório JSON (padrão: stdout)")
+    args = parser.parse_args()
+
+    sf_samples = load_samples(args.situacao_fiscal, "situacao_fiscal", 3)
+    darf_samples = load_samples(args.darf, "darf", 3)
+    # Mistura com a proporção pedida de DARF
+    n_darf = round(10 * args.proporcao_darf)
+    samples = [sf_samples[i % len(sf_samples)] for i in range(10 - n_darf)] + \
+              [darf_samples[i % len(darf_samples)] for i in range(n_darf)]
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    process = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.pid
+    else:
+        process, url = start_server(free_port(), args.workers, env_overrides)
+        pid = process.pid
+
+    try:
+        for sample in samples[:args.aquecimento]:
+            send(requests.Session, url, sample, args.timeout)
+
+        levels = []
+        for concurrency in [int(value) for value in args.concorrencia.split(",") if value.strip()]:
+            level = run_level(url, samples, concurrency, args.requisicoes, args.timeout, pid)
+            levels.append(level)
+            print(f"concorrência {concurrency}: {level['throughputRps']} req/s, p95 {level['latenciaMs']['p95']} ms, "
+                  f"erros {level['taxaErro']:.1%}, 429 {level['taxa429']:.1%}, pico RSS {level['picoRssMb']} MB",
+                  file=sys.stderr)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "geradoEm": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "configuracao": {
+            "url": args.url or "local",
+            "workersUvicorn": None if args.url else args.workers,
+            "env": env_overrides,
+            "requisicoesPorNivel": args.requisicoes,
+            "proporcaoDarf": n_darf / 10,
+            "amostras": {"situacao_fiscal": [name for _, name, _ in sf_samples], "darf": [name for _, name, _ in darf_samples]},
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "niveis": levels,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Reproduz offline as capturas de texto de produção (app/capture.py).
+
+Cada captura (texto pré-processado e mascarado de uma requisição lenta ou com erro) é
+extraída de novo pelos mesmos extratores dos endpoints, sem HTTP e com os logs por
+linha descartados: Situação Fiscal por process_situacao_fiscal_text (só as seções
+pendentes, nas capturas de continuação) e DARF por process_darf_text. Mostra o tempo
+original, o melhor tempo da reprodução, os itens por seção e se o erro se repete. Com
+--perfil, roda cada captura sob o cProfile e soma as funções mais caras de todas.
+
+Uso:
+    python tools/replay_captures.py                          # diretório de CAPTURE_DIR
+    python tools/replay_captures.py /capturas --repeticoes 5 --perfil --saida replay.json
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def replay(extractor, registro):
+    if registro["tipoDocumento"] == extractor.DOC_TYPE_DARF:
+        return extractor.process_darf_text(registro["texto"])
+    return extractor.process_situacao_fiscal_text(registro["texto"], registro.get("secoes"))
+
+
+def replay_capture(extractor, profiling, registro, repeticoes, perfil):
+    """Resultado da reprodução de uma captura (tempos, itens e erro) e o resumo do perfil."""
+    tempos = []
+    resultado = None
+    erro = None
+    with extractor.quiet_parser():
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            try:
+                resultado = replay(extractor, registro)
+            except Exception as e:
+                erro = f"{type(e).__name__}: {e}"
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resumo_perfil = None
+        if perfil:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                replay(extractor, registro)
+            except Exception:
+                pass
+            finally:
+                profiler.disable()
+            resumo_perfil = profiling.summarize_stats(pstats.Stats(profiler))
+    itens = {}
+    if resultado:
+        itens = {secao: len(valor) for secao, valor in resultado.items() if isinstance(valor, list)}
+    linha = {
+        "id": registro["id"],
+        "endpoint": registro["endpoint"],
+        "tipoDocumento": registro["tipoDocumento"],
+        "linhas": registro["texto"].count("\n") + 1,
+        "duracaoOriginalMs": registro["duracaoMs"],
+        "erroOriginal": registro["erro"],
+        "tempoMs": round(min(tempos), 1),
+        "erro": erro,
+        "itensPorSecao": itens,
+    }
+    return linha, resumo_perfil
+
+
+def merge_hot_spots(resumos, limite):
+    """Soma, entre as capturas, o tempo acumulado de cada função acompanhada pelo perfil."""
+    funcoes = {}
+    for resumo in resumos:
+        for funcao in resumo["funcoes"]:
+            atual = funcoes.setdefault((funcao["funcao"], funcao["arquivo"]), {"chamadas": 0, "tempoAcumuladoS": 0.0})
+            atual["chamadas"] += funcao["chamadas"]
+            atual["tempoAcumuladoS"] += funcao["tempoAcumuladoS"]
+    ordenadas = sorted(funcoes.items(), key=lambda item: item[1]["tempoAcumuladoS"], reverse=True)[:limite]
+    return [
+        {"funcao": nome, "arquivo": arquivo, "chamadas": dados["chamadas"], "tempoAcumuladoS": round(dados["tempoAcumuladoS"], 6)}
+        for (nome, arquivo), dados in ordenadas
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz e mede as capturas de texto de produção.")
+    parser.add_argument("diretorio", nargs="?", default=os.environ.get("CAPTURE_DIR", ""), help="diretório das capturas")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por captura (vale a melhor)")
+    parser.add_argument("--perfil", action="store_true", help="perfila cada captura e lista as funções mais caras")
+    parser.add_argument("--limite", type=int, default=15, help="funções listadas com --perfil")
+    parser.add_argument("--saida", help="grava o relatório em JSON")
+    args = parser.parse_args()
+    if not args.diretorio or not os.path.isdir(args.diretorio):
+        parser.error("informe o diretório das capturas (ou configure CAPTURE_DIR)")
+
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    from app import capture
+    from app import main as extractor
+    from app import profiling
+
+    capturas = []
+    resumos = []
+    for caminho in capture.list_captures(args.diretorio):
+        linha, resumo_perfil = replay_capture(extractor, profiling, capture.load_capture(caminho), args.repeticoes, args.perfil)
+        capturas.append(linha)
+        if resumo_perfil:
+            resumos.append(resumo_perfil)
+        situacao = f"ERRO {linha['erro']}" if linha["erro"] else f"{sum(linha['itensPorSecao'].values())} itens"
+        print(
+            f"{linha['id']} {linha['endpoint']:14} {linha['linhas']:7} linhas  original {linha['duracaoOriginalMs']:9.1f} ms"
+            f"  reprodução {linha['tempoMs']:9.1f} ms  {situacao}",
+            file=sys.stderr,
+        )
+
+    relatorio = {"capturas": sorted(capturas, key=lambda linha: linha["tempoMs"], reverse=True)}
+    if args.perfil:
+        relatorio["funcoesMaisCaras"] = merge_hot_spots(resumos, args.limite)
+        print("\nFunções mais caras (tempo acumulado em todas as capturas):", file=sys.stderr)
+        for funcao in relatorio["funcoesMaisCaras"]:
+            print(f"  {funcao['tempoAcumuladoS']:9.3f} s  {funcao['chamadas']:9}  {funcao['funcao']} ({funcao['arquivo']})", file=sys.stderr)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    # Código 1 se alguma reprodução falhou (erro reproduzido ou novo)
+    return 1 if any(linha["erro"] for linha in capturas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Reprocessa em primeiro plano as extrações do histórico gravadas por versões anteriores dos extratores.
+
+Faz o mesmo que POST /api/historico/reprocessamento (app/reprocessing.py), neste processo:
+útil em uma janela de manutenção ou em um cron, sem depender do servidor. O registro do
+reprocessamento é o mesmo, então o progresso aparece em GET /api/historico/reprocessamento
+e as alterações em /api/historico/reprocessamento/alteracoes. --ciclo 1 desliga a pausa entre
+os documentos.
+
+Uso:
+    HISTORY_DB_PATH=/dados/historico.db python tools/reprocess_history.py
+    HISTORY_DB_PATH=/dados/historico.db python tools/reprocess_history.py --ciclo 1
+"""
+import argparse
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocessa as extrações desatualizadas do histórico.")
+    parser.add_argument("--ciclo", type=float, help="fração do tempo ocupada pela extração (padrão REPROCESS_DUTY_CYCLE)")
+    args = parser.parse_args()
+    if not os.environ.get("HISTORY_DB_PATH"):
+        parser.error("configure HISTORY_DB_PATH")
+    if args.ciclo is not None:
+        os.environ["REPROCESS_DUTY_CYCLE"] = str(args.ciclo)
+
+    os.environ["EXTRACTION_PARALLEL_WORKERS"] = "1"
+    from app import main as extractor
+    from app import reprocessing
+
+    registro = reprocessing.claim(extractor.PARSER_VERSION)
+    if registro is None:
+        print("Já existe um reprocessamento em andamento.", file=sys.stderr)
+        return 1
+    job_id, total = registro
+    print(f"Reprocessamento {job_id}: {total} extrações até a versão {extractor.PARSER_VERSION}.", file=sys.stderr)
+    reprocessing.run(job_id, extractor.PARSER_VERSION)
+    job = reprocessing.get_job(job_id)
+    print(
+        f"{job['estado']}: {job['processadas']} processadas, {job['alteradas']} alteradas "
+        f"({job['linhasAlteradas']} linhas), {job['erros']} erros, {job['porMinuto']} por minuto.",
+        file=sys.stderr,
+    )
+    return 1 if job["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Atualiza a tabela local da Selic mensal (série 4390 do SGS/Banco Central).
+
+Baixa a série da API do SGS e grava o arquivo lido por /api/atualizacao/debitos
+(SELIC_TABLE_PATH, padrão app/selic_mensal.json). Sem acesso à API a partir do
+servidor, baixe o JSON em outra máquina e importe com --de-arquivo.
+
+Uso:
+    python tools/update_selic.py
+    python tools/update_selic.py --de-arquivo bcdata.sgs.4390.json --saida /dados/selic.json
+"""
+import argparse
+import json
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from app import late_charges  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grava a tabela local da Selic mensal (série 4390).")
+    parser.add_argument("--de-arquivo", help="JSON da série já baixado (formato da API do SGS)")
+    parser.add_argument("--saida", help="arquivo da tabela (padrão: SELIC_TABLE_PATH ou app/selic_mensal.json)")
+    args = parser.parse_args()
+
+    if args.de_arquivo:
+        with open(args.de_arquivo, encoding="utf-8") as f:
+            taxas = {}
+            for ponto in json.load(f):
+                dia, mes, ano = ponto["data"].split("/")
+                taxas[f"{ano}-{mes}"] = float(ponto["valor"])
+    else:
+        taxas = late_charges.download_table()
+    # Valida a sequência de meses antes de gravar
+    tabela = late_charges.RateTable(taxas)
+    caminho = args.saida or late_charges.get_table_path()
+    late_charges.save_table(taxas, caminho)
+    print(f"{len(taxas)} meses gravados em {caminho} (até {tabela.last_month()}).", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())